@@ -0,0 +1,282 @@
+"""
+Batch Processing
+Runs scene detection for many clips submitted together, fairly across users
+
+Trainers often record a session as 10-20 short clips. POST /api/batches
+takes them in one request (as files, or as direct upload tokens) and
+returns a batch id; every clip becomes its own editor session and is
+detected in the background.
+
+Clips are queued per user and dispatched round-robin, so one user's
+20-clip batch does not hold up another user's two clips. Each web worker
+runs MEDIA_WORKERS dispatcher threads; the media slots in media_pool
+keep the host-wide limit on concurrent detection.
+
+Batch state is written to a JSON file in BATCH_STATE_DIR after every
+change, so any web worker on the host can answer polls for a batch. The
+clips themselves are processed by the worker that accepted the batch,
+whose pid is in the state file; if that worker has died (a restart or
+timeout), the next read marks its unfinished files failed.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from werkzeug.utils import secure_filename
+
+try:
+    from config import Config
+    BATCH_STATE_DIR = Config.BATCH_STATE_DIR
+    BATCH_RETENTION_HOURS = Config.BATCH_RETENTION_HOURS
+    MEDIA_WORKERS = Config.MEDIA_WORKERS
+except ImportError:
+    BATCH_STATE_DIR = os.getenv('BATCH_STATE_DIR', 'batches')
+    BATCH_RETENTION_HOURS = float(os.getenv('BATCH_RETENTION_HOURS', 24))
+    MEDIA_WORKERS = int(os.getenv('MEDIA_WORKERS', 0)) or os.cpu_count() or 1
+
+# File states, in the order a file goes through them
+FILE_QUEUED = 'queued'
+FILE_PROCESSING = 'processing'
+FILE_COMPLETED = 'completed'
+FILE_FAILED = 'failed'
+
+BATCH_RUNNING = 'running'
+BATCH_COMPLETED = 'completed'
+
+
+class FairQueue:
+    """
+    Queue that hands out items in turns across users
+
+    The next item comes from the user with the fewest turns so far, then the
+    one whose last turn was longest ago. A user who joins while others are
+    waiting starts level with them and goes next, instead of behind every
+    item already queued.
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._turns = {}
+        self._last_turn = {}
+        self._clock = 0
+        self._condition = threading.Condition()
+
+    def put(self, user: str, item) -> None:
+        with self._condition:
+            if user not in self._queues:
+                self._queues[user] = deque()
+                self._turns[user] = min((self._turns[u] for u in self._queues if u != user), default=0)
+                self._last_turn[user] = -1
+            self._queues[user].append(item)
+            self._condition.notify()
+
+    def get(self):
+        """Next item (blocks while the queue is empty)"""
+        with self._condition:
+            while not self._queues:
+                self._condition.wait()
+            user = min(self._queues, key=lambda u: (self._turns[u], self._last_turn[u]))
+            queue = self._queues[user]
+            item = queue.popleft()
+            self._clock += 1
+            self._turns[user] += 1
+            self._last_turn[user] = self._clock
+            if not queue:
+                del self._queues[user], self._turns[user], self._last_turn[user]
+            return item
+
+    def __len__(self) -> int:
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+
+def _state_path(batch_id: str, state_dir: str) -> str:
+    return os.path.join(state_dir, f"{secure_filename(batch_id)}.json")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _write_state(batch: Dict, state_dir: str) -> None:
+    """Write a batch's state file atomically"""
+    path = _state_path(batch['batch_id'], state_dir)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(batch, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[Batch] Warning: Could not write state of {batch['batch_id']}: {e}")
+
+
+def load_batch(batch_id: str, state_dir: str = BATCH_STATE_DIR) -> Optional[Dict]:
+    """
+    Read a batch's state
+
+    A running batch whose worker is gone can make no more progress: its
+    queued and processing files are marked failed and the batch completed.
+
+    Args:
+        batch_id: Batch id from submit()
+        state_dir: Folder holding batch state files
+
+    Returns:
+        Batch state dictionary, or None if the batch is unknown
+    """
+    try:
+        with open(_state_path(batch_id, state_dir), encoding='utf-8') as f:
+            batch = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if batch['state'] == BATCH_RUNNING and batch.get('pid') and not _process_alive(batch['pid']):
+        now = time.time()
+        for f in batch['files']:
+            if f['state'] in (FILE_QUEUED, FILE_PROCESSING):
+                f.update(state=FILE_FAILED, finished=now, error='The worker processing this batch stopped')
+        batch.update(state=BATCH_COMPLETED, updated=now)
+        print(f"[Batch] {batch_id}: worker {batch['pid']} is gone, unfinished files marked failed")
+        _write_state(batch, state_dir)
+    return batch
+
+
+def prune_batches(state_dir: str = BATCH_STATE_DIR, max_age_hours: float = BATCH_RETENTION_HOURS) -> int:
+    """Delete state files of batches not updated for max_age_hours; returns the number deleted"""
+    if not os.path.isdir(state_dir):
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    deleted = 0
+    for name in os.listdir(state_dir):
+        path = os.path.join(state_dir, name)
+        try:
+            if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                deleted += 1
+        except FileNotFoundError:
+            pass
+    return deleted
+
+
+class BatchScheduler:
+    """
+    Queues batch files fairly across users and processes them on dispatcher threads
+
+    The process callable does the work for one file:
+    process(source, params) -> result dictionary, where source is what
+    submit() was given for that file. An exception marks the file failed.
+    """
+
+    def __init__(self, process: Callable[[Dict, Dict], Dict], workers: int = MEDIA_WORKERS,
+                 state_dir: str = BATCH_STATE_DIR):
+        """
+        Args:
+            process: Called for each file on a dispatcher thread
+            workers: Dispatcher threads
+            state_dir: Folder for batch state files
+        """
+        self._process = process
+        self._workers = max(1, workers)
+        self._state_dir = state_dir
+        self._queue = FairQueue()
+        self._batches = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, user: str, sources: List[Dict], params: Dict) -> Dict:
+        """
+        Queue a batch
+
+        Args:
+            user: Fairness key (files of different users are interleaved)
+            sources: One dictionary per file; must include 'filename'
+            params: Passed to process() with every file
+
+        Returns:
+            The new batch's state
+        """
+        os.makedirs(self._state_dir, exist_ok=True)
+        prune_batches(self._state_dir)
+
+        batch_id = uuid.uuid4().hex[:16]
+        now = time.time()
+        batch = {
+            'batch_id': batch_id,
+            'user': user,
+            # Only this process has the files queued
+            'pid': os.getpid(),
+            'state': BATCH_RUNNING,
+            'created': now,
+            'updated': now,
+            'params': params,
+            'files': [
+                {'index': i, 'filename': source['filename'], 'state': FILE_QUEUED,
+                 'started': None, 'finished': None, 'result': None, 'error': None}
+                for i, source in enumerate(sources)
+            ]
+        }
+        with self._lock:
+            self._batches[batch_id] = batch
+            self._write(batch)
+            snapshot = json.loads(json.dumps(batch))
+
+        self._start()
+        for i, source in enumerate(sources):
+            self._queue.put(user, (batch_id, i, source))
+        print(f"[Batch] {batch_id}: {len(sources)} files queued for {user} ({len(self._queue)} files waiting)")
+        return snapshot
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self._workers):
+                thread = threading.Thread(target=self._dispatch, name=f"batch-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _dispatch(self) -> None:
+        while True:
+            batch_id, index, source = self._queue.get()
+            self._update(batch_id, index, state=FILE_PROCESSING, started=time.time())
+            with self._lock:
+                params = self._batches[batch_id]['params']
+            try:
+                result = self._process(source, params)
+                self._update(batch_id, index, state=FILE_COMPLETED, finished=time.time(), result=result)
+            except Exception as e:
+                print(f"[Batch] {batch_id}: {source['filename']} failed: {e}")
+                self._update(batch_id, index, state=FILE_FAILED, finished=time.time(), error=str(e))
+
+    def _update(self, batch_id: str, index: int, **changes) -> None:
+        with self._lock:
+            batch = self._batches[batch_id]
+            batch['files'][index].update(changes)
+            batch['updated'] = time.time()
+            if all(f['state'] in (FILE_COMPLETED, FILE_FAILED) for f in batch['files']):
+                batch['state'] = BATCH_COMPLETED
+                # Finished batches are served from their state file
+                del self._batches[batch_id]
+            self._write(batch)
+
+    def _write(self, batch: Dict) -> None:
+        """Write a batch's state file (called with the lock held)"""
+        _write_state(batch, self._state_dir)
+
+
+def summarize(batch: Dict) -> Dict:
+    """Batch state with a count of files per state"""
+    counts = {state: 0 for state in (FILE_QUEUED, FILE_PROCESSING, FILE_COMPLETED, FILE_FAILED)}
+    for f in batch['files']:
+        counts[f['state']] += 1
+    return dict(batch, counts=counts)
@@ -0,0 +1,7 @@
+"""
+Performance Benchmarks
+Synthetic test clips and timing harnesses for the video pipeline
+
+Run from the repository root, e.g.:
+    python -m benchmarks.bench_detectors
+"""
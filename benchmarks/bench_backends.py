@@ -0,0 +1,215 @@
+"""
+Detection Backend Benchmark
+Compares the content detector on PySceneDetect with the FFmpeg rawvideo pipe
+backend (pipe_detection.py): throughput, scoring cost per frame and how
+closely their cuts agree
+
+Throughput is whole-run frames per second through run_detection(), decode
+included. Scoring cost is the time spent in ContentDetector.process_frame()
+(HSV conversion and frame score) against FrameRing.scores() (one batch of
+NumPy operations, divided by its frames); the pipe is also run with each
+batch size from --batches.
+
+Agreement matches the pipe backend's cuts to ContentDetector's within one
+frame; both are also checked against the clips' ground truth.
+
+Before timing, the pipe backend is run with minimum scene lengths of 0,
+under one frame and below 0 (the HTTP routes reject these, run_detection()
+clamps them to one frame). It exits with 1 if any of them hangs past
+--check-timeout or reports two cuts less than a frame apart.
+
+Usage:
+    python -m benchmarks.bench_backends [--resolutions 360p,720p] [--lengths 12]
+                                        [--batches 1,16,64] [--threshold 27]
+                                        [--check-timeout 60] [--json backends.json]
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+
+from benchmarks.harness import build_report, write_report
+from benchmarks.synthetic import generate_clip_set, match_cuts
+from scene_detection import run_detection
+
+
+class _Timer:
+    """Wraps a method and adds up the time spent in it and the frames it handled"""
+
+    def __init__(self, owner, name: str, frames):
+        self.owner = owner
+        self.name = name
+        self.original = getattr(owner, name)
+        self.seconds = 0.0
+        self.frames = 0
+        timer = self
+
+        def timed(instance, *args, **kwargs):
+            start = time.perf_counter()
+            result = timer.original(instance, *args, **kwargs)
+            timer.seconds += time.perf_counter() - start
+            timer.frames += frames(args, result)
+            return result
+
+        setattr(owner, name, timed)
+
+    def restore(self):
+        setattr(self.owner, self.name, self.original)
+
+    def us_per_frame(self) -> float:
+        return round(self.seconds / self.frames * 1e6, 1) if self.frames else 0.0
+
+
+def bench_scenedetect(clip: dict, threshold: float, min_scene_length: float) -> dict:
+    from scenedetect.detectors import ContentDetector
+
+    timer = _Timer(ContentDetector, 'process_frame', lambda args, result: 1)
+    try:
+        start = time.perf_counter()
+        result = run_detection(clip['path'], ['content'], threshold, min_scene_length=min_scene_length,
+                               backend='scenedetect')
+        elapsed = time.perf_counter() - start
+    finally:
+        timer.restore()
+    return {'result': result, 'seconds': elapsed, 'score_us_per_frame': timer.us_per_frame()}
+
+
+def bench_pipe(clip: dict, threshold: float, min_scene_length: float) -> dict:
+    from pipe_detection import FrameRing
+
+    timer = _Timer(FrameRing, 'scores', lambda args, result: len(result))
+    try:
+        start = time.perf_counter()
+        result = run_detection(clip['path'], ['content'], threshold, min_scene_length=min_scene_length,
+                               backend='pipe')
+        elapsed = time.perf_counter() - start
+    finally:
+        timer.restore()
+    return {'result': result, 'seconds': elapsed, 'score_us_per_frame': timer.us_per_frame()}
+
+
+def bench_batch(clip: dict, batch: int) -> dict:
+    """Frame scores alone with one batch size (the scores, and so the cuts, do not depend on it)"""
+    from pipe_detection import FrameRing, frame_scores
+
+    timer = _Timer(FrameRing, 'scores', lambda args, result: len(result))
+    try:
+        start = time.perf_counter()
+        scored = frame_scores(clip['path'], batch=batch)
+        elapsed = time.perf_counter() - start
+    finally:
+        timer.restore()
+    return {
+        'frames': scored['frames'],
+        'median_s': round(elapsed, 4),
+        'fps': round(scored['frames'] / elapsed, 1) if elapsed > 0 else 0.0,
+        'score_us_per_frame': timer.us_per_frame()
+    }
+
+
+# Minimum scene lengths in seconds that once made the pipe backend loop forever
+SHORT_MIN_SCENE_LENGTHS = (0.0, 0.01, -1.0)
+
+
+def _pipe_cut_frames(path: str, threshold: float, min_scene_length: float) -> list:
+    result = run_detection(path, ['content'], threshold, min_scene_length=min_scene_length, backend='pipe')
+    return [cut['frame'] for cut in result['cuts']]
+
+
+def check_short_min_scene_lengths(clip: dict, threshold: float, timeout: float) -> list:
+    """Pipe backend runs with zero, sub-frame and negative minimum lengths; returns failure messages"""
+    failures = []
+    context = multiprocessing.get_context('spawn')
+    for min_scene_length in SHORT_MIN_SCENE_LENGTHS:
+        with context.Pool(1) as pool:
+            job = pool.apply_async(_pipe_cut_frames, (clip['path'], threshold, min_scene_length))
+            try:
+                frames = job.get(timeout)
+            except multiprocessing.TimeoutError:
+                failures.append(f"{clip['name']} min_scene_length={min_scene_length}: no result in {timeout:.0f}s")
+                pool.terminate()
+                continue
+        if not frames or any(b - a < 1 for a, b in zip(frames, frames[1:])):
+            failures.append(f"{clip['name']} min_scene_length={min_scene_length}: cuts {frames}")
+    return failures
+
+
+def summarize(run: dict, clip: dict, reference=None) -> dict:
+    """Throughput and accuracy of one run; agreement with the reference (ContentDetector) cuts"""
+    result = run['result']
+    times = [cut['time'] for cut in result['cuts']]
+    truth = match_cuts(times, clip['cuts'])
+    row = {
+        'frames': result['frames'],
+        'median_s': round(run['seconds'], 4),
+        'fps': round(result['frames'] / run['seconds'], 1) if run['seconds'] > 0 else 0.0,
+        'score_us_per_frame': run['score_us_per_frame'],
+        'cuts': len(times),
+        'recall': round(truth['recall'], 3),
+        'precision': round(truth['precision'], 3)
+    }
+    if reference is not None:
+        agreement = match_cuts(times, reference, tolerance=1.0 / result['fps'])
+        # Share of ContentDetector's cuts found, and share of these cuts ContentDetector also found
+        row['agreement_recall'] = round(agreement['recall'], 3)
+        row['agreement_precision'] = round(agreement['precision'], 3)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Content detection on PySceneDetect vs the rawvideo pipe backend')
+    parser.add_argument('--clips-dir', default='benchmarks/clips', help='Folder for synthetic clips')
+    parser.add_argument('--resolutions', default='360p,720p', help='Comma-separated: 360p,720p,1080p')
+    parser.add_argument('--lengths', default='12', help='Comma-separated block counts per clip')
+    parser.add_argument('--batches', default='1,16,64', help='Comma-separated pipe batch sizes (frames)')
+    parser.add_argument('--threshold', type=float, default=27.0)
+    parser.add_argument('--min-scene-length', type=float, default=0.6)
+    parser.add_argument('--check-timeout', type=float, default=60.0,
+                        help='Seconds a short minimum scene length run may take before it counts as hung')
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    clips = generate_clip_set(
+        args.clips_dir,
+        resolutions=args.resolutions.split(','),
+        lengths=[int(n) for n in args.lengths.split(',')]
+    )
+    batches = [int(b) for b in args.batches.split(',') if b.strip()]
+
+    failures = []
+    for clip in clips:
+        failures.extend(check_short_min_scene_lengths(clip, args.threshold, args.check_timeout))
+    if failures:
+        print("[Benchmark] FAILED:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print(f"[Benchmark] Minimum scene lengths {', '.join(map(str, SHORT_MIN_SCENE_LENGTHS))} finish on the pipe backend")
+
+    results = {}
+    print(f"{'clip':<14} {'backend':<16} {'fps':>7} {'score us/f':>11} {'cuts':>5} {'recall':>7} "
+          f"{'agree rec':>10} {'agree prec':>11}")
+    for clip in clips:
+        reference_run = bench_scenedetect(clip, args.threshold, args.min_scene_length)
+        reference = [cut['time'] for cut in reference_run['result']['cuts']]
+        rows = {
+            'scenedetect': summarize(reference_run, clip),
+            'pipe': summarize(bench_pipe(clip, args.threshold, args.min_scene_length), clip, reference)
+        }
+        for batch in batches:
+            rows[f"pipe batch {batch}"] = bench_batch(clip, batch)
+
+        for backend, row in rows.items():
+            print(f"{clip['name']:<14} {backend:<16} {row['fps']:>7} {row['score_us_per_frame']:>11} "
+                  f"{row.get('cuts', '-'):>5} {row.get('recall', '-'):>7} {row.get('agreement_recall', '-'):>10} "
+                  f"{row.get('agreement_precision', '-'):>11}")
+            results[f"detect {clip['name']} {backend}"] = row
+
+    report = build_report('backends', results)
+    if args.json_path:
+        write_report(report, args.json_path)
+
+
+if __name__ == '__main__':
+    main()
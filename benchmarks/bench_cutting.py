@@ -0,0 +1,165 @@
+"""
+Segment Cutting Benchmark
+Checks that cut segments start on the right frame and measures the decode
+work per cut, with and without the keyframe index (two-stage seeking in
+video_processing.cut_video_segment)
+
+Cuts are made from synthetic counter clips (benchmarks/synthetic.py) whose
+frames show their own index, at random frame times and at times between
+two frames. A segment is frame-accurate when its first frame is the first
+source frame at or after the cut's start time and it has as many frames as
+its duration covers. Decode work is reported as the frames decoded and
+dropped before each segment's first frame (start time minus the preceding
+keyframe) and as FFmpeg CPU seconds per cut.
+
+Exits with 1 if any two-stage cut is not frame-accurate, so it doubles as
+the check for seek accuracy.
+
+Usage:
+    python -m benchmarks.bench_cutting [--gops 30,300] [--cuts 12] [--duration 40]
+                                       [--segment 2.0] [--seed 7] [--json cutting.json]
+"""
+
+import argparse
+import math
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import build_report, write_report
+from benchmarks.synthetic import generate_counter_clip, first_frame_index
+from encoder_profiles import get_profile
+from video_processing import cut_video_segment, get_ffprobe_command, preceding_keyframe, _probe_keyframes
+
+METHODS = ['input-seek', 'two-stage']
+
+
+def frame_count(video_path: str) -> int:
+    """Video frames in a file (counted from packets, without decoding)"""
+    result = subprocess.run([
+        get_ffprobe_command(), '-v', 'error', '-select_streams', 'v:0', '-count_packets',
+        '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', video_path
+    ], capture_output=True, text=True, check=True)
+    return int(result.stdout.strip().rstrip(','))
+
+
+def cut_times(clip: dict, count: int, segment: float, seed: int) -> list:
+    """Start times: half on frame times, half between two frames, none on a keyframe"""
+    rng = random.Random(seed)
+    fps = clip['fps']
+    last_frame = int((clip['duration'] - segment) * fps) - 1
+    times = []
+    while len(times) < count:
+        frame = rng.randint(1, last_frame)
+        if frame % clip['gop'] == 0:
+            continue
+        offset = 0.0 if len(times) % 2 == 0 else 0.4 / fps
+        times.append(round(frame / fps + offset, 6))
+    return times
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_clip(clip: dict, starts: list, segment: float, workdir: str) -> dict:
+    """Cut every start time with both methods and check each segment's frames"""
+    fps = clip['fps']
+    profile = get_profile('fast-preview')
+
+    started = time.perf_counter()
+    index = _probe_keyframes(clip['path'])
+    index_seconds = time.perf_counter() - started
+
+    results = {}
+    for method in METHODS:
+        errors = []
+        cpu = []
+        wall = []
+        for n, start in enumerate(starts):
+            output = os.path.join(workdir, f"cut_{method}_{n}.mp4")
+            cpu_before = _children_cpu()
+            wall_before = time.perf_counter()
+            cut_video_segment(clip['path'], output, start, start + segment, remove_audio=True, profile=profile,
+                              keyframes=index if method == 'two-stage' else None)
+            wall.append(time.perf_counter() - wall_before)
+            cpu_before_probe = _children_cpu()
+            cpu.append(cpu_before_probe - cpu_before)
+
+            # A start within 1ms of a frame time means that frame
+            expected_first = math.ceil(start * fps - 0.001 * fps)
+            expected_frames = round(segment * fps)
+            first = first_frame_index(output)
+            frames = frame_count(output)
+            if first != expected_first or frames != expected_frames:
+                errors.append({'start': start, 'expected_first': expected_first, 'first': first,
+                               'expected_frames': expected_frames, 'frames': frames})
+            os.remove(output)
+
+        dropped = [round((start - preceding_keyframe(index['keyframes'], start)) * fps) for start in starts]
+        results[method] = {
+            'cuts': len(starts),
+            'frame_accurate': len(starts) - len(errors),
+            'errors': errors,
+            'max_start_error_frames': max((abs(e['first'] - e['expected_first']) for e in errors), default=0),
+            'median_s': round(statistics.median(wall), 4),
+            'cpu_s_per_cut': round(statistics.mean(cpu), 4),
+            # Both methods start decoding at the keyframe before the cut
+            'dropped_frames_per_cut': round(statistics.mean(dropped), 1)
+        }
+
+    return {'keyframes': len(index['keyframes']), 'index_s': round(index_seconds, 4), 'methods': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Frame accuracy and decode work of segment cuts')
+    parser.add_argument('--gops', default='30,300', help='Comma-separated keyframe intervals (frames) to test')
+    parser.add_argument('--cuts', type=int, default=12, help='Cuts per clip')
+    parser.add_argument('--duration', type=float, default=40.0, help='Length of each test clip in seconds')
+    parser.add_argument('--segment', type=float, default=2.0, help='Length of each cut in seconds')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    with tempfile.TemporaryDirectory(prefix='bench_cutting_') as workdir:
+        for gop in [int(g) for g in args.gops.split(',') if g.strip()]:
+            path = os.path.join(workdir, f"counter_gop{gop}.mp4")
+            clip = generate_counter_clip(path, duration=args.duration, fps=args.fps, gop=gop)
+            starts = cut_times(clip, args.cuts, args.segment, args.seed)
+            result = bench_clip(clip, starts, args.segment, workdir)
+
+            print(f"[Benchmark] GOP {gop} frames: {result['keyframes']} keyframes indexed in {result['index_s']:.3f}s")
+            for method, stats in result['methods'].items():
+                print(f"  {method:<11} {stats['frame_accurate']}/{stats['cuts']} frame-accurate  "
+                      f"median {stats['median_s']:.3f}s  cpu {stats['cpu_s_per_cut']:.3f}s/cut  "
+                      f"{stats['dropped_frames_per_cut']:.0f} frames decoded before the start")
+                results[f"cut gop{gop} {method}"] = stats
+            two_stage = result['methods']['two-stage']
+            if two_stage['errors']:
+                failures.append(f"GOP {gop}: {len(two_stage['errors'])} two-stage cuts not frame-accurate: "
+                                f"{two_stage['errors'][:3]}")
+            results[f"keyframe index gop{gop}"] = {'keyframes': result['keyframes'], 'median_s': result['index_s']}
+
+    report = build_report('cutting', results)
+    if args.json_path:
+        write_report(report, args.json_path)
+
+    if failures:
+        print("[Benchmark] FAILED:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("[Benchmark] Passed")
+
+
+if __name__ == '__main__':
+    main()
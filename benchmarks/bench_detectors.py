@@ -0,0 +1,84 @@
+"""
+Scene Detector Benchmark
+Reports frames/sec and cut recall for every detector combination on
+synthetic test clips
+
+Usage:
+    python -m benchmarks.bench_detectors [--resolutions 360p,720p] [--lengths 6]
+                                         [--combos singles|all] [--json results.json]
+"""
+
+import argparse
+import itertools
+import json
+import time
+
+from scene_detection import run_detection, DETECTOR_NAMES
+from benchmarks.synthetic import generate_clip_set, match_cuts
+
+
+def detector_combinations(mode: str = 'all'):
+    """Detector combinations to benchmark: each alone, or every non-empty subset"""
+    if mode == 'singles':
+        return [(name,) for name in DETECTOR_NAMES]
+    combos = []
+    for size in range(1, len(DETECTOR_NAMES) + 1):
+        combos.extend(itertools.combinations(DETECTOR_NAMES, size))
+    return combos
+
+
+def bench_clip(clip: dict, detectors, threshold: float = 27.0, min_scene_length: float = 0.6) -> dict:
+    """Run one detector combination over one clip and time it"""
+    min_scene_len = int(min_scene_length * clip['fps'])
+
+    start = time.perf_counter()
+    result = run_detection(clip['path'], detectors=detectors, threshold=threshold,
+                           min_scene_len=min_scene_len)
+    elapsed = time.perf_counter() - start
+
+    accuracy = match_cuts([cut['time'] for cut in result['cuts']], clip['cuts'])
+
+    return {
+        'clip': clip['name'],
+        'detectors': '+'.join(detectors),
+        'frames': result['frames'],
+        'seconds': round(elapsed, 4),
+        'fps': round(result['frames'] / elapsed, 1) if elapsed > 0 else 0.0,
+        'cuts': len(result['cuts']),
+        'recall': round(accuracy['recall'], 3),
+        'precision': round(accuracy['precision'], 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scene detector combinations')
+    parser.add_argument('--clips-dir', default='benchmarks/clips', help='Folder for synthetic clips')
+    parser.add_argument('--resolutions', default='360p', help='Comma-separated: 360p,720p,1080p')
+    parser.add_argument('--lengths', default='6', help='Comma-separated block counts per clip')
+    parser.add_argument('--combos', choices=['singles', 'all'], default='all')
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    clips = generate_clip_set(
+        args.clips_dir,
+        resolutions=args.resolutions.split(','),
+        lengths=[int(n) for n in args.lengths.split(',')]
+    )
+
+    results = []
+    print(f"{'clip':<14} {'detectors':<36} {'frames':>7} {'fps':>8} {'cuts':>5} {'recall':>7} {'prec':>6}")
+    for clip in clips:
+        for combo in detector_combinations(args.combos):
+            row = bench_clip(clip, combo)
+            results.append(row)
+            print(f"{row['clip']:<14} {row['detectors']:<36} {row['frames']:>7} {row['fps']:>8} "
+                  f"{row['cuts']:>5} {row['recall']:>7} {row['precision']:>6}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'detectors', 'results': results}, f, indent=2)
+        print(f"[Benchmark] Results written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
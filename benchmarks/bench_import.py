@@ -0,0 +1,158 @@
+"""
+Import Time Benchmark
+Profiles `import server` with `python -X importtime` in a fresh interpreter
+
+A web worker imports server.py before it can accept requests, so anything
+imported at module level delays every cold start and restart. PySceneDetect
+(with OpenCV and NumPy), boto3 and psycopg2 are loaded on first use or by the
+background warm-up instead. This benchmark fails (exit 1) if one of them is
+imported again at module level, or if the import gets slower than
+--max-ms or more than --max-regression slower than a baseline run.
+
+Usage:
+    python -m benchmarks.bench_import [--repeat 5] [--top 15] [--max-ms 400]
+                                      [--baseline previous.json] [--json import.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.harness import build_report, compare, write_report
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages that must not be imported by `import server`
+DEFERRED_MODULES = ['scenedetect', 'cv2', 'numpy', 'boto3', 'psycopg2']
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def profile_import(module: str = 'server') -> dict:
+    """
+    Import a module in a new interpreter with -X importtime
+
+    Runs in an empty temporary directory with local storage and the garbage
+    collector disabled, so the import does not create folders or threads.
+
+    Args:
+        module: Module to import from the repo root
+
+    Returns:
+        Dictionary with total_ms, every imported module ('modules') and
+        the ones imported by the module itself ('subtree'), each as
+        {'module', 'self_ms', 'cumulative_ms', 'depth'}
+    """
+    env = dict(os.environ)
+    env.update({
+        'STORAGE_BACKEND': 'local',
+        'GC_INTERVAL_MINUTES': '0',
+        'PYTHONPATH': REPO_ROOT + os.pathsep + env.get('PYTHONPATH', ''),
+        'PYTHONDONTWRITEBYTECODE': '1'
+    })
+    with tempfile.TemporaryDirectory(prefix='bench_import_') as workdir:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                'module': name,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'depth': len(indent) // 2
+            })
+
+    index = next((i for i, m in enumerate(modules) if m['module'] == module and m['depth'] == 0), None)
+    if index is None:
+        raise RuntimeError(f"No importtime entry for {module}")
+    # importtime prints a module after everything it imported
+    start = index
+    while start > 0 and modules[start - 1]['depth'] > 0:
+        start -= 1
+    return {'total_ms': modules[index]['cumulative_ms'], 'modules': modules, 'subtree': modules[start:index]}
+
+
+def deferred_imports(modules: list) -> list:
+    """Top-level packages from DEFERRED_MODULES that were imported"""
+    imported = {m['module'].split('.')[0] for m in modules}
+    return [name for name in DEFERRED_MODULES if name in imported]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time of server.py (python -X importtime)')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to time (median is reported)')
+    parser.add_argument('--top', type=int, default=15, help='Slowest top-level imports to list')
+    parser.add_argument('--max-ms', type=float, help='Fail if the median import time exceeds this')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Allowed slowdown vs the baseline (fraction, default 0.2)')
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    # One untimed run so the bytecode cache and page cache are warm
+    profile_import()
+    runs = [profile_import() for _ in range(args.repeat)]
+    totals = [run['total_ms'] for run in runs]
+    median_ms = statistics.median(totals)
+    last = runs[-1]
+
+    print(f"[Benchmark] import server: median {median_ms:.1f}ms "
+          f"(min {min(totals):.1f}ms, max {max(totals):.1f}ms, {args.repeat} runs)")
+
+    # Direct imports of server, by cumulative time
+    top_level = [m for m in last['subtree'] if m['depth'] == 1]
+    top_level.sort(key=lambda m: m['cumulative_ms'], reverse=True)
+    for entry in top_level[:args.top]:
+        print(f"  {entry['cumulative_ms']:8.1f}ms  {entry['module']}")
+
+    failures = []
+    loaded = deferred_imports(last['modules'])
+    if loaded:
+        failures.append(f"import server loads {', '.join(loaded)} (should be imported on first use)")
+    if args.max_ms is not None and median_ms > args.max_ms:
+        failures.append(f"import server: {median_ms:.1f}ms exceeds {args.max_ms:.1f}ms")
+
+    results = {
+        'import server': {
+            'median_s': round(median_ms / 1000, 6),
+            'min_s': round(min(totals) / 1000, 6),
+            'max_s': round(max(totals) / 1000, 6),
+            'runs': args.repeat,
+            'deferred_modules_loaded': loaded,
+            'slowest': [{'module': m['module'], 'cumulative_ms': m['cumulative_ms']}
+                        for m in top_level[:args.top]]
+        }
+    }
+    report = build_report('import', results)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        failures += compare(report, baseline, max_regression=args.max_regression)
+
+    if args.json_path:
+        write_report(report, args.json_path)
+
+    if failures:
+        print("[Benchmark] FAILED:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("[Benchmark] Passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Serving Load Test
+Runs the app under gunicorn and measures exercise library listing latency,
+first on an idle server and then while media jobs (scene detection through
+/reprocess) keep every CPU busy
+
+With the gthread layout from gunicorn.conf.py, listing p99 should stay close
+to its idle value under media load. `--layout sync` starts the previous
+layout (2 sync workers, 120s timeout) for comparison.
+
+Usage:
+    python -m benchmarks.bench_serving [--layout gthread|sync] [--duration 20]
+                                       [--listing-clients 4] [--media-clients 4]
+                                       [--database-url postgresql://postgres@localhost/postgres]
+                                       [--json serving.json]
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import psycopg2
+import requests
+
+from benchmarks.harness import build_report, write_report
+from benchmarks.postgres import throwaway_database
+from benchmarks.synthetic import generate_clip_set
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYOUTS = {
+    'gthread': [],
+    # threads must be 1, or gunicorn silently switches sync workers to gthread
+    'sync': ['--worker-class', 'sync', '--workers', '2', '--threads', '1', '--timeout', '120']
+}
+
+
+def seed_exercises(db_config: dict, count: int) -> None:
+    """Insert count exercises with a muscle group and equipment each"""
+    conn = psycopg2.connect(**db_config)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO muscle_groups (name) VALUES ('legs'), ('core') ON CONFLICT DO NOTHING")
+    cursor.execute("INSERT INTO equipment (name) VALUES ('dumbbells') ON CONFLICT DO NOTHING")
+    cursor.execute("""
+        INSERT INTO exercises (video_file_path, exercise_name, duration, start_time, end_time, thumbnail_url)
+        SELECT '/download/library/' || i || '.mp4', 'Load test exercise ' || i, 3.0, 0, 3.0,
+               '/download/library/' || i || '.jpg'
+        FROM generate_series(1, %s) AS i
+    """, (count,))
+    cursor.execute("""
+        INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id)
+        SELECT e.id, mg.id FROM exercises e
+        JOIN muscle_groups mg ON mg.name = CASE WHEN e.id % 2 = 0 THEN 'legs' ELSE 'core' END
+    """)
+    cursor.execute("""
+        INSERT INTO exercise_equipment (exercise_id, equipment_id)
+        SELECT e.id, eq.id FROM exercises e, equipment eq WHERE e.id % 3 = 0
+    """)
+    conn.commit()
+    conn.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(layout: str, workdir: str, db_config: dict, port: int) -> subprocess.Popen:
+    """Start gunicorn with the repo's config (plus the layout's overrides) and wait until it answers"""
+    env = dict(os.environ)
+    for name in ('DATABASE_URL', 'DATABASE_PUBLIC_URL'):
+        env.pop(name, None)
+    env.update({
+        'DB_HOST': db_config['host'],
+        'DB_PORT': str(db_config['port']),
+        'DB_NAME': db_config['database'],
+        'DB_USER': db_config['user'],
+        'DB_PASSWORD': db_config['password'] or 'unused',
+        'STORAGE_BACKEND': 'local',
+        'GC_INTERVAL_MINUTES': '0',
+        'MEDIA_SLOT_DIR': os.path.join(workdir, 'media_slots'),
+        'PROMETHEUS_MULTIPROC_DIR': os.path.join(workdir, 'metrics')
+    })
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'server:app',
+         '--config', os.path.join(REPO_ROOT, 'gunicorn.conf.py'),
+         '--pythonpath', REPO_ROOT, '--bind', f"127.0.0.1:{port}",
+         '--access-logfile', os.devnull, *LAYOUTS[layout]],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(workdir, 'gunicorn.log'), 'w')
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.25)
+    process.kill()
+    raise RuntimeError(f"gunicorn did not start; see {os.path.join(workdir, 'gunicorn.log')}")
+
+
+def _percentiles(samples: list) -> dict:
+    if not samples:
+        return {'requests': 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        'requests': len(ordered),
+        'p50_s': round(statistics.median(ordered), 4),
+        'p95_s': round(pick(0.95), 4),
+        'p99_s': round(pick(0.99), 4),
+        'max_s': round(ordered[-1], 4)
+    }
+
+
+def run_phase(base_url: str, duration: float, listing_clients: int, media_clients: int, video_path: str) -> dict:
+    """Listing clients (and optionally media clients) in a loop for duration seconds"""
+    stop = threading.Event()
+    latencies, errors = [], []
+    media = {'completed': 0, 'busy': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def list_library():
+        session = requests.Session()
+        page = 0
+        while not stop.is_set():
+            page = page % 10 + 1
+            start = time.perf_counter()
+            try:
+                response = session.get(f"{base_url}/api/exercises", params={'page': page, 'per_page': 50}, timeout=120)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+
+    def detect():
+        session = requests.Session()
+        while not stop.is_set():
+            try:
+                response = session.get(f"{base_url}/reprocess", params={'path': video_path, 'threshold': 27},
+                                       timeout=600)
+                outcome = {200: 'completed', 503: 'busy'}.get(response.status_code, 'failed')
+            except requests.RequestException:
+                outcome = 'failed'
+            with lock:
+                media[outcome] += 1
+            if outcome == 'busy':
+                time.sleep(0.5)
+
+    threads = [threading.Thread(target=list_library) for _ in range(listing_clients)]
+    threads += [threading.Thread(target=detect) for _ in range(media_clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    result = _percentiles(latencies)
+    result['errors'] = len(errors)
+    if media_clients:
+        result['media'] = media
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Library listing latency under media load')
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), default='gthread')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds per phase')
+    parser.add_argument('--listing-clients', type=int, default=4)
+    parser.add_argument('--media-clients', type=int, default=0, help='Concurrent detection clients (default: 2x CPUs)')
+    parser.add_argument('--exercises', type=int, default=2000, help='Exercises seeded into the library')
+    parser.add_argument('--resolution', default='360p', help='Clip resolution for the media jobs')
+    parser.add_argument('--clips-dir', default='benchmarks/clips', help='Folder for synthetic clips')
+    parser.add_argument('--database-url', help='Server to create the throwaway database on '
+                                               '(default: BENCH_DATABASE_URL, else a temporary cluster)')
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    media_clients = args.media_clients or 2 * (os.cpu_count() or 1)
+    clip = generate_clip_set(os.path.abspath(args.clips_dir), resolutions=[args.resolution], lengths=[12])[0]
+
+    workdir = tempfile.mkdtemp(prefix='bench_serving_')
+    # /reprocess only accepts paths under output/
+    video_path = os.path.join('output', 'load_test', os.path.basename(clip['path']))
+    os.makedirs(os.path.join(workdir, 'output', 'load_test'))
+    shutil.copy2(clip['path'], os.path.join(workdir, video_path))
+
+    process = None
+    try:
+        with throwaway_database(args.database_url) as db_config:
+            seed_exercises(db_config, args.exercises)
+            port = _free_port()
+            process = start_server(args.layout, workdir, db_config, port)
+            base_url = f"http://127.0.0.1:{port}"
+            print(f"[Benchmark] gunicorn ({args.layout}) on {base_url}, {os.cpu_count()} CPUs")
+
+            results = {}
+            print(f"[Benchmark] Idle: {args.listing_clients} listing clients for {args.duration:.0f}s")
+            results['idle'] = run_phase(base_url, args.duration, args.listing_clients, 0, video_path)
+            print(f"  {results['idle']}")
+
+            print(f"[Benchmark] Loaded: + {media_clients} detection clients on {clip['name']}")
+            results['loaded'] = run_phase(base_url, args.duration, args.listing_clients, media_clients, video_path)
+            print(f"  {results['loaded']}")
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    idle_p99, loaded_p99 = results['idle'].get('p99_s'), results['loaded'].get('p99_s')
+    if idle_p99 and loaded_p99:
+        results['p99_ratio'] = round(loaded_p99 / idle_p99, 2)
+        print(f"[Benchmark] Listing p99: idle {idle_p99 * 1000:.1f}ms, loaded {loaded_p99 * 1000:.1f}ms "
+              f"({results['p99_ratio']}x)")
+
+    if args.json_path:
+        report = build_report('serving', results)
+        report['layout'] = args.layout
+        write_report(report, args.json_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+Upload Memory Benchmark
+Receives concurrent multipart uploads the way /process and /share-receiver
+do and reports the process's peak RSS, for the streaming parser
+(streaming_upload.receive_multipart) and for Werkzeug's form parser plus
+file.save() (what request.files did before)
+
+Each mode runs in a fresh interpreter, so peak RSS (VmHWM) is its own.
+Request bodies are generated on the fly and read in 64 KB pieces like a
+socket, so the client side adds no memory. Dirty page cache (system-wide,
+from /proc/meminfo) is sampled as well; the streaming parser's fsync
+budgets keep it bounded.
+
+Usage:
+    python -m benchmarks.bench_upload [--clients 8] [--size-mb 100] [--modes streaming,werkzeug]
+                                      [--fsync-mb 16] [--inflight-mb 64] [--dir /var/tmp]
+                                      [--max-rss-mb 200] [--json upload.json]
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.harness import build_report, write_report
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ['streaming', 'werkzeug']
+BOUNDARY = 'benchUploadBoundary7d41'
+# Bytes a socket read typically returns
+SOCKET_READ = 64 * 1024
+SAMPLE_SECONDS = 0.01
+
+
+class MultipartBody(io.RawIOBase):
+    """Multipart body with a 'video' file part of size bytes, generated while it is read"""
+
+    def __init__(self, size: int, filename: str = 'clip.mp4'):
+        head = (f"--{BOUNDARY}\r\n"
+                f'Content-Disposition: form-data; name="video"; filename="{filename}"\r\n'
+                f"Content-Type: video/mp4\r\n\r\n").encode()
+        tail = (f"\r\n--{BOUNDARY}\r\n"
+                f'Content-Disposition: form-data; name="threshold"\r\n\r\n27\r\n'
+                f"--{BOUNDARY}--\r\n").encode()
+        self._parts = [(head, len(head)), (None, size), (tail, len(tail))]
+        self._pattern = bytes(range(256)) * (SOCKET_READ // 256)
+        self._part = 0
+        self._offset = 0
+        self.length = len(head) + size + len(tail)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self._part < len(self._parts):
+            data, size = self._parts[self._part]
+            if self._offset < size:
+                count = min(len(buffer), size - self._offset, SOCKET_READ)
+                if data is None:
+                    buffer[:count] = self._pattern[:count]
+                else:
+                    buffer[:count] = data[self._offset:self._offset + count]
+                self._offset += count
+                return count
+            self._part += 1
+            self._offset = 0
+        return 0
+
+
+def _status_kb(field: str) -> int:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def _dirty_kb() -> int:
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('Dirty:'):
+                return int(line.split()[1])
+    return 0
+
+
+def receive_streaming(body: MultipartBody, path: str) -> int:
+    from streaming_upload import receive_multipart
+    _, upload = receive_multipart(
+        io.BufferedReader(body, SOCKET_READ), f'multipart/form-data; boundary={BOUNDARY}', body.length,
+        'video', lambda filename: path, max_bytes=body.length
+    )
+    return upload['size']
+
+
+def receive_werkzeug(body: MultipartBody, path: str) -> int:
+    from werkzeug.formparser import parse_form_data
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+        'CONTENT_LENGTH': str(body.length),
+        'wsgi.input': io.BufferedReader(body, SOCKET_READ)
+    }
+    _, _, files = parse_form_data(environ)
+    files['video'].save(path)
+    files['video'].close()
+    return os.path.getsize(path)
+
+
+def run_mode(mode: str, clients: int, size: int, directory: str) -> dict:
+    """Receive clients uploads of size bytes at once in this process"""
+    receive = receive_streaming if mode == 'streaming' else receive_werkzeug
+    # Imports and first-use allocations are not part of the measurement
+    warmup_path = os.path.join(directory, 'upload_warmup.mp4')
+    receive(MultipartBody(SOCKET_READ), warmup_path)
+    os.remove(warmup_path)
+
+    start_rss = _status_kb('VmRSS')
+    start_dirty = _dirty_kb()
+    peak = {'rss': start_rss, 'dirty': start_dirty}
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak['rss'] = max(peak['rss'], _status_kb('VmRSS'))
+            peak['dirty'] = max(peak['dirty'], _dirty_kb())
+            time.sleep(SAMPLE_SECONDS)
+
+    sizes = [0] * clients
+    errors = []
+
+    def client(n):
+        path = os.path.join(directory, f"upload_{n}.mp4")
+        try:
+            sizes[n] = receive(MultipartBody(size), path)
+        except Exception as e:
+            errors.append(f"client {n}: {e}")
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+
+    if errors:
+        raise RuntimeError('; '.join(errors))
+    if any(s != size for s in sizes):
+        raise RuntimeError(f"Received sizes {sizes}, expected {size}")
+    total_mb = clients * size / (1024 * 1024)
+    return {
+        'clients': clients,
+        'upload_mb': size / (1024 * 1024),
+        'seconds': round(elapsed, 3),
+        'mb_per_s': round(total_mb / elapsed, 1),
+        'start_rss_mb': round(start_rss / 1024, 1),
+        'peak_rss_mb': round(max(peak['rss'], _status_kb('VmHWM')) / 1024, 1),
+        'peak_rss_growth_mb': round((max(peak['rss'], _status_kb('VmHWM')) - start_rss) / 1024, 1),
+        'peak_dirty_mb': round(peak['dirty'] / 1024, 1),
+        'start_dirty_mb': round(start_dirty / 1024, 1)
+    }
+
+
+def run_isolated(mode: str, args) -> dict:
+    """run_mode() in a fresh interpreter"""
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': REPO_ROOT + os.pathsep + env.get('PYTHONPATH', ''),
+        'UPLOAD_FSYNC_MB': str(args.fsync_mb),
+        'UPLOAD_INFLIGHT_MB': str(args.inflight_mb)
+    })
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_upload', '--child', mode, '--clients', str(args.clients),
+         '--size-mb', str(args.size_mb), '--dir', args.dir],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak RSS while receiving concurrent multipart uploads')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent uploads')
+    parser.add_argument('--size-mb', type=float, default=100, help='Size of each uploaded file')
+    parser.add_argument('--modes', default=','.join(MODES), help=f"Comma-separated: {', '.join(MODES)}")
+    parser.add_argument('--fsync-mb', type=float, default=16, help='UPLOAD_FSYNC_MB for the streaming parser')
+    parser.add_argument('--inflight-mb', type=float, default=64, help='UPLOAD_INFLIGHT_MB for the streaming parser')
+    parser.add_argument('--dir', default=tempfile.gettempdir(), help='Folder the uploads are written to')
+    parser.add_argument('--max-rss-mb', type=float, help='Fail if the streaming parser peak RSS growth exceeds this')
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_mode(args.child, args.clients, int(args.size_mb * 1024 * 1024), args.dir)
+        print(json.dumps(result))
+        return
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"Unknown modes: {', '.join(unknown)}")
+
+    print(f"[Benchmark] {args.clients} concurrent uploads of {args.size_mb:g} MB to {args.dir}")
+    results = {}
+    for mode in modes:
+        result = run_isolated(mode, args)
+        results[f"upload {mode}"] = result
+        print(f"  {mode:<10} peak RSS {result['peak_rss_mb']:7.1f} MB (+{result['peak_rss_growth_mb']:.1f} MB)  "
+              f"peak dirty {result['peak_dirty_mb']:7.1f} MB  {result['mb_per_s']:7.1f} MB/s  ({result['seconds']:.2f}s)")
+
+    report = build_report('upload', results)
+    if args.json_path:
+        write_report(report, args.json_path)
+
+    streaming = results.get('upload streaming')
+    if args.max_rss_mb is not None and streaming and streaming['peak_rss_growth_mb'] > args.max_rss_mb:
+        print(f"[Benchmark] FAILED: streaming peak RSS growth {streaming['peak_rss_growth_mb']:.1f} MB "
+              f"exceeds {args.max_rss_mb:.1f} MB")
+        sys.exit(1)
+    print("[Benchmark] Passed")
+
+
+if __name__ == '__main__':
+    main()
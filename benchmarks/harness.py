@@ -0,0 +1,117 @@
+"""
+Benchmark Harness
+Timing, result files and threshold comparison shared by the benchmark suites
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional
+
+
+def measure(fn: Callable, repeat: int = 3, warmup: int = 0, setup: Optional[Callable] = None) -> Dict:
+    """
+    Time a callable several times
+
+    Args:
+        fn: Function to time (its last return value is kept under 'result')
+        repeat: Timed runs
+        warmup: Untimed runs before timing
+        setup: Called before every run, outside the timed region
+
+    Returns:
+        Dictionary with median/min/max seconds and the run count
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'median_s': round(statistics.median(timings), 6),
+        'min_s': round(min(timings), 6),
+        'max_s': round(max(timings), 6),
+        'runs': repeat,
+        'result': result
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Current commit hash, if run inside a git checkout"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def build_report(suite: str, results: Dict[str, Dict]) -> Dict:
+    """Wrap results with the metadata needed to compare runs between commits"""
+    return {
+        'suite': suite,
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count()
+        },
+        'results': results
+    }
+
+
+def write_report(report: Dict, path: str) -> None:
+    """Write a report as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"[Benchmark] Results written to {path}")
+
+
+def compare(report: Dict, baseline: Dict, max_regression: float = 0.2,
+            thresholds: Optional[Dict[str, float]] = None) -> List[str]:
+    """
+    Compare a run with a baseline run
+
+    A benchmark fails if its median is more than max_regression (fractional)
+    slower than the baseline median, or above its absolute threshold in seconds.
+
+    Args:
+        report: Current report from build_report()
+        baseline: Earlier report to compare against
+        max_regression: Allowed slowdown, e.g. 0.2 for 20%
+        thresholds: Optional absolute limits {benchmark name: max median seconds}
+
+    Returns:
+        List of failure messages (empty if everything passed)
+    """
+    failures = []
+    baseline_results = baseline.get('results', {}) if baseline else {}
+
+    for name, result in report['results'].items():
+        if 'median_s' not in result:
+            continue
+        median = result['median_s']
+
+        previous = baseline_results.get(name, {}).get('median_s')
+        if previous:
+            change = (median - previous) / previous
+            if change > max_regression:
+                failures.append(f"{name}: {previous:.4f}s -> {median:.4f}s (+{change * 100:.1f}%)")
+
+        limit = (thresholds or {}).get(name)
+        if limit is not None and median > limit:
+            failures.append(f"{name}: {median:.4f}s exceeds threshold {limit:.4f}s")
+
+    return failures
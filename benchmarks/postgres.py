@@ -0,0 +1,100 @@
+"""
+Throwaway Postgres for Benchmarks
+Creates a temporary database with the app's migrations applied, either on an
+existing server (BENCH_DATABASE_URL / --database-url) or on a temporary
+cluster started with initdb + pg_ctl, and removes it afterwards
+"""
+
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import psycopg2
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / 'migrations'
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def _apply_migrations(db_config: Dict) -> None:
+    conn = psycopg2.connect(**db_config)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    for migration_file in sorted(MIGRATIONS_DIR.glob('*.sql')):
+        cursor.execute(migration_file.read_text(encoding='utf-8'))
+    cursor.close()
+    conn.close()
+
+
+@contextmanager
+def _temporary_cluster():
+    """Start a throwaway Postgres cluster (needs initdb/pg_ctl on PATH; not as root)"""
+    initdb = shutil.which('initdb')
+    pg_ctl = shutil.which('pg_ctl')
+    if not initdb or not pg_ctl:
+        raise RuntimeError("initdb/pg_ctl not found; pass --database-url to use an existing server")
+
+    data_dir = tempfile.mkdtemp(prefix='bench_pg_')
+    port = _free_port()
+    try:
+        subprocess.run([initdb, '-D', data_dir, '-U', 'postgres', '--auth=trust'],
+                       capture_output=True, text=True, check=True)
+        subprocess.run([pg_ctl, '-D', data_dir, '-w', '-l', os.path.join(data_dir, 'server.log'),
+                        '-o', f"-p {port} -k {data_dir} -c listen_addresses=localhost", 'start'],
+                       capture_output=True, text=True, check=True)
+        yield {'host': 'localhost', 'port': port, 'user': 'postgres', 'password': '', 'database': 'postgres'}
+    finally:
+        subprocess.run([pg_ctl, '-D', data_dir, '-m', 'immediate', 'stop'], capture_output=True, text=True)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@contextmanager
+def throwaway_database(database_url: Optional[str] = None):
+    """
+    Yield a DB_CONFIG dict for a freshly migrated temporary database
+
+    Args:
+        database_url: Existing server to create the database on
+                      (default: BENCH_DATABASE_URL, else a temporary cluster)
+    """
+    database_url = database_url or os.getenv('BENCH_DATABASE_URL')
+
+    if database_url:
+        parsed = urlparse(database_url)
+        server = {
+            'host': parsed.hostname,
+            'port': parsed.port or 5432,
+            'user': parsed.username,
+            'password': parsed.password or '',
+            'database': parsed.path[1:] or 'postgres'
+        }
+        cluster = None
+    else:
+        cluster = _temporary_cluster()
+        server = cluster.__enter__()
+
+    db_name = f"workout_bench_{secrets.token_hex(4)}"
+    admin = psycopg2.connect(**server)
+    admin.autocommit = True
+    try:
+        admin.cursor().execute(f"CREATE DATABASE {db_name}")
+        db_config = dict(server, database=db_name)
+        _apply_migrations(db_config)
+        print(f"[Benchmark] Using throwaway database {db_name} on {server['host']}:{server['port']}")
+        yield db_config
+    finally:
+        admin.cursor().execute(f"DROP DATABASE IF EXISTS {db_name} WITH (FORCE)")
+        admin.close()
+        if cluster is not None:
+            cluster.__exit__(None, None, None)
@@ -0,0 +1,259 @@
+"""
+End-to-End Benchmark Suite
+Times scene detection, segment cutting, local storage and the Flask endpoints
+on deterministic synthetic clips, and writes a JSON report that can be
+compared with a baseline run to catch regressions between commits
+
+The app runs in a temporary working directory with local storage. Database
+endpoints use a throwaway Postgres (see benchmarks/postgres.py) and are
+reported as skipped when none is available.
+
+Usage:
+    python -m benchmarks.run_suite [--resolutions 360p,720p] [--lengths 6,12]
+                                   [--repeat 3] [--json results.json]
+                                   [--database-url postgresql://postgres@localhost/postgres | --no-db]
+                                   [--baseline previous.json --max-regression 0.2]
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import ExitStack
+
+from benchmarks.harness import measure, build_report, write_report, compare
+from benchmarks.synthetic import generate_clip_set
+
+
+def _segments_for(clip: dict) -> list:
+    """One timeline segment per colour block, as the editor would send them"""
+    bounds = [0.0] + clip['cuts'] + [clip['duration']]
+    return [
+        {
+            'start': start,
+            'end': end,
+            'details': {
+                'name': f"Benchmark exercise {i + 1}",
+                'muscleGroups': ['legs'] if i % 2 == 0 else ['core'],
+                'equipment': ['dumbbells'] if i % 3 == 0 else [],
+                'removeAudio': i % 2 == 1
+            }
+        }
+        for i, (start, end) in enumerate(zip(bounds, bounds[1:]))
+    ]
+
+
+def _record(results: dict, name: str, stats: dict, **extra) -> None:
+    stats.pop('result', None)
+    stats.update(extra)
+    results[name] = stats
+    print(f"  {name:<44} median {stats['median_s']:.4f}s  (min {stats['min_s']:.4f}s, max {stats['max_s']:.4f}s)")
+
+
+def bench_pipeline(server, clips: list, repeat: int, profile: str) -> dict:
+    """Scene detection and timeline cutting called directly (no HTTP)"""
+    from video_processing import split_video_by_timeline
+
+    results = {}
+    for clip in clips:
+        stats = measure(lambda: server.detect_scenes(clip['path'], threshold=27.0, min_scene_length=0.6),
+                        repeat=repeat)
+        frames = stats['result']['frames']
+        _record(results, f"detect_scenes[{clip['name']}]", stats, frames=frames,
+                fps=round(frames / stats['median_s'], 1))
+
+        out_dir = os.path.join('output', f"bench_split_{clip['name']}")
+        stats = measure(
+            lambda: split_video_by_timeline(clip['path'], _segments_for(clip), out_dir,
+                                            base_name=clip['name'], profile=profile),
+            repeat=repeat,
+            setup=lambda: shutil.rmtree(out_dir, ignore_errors=True)
+        )
+        _record(results, f"split_video_by_timeline[{clip['name']},{profile}]", stats,
+                segments=len(stats['result']))
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return results
+
+
+def bench_storage(clips: list, repeat: int) -> dict:
+    """LocalStorage.save from a file path and from a file object"""
+    from storage import LocalStorage
+
+    storage = LocalStorage(os.path.join('output', 'bench_storage'))
+    results = {}
+    for clip in clips:
+        size = os.path.getsize(clip['path'])
+        stats = measure(lambda: storage.save(clip['path'], os.path.basename(clip['path']), folder='path'),
+                        repeat=repeat)
+        _record(results, f"LocalStorage.save_path[{clip['name']}]", stats, bytes=size)
+
+        with open(clip['path'], 'rb') as f:
+            data = f.read()
+        stats = measure(lambda: storage.save(io.BytesIO(data), os.path.basename(clip['path']), folder='fileobj'),
+                        repeat=repeat)
+        _record(results, f"LocalStorage.save_fileobj[{clip['name']}]", stats, bytes=size)
+    shutil.rmtree(storage.base_path, ignore_errors=True)
+    return results
+
+
+def _check(response, name: str):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{name} returned {response.status_code}: {response.get_data(as_text=True)[:300]}")
+    return response
+
+
+def bench_endpoints(server, clips: list, repeat: int, profile: str, with_db: bool) -> dict:
+    """Flask endpoints through the test client"""
+    client = server.app.test_client()
+    results = {}
+
+    _record(results, 'GET /health', measure(lambda: _check(client.get('/health'), '/health'), repeat=repeat * 10))
+
+    for clip in clips:
+        def upload():
+            with open(clip['path'], 'rb') as f:
+                response = client.post('/process', data={
+                    'video': (f, f"{clip['name']}.mp4"),
+                    'threshold': '27',
+                    'min_scene_length': '0.6'
+                }, content_type='multipart/form-data')
+            return _check(response, '/process').get_json()
+
+        stats = measure(upload, repeat=repeat)
+        processed = stats['result']
+        _record(results, f"POST /process[{clip['name']}]", stats, cuts=len(processed['suggested_cuts']))
+
+        # /download/<folder>/<file> -> output/<folder>/<file>
+        video_path = os.path.join('output', *processed['video_url'].split('/')[2:])
+        stats = measure(lambda: _check(client.get('/reprocess', query_string={
+            'path': video_path, 'threshold': '30', 'min_scene_length': '1.0'
+        }), '/reprocess'), repeat=repeat)
+        _record(results, f"GET /reprocess[{clip['name']}]", stats)
+
+        if with_db:
+            # The save deletes the original upload, so restore it before every run
+            original = os.path.join(tempfile.gettempdir(), f"bench_original_{os.getpid()}.mp4")
+            shutil.copy2(video_path, original)
+            payload = {
+                'videoUrl': processed['video_url'],
+                'cutPoints': clip['cuts'],
+                'segments': _segments_for(clip),
+                'encoderProfile': profile
+            }
+            save = lambda: _check(client.post('/api/timeline/save', json=payload), '/api/timeline/save')
+
+            def cold_setup():
+                shutil.copy2(original, video_path)
+                shutil.rmtree(os.path.join('output', 'library'), ignore_errors=True)
+
+            stats = measure(save, repeat=repeat, setup=cold_setup)
+            _record(results, f"POST /api/timeline/save[{clip['name']},{profile}]", stats,
+                    segments=len(payload['segments']))
+
+            # Same timeline again: every segment is already stored
+            stats = measure(save, repeat=repeat, setup=lambda: shutil.copy2(original, video_path))
+            _record(results, f"POST /api/timeline/save[{clip['name']},{profile},reused]", stats,
+                    segments=len(payload['segments']))
+            os.remove(original)
+
+    if with_db:
+        _record(results, 'GET /api/exercises', measure(
+            lambda: _check(client.get('/api/exercises?per_page=20'), '/api/exercises'), repeat=repeat * 5))
+        _record(results, 'GET /api/exercises?search', measure(
+            lambda: _check(client.get('/api/exercises?search=exercise&muscle_groups=legs'), '/api/exercises'),
+            repeat=repeat * 5))
+    else:
+        for name in ('POST /api/timeline/save', 'GET /api/exercises', 'GET /api/exercises?search'):
+            results[name] = {'skipped': 'no database'}
+
+    _record(results, 'GET /metrics', measure(lambda: _check(client.get('/metrics'), '/metrics'), repeat=repeat * 5))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the end-to-end benchmark suite')
+    parser.add_argument('--clips-dir', default='benchmarks/clips', help='Folder for synthetic clips')
+    parser.add_argument('--resolutions', default='360p', help='Comma-separated: 360p,720p,1080p')
+    parser.add_argument('--lengths', default='6', help='Comma-separated block counts per clip')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark')
+    parser.add_argument('--profile', default='fast-preview', help='Encoder profile for cutting benchmarks')
+    parser.add_argument('--database-url', help='Server to create the throwaway database on '
+                                               '(default: BENCH_DATABASE_URL, else a temporary cluster)')
+    parser.add_argument('--no-db', action='store_true', help='Skip the database endpoints')
+    parser.add_argument('--json', dest='json_path', default='benchmark_results.json', help='Report file')
+    parser.add_argument('--baseline', help='Earlier report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Fail if a median is this much slower than the baseline (0.2 = 20%%)')
+    parser.add_argument('--thresholds', help='JSON file of absolute limits {benchmark name: max median seconds}')
+    args = parser.parse_args()
+
+    clips = generate_clip_set(
+        os.path.abspath(args.clips_dir),
+        resolutions=args.resolutions.split(','),
+        lengths=[int(n) for n in args.lengths.split(',')]
+    )
+    json_path = os.path.abspath(args.json_path)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    thresholds_path = os.path.abspath(args.thresholds) if args.thresholds else None
+
+    # server.py creates uploads/ and output/ relative to the working directory
+    repo_root = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='bench_run_')
+    os.environ['STORAGE_BACKEND'] = 'local'
+    os.chdir(workdir)
+    sys.path.insert(0, repo_root)
+
+    try:
+        with ExitStack() as stack:
+            db_config = None
+            if not args.no_db:
+                from benchmarks.postgres import throwaway_database
+                try:
+                    db_config = stack.enter_context(throwaway_database(args.database_url))
+                except Exception as e:
+                    print(f"[Benchmark] No database available, skipping DB endpoints: {e}")
+
+            import server
+            if db_config is not None:
+                server.DB_CONFIG = db_config
+
+            results = {}
+            print("[Benchmark] Pipeline")
+            results.update(bench_pipeline(server, clips, args.repeat, args.profile))
+            print("[Benchmark] Storage")
+            results.update(bench_storage(clips, args.repeat))
+            print("[Benchmark] Endpoints")
+            results.update(bench_endpoints(server, clips, args.repeat, args.profile,
+                                           with_db=db_config is not None))
+    finally:
+        os.chdir(repo_root)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = build_report('end_to_end', results)
+    report['clips'] = [{k: clip[k] for k in ('name', 'resolution', 'duration', 'fps')} for clip in clips]
+    write_report(report, json_path)
+
+    if baseline_path or thresholds_path:
+        baseline = {}
+        if baseline_path:
+            with open(baseline_path, encoding='utf-8') as f:
+                baseline = json.load(f)
+        thresholds = None
+        if thresholds_path:
+            with open(thresholds_path, encoding='utf-8') as f:
+                thresholds = json.load(f)
+
+        failures = compare(report, baseline, args.max_regression, thresholds)
+        if failures:
+            print(f"[Benchmark] FAILED: {len(failures)} regression(s)")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("[Benchmark] PASSED: no regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Synthetic Workout Clips
+Generates deterministic test videos with FFmpeg's lavfi sources: solid colour
+blocks separated by hard cuts and fades to black, with a short audio beep at
+the start of every block. Cut times are known exactly, so detection results
+can be checked against ground truth.
+"""
+
+import os
+import subprocess
+from typing import List, Dict, Optional
+
+from video_processing import get_ffmpeg_command, VideoProcessingError
+
+
+# Block colours, chosen so neighbouring blocks differ in hue, saturation and luma
+BLOCK_COLOURS = ['red', 'navy', 'yellow', 'darkgreen', 'white', 'purple', 'orange', 'teal']
+
+# Named clip sizes used by the benchmark suites
+RESOLUTIONS = {
+    '360p': (640, 360),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+
+def clip_cuts(blocks: int, block_duration: float) -> List[float]:
+    """
+    Ground-truth cut times for a clip
+
+    Args:
+        blocks: Number of colour blocks
+        block_duration: Duration of each block in seconds
+
+    Returns:
+        Times in seconds where one block ends and the next begins
+    """
+    return [round(i * block_duration, 3) for i in range(1, blocks)]
+
+
+def generate_clip(output_path: str, width: int = 640, height: int = 360, fps: int = 30,
+                  blocks: int = 6, block_duration: float = 3.0, fade_every: int = 3,
+                  fade_duration: float = 0.5, audio: bool = True) -> Dict:
+    """
+    Generate a synthetic workout clip
+
+    Every block is a solid colour with a fixed-seed noise overlay (so histogram
+    and content detectors see texture, not flat frames). Every fade_every-th
+    transition is a fade out to black and back in; the rest are hard cuts.
+
+    Args:
+        output_path: Where to write the MP4
+        width: Frame width in pixels
+        height: Frame height in pixels
+        fps: Constant frame rate
+        blocks: Number of colour blocks
+        block_duration: Duration of each block in seconds
+        fade_every: Make every Nth transition a fade (0 = hard cuts only)
+        fade_duration: Length of each fade half in seconds
+        audio: Add a 1kHz beep at the start of every block
+
+    Returns:
+        Dictionary with path, duration, fps, resolution and ground-truth cuts
+
+    Raises:
+        VideoProcessingError: If FFmpeg fails
+    """
+    filters = []
+    labels = []
+    for i in range(blocks):
+        colour = BLOCK_COLOURS[i % len(BLOCK_COLOURS)]
+        chain = (
+            f"color=c={colour}:s={width}x{height}:r={fps}:d={block_duration},"
+            f"noise=alls=12:allf=t:all_seed={1000 + i},format=yuv420p"
+        )
+        if fade_every and i < blocks - 1 and (i + 1) % fade_every == 0:
+            chain += f",fade=t=out:st={block_duration - fade_duration}:d={fade_duration}"
+        if fade_every and i > 0 and i % fade_every == 0:
+            chain += f",fade=t=in:st=0:d={fade_duration}"
+        filters.append(f"{chain}[v{i}]")
+        labels.append(f"[v{i}]")
+
+    filters.append(f"{''.join(labels)}concat=n={blocks}:v=1:a=0[v]")
+
+    duration = blocks * block_duration
+    cmd = [get_ffmpeg_command(), '-y', '-filter_complex', ';'.join(filters)]
+
+    if audio:
+        beep = f"aevalsrc=0.4*sin(2*PI*1000*t)*lt(mod(t\\,{block_duration})\\,0.15):s=44100:d={duration}"
+        cmd.extend(['-f', 'lavfi', '-i', beep, '-map', '[v]', '-map', '0:a'])
+    else:
+        cmd.extend(['-map', '[v]'])
+
+    cmd.extend([
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-g', str(fps * 2),
+        '-threads', '1', '-fflags', '+bitexact', '-flags:v', '+bitexact',
+    ])
+    if audio:
+        cmd.extend(['-c:a', 'aac', '-b:a', '96k', '-flags:a', '+bitexact'])
+    cmd.extend(['-t', str(duration), output_path])
+
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise VideoProcessingError(f"FFmpeg error: {e.stderr}")
+
+    return {
+        'path': output_path,
+        'duration': duration,
+        'fps': fps,
+        'resolution': f"{width}x{height}",
+        'cuts': clip_cuts(blocks, block_duration)
+    }
+
+
+def generate_clip_set(output_dir: str, resolutions: Optional[List[str]] = None,
+                      lengths: Optional[List[int]] = None, **kwargs) -> List[Dict]:
+    """
+    Generate one clip per (resolution, length) pair, reusing files already on disk
+
+    Args:
+        output_dir: Folder for the generated clips
+        resolutions: Names from RESOLUTIONS (default: 360p)
+        lengths: Number of blocks per clip (default: 6)
+        **kwargs: Passed through to generate_clip
+
+    Returns:
+        List of clip info dictionaries
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    block_duration = kwargs.get('block_duration', 3.0)
+
+    clips = []
+    for resolution in resolutions or ['360p']:
+        width, height = RESOLUTIONS[resolution]
+        for blocks in lengths or [6]:
+            path = os.path.join(output_dir, f"synthetic_{resolution}_{blocks}blk.mp4")
+            if os.path.exists(path):
+                clip = {
+                    'path': path,
+                    'duration': blocks * block_duration,
+                    'fps': kwargs.get('fps', 30),
+                    'resolution': f"{width}x{height}",
+                    'cuts': clip_cuts(blocks, block_duration)
+                }
+            else:
+                print(f"[Benchmark] Generating {path}")
+                clip = generate_clip(path, width=width, height=height, blocks=blocks, **kwargs)
+            clip['name'] = f"{resolution}_{blocks}blk"
+            clips.append(clip)
+
+    return clips
+
+
+def match_cuts(detected: List[float], expected: List[float], tolerance: float = 0.5) -> Dict:
+    """
+    Compare detected cut times with ground truth
+
+    Args:
+        detected: Detected cut times in seconds
+        expected: Ground-truth cut times in seconds
+        tolerance: Maximum distance in seconds for a cut to count as found
+
+    Returns:
+        Dictionary with matched count, recall and precision
+    """
+    remaining = list(detected)
+    matched = 0
+    for cut in expected:
+        nearest = min(remaining, key=lambda t: abs(t - cut), default=None)
+        if nearest is not None and abs(nearest - cut) <= tolerance:
+            matched += 1
+            remaining.remove(nearest)
+
+    return {
+        'matched': matched,
+        'recall': matched / len(expected) if expected else 1.0,
+        'precision': matched / len(detected) if detected else 1.0
+    }
+
+
+# Frame counter clips: a frame's index is written into its flat luma and chroma levels
+COUNTER_STEP_Y = 3
+COUNTER_STEP_C = 12
+COUNTER_DIGITS = (64, 16, 16)  # Values of the Y, Cb and Cr digits (16384 frames)
+
+
+def generate_counter_clip(output_path: str, duration: float = 30.0, fps: int = 30, gop: int = 300,
+                          width: int = 320, height: int = 240) -> Dict:
+    """
+    Generate a clip whose frames each show their own index
+
+    Every frame is flat; its Y, Cb and Cr levels are the digits of the frame
+    index (see frame_index()), spaced far enough apart to survive encoding.
+    With a known index per frame, the first frame of a cut shows exactly
+    where the cut started.
+
+    Args:
+        output_path: Where to write the MP4
+        duration: Length in seconds
+        fps: Constant frame rate
+        gop: Keyframe interval in frames (phone footage often uses long ones)
+        width: Frame width in pixels
+        height: Frame height in pixels
+
+    Returns:
+        Dictionary with path, duration, fps and gop
+
+    Raises:
+        VideoProcessingError: If FFmpeg fails
+    """
+    y_digits, cb_digits, _ = COUNTER_DIGITS
+    planes = (
+        f"lum='16+{COUNTER_STEP_Y}*mod(N,{y_digits})'"
+        f":cb='16+{COUNTER_STEP_C}*mod(floor(N/{y_digits}),{cb_digits})'"
+        f":cr='16+{COUNTER_STEP_C}*mod(floor(N/{y_digits * cb_digits}),16)'"
+    )
+    cmd = [
+        get_ffmpeg_command(), '-y', '-f', 'lavfi',
+        '-i', f"color=c=black:s={width}x{height}:r={fps}:d={duration},format=yuv420p,geq={planes}",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '12', '-bf', '2',
+        '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0',
+        '-threads', '1', '-fflags', '+bitexact', '-flags:v', '+bitexact',
+        output_path
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise VideoProcessingError(f"FFmpeg error: {e.stderr}")
+    return {'path': output_path, 'duration': duration, 'fps': fps, 'gop': gop}
+
+
+def frame_index(y: float, cb: float, cr: float) -> int:
+    """Frame index shown by a counter clip frame with these mean plane levels"""
+    y_digits, cb_digits, _ = COUNTER_DIGITS
+    y_digit = round((y - 16) / COUNTER_STEP_Y)
+    cb_digit = round((cb - 16) / COUNTER_STEP_C)
+    cr_digit = round((cr - 16) / COUNTER_STEP_C)
+    return y_digit + y_digits * (cb_digit + cb_digits * cr_digit)
+
+
+def first_frame_index(video_path: str) -> int:
+    """Frame index shown by the first frame of a (cut) counter clip"""
+    cmd = [get_ffmpeg_command(), '-v', 'error', '-i', video_path, '-frames:v', '1',
+           '-f', 'rawvideo', '-pix_fmt', 'yuv420p', '-']
+    try:
+        raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise VideoProcessingError(f"FFmpeg error: {e.stderr}")
+    luma = len(raw) * 2 // 3
+    chroma = luma // 4
+    planes = (raw[:luma], raw[luma:luma + chroma], raw[luma + chroma:luma + 2 * chroma])
+    return frame_index(*(sum(plane) / len(plane) for plane in planes))
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Bulk Import
+Adds pre-cut clips and their tags to the exercise library from a manifest
+
+Manifest: CSV with a header row, or JSON Lines (.jsonl), one clip per row:
+
+    path            Clip file (relative paths are resolved against the manifest's folder)
+    name            Exercise name
+    muscle_groups   List, or '|' or ',' separated names
+    equipment       List, or '|' or ',' separated names
+    start_time      Optional, seconds (position in the original video)
+    end_time        Optional, seconds
+    remove_audio    Optional, true/false
+
+Rows are processed in batches. For each batch the clips are hashed and
+probed with ffprobe concurrently, thumbnails are generated on a process
+pool started from the fork server (each in a batch-priority media slot,
+see media_pool.py), and clip +
+thumbnail are uploaded to library/<content hash> with bounded
+concurrency (files already stored are not uploaded again). The
+batch is then loaded with COPY into a temporary staging table and merged
+into exercises and the tag tables in one transaction.
+
+Progress is appended to <manifest>.progress.jsonl. Re-running the same
+manifest skips rows already merged and merges uploaded rows without
+re-processing them; exercises.import_key (migration 002) makes the merge
+itself idempotent. One run at a time holds <manifest>.lock (flock), so
+the same manifest posted to two web workers, or imported from the command
+line while the server imports it, is not run twice on one journal.
+
+Usage:
+    python bulk_import.py manifest.csv [--batch-size 200] [--upload-concurrency 4]
+                                       [--probe-workers 8] [--thumbnail-workers 4] [--json]
+"""
+
+import argparse
+import csv
+import fcntl
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from media_pool import media_slot, PRIORITY_BATCH
+from storage import VideoStorage, CONTENT_FOLDER, IMMUTABLE_CACHE_CONTROL
+from video_processing import file_content_hash, generate_thumbnail, get_video_info
+
+try:
+    from config import Config
+    IMPORT_UPLOAD_CONCURRENCY = Config.IMPORT_UPLOAD_CONCURRENCY
+    THUMBNAIL_WIDTH = Config.THUMBNAIL_WIDTH
+    THUMBNAIL_HEIGHT = Config.THUMBNAIL_HEIGHT
+except ImportError:
+    IMPORT_UPLOAD_CONCURRENCY = int(os.getenv('IMPORT_UPLOAD_CONCURRENCY', 4))
+    THUMBNAIL_WIDTH = int(os.getenv('THUMBNAIL_WIDTH', 320))
+    THUMBNAIL_HEIGHT = int(os.getenv('THUMBNAIL_HEIGHT', 180))
+
+IMPORT_BATCH_SIZE = 200
+PROBE_WORKERS = 8
+# Longest wait for a media slot per thumbnail; imports queue behind interactive and save jobs
+THUMBNAIL_SLOT_WAIT = 3600
+
+MANIFEST_FIELDS = ('path', 'name', 'muscle_groups', 'equipment', 'start_time', 'end_time', 'remove_audio')
+STAGING_COLUMNS = (
+    'import_key', 'video_file_path', 'exercise_name', 'duration', 'start_time', 'end_time',
+    'remove_audio', 'thumbnail_url', 'muscle_groups', 'equipment'
+)
+
+
+class ImportRunning(RuntimeError):
+    """Another process is importing the same manifest"""
+
+
+def _split_tags(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace('|', ',').split(',')
+    return sorted({str(v).strip() for v in value if str(v).strip()})
+
+
+def _optional_float(value) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes')
+
+
+def read_manifest(manifest_path: str, root: Optional[str] = None) -> List[Dict]:
+    """
+    Parse and validate a manifest
+
+    Args:
+        manifest_path: CSV or JSON Lines manifest
+        root: If set, every clip path must resolve inside this folder
+
+    Returns:
+        Rows with 'line' (1-based, data rows only), an absolute 'path',
+        'name', tag lists, times and 'remove_audio'; invalid rows carry 'error'
+
+    Raises:
+        ValueError: If the manifest cannot be read or has no 'path' column
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r', encoding='utf-8-sig', newline='') as f:
+        if manifest_path.lower().endswith(('.jsonl', '.ndjson')):
+            try:
+                records = [json.loads(line) for line in f if line.strip()]
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON Lines manifest: {e}")
+        else:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or 'path' not in reader.fieldnames:
+                raise ValueError("Manifest needs a 'path' column")
+            records = list(reader)
+
+    rows = []
+    for line, record in enumerate(records, start=1):
+        row = {'line': line}
+        try:
+            if not record.get('path'):
+                raise ValueError("missing path")
+            path = os.path.abspath(os.path.join(base_dir, record['path']))
+            if root and os.path.commonpath([os.path.abspath(root), path]) != os.path.abspath(root):
+                raise ValueError(f"{record['path']} is outside the import folder")
+            row.update({
+                'path': path,
+                'name': (record.get('name') or '').strip() or None,
+                'muscle_groups': _split_tags(record.get('muscle_groups')),
+                'equipment': _split_tags(record.get('equipment')),
+                'start_time': _optional_float(record.get('start_time')),
+                'end_time': _optional_float(record.get('end_time')),
+                'remove_audio': _parse_bool(record.get('remove_audio'))
+            })
+        except (TypeError, ValueError) as e:
+            row['error'] = str(e)
+        rows.append(row)
+    return rows
+
+
+def progress_path(manifest_path: str) -> str:
+    return f"{manifest_path}.progress.jsonl"
+
+
+@contextmanager
+def import_lock(manifest_path: str):
+    """
+    Hold the manifest's import lock for the length of a run
+
+    Raises:
+        ImportRunning: Another process (e.g. another gunicorn worker) holds it
+    """
+    with open(f"{manifest_path}.lock", 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise ImportRunning(f"{os.path.basename(manifest_path)} is already being imported")
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_progress(path: str):
+    """
+    Read the progress journal
+
+    Returns:
+        (uploaded rows by line number, set of merged line numbers)
+    """
+    uploaded, merged = {}, set()
+    if not os.path.exists(path):
+        return uploaded, merged
+    with open(path, 'r', encoding='utf-8') as f:
+        for entry in f:
+            try:
+                record = json.loads(entry)
+            except json.JSONDecodeError:
+                continue  # Line cut short by an interruption
+            if 'merged' in record:
+                merged.update(record['merged'])
+            else:
+                uploaded[record['line']] = record
+    return uploaded, merged
+
+
+def _append_progress(path: str, records: List[Dict]) -> None:
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _probe(row: Dict) -> Dict:
+    """Content hash and duration of one clip (run on a thread pool)"""
+    try:
+        content_hash = file_content_hash(row['path'])
+        duration = get_video_info(row['path'])['duration']
+    except Exception as e:
+        return dict(row, error=f"probe failed: {e}")
+    import_key = hashlib.sha256(
+        json.dumps([content_hash, row['start_time'], row['end_time']]).encode('utf-8')
+    ).hexdigest()[:40]
+    return dict(row, content_hash=content_hash, duration=duration, import_key=import_key)
+
+
+def _thumbnail_job(args) -> Optional[str]:
+    """Generate one thumbnail (run in a worker process); returns an error message or None"""
+    video_path, output_path, timestamp, width, height = args
+    try:
+        with media_slot(wait=THUMBNAIL_SLOT_WAIT, priority=PRIORITY_BATCH, user='import'):
+            generate_thumbnail(video_path, output_path, timestamp=timestamp, width=width, height=height)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def _upload(storage: VideoStorage, row: Dict, thumbnail_path: str) -> Dict:
+    """Store a clip and its thumbnail under their content hash (run on a thread pool)"""
+    key = row['content_hash'][:40]
+    ext = os.path.splitext(row['path'])[1].lower() or '.mp4'
+    uploads = [(row['path'], f"{key}{ext}"), (thumbnail_path, f"{key}.jpg")]
+    reused = 0
+    try:
+        for path, filename in uploads:
+            stored_key = f"{CONTENT_FOLDER}/{filename}"
+            if storage.exists(stored_key):
+                reused += 1
+                continue
+            storage.save(path, filename, folder=CONTENT_FOLDER, cache_control=IMMUTABLE_CACHE_CONTROL)
+    except Exception as e:
+        return dict(row, error=f"upload failed: {e}")
+    return dict(row, video_url=storage.get_url(f"{CONTENT_FOLDER}/{key}{ext}"),
+                thumbnail_url=storage.get_url(f"{CONTENT_FOLDER}/{key}.jpg"), reused=reused)
+
+
+def stage_and_merge(conn, records: List[Dict]) -> int:
+    """
+    COPY records into a staging table and merge them into the library
+
+    Args:
+        conn: Database connection (committed on success)
+        records: Uploaded rows
+
+    Returns:
+        Number of exercises inserted (rows already imported are skipped)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for r in records:
+        writer.writerow([
+            r['import_key'], r['video_url'], r['name'], r['duration'], r['start_time'], r['end_time'],
+            r['remove_audio'], r['thumbnail_url'], '|'.join(r['muscle_groups']), '|'.join(r['equipment'])
+        ])
+    buffer.seek(0)
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            CREATE TEMP TABLE import_staging (
+                import_key VARCHAR(64), video_file_path TEXT, exercise_name VARCHAR(255),
+                duration FLOAT, start_time FLOAT, end_time FLOAT, remove_audio BOOLEAN,
+                thumbnail_url TEXT, muscle_groups TEXT, equipment TEXT
+            ) ON COMMIT DROP
+        """)
+        cursor.copy_expert(f"COPY import_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+        for table, column in (('muscle_groups', 'muscle_groups'), ('equipment', 'equipment')):
+            cursor.execute(f"""
+                INSERT INTO {table} (name)
+                SELECT DISTINCT unnest(string_to_array(NULLIF({column}, ''), '|')) FROM import_staging
+                ON CONFLICT (name) DO NOTHING
+            """)
+
+        cursor.execute("""
+            INSERT INTO exercises (import_key, video_file_path, exercise_name, duration,
+                                   start_time, end_time, remove_audio, thumbnail_url)
+            SELECT import_key, video_file_path, exercise_name, duration,
+                   start_time, end_time, remove_audio, thumbnail_url
+            FROM import_staging
+            ON CONFLICT (import_key) DO NOTHING
+        """)
+        inserted = cursor.rowcount
+
+        for junction, table, column, id_column in (
+            ('exercise_muscle_groups', 'muscle_groups', 'muscle_groups', 'muscle_group_id'),
+            ('exercise_equipment', 'equipment', 'equipment', 'equipment_id')
+        ):
+            cursor.execute(f"""
+                INSERT INTO {junction} (exercise_id, {id_column})
+                SELECT e.id, t.id
+                FROM import_staging s
+                JOIN exercises e ON e.import_key = s.import_key
+                CROSS JOIN LATERAL unnest(string_to_array(NULLIF(s.{column}, ''), '|')) AS tag(name)
+                JOIN {table} t ON t.name = tag.name
+                ON CONFLICT DO NOTHING
+            """)
+
+        conn.commit()
+        return inserted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def run_import(manifest_path: str, storage: VideoStorage, connect: Callable, root: Optional[str] = None,
+               batch_size: int = IMPORT_BATCH_SIZE, upload_concurrency: int = IMPORT_UPLOAD_CONCURRENCY,
+               probe_workers: int = PROBE_WORKERS, thumbnail_workers: Optional[int] = None,
+               progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Import (or resume importing) a manifest
+
+    Args:
+        manifest_path: CSV or JSON Lines manifest
+        storage: Storage backend for clips and thumbnails
+        connect: Callable returning a new database connection
+        root: If set, clip paths must be inside this folder
+        batch_size: Rows per probe/upload/merge batch
+        upload_concurrency: Maximum concurrent storage uploads
+        probe_workers: Concurrent ffprobe processes
+        thumbnail_workers: Thumbnail worker processes (default: CPU count)
+        progress: Called with the summary after every batch
+
+    Returns:
+        Summary with 'total', 'imported', 'already_imported', 'uploads_reused' and 'failed'
+
+    Raises:
+        ImportRunning: The manifest is being imported by another process
+    """
+    with import_lock(manifest_path):
+        rows = read_manifest(manifest_path, root=root)
+        journal = progress_path(manifest_path)
+        uploaded, merged = load_progress(journal)
+
+        summary = {
+            'total': len(rows),
+            'imported': 0,
+            'already_imported': len([r for r in rows if r['line'] in merged]),
+            'uploads_reused': 0,
+            'failed': [{'line': r['line'], 'error': r['error']} for r in rows if 'error' in r]
+        }
+        pending = [r for r in rows if 'error' not in r and r['line'] not in merged]
+        print(f"[Import] {manifest_path}: {len(rows)} rows, {summary['already_imported']} already imported, "
+              f"{len(pending)} to process")
+
+        conn = connect()
+        if conn is None:
+            raise RuntimeError("Database connection failed")
+        try:
+            # Thumbnail processes come from the fork server, not a fork of a threaded web worker
+            forkserver = multiprocessing.get_context('forkserver')
+            with ThreadPoolExecutor(max_workers=probe_workers) as probe_pool, \
+                    ProcessPoolExecutor(max_workers=thumbnail_workers, mp_context=forkserver) as thumbnail_pool, \
+                    ThreadPoolExecutor(max_workers=upload_concurrency) as upload_pool, \
+                    tempfile.TemporaryDirectory(prefix='import_') as workdir:
+                for start in range(0, len(pending), batch_size):
+                    batch = pending[start:start + batch_size]
+                    # Rows uploaded by an interrupted run go straight to the merge
+                    ready = [uploaded[r['line']] for r in batch if r['line'] in uploaded]
+                    todo = [r for r in batch if r['line'] not in uploaded]
+
+                    probed = list(probe_pool.map(_probe, todo))
+                    ok = [r for r in probed if 'error' not in r]
+
+                    thumbnails = [os.path.join(workdir, f"{r['line']}.jpg") for r in ok]
+                    jobs = [(r['path'], path, min(1.0, r['duration'] / 2), THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+                            for r, path in zip(ok, thumbnails)]
+                    thumbnail_errors = list(thumbnail_pool.map(_thumbnail_job, jobs))
+                    for r, error in zip(ok, thumbnail_errors):
+                        if error:
+                            r['error'] = f"thumbnail failed: {error}"
+
+                    results = list(upload_pool.map(
+                        lambda args: _upload(storage, *args),
+                        [(r, path) for r, path in zip(ok, thumbnails) if 'error' not in r]
+                    ))
+                    done = [r for r in results if 'error' not in r]
+                    summary['uploads_reused'] += sum(r.pop('reused') for r in done)
+                    summary['failed'].extend({'line': r['line'], 'error': r['error']}
+                                             for r in probed + results if 'error' in r)
+                    for path in thumbnails:
+                        if os.path.exists(path):
+                            os.remove(path)
+
+                    records = [{k: r[k] for k in (
+                        'line', 'import_key', 'video_url', 'thumbnail_url', 'name', 'duration', 'start_time',
+                        'end_time', 'remove_audio', 'muscle_groups', 'equipment'
+                    )} for r in done]
+                    _append_progress(journal, records)
+
+                    records += ready
+                    if records:
+                        inserted = stage_and_merge(conn, records)
+                        _append_progress(journal, [{'merged': [r['line'] for r in records]}])
+                        summary['imported'] += inserted
+                        summary['already_imported'] += len(records) - inserted
+
+                    print(f"[Import] Batch {start // batch_size + 1}: {len(records)} merged, "
+                          f"{len(batch) - len(records)} failed")
+                    if progress:
+                        progress(summary)
+        finally:
+            conn.close()
+
+        summary['failed'].sort(key=lambda f: f['line'])
+        print(f"[Import] Done: {summary['imported']} imported, {summary['already_imported']} already imported, "
+              f"{len(summary['failed'])} failed")
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import pre-cut clips into the exercise library')
+    parser.add_argument('manifest', help='CSV or JSON Lines manifest')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Rows per batch')
+    parser.add_argument('--upload-concurrency', type=int, default=IMPORT_UPLOAD_CONCURRENCY,
+                        help='Maximum concurrent uploads')
+    parser.add_argument('--probe-workers', type=int, default=PROBE_WORKERS, help='Concurrent ffprobe processes')
+    parser.add_argument('--thumbnail-workers', type=int, help='Thumbnail processes (default: CPU count)')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    from config import Config
+    from run_migrations import get_db_connection
+    from storage import create_storage
+
+    storage = create_storage(Config.get_storage_config())
+    try:
+        summary = run_import(
+            args.manifest, storage, connect=get_db_connection,
+            batch_size=args.batch_size, upload_concurrency=args.upload_concurrency,
+            probe_workers=args.probe_workers, thumbnail_workers=args.thumbnail_workers
+        )
+    except ImportRunning as e:
+        print(f"[Import] {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for failure in summary['failed']:
+            print(f"  line {failure['line']}: {failure['error']}")
+    sys.exit(1 if summary['failed'] else 0)
+
+
+if __name__ == '__main__':
+    main()
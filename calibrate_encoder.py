@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Encoder Calibration
+Encodes a synthetic reference clip under each encoder profile on this host
+and picks the fastest one that meets a quality floor (SSIM or VMAF) and an
+optional bitrate budget. The result is written to ENCODER_CALIBRATION_FILE
+and used whenever the 'auto' encoder profile is requested.
+
+Usage:
+    python calibrate_encoder.py [--metric ssim|vmaf] [--min-quality 0.95]
+                                [--max-bitrate 4000] [--profiles fast-preview,standard]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from encoder_profiles import PROFILES, ENCODER_CALIBRATION_FILE, get_profile, profile_args
+from video_processing import get_ffmpeg_command, check_ffmpeg_installed, VideoProcessingError
+
+
+def _generate_reference_clip(output_path: str, duration: float, width: int, height: int) -> None:
+    """Render a lossless synthetic reference clip with motion and fine detail"""
+    cmd = [
+        get_ffmpeg_command(), '-y',
+        '-f', 'lavfi', '-i', f"testsrc2=s={width}x{height}:r=30:d={duration}",
+        '-vf', 'format=yuv420p',
+        '-c:v', 'libx264', '-qp', '0', '-preset', 'ultrafast',
+        output_path
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise VideoProcessingError(f"FFmpeg error: {e.stderr}")
+
+
+def _has_filter(name: str) -> bool:
+    """Check whether this FFmpeg build includes a filter"""
+    try:
+        result = subprocess.run([get_ffmpeg_command(), '-hide_banner', '-filters'],
+                                capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+    return re.search(rf"\s{re.escape(name)}\s", result.stdout) is not None
+
+
+def measure_quality(distorted_path: str, reference_path: str, metric: str = 'ssim') -> float:
+    """
+    Compare an encode with its reference
+
+    Args:
+        distorted_path: Encoded clip
+        reference_path: Lossless reference clip
+        metric: 'ssim' (0-1) or 'vmaf' (0-100, needs FFmpeg built with libvmaf)
+
+    Returns:
+        Score (higher is better)
+
+    Raises:
+        VideoProcessingError: If the metric cannot be computed
+    """
+    lavfi = 'libvmaf' if metric == 'vmaf' else 'ssim'
+    cmd = [
+        get_ffmpeg_command(), '-hide_banner',
+        '-i', distorted_path, '-i', reference_path,
+        '-lavfi', lavfi, '-f', 'null', '-'
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise VideoProcessingError(f"FFmpeg error: {e.stderr}")
+
+    pattern = r"VMAF score: ([\d.]+)" if metric == 'vmaf' else r"SSIM .*All:([\d.]+)"
+    match = re.search(pattern, result.stderr)
+    if not match:
+        raise VideoProcessingError(f"Could not parse {metric} score from FFmpeg output")
+    return float(match.group(1))
+
+
+def calibrate(candidates: Optional[List[str]] = None, metric: str = 'ssim',
+              min_quality: Optional[float] = None, max_bitrate_kbps: Optional[float] = None,
+              duration: float = 10.0, width: int = 1280, height: int = 720,
+              output_path: Optional[str] = None) -> Dict:
+    """
+    Encode a synthetic reference clip under each candidate profile and pick
+    the fastest one that meets the quality floor and bitrate budget
+
+    Args:
+        candidates: Profile names to try (default: all profiles)
+        metric: 'ssim' or 'vmaf' (falls back to ssim if libvmaf is missing)
+        min_quality: Minimum acceptable score (default: 0.95 SSIM / 90 VMAF)
+        max_bitrate_kbps: Maximum acceptable video bitrate, None for no budget
+        duration: Reference clip duration in seconds
+        width: Reference clip width
+        height: Reference clip height
+        output_path: Write the result here (default: ENCODER_CALIBRATION_FILE)
+
+    Returns:
+        Calibration dictionary with per-profile measurements and 'selected'
+    """
+    candidates = candidates or list(PROFILES)
+
+    if metric == 'vmaf' and not _has_filter('libvmaf'):
+        print("[Calibration] libvmaf not available in this FFmpeg build, using SSIM")
+        metric = 'ssim'
+    if min_quality is None:
+        min_quality = 90.0 if metric == 'vmaf' else 0.95
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='encoder_calibration_') as work_dir:
+        reference_path = os.path.join(work_dir, 'reference.mkv')
+        print(f"[Calibration] Rendering {width}x{height} reference clip ({duration:.0f}s)")
+        _generate_reference_clip(reference_path, duration, width, height)
+
+        for name in candidates:
+            profile = get_profile(name)
+            encoded_path = os.path.join(work_dir, f"{name}.mp4")
+            cmd = [get_ffmpeg_command(), '-y', '-i', reference_path] + profile_args(profile) + ['-an', encoded_path]
+
+            start = time.perf_counter()
+            try:
+                subprocess.run(cmd, capture_output=True, text=True, check=True)
+            except subprocess.CalledProcessError as e:
+                raise VideoProcessingError(f"FFmpeg error: {e.stderr}")
+            encode_seconds = time.perf_counter() - start
+
+            bitrate_kbps = os.path.getsize(encoded_path) * 8 / 1000 / duration
+            quality = measure_quality(encoded_path, reference_path, metric)
+
+            meets_target = quality >= min_quality and (
+                max_bitrate_kbps is None or bitrate_kbps <= max_bitrate_kbps
+            )
+            results.append({
+                'profile': name,
+                'encode_seconds': round(encode_seconds, 3),
+                'speed': round(duration / encode_seconds, 2) if encode_seconds > 0 else None,
+                'bitrate_kbps': round(bitrate_kbps, 1),
+                metric: round(quality, 4),
+                'meets_target': meets_target
+            })
+            print(f"[Calibration] {name:<13} {encode_seconds:7.2f}s  {bitrate_kbps:8.1f} kbps  "
+                  f"{metric}={quality:.4f}  {'OK' if meets_target else '--'}")
+
+    passing = [r for r in results if r['meets_target']]
+    selected = min(passing, key=lambda r: r['encode_seconds'])['profile'] if passing else None
+
+    calibration = {
+        'metric': metric,
+        'min_quality': min_quality,
+        'max_bitrate_kbps': max_bitrate_kbps,
+        'reference': {'duration': duration, 'resolution': f"{width}x{height}"},
+        'results': results,
+        'selected': selected,
+        'calibrated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+    output_path = output_path or ENCODER_CALIBRATION_FILE
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(calibration, f, indent=2)
+        print(f"[Calibration] Saved to {output_path}")
+
+    if selected:
+        print(f"[Calibration] Selected profile: {selected}")
+    else:
+        print("[Calibration] WARNING: No profile met the target; 'auto' will use 'standard'")
+
+    return calibration
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pick the fastest encoder profile meeting a quality target')
+    parser.add_argument('--profiles', help='Comma-separated candidate profiles (default: all)')
+    parser.add_argument('--metric', choices=['ssim', 'vmaf'], default='ssim')
+    parser.add_argument('--min-quality', type=float, help='Minimum score (default: 0.95 SSIM / 90 VMAF)')
+    parser.add_argument('--max-bitrate', type=float, help='Maximum video bitrate in kbps')
+    parser.add_argument('--duration', type=float, default=10.0, help='Reference clip length in seconds')
+    parser.add_argument('--resolution', default='1280x720', help='Reference clip size, e.g. 1280x720')
+    parser.add_argument('--output', default=ENCODER_CALIBRATION_FILE, help='Calibration JSON file')
+    args = parser.parse_args()
+
+    if not check_ffmpeg_installed():
+        raise SystemExit("FFmpeg is not installed or not accessible")
+
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+    calibrate(
+        candidates=args.profiles.split(',') if args.profiles else None,
+        metric=args.metric,
+        min_quality=args.min_quality,
+        max_bitrate_kbps=args.max_bitrate,
+        duration=args.duration,
+        width=width,
+        height=height,
+        output_path=args.output
+    )
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Encoder Profile Calibration")
+    print("=" * 60)
+    main()
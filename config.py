@@ -11,6 +11,28 @@ from urllib.parse import urlparse
 # override=False ensures Railway environment variables take precedence over .env file
 load_dotenv(override=False)
 
+# Time budget per Flask endpoint in seconds; everything else gets DEFAULT_ROUTE_TIMEOUT.
+# Override with ROUTE_TIMEOUTS="process_video=900,save_timeline=3600"
+DEFAULT_ROUTE_TIMEOUTS = {
+    'process_video': 600,
+    'share_receiver': 600,
+    'reprocess_video': 600,
+    'sweep_scenes': 600,
+    'complete_direct_upload': 600,
+    'receive_upload_part': 300,
+    'save_timeline': 1800,
+    'compile_workout_video': 600,
+    'export_exercises': 3600
+}
+
+
+def _route_timeouts(value):
+    timeouts = dict(DEFAULT_ROUTE_TIMEOUTS)
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, seconds = item.partition('=')
+        timeouts[endpoint.strip()] = float(seconds)
+    return timeouts
+
 
 class Config:
     """Base configuration class"""
@@ -28,6 +50,11 @@ class Config:
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     OUTPUT_FOLDER = os.getenv('OUTPUT_FOLDER', 'output')
     ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'flv', 'wmv'}
+    # Streaming uploads (/process, /share-receiver; see streaming_upload.py)
+    UPLOAD_CHUNK_KB = int(os.getenv('UPLOAD_CHUNK_KB', 256))  # Body read and write size
+    UPLOAD_FSYNC_MB = float(os.getenv('UPLOAD_FSYNC_MB', 16))  # Unsynced MB per upload before fsync (0: only at the end)
+    UPLOAD_INFLIGHT_MB = float(os.getenv('UPLOAD_INFLIGHT_MB', 64))  # Unsynced MB across all uploads on the host
+    UPLOAD_BUDGET_WAIT_SECONDS = float(os.getenv('UPLOAD_BUDGET_WAIT_SECONDS', 30))  # Then 503
 
     # Database Configuration
     # Support Railway's DATABASE_PUBLIC_URL or DATABASE_URL or individual variables
@@ -61,6 +88,14 @@ class Config:
     # Video Processing Configuration
     SCENE_DETECTION_THRESHOLD = float(os.getenv('SCENE_DETECTION_THRESHOLD', 27.0))
     MIN_SCENE_LENGTH = float(os.getenv('MIN_SCENE_LENGTH', 0.6))
+    SCENE_DETECTORS = os.getenv('SCENE_DETECTORS', 'content')  # Default detectors (content, adaptive, threshold, histogram)
+    ADAPTIVE_THRESHOLD = float(os.getenv('ADAPTIVE_THRESHOLD', 3.0))  # AdaptiveDetector rolling-average ratio
+    FADE_THRESHOLD = float(os.getenv('FADE_THRESHOLD', 12.0))  # ThresholdDetector mean brightness for fade-to-black
+    HISTOGRAM_THRESHOLD = float(os.getenv('HISTOGRAM_THRESHOLD', 0.05))  # HistogramDetector distance (0-1)
+    DETECTION_BACKEND = os.getenv('DETECTION_BACKEND', 'scenedetect')  # scenedetect, or pipe (content detector alone)
+    PIPE_DETECT_WIDTH = int(os.getenv('PIPE_DETECT_WIDTH', 256))  # Width frames are scored at on the pipe backend
+    PIPE_DETECT_BATCH = int(os.getenv('PIPE_DETECT_BATCH', 64))  # Frames scored per NumPy batch
+    PIPE_DETECT_FORMAT = os.getenv('PIPE_DETECT_FORMAT', 'yuv420p')  # yuv420p, or gray (luma only)
 
     # FFmpeg Configuration
     FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')  # Use system ffmpeg or specify path
@@ -69,6 +104,43 @@ class Config:
     VIDEO_CODEC = os.getenv('VIDEO_CODEC', 'libx264')  # H.264 codec
     VIDEO_PRESET = os.getenv('VIDEO_PRESET', 'medium')  # Encoding speed/quality tradeoff
     VIDEO_CRF = int(os.getenv('VIDEO_CRF', 23))  # Constant Rate Factor (lower = better quality)
+    ENCODER_PROFILE = os.getenv('ENCODER_PROFILE', 'standard')  # fast-preview, standard, archive or auto
+    ENCODER_CALIBRATION_FILE = os.getenv('ENCODER_CALIBRATION_FILE', 'encoder_calibration.json')  # Written by calibrate_encoder.py
+    # Upload normalization (see video_processing.normalize_video): uploads that are not
+    # H.264, constant frame rate, upright and keyframed every NORMALIZE_GOP_SECONDS are
+    # re-encoded once to a mezzanine file that detection and cutting then use
+    NORMALIZE_UPLOADS = os.getenv('NORMALIZE_UPLOADS', 'False').lower() == 'true'
+    NORMALIZE_GOP_SECONDS = float(os.getenv('NORMALIZE_GOP_SECONDS', 1.0))  # Keyframe interval of the mezzanine
+    NORMALIZE_MAX_FPS = float(os.getenv('NORMALIZE_MAX_FPS', 60))  # Higher frame rates are reduced to this
+    NORMALIZE_PRESET = os.getenv('NORMALIZE_PRESET', 'veryfast')
+    NORMALIZE_CRF = int(os.getenv('NORMALIZE_CRF', 18))  # Near-lossless; segments are encoded again when cut
+
+    # Serving Configuration (worker counts for the web tier are in gunicorn.conf.py)
+    MEDIA_WORKERS = int(os.getenv('MEDIA_WORKERS', 0)) or os.cpu_count() or 1  # Concurrent media jobs per host
+    MEDIA_SLOT_DIR = os.getenv('MEDIA_SLOT_DIR', '/tmp/workout_media_slots')  # Shared by all workers on the host
+    MEDIA_NICE = int(os.getenv('MEDIA_NICE', 10))  # CPU priority offset of media processes
+    # FFmpeg encodes use several threads each, so fewer of them run at once than media jobs
+    MEDIA_FFMPEG_WORKERS = int(os.getenv('MEDIA_FFMPEG_WORKERS', 0)) or max(1, (os.cpu_count() or 1) // 2)
+    MEDIA_QUEUE_BUDGET = int(os.getenv('MEDIA_QUEUE_BUDGET', 0)) or 4 * MEDIA_WORKERS  # Jobs queued ahead before 429
+    MEDIA_PRIORITY_AGING_SECONDS = float(os.getenv('MEDIA_PRIORITY_AGING_SECONDS', 60))  # Waiting this long raises a job one class
+    DEFAULT_ROUTE_TIMEOUT = float(os.getenv('DEFAULT_ROUTE_TIMEOUT', 30))
+    ROUTE_TIMEOUTS = _route_timeouts(os.getenv('ROUTE_TIMEOUTS', ''))
+
+    # Metrics Configuration
+    # Shared directory for Prometheus multiprocess mode (required with several gunicorn workers)
+    PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR', '')
+
+    # Tracing Configuration
+    TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', 'none')  # 'none', 'jsonl' or 'otlp'
+    TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')  # Used by the jsonl exporter
+    TRACE_OTLP_ENDPOINT = os.getenv('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+
+    # Garbage Collection Configuration (session_gc.py)
+    GC_INTERVAL_MINUTES = float(os.getenv('GC_INTERVAL_MINUTES', 60))  # In-server schedule (0 = disabled)
+    GC_MAX_AGE_HOURS = float(os.getenv('GC_MAX_AGE_HOURS', 24))  # Evict editor sessions idle longer than this
+    GC_DISK_BUDGET_MB = float(os.getenv('GC_DISK_BUDGET_MB', 0))  # Evict LRU sessions above this size (0 = no budget)
+    GC_UPLOAD_MAX_AGE_HOURS = float(os.getenv('GC_UPLOAD_MAX_AGE_HOURS', 2))  # Stale files in uploads/
+    GC_OBJECT_GRACE_HOURS = float(os.getenv('GC_OBJECT_GRACE_HOURS', 24))  # Minimum age of unreferenced objects to delete
 
     # Storage Configuration
     STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')  # 'local', 's3', or 'r2'
@@ -83,6 +155,23 @@ class Config:
     S3_SECRET_KEY = os.getenv('S3_SECRET_KEY', '')
     S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL', None)  # For S3-compatible services
 
+    # Local disk cache in front of S3/R2 (downloads for reprocessing, GC, cutting)
+    STORAGE_CACHE_DIR = os.getenv('STORAGE_CACHE_DIR', 'storage_cache')
+    STORAGE_CACHE_MAX_MB = float(os.getenv('STORAGE_CACHE_MAX_MB', 2048))  # 0 = disabled
+
+    # Result cache shared by all workers on the host (detection, sweeps, ffprobe, file hashes)
+    RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', '/tmp/workout_result_cache.sqlite3')
+    RESULT_CACHE_MAX_MB = float(os.getenv('RESULT_CACHE_MAX_MB', 256))  # 0 = disabled
+    RESULT_CACHE_TTL_HOURS = float(os.getenv('RESULT_CACHE_TTL_HOURS', 24))
+
+    # Batch uploads (POST /api/batches); state files are shared by the workers on the host
+    BATCH_STATE_DIR = os.getenv('BATCH_STATE_DIR', 'batches')
+    BATCH_RETENTION_HOURS = float(os.getenv('BATCH_RETENTION_HOURS', 24))
+
+    # Bulk import (bulk_import.py / POST /api/exercises/import)
+    IMPORT_ROOT = os.getenv('IMPORT_ROOT', 'imports')  # Manifests posted to the API may only reference files here
+    IMPORT_UPLOAD_CONCURRENCY = int(os.getenv('IMPORT_UPLOAD_CONCURRENCY', 4))
+
     # Cloudflare R2 Configuration (S3-compatible)
     R2_ACCOUNT_ID = os.getenv('R2_ACCOUNT_ID', '')
     R2_BUCKET_NAME = os.getenv('R2_BUCKET_NAME', '')
@@ -96,7 +185,8 @@ class Config:
         if cls.STORAGE_BACKEND == 'local':
             return {
                 'type': 'local',
-                'path': cls.LOCAL_STORAGE_PATH
+                'path': cls.LOCAL_STORAGE_PATH,
+                'signing_key': cls.SECRET_KEY  # Signs the local stand-in for presigned upload URLs
             }
         elif cls.STORAGE_BACKEND == 's3':
             return {
@@ -105,7 +195,9 @@ class Config:
                 'region': cls.S3_REGION,
                 'access_key': cls.S3_ACCESS_KEY,
                 'secret_key': cls.S3_SECRET_KEY,
-                'endpoint_url': cls.S3_ENDPOINT_URL
+                'endpoint_url': cls.S3_ENDPOINT_URL,
+                'cache_dir': cls.STORAGE_CACHE_DIR,
+                'cache_max_mb': cls.STORAGE_CACHE_MAX_MB
             }
         elif cls.STORAGE_BACKEND == 'r2':
             return {
@@ -114,7 +206,9 @@ class Config:
                 'bucket': cls.R2_BUCKET_NAME,
                 'access_key': cls.R2_ACCESS_KEY,
                 'secret_key': cls.R2_SECRET_KEY,
-                'public_url': cls.R2_PUBLIC_URL
+                'public_url': cls.R2_PUBLIC_URL,
+                'cache_dir': cls.STORAGE_CACHE_DIR,
+                'cache_max_mb': cls.STORAGE_CACHE_MAX_MB
             }
         else:
             raise ValueError(f"Unsupported storage backend: {cls.STORAGE_BACKEND}")
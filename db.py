@@ -0,0 +1,74 @@
+"""
+Database Instrumentation
+psycopg2 connection class that records the latency of every statement,
+labelled with the Flask route that issued it, and traces it as a span
+"""
+
+import time
+
+from flask import has_request_context, request
+from psycopg2.extensions import connection, cursor
+
+from metrics import DB_QUERY_SECONDS
+from tracing import span
+
+
+def current_route() -> str:
+    """Flask endpoint name of the current request, or 'none' outside a request"""
+    if has_request_context() and request.endpoint:
+        return request.endpoint
+    return 'none'
+
+
+def _statement_summary(query) -> str:
+    """Whitespace-collapsed first 120 characters of a statement, for span attributes"""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    return ' '.join(str(query).split())[:120]
+
+
+class _InstrumentedCursorMixin:
+    """Times and traces execute() and executemany() on any psycopg2 cursor class"""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            with span('db.execute', statement=_statement_summary(query)):
+                return super().execute(query, vars)
+        finally:
+            DB_QUERY_SECONDS.labels(route=current_route()).observe(time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            with span('db.executemany', statement=_statement_summary(query)):
+                return super().executemany(query, vars_list)
+        finally:
+            DB_QUERY_SECONDS.labels(route=current_route()).observe(time.perf_counter() - start)
+
+
+_instrumented_cursors = {}
+
+
+def _instrumented_cursor_class(base):
+    """Return (and cache) an instrumented subclass of a cursor class"""
+    if issubclass(base, _InstrumentedCursorMixin):
+        return base
+    if base not in _instrumented_cursors:
+        _instrumented_cursors[base] = type(f"Instrumented{base.__name__}", (_InstrumentedCursorMixin, base), {})
+    return _instrumented_cursors[base]
+
+
+class InstrumentedConnection(connection):
+    """
+    Connection whose cursors are instrumented, including cursors created with
+    an explicit cursor_factory such as RealDictCursor
+
+    Usage:
+        psycopg2.connect(**DB_CONFIG, connection_factory=InstrumentedConnection)
+    """
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get('cursor_factory') or self.cursor_factory or cursor
+        kwargs['cursor_factory'] = _instrumented_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
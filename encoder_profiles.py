@@ -0,0 +1,135 @@
+"""
+Encoder Profiles
+Named x264 settings (preset, CRF, tune, threads, GOP) for segment encoding.
+Run calibrate_encoder.py to pick the fastest profile for the current host.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Union
+
+try:
+    from config import Config
+    VIDEO_CODEC = Config.VIDEO_CODEC
+    VIDEO_PRESET = Config.VIDEO_PRESET
+    VIDEO_CRF = Config.VIDEO_CRF
+    ENCODER_PROFILE = Config.ENCODER_PROFILE
+    ENCODER_CALIBRATION_FILE = Config.ENCODER_CALIBRATION_FILE
+except ImportError:
+    VIDEO_CODEC = os.getenv('VIDEO_CODEC', 'libx264')
+    VIDEO_PRESET = os.getenv('VIDEO_PRESET', 'medium')
+    VIDEO_CRF = int(os.getenv('VIDEO_CRF', 23))
+    ENCODER_PROFILE = os.getenv('ENCODER_PROFILE', 'standard')
+    ENCODER_CALIBRATION_FILE = os.getenv('ENCODER_CALIBRATION_FILE', 'encoder_calibration.json')
+
+
+# Named profiles. 'standard' takes its preset and CRF from VIDEO_PRESET /
+# VIDEO_CRF so existing overrides keep working. threads=0 lets x264 decide;
+# gop is the keyframe interval in frames (None = encoder default).
+PROFILES = {
+    'fast-preview': {
+        'codec': VIDEO_CODEC,
+        'preset': 'veryfast',
+        'crf': 28,
+        'tune': 'fastdecode',
+        'threads': 0,
+        'gop': 30
+    },
+    'standard': {
+        'codec': VIDEO_CODEC,
+        'preset': VIDEO_PRESET,
+        'crf': VIDEO_CRF,
+        'tune': None,
+        'threads': 0,
+        'gop': 60
+    },
+    'archive': {
+        'codec': VIDEO_CODEC,
+        'preset': 'slow',
+        'crf': 18,
+        'tune': 'film',
+        'threads': 0,
+        'gop': 120
+    }
+}
+
+# Resolved from the calibration file when present, otherwise 'standard'
+AUTO_PROFILE = 'auto'
+
+
+def load_calibration(path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Load the result of a previous calibration run
+
+    Args:
+        path: Calibration JSON file (defaults to ENCODER_CALIBRATION_FILE)
+
+    Returns:
+        Calibration dictionary or None if not calibrated
+    """
+    path = path or ENCODER_CALIBRATION_FILE
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[Encoder] Warning: Could not read calibration file {path}: {e}")
+        return None
+
+
+def get_profile(name: Optional[Union[str, Dict]] = None) -> Dict:
+    """
+    Resolve a profile name to its settings
+
+    Args:
+        name: Profile name, 'auto', a settings dict, or None for the configured default
+
+    Returns:
+        Settings dictionary including a 'name' key
+
+    Raises:
+        ValueError: If the profile name is unknown
+    """
+    if isinstance(name, dict):
+        profile = dict(PROFILES['standard'])
+        profile.update(name)
+        profile.setdefault('name', 'custom')
+        return profile
+
+    name = name or ENCODER_PROFILE
+
+    if name == AUTO_PROFILE:
+        calibration = load_calibration()
+        name = calibration['selected'] if calibration and calibration.get('selected') in PROFILES else 'standard'
+
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoder profile '{name}'. Available profiles: {', '.join(PROFILES)}, {AUTO_PROFILE}")
+
+    profile = dict(PROFILES[name])
+    profile['name'] = name
+    return profile
+
+
+def profile_args(profile: Dict) -> List[str]:
+    """
+    Build the FFmpeg video encoding arguments for a profile
+
+    Args:
+        profile: Settings dictionary from get_profile()
+
+    Returns:
+        List of FFmpeg arguments
+    """
+    args = [
+        '-c:v', profile['codec'],
+        '-preset', profile['preset'],
+        '-crf', str(profile['crf']),
+    ]
+    if profile.get('tune'):
+        args.extend(['-tune', profile['tune']])
+    if profile.get('threads') is not None:
+        args.extend(['-threads', str(profile['threads'])])
+    if profile.get('gop'):
+        args.extend(['-g', str(profile['gop'])])
+    return args
@@ -5,12 +5,14 @@
 # Set default PORT if not provided by Railway
 PORT=${PORT:-8080}
 
+# Prometheus multiprocess mode: every gunicorn worker writes its metrics to
+# this directory and /metrics aggregates them. It must start empty.
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 echo "Starting Gunicorn on port $PORT..."
 
-# Execute gunicorn with proper port binding
-exec gunicorn server:app \
-    --bind "0.0.0.0:$PORT" \
-    --workers 2 \
-    --timeout 120 \
-    --access-logfile - \
-    --error-logfile -
+# Worker class, counts and timeouts are in gunicorn.conf.py
+# (WEB_CONCURRENCY, GUNICORN_THREADS, MEDIA_WORKERS, ROUTE_TIMEOUTS)
+exec gunicorn server:app --bind "0.0.0.0:$PORT"
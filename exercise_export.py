@@ -0,0 +1,218 @@
+"""
+Exercise Library Export
+Streams the exercise catalogue as CSV, JSON Lines or Parquet
+
+Rows come from a server-side (named) cursor in fixed-size batches and each
+batch is encoded and compressed as soon as it is fetched, so memory use does
+not grow with the size of the library. CSV and JSON Lines are gzipped as
+they stream. Parquet writes one row group per batch and compresses its
+columns internally, so it is not gzipped again; it needs pyarrow.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+EXPORT_BATCH_SIZE = 1000
+MAX_EXPORT_BATCH_SIZE = 10000
+
+EXPORT_COLUMNS = [
+    'id', 'exercise_name', 'duration', 'start_time', 'end_time', 'remove_audio',
+    'video_url', 'thumbnail_url', 'muscle_groups', 'equipment', 'created_at'
+]
+
+# Correlated tag subqueries instead of JOIN + GROUP BY, so rows stream in
+# primary key order without sorting the whole library first
+EXPORT_QUERY = """
+    SELECT
+        e.id,
+        e.exercise_name,
+        e.duration,
+        e.start_time,
+        e.end_time,
+        e.remove_audio,
+        e.video_file_path AS video_url,
+        e.thumbnail_url,
+        ARRAY(
+            SELECT mg.name FROM exercise_muscle_groups emg
+            JOIN muscle_groups mg ON mg.id = emg.muscle_group_id
+            WHERE emg.exercise_id = e.id ORDER BY mg.name
+        ) AS muscle_groups,
+        ARRAY(
+            SELECT eq.name FROM exercise_equipment ee
+            JOIN equipment eq ON eq.id = ee.equipment_id
+            WHERE ee.exercise_id = e.id ORDER BY eq.name
+        ) AS equipment,
+        e.created_at
+    FROM exercises e
+    ORDER BY e.id
+"""
+
+
+def iter_exercise_batches(conn, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[tuple]]:
+    """
+    Yield every exercise in batches from a server-side cursor
+
+    Args:
+        conn: Open database connection (closed when the generator finishes)
+        batch_size: Rows fetched per round trip
+
+    Yields:
+        Lists of row tuples in EXPORT_COLUMNS order
+    """
+    try:
+        cursor = conn.cursor(name='exercise_export')
+        cursor.itersize = batch_size
+        cursor.execute(EXPORT_QUERY)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunks(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        for row in rows:
+            # Tag lists as one '|'-separated cell
+            writer.writerow(['|'.join(v) if isinstance(v, list) else _value(v) for v in row])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _jsonl_chunks(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    for rows in batches:
+        lines = [
+            json.dumps({column: _value(v) for column, v in zip(EXPORT_COLUMNS, row)}, ensure_ascii=False)
+            for row in rows
+        ]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.int64()),
+        ('exercise_name', pa.string()),
+        ('duration', pa.float64()),
+        ('start_time', pa.float64()),
+        ('end_time', pa.float64()),
+        ('remove_audio', pa.bool_()),
+        ('video_url', pa.string()),
+        ('thumbnail_url', pa.string()),
+        ('muscle_groups', pa.list_(pa.string())),
+        ('equipment', pa.list_(pa.string())),
+        ('created_at', pa.timestamp('us'))
+    ])
+
+
+def _parquet_chunks(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def check_format(export_format: str) -> None:
+    """
+    Raises:
+        ValueError: If the format is unknown or its dependency is missing
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{export_format}'. Available: {', '.join(EXPORT_FORMATS)}")
+    if export_format == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+
+
+def export_stream(batches: Iterable[List[tuple]], export_format: str, compress: bool = True) -> Dict:
+    """
+    Encode exercise batches for a streaming response
+
+    Args:
+        batches: Row batches from iter_exercise_batches()
+        export_format: 'csv', 'jsonl' or 'parquet'
+        compress: Gzip CSV/JSON Lines output as it streams
+
+    Returns:
+        Dictionary with 'chunks' (byte generator), 'mimetype' and 'filename'
+    """
+    check_format(export_format)
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    chunks = {'csv': _csv_chunks, 'jsonl': _jsonl_chunks, 'parquet': _parquet_chunks}[export_format](batches)
+
+    filename = f"exercises_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    if compress and export_format != 'parquet':
+        return {'chunks': _gzip(chunks), 'mimetype': 'application/gzip', 'filename': f"{filename}.gz"}
+    return {'chunks': chunks, 'mimetype': mimetype, 'filename': filename}
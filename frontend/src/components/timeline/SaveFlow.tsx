@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Save, Loader2, CheckCircle, AlertCircle } from 'lucide-react';
 import { Button } from '@/components/ui/Button';
@@ -12,6 +12,8 @@ export function SaveFlow() {
   const [status, setStatus] = useState<SaveStatus>('idle');
   const [error, setError] = useState<string | null>(null);
   const [savedCount, setSavedCount] = useState(0);
+  // Kept across retries so the server resumes the same save instead of starting over
+  const saveIdRef = useRef<string | null>(null);
 
   const { videoUrl, cutPoints, segments } = useTimelineStore();
 
@@ -30,9 +32,14 @@ export function SaveFlow() {
     setStatus('saving');
     setError(null);
 
+    if (!saveIdRef.current) {
+      saveIdRef.current = crypto.randomUUID();
+    }
+
     try {
       // Prepare data for backend
       const data = {
+        saveId: saveIdRef.current,
         videoUrl,
         cutPoints,
         segments: segmentsWithDetails.map(seg => ({
@@ -45,6 +52,7 @@ export function SaveFlow() {
       const result = await saveTimeline(data);
 
       if (result.success) {
+        saveIdRef.current = null;
         setSavedCount(result.saved_count);
         setStatus('success');
 
@@ -62,6 +70,8 @@ export function SaveFlow() {
   };
 
   const handleCancel = () => {
+    // The timeline may be edited before the next save, which makes it a different save
+    saveIdRef.current = null;
     setStatus('idle');
     setError(null);
   };
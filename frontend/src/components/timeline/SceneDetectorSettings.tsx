@@ -15,6 +15,7 @@ interface SceneDetectorSettingsProps {
   onOpenChange: (open: boolean) => void;
   onReprocess: () => void;
   isProcessing?: boolean;
+  previewSceneCount?: number | null;  // From the sweep, null until it has loaded
 }
 
 export function SceneDetectorSettings({
@@ -22,6 +23,7 @@ export function SceneDetectorSettings({
   onOpenChange,
   onReprocess,
   isProcessing = false,
+  previewSceneCount = null,
 }: SceneDetectorSettingsProps) {
   const {
     threshold,
@@ -64,6 +66,13 @@ export function SceneDetectorSettings({
             helpText="מונע סצנות קצרות מדי"
           />
 
+          {/* Scene count for the current slider positions */}
+          {previewSceneCount !== null && (
+            <p className="text-sm text-gray-300">
+              סצנות בהגדרות אלה: <span className="font-mono text-blue-400">{previewSceneCount}</span>
+            </p>
+          )}
+
           {/* Reset to defaults button */}
           <Button
             onClick={resetToDefaults}
@@ -84,6 +84,110 @@ export function uploadVideoWithProgress(
   return () => xhr.abort();
 }
 
+interface DirectUploadResponse {
+  success: boolean;
+  upload_token: string;
+  part_size: number;
+  parts: Array<{ part_number: number; url: string }>;
+}
+
+function putPart(url: string, body: Blob, onProgress: (loaded: number) => void, xhrRef: { current?: XMLHttpRequest }) {
+  return new Promise<void>((resolve, reject) => {
+    const xhr = new XMLHttpRequest();
+    xhrRef.current = xhr;
+    xhr.upload.onprogress = (event) => onProgress(event.loaded);
+    xhr.onload = () =>
+      xhr.status >= 200 && xhr.status < 300
+        ? resolve()
+        : reject(new Error(`Part upload failed with status ${xhr.status}`));
+    xhr.onerror = () => reject(new Error('Network error occurred during upload'));
+    xhr.onabort = () => reject(new Error('Upload aborted'));
+    xhr.open('PUT', url);
+    xhr.send(body);
+  });
+}
+
+/**
+ * Upload a video straight to storage in parts (presigned URLs), then run
+ * scene detection. Falls back to uploadVideoWithProgress when the server's
+ * storage backend does not support direct uploads.
+ */
+export function uploadVideoDirect(
+  file: File,
+  options: UploadOptions = {},
+  callbacks: UploadCallbacks
+): () => void {
+  const { threshold = 27, minSceneLength = 0.6 } = options;
+  const { onProgress, onComplete, onError } = callbacks;
+  const xhrRef: { current?: XMLHttpRequest } = {};
+  let aborted = false;
+  let abortFallback: (() => void) | undefined;
+  let uploadToken: string | undefined;
+
+  const run = async () => {
+    const start = await fetch('/api/uploads', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type }),
+    });
+    if (start.status === 501) {
+      abortFallback = uploadVideoWithProgress(file, options, callbacks);
+      return;
+    }
+    if (!start.ok) {
+      const error = await start.json().catch(() => ({}));
+      throw new Error(error.error || `Upload failed with status ${start.status}`);
+    }
+    const upload: DirectUploadResponse = await start.json();
+    uploadToken = upload.upload_token;
+
+    let uploaded = 0;
+    for (const part of upload.parts) {
+      if (aborted) return;
+      const offset = (part.part_number - 1) * upload.part_size;
+      const body = file.slice(offset, offset + upload.part_size);
+      await putPart(part.url, body, (loaded) => {
+        const total = Math.min(uploaded + loaded, file.size);
+        onProgress({ loaded: total, total: file.size, percent: Math.round((total / file.size) * 100) });
+      }, xhrRef);
+      uploaded += body.size;
+    }
+
+    onProgress({ loaded: file.size, total: file.size, percent: 100 });
+    const complete = await fetch('/api/uploads/complete', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        upload_token: uploadToken,
+        threshold,
+        min_scene_length: minSceneLength,
+      }),
+    });
+    if (!complete.ok) {
+      const error = await complete.json().catch(() => ({}));
+      throw new Error(error.error || `Processing failed with status ${complete.status}`);
+    }
+    onComplete(await complete.json());
+  };
+
+  run().catch((error: Error) => {
+    if (!aborted) onError(error);
+  });
+
+  return () => {
+    aborted = true;
+    abortFallback?.();
+    xhrRef.current?.abort();
+    if (uploadToken) {
+      fetch('/api/uploads/abort', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ upload_token: uploadToken }),
+      }).catch(() => undefined);
+    }
+  };
+}
+
 // Response type for getTags API
 export interface TagsResponse {
   muscle_groups: string[];
@@ -119,17 +223,24 @@ export interface SaveTimelineRequest {
   videoUrl: string;
   cutPoints: Array<{ time: number; type: string; id: string }>;
   segments: SaveTimelineSegment[];
+  /** Generated once per save and sent again on retries, so a retry resumes the save */
+  saveId?: string;
 }
 
 export interface SaveTimelineResponse {
   success: boolean;
   saved_count: number;
   message: string;
+  save_id?: string;
+  resumed?: boolean;
+  already_saved?: boolean;
 }
 
 /**
  * Save timeline with cut points and exercise segments to the backend.
  * Backend will cut the video into segments and store them.
+ * A save that did not finish (success: false, or a failed request) can be
+ * retried with the same saveId; work already done is not repeated.
  */
 export async function saveTimeline(data: SaveTimelineRequest): Promise<SaveTimelineResponse> {
   const response = await fetch('/api/timeline/save', {
@@ -273,6 +384,73 @@ export async function deleteExercise(exerciseId: number): Promise<DeleteExercise
   return response.json();
 }
 
+export interface DeleteExercisesResponse {
+  success: boolean;
+  message: string;
+  deleted_count: number;
+  deleted_ids: number[];
+  files_queued: number;
+  not_found?: number[];
+}
+
+/**
+ * Delete several exercises in one request (files are removed in the background)
+ */
+export async function deleteExercises(exerciseIds: number[]): Promise<DeleteExercisesResponse> {
+  const response = await fetch('/api/exercises', {
+    method: 'DELETE',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ ids: exerciseIds }),
+  });
+
+  if (!response.ok) {
+    const errorText = await response.text();
+    throw new Error(`Failed to delete exercises: ${errorText}`);
+  }
+
+  return response.json();
+}
+
+export interface CompileWorkoutRequest {
+  exercise_ids: number[];
+  repeats?: number | number[];
+  rest_seconds?: number | number[];
+  encoderProfile?: string;
+}
+
+export interface CompileWorkoutResponse {
+  success: boolean;
+  video_url: string;
+  key: string;
+  cached: boolean;
+  duration?: number;
+  clips?: number;
+  stream_copied?: number;
+  normalized?: number;
+}
+
+/**
+ * Join exercise clips (with repeats and rest gaps) into one workout video
+ */
+export async function compileWorkout(data: CompileWorkoutRequest): Promise<CompileWorkoutResponse> {
+  const response = await fetch('/api/workouts/compile', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(data),
+  });
+
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({}));
+    throw new Error(error.error || 'Failed to compile workout');
+  }
+
+  return response.json();
+}
+
 // Reprocess Video API Types and Function
 
 export interface ReprocessResponse {
@@ -282,13 +460,28 @@ export interface ReprocessResponse {
   message?: string;
 }
 
+/**
+ * Thrown when the server stopped a detection job because a newer request
+ * for the same video replaced it
+ */
+export class DetectionSupersededError extends Error {
+  constructor(message = 'Superseded by a newer request') {
+    super(message);
+    this.name = 'DetectionSupersededError';
+  }
+}
+
 /**
  * Reprocess video with new scene detection settings
+ *
+ * A newer call for the same video cancels this one on the server; pass a
+ * signal to also abort the request in the browser.
  */
 export async function reprocessVideo(
   videoPath: string,
   threshold: number,
-  minSceneLength: number
+  minSceneLength: number,
+  signal?: AbortSignal
 ): Promise<ReprocessResponse> {
   const params = new URLSearchParams({
     path: videoPath,
@@ -296,12 +489,64 @@ export async function reprocessVideo(
     min_scene_length: minSceneLength.toString(),
   });
 
-  const response = await fetch(`/reprocess?${params.toString()}`);
+  const response = await fetch(`/reprocess?${params.toString()}`, { signal });
 
   if (!response.ok) {
     const error = await response.json().catch(() => ({ error: 'Unknown error' }));
+    if (response.status === 409 && error.cancelled) {
+      throw new DetectionSupersededError(error.error);
+    }
     throw new Error(error.error || 'Failed to reprocess video');
   }
 
   return response.json();
 }
+
+// Scene Detection Sweep API Types and Functions
+
+export interface SceneSweepResult {
+  suggested_cuts: number[];
+  scene_count: number;
+}
+
+export interface SceneSweepResponse {
+  success: boolean;
+  thresholds: number[];
+  min_scene_lengths: number[];
+  // Distinct outcomes; table[i][j] indexes this for thresholds[i] and min_scene_lengths[j]
+  results: SceneSweepResult[];
+  table: number[][];
+}
+
+/**
+ * Get scene cuts for every detection slider position in one server call
+ */
+export async function sweepScenes(videoPath: string, signal?: AbortSignal): Promise<SceneSweepResponse> {
+  const params = new URLSearchParams({ path: videoPath });
+
+  const response = await fetch(`/api/scenes/sweep?${params.toString()}`, { signal });
+
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({ error: 'Unknown error' }));
+    if (response.status === 409 && error.cancelled) {
+      throw new DetectionSupersededError(error.error);
+    }
+    throw new Error(error.error || 'Failed to sweep scene detection settings');
+  }
+
+  return response.json();
+}
+
+/**
+ * Look up the sweep result for a slider position (null if it is not on the sweep's grid)
+ */
+export function lookupSweep(
+  sweep: SceneSweepResponse,
+  threshold: number,
+  minSceneLength: number
+): SceneSweepResult | null {
+  const i = sweep.thresholds.findIndex((value) => Math.abs(value - threshold) < 1e-6);
+  const j = sweep.min_scene_lengths.findIndex((value) => Math.abs(value - minSceneLength) < 1e-6);
+  if (i === -1 || j === -1) return null;
+  return sweep.results[sweep.table[i][j]];
+}
@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useSearchParams, useNavigate } from 'react-router-dom';
 import { useTimelineStore } from '@/stores/timelineStore';
 import { useSceneDetectorStore } from '@/stores/sceneDetectorStore';
@@ -12,7 +12,8 @@ import {
   DialogHeader,
   DialogTitle,
 } from '@/components/ui/dialog';
-import { getTags, reprocessVideo } from '@/lib/api';
+import { getTags, reprocessVideo, sweepScenes, lookupSweep, DetectionSupersededError } from '@/lib/api';
+import type { SceneSweepResponse } from '@/lib/api';
 import { formatTime } from '@/hooks/useCanvasTimeline';
 import { cn } from '@/lib/utils';
 import { Settings, Scissors, Check, X, Trash2, Loader2 } from 'lucide-react';
@@ -27,6 +28,8 @@ export function EditorPage() {
   const [showReprocessConfirm, setShowReprocessConfirm] = useState(false);
   const [isReprocessing, setIsReprocessing] = useState(false);
   const [pendingCuts, setPendingCuts] = useState<number[] | null>(null);
+  const [sweep, setSweep] = useState<SceneSweepResponse | null>(null);
+  const reprocessAbort = useRef<AbortController | null>(null);
 
   // Get URL parameters
   const videoUrl = searchParams.get('video');
@@ -77,6 +80,26 @@ export function EditorPage() {
     };
   }, [videoUrl, cutsParam, loadVideo]);
 
+  // Fetch cuts for every slider position once, when the settings drawer first opens
+  useEffect(() => {
+    setSweep(null);
+  }, [videoUrl]);
+
+  useEffect(() => {
+    if (!showSettings || !videoUrl || sweep) return;
+
+    const controller = new AbortController();
+    sweepScenes(videoUrl.replace('/download/', 'output/'), controller.signal)
+      .then(setSweep)
+      .catch((error) => {
+        if (controller.signal.aborted || error instanceof DetectionSupersededError) return;
+        // Reprocessing falls back to /reprocess
+        console.error('[EditorPage] Scene sweep failed:', error);
+      });
+
+    return () => controller.abort();
+  }, [showSettings, videoUrl, sweep]);
+
   // Load existing tags on mount
   useEffect(() => {
     getTags()
@@ -105,6 +128,20 @@ export function EditorPage() {
   const handleReprocess = async () => {
     if (!videoUrl) return;
 
+    // Slider positions covered by the sweep need no server call
+    const swept = sweep ? lookupSweep(sweep, threshold, minSceneLen) : null;
+    if (swept) {
+      setShowSettings(false);
+      setPendingCuts(swept.suggested_cuts);
+      setShowReprocessConfirm(true);
+      return;
+    }
+
+    // Only the latest request matters; the server also stops the older job
+    reprocessAbort.current?.abort();
+    const controller = new AbortController();
+    reprocessAbort.current = controller;
+
     setIsReprocessing(true);
     setShowSettings(false); // Close settings drawer
 
@@ -112,18 +149,22 @@ export function EditorPage() {
       // Extract video path from URL: /download/folder/file.mp4 -> output/folder/file.mp4
       const videoPath = videoUrl.replace('/download/', 'output/');
 
-      const result = await reprocessVideo(videoPath, threshold, minSceneLen);
+      const result = await reprocessVideo(videoPath, threshold, minSceneLen, controller.signal);
 
       // Store pending cuts for confirmation
       setPendingCuts(result.suggested_cuts);
       setShowReprocessConfirm(true);
 
     } catch (error) {
+      if (controller.signal.aborted || error instanceof DetectionSupersededError) return;
       console.error('[EditorPage] Reprocessing failed:', error);
       // Show error dialog or toast
       alert('שגיאה בזיהוי סצנות: ' + (error instanceof Error ? error.message : 'Unknown error'));
     } finally {
-      setIsReprocessing(false);
+      if (reprocessAbort.current === controller) {
+        reprocessAbort.current = null;
+        setIsReprocessing(false);
+      }
     }
   };
 
@@ -320,6 +361,7 @@ export function EditorPage() {
         onOpenChange={setShowSettings}
         onReprocess={handleReprocess}
         isProcessing={isReprocessing}
+        previewSceneCount={sweep ? lookupSweep(sweep, threshold, minSceneLen)?.scene_count ?? null : null}
       />
 
       {/* Segment Tagging Drawer */}
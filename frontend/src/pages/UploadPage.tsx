@@ -2,7 +2,7 @@ import { useNavigate } from 'react-router-dom';
 import { useEffect, useRef } from 'react';
 import { Loader2 } from 'lucide-react';
 import { useUploadStore } from '@/stores/uploadStore';
-import { uploadVideoWithProgress } from '@/lib/api';
+import { uploadVideoDirect } from '@/lib/api';
 import { DropZone } from '@/components/upload/DropZone';
 import { ProgressBar } from '@/components/ui/ProgressBar';
 import { Button } from '@/components/ui/Button';
@@ -61,7 +61,7 @@ export function UploadPage() {
     if (!file) return;
 
     startUpload();
-    abortRef.current = uploadVideoWithProgress(
+    abortRef.current = uploadVideoDirect(
       file,
       { threshold: 27, minSceneLength: 0.6 },
       {
@@ -0,0 +1,42 @@
+"""
+Gunicorn Configuration
+Loaded automatically by gunicorn from the working directory; command-line
+flags in entrypoint.sh take precedence over settings here
+
+Web workers are threaded (gthread): a thread waiting on a long upload,
+save or media job does not hold up library listings and health checks in
+the same worker. CPU-bound media work runs in a separate pool sized by
+MEDIA_WORKERS (see media_pool.py), so web and media capacity are tuned
+independently. Per-route time budgets are set with ROUTE_TIMEOUTS in the
+app; `timeout` below only restarts a worker that stops responding.
+"""
+
+import os
+
+cpus = os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 0)) or min(cpus + 1, 8)
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# With gthread the worker's heartbeat comes from its main loop, not from
+# request threads, so long requests do not trip this
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 60))
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """Run startup checks in the background once the worker has loaded the app"""
+    import server
+    server.start_warmup()
+
+
+def child_exit(server, worker):
+    """Remove a dead worker's live gauge files so /metrics stops counting it"""
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
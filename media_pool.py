@@ -0,0 +1,470 @@
+"""
+Media Worker Pool
+Runs CPU-bound media work outside the web workers
+
+The web workers are threaded (see gunicorn.conf.py), so a long scene
+detection must not hold their GIL. Detection runs in a separate process
+that the caller waits on. The process is started from a forkserver, so it
+does not inherit the web worker's threads and locks, and it runs at a
+lower CPU priority (MEDIA_NICE) so library and health requests keep
+their latency while media jobs saturate the CPU.
+
+At most MEDIA_WORKERS media jobs run at once across all web workers on
+the host. The limit is kept with one lock file per slot in MEDIA_SLOT_DIR.
+FFmpeg encoding jobs take a slot as well (media_slot()) and run in the
+web worker's thread, since FFmpeg is already a separate process. An
+encode uses several cores, so at most MEDIA_FFMPEG_WORKERS of them hold a
+slot at once, kept with a second set of lock files.
+
+Jobs waiting for a slot are queued in MEDIA_SLOT_DIR/queue, one file per
+job, and are let in in this order:
+
+1. Priority class: interactive (upload and re-run detection), then save
+   (timeline save, workout compilation), then batch (batch uploads, bulk
+   import). A job moves up one class for every MEDIA_PRIORITY_AGING_SECONDS
+   it has waited, so batch work is delayed but never starved.
+2. Fair share: the user with fewer running jobs goes first, so one user's
+   hour-long upload does not hold up everyone else's clips.
+3. Arrival time.
+
+A request that would wait behind MEDIA_QUEUE_BUDGET or more jobs is
+turned away with MediaQueueFull (429) instead of queueing. Background
+work (batches, imports) is never turned away.
+
+Every route has a time budget (ROUTE_TIMEOUTS, DEFAULT_ROUTE_TIMEOUT).
+Media jobs that exceed it are killed, and database statements issued by
+the route are cancelled by Postgres (statement_timeout).
+
+Jobs can also be cancelled. A request that re-runs detection on a video
+claims that video's job file with latest_request(); a job whose file has
+been claimed by a newer request stops waiting for a slot, or has its
+process killed, within CANCEL_POLL_SECONDS. The job file lives in the
+video's session folder, so this works across web workers on the host.
+"""
+
+import fcntl
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from flask import has_request_context, request
+
+from metrics import MEDIA_QUEUE_SECONDS, MEDIA_JOBS, MEDIA_REJECTED, mark_process_dead, record_in_memory, replay
+from tracing import continue_trace, trace_context, flush as flush_spans
+
+try:
+    from config import Config
+    MEDIA_WORKERS = Config.MEDIA_WORKERS
+    MEDIA_SLOT_DIR = Config.MEDIA_SLOT_DIR
+    MEDIA_NICE = Config.MEDIA_NICE
+    MEDIA_FFMPEG_WORKERS = Config.MEDIA_FFMPEG_WORKERS
+    MEDIA_QUEUE_BUDGET = Config.MEDIA_QUEUE_BUDGET
+    MEDIA_PRIORITY_AGING_SECONDS = Config.MEDIA_PRIORITY_AGING_SECONDS
+    ROUTE_TIMEOUTS = Config.ROUTE_TIMEOUTS
+    DEFAULT_ROUTE_TIMEOUT = Config.DEFAULT_ROUTE_TIMEOUT
+except ImportError:
+    MEDIA_WORKERS = int(os.getenv('MEDIA_WORKERS', 0)) or os.cpu_count() or 1
+    MEDIA_SLOT_DIR = os.getenv('MEDIA_SLOT_DIR', '/tmp/workout_media_slots')
+    MEDIA_NICE = int(os.getenv('MEDIA_NICE', 10))
+    MEDIA_FFMPEG_WORKERS = int(os.getenv('MEDIA_FFMPEG_WORKERS', 0)) or max(1, (os.cpu_count() or 1) // 2)
+    MEDIA_QUEUE_BUDGET = int(os.getenv('MEDIA_QUEUE_BUDGET', 0)) or 4 * MEDIA_WORKERS
+    MEDIA_PRIORITY_AGING_SECONDS = float(os.getenv('MEDIA_PRIORITY_AGING_SECONDS', 60))
+    ROUTE_TIMEOUTS = {}
+    DEFAULT_ROUTE_TIMEOUT = float(os.getenv('DEFAULT_ROUTE_TIMEOUT', 30))
+
+SLOT_POLL_SECONDS = 0.05
+CANCEL_POLL_SECONDS = 0.1
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_SAVE = 'save'
+PRIORITY_BATCH = 'batch'
+# Highest first
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_SAVE, PRIORITY_BATCH)
+
+# Priority class by Flask endpoint; other requests are interactive, background work is batch
+ROUTE_PRIORITIES = {
+    'save_timeline': PRIORITY_SAVE,
+    'compile_workout_video': PRIORITY_SAVE
+}
+
+_context = None
+_context_lock = threading.Lock()
+
+
+class MediaPoolBusy(Exception):
+    """No media slot became free within the wait (callers answer 503 with Retry-After)"""
+
+
+class MediaQueueFull(MediaPoolBusy):
+    """Too many media jobs are queued ahead of a request (callers answer 429 with Retry-After)"""
+
+
+class MediaTimeout(Exception):
+    """A media job ran past its route's time budget and was killed"""
+
+
+class MediaCancelled(Exception):
+    """A media job was superseded by a newer request and stopped"""
+
+
+def route_timeout(endpoint: Optional[str] = None) -> float:
+    """
+    Time budget in seconds for a Flask endpoint
+
+    Args:
+        endpoint: Endpoint name (default: the current request's)
+    """
+    if endpoint is None and has_request_context():
+        endpoint = request.endpoint
+    return ROUTE_TIMEOUTS.get(endpoint, DEFAULT_ROUTE_TIMEOUT)
+
+
+def request_priority() -> str:
+    """Priority class of the current request's media jobs (batch outside a request)"""
+    if not has_request_context():
+        return PRIORITY_BATCH
+    return ROUTE_PRIORITIES.get(request.endpoint, PRIORITY_INTERACTIVE)
+
+
+def request_user() -> str:
+    """Fair-share key of the current request: X-User-Id header, else the client address"""
+    if not has_request_context():
+        return 'background'
+    return (request.headers.get('X-User-Id') or request.remote_addr or 'anonymous')[:64]
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _entries(directory: str) -> List[Dict]:
+    """
+    Queue or running entries of live processes, parsed from their file names
+
+    Entries left behind by dead processes are removed.
+    """
+    entries = []
+    for name in os.listdir(directory):
+        parts = name.split('_')
+        if len(parts) != 6:
+            continue
+        rank, created, pid, user, ffmpeg, token = parts
+        if not _process_alive(int(pid)):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+            continue
+        entries.append({'rank': int(rank), 'created': int(created), 'user': user,
+                        'ffmpeg': ffmpeg == '1', 'token': token})
+    return entries
+
+
+def _entry_name(rank: int, created: int, user: str, ffmpeg: bool, token: str) -> str:
+    """File name of a queue entry (rank: priority class) or running entry (rank: slot)"""
+    user_key = hashlib.sha1(user.encode('utf-8')).hexdigest()[:12]
+    return f"{rank}_{created}_{os.getpid()}_{user_key}_{int(ffmpeg)}_{token}"
+
+
+def _queue_order(waiting: List[Dict], running: List[Dict]) -> List[Dict]:
+    """Waiting jobs in the order they get slots: aged priority class, user's running jobs, arrival"""
+    now = time.time_ns()
+    running_per_user = Counter(entry['user'] for entry in running)
+
+    def order(entry):
+        level = entry['rank']
+        if MEDIA_PRIORITY_AGING_SECONDS > 0:
+            level -= int((now - entry['created']) / 1e9 / MEDIA_PRIORITY_AGING_SECONDS)
+        return max(0, level), running_per_user[entry['user']], entry['created']
+
+    return sorted(waiting, key=order)
+
+
+def _try_lock(prefix: str, count: int) -> Optional[tuple]:
+    """Lock the first free of count slot files; returns (slot, fd) or None"""
+    for slot in range(count):
+        fd = os.open(os.path.join(MEDIA_SLOT_DIR, f"{prefix}-{slot}.lock"), os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return slot, fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+def _unlock(fd: int) -> None:
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def _acquire(ffmpeg: bool) -> list:
+    """Lock an FFmpeg slot (if needed) and a media slot; returns [(slot, fd), ...] with the media slot last, or []"""
+    handles = []
+    if ffmpeg:
+        handle = _try_lock('ffmpeg', MEDIA_FFMPEG_WORKERS)
+        if handle is None:
+            return []
+        handles.append(handle)
+    handle = _try_lock('slot', MEDIA_WORKERS)
+    if handle is None:
+        for _, fd in handles:
+            _unlock(fd)
+        return []
+    handles.append(handle)
+    return handles
+
+
+@contextmanager
+def media_slot(wait: Optional[float] = None, cancelled: Optional[Callable[[], bool]] = None,
+               priority: Optional[str] = None, user: Optional[str] = None, ffmpeg: bool = False):
+    """
+    Hold one of the host's MEDIA_WORKERS media slots for the duration of a block
+
+    Waiting jobs get slots by priority class, then fair share across users,
+    then arrival (see the module docstring).
+
+    Args:
+        wait: Seconds to wait for a free slot (default: the current route's timeout)
+        cancelled: Checked while waiting; stop waiting once it returns True
+        priority: One of PRIORITY_CLASSES (default: by the current route)
+        user: Fair-share key (default: the current request's user)
+        ffmpeg: The block runs an FFmpeg encode; also hold one of MEDIA_FFMPEG_WORKERS slots
+
+    Raises:
+        MediaQueueFull: If MEDIA_QUEUE_BUDGET or more jobs were queued ahead of a request
+        MediaPoolBusy: If every slot stayed taken for the whole wait
+        MediaCancelled: If cancelled() returned True before a slot was free
+    """
+    wait = route_timeout() if wait is None else wait
+    priority = priority or request_priority()
+    user = user or request_user()
+    queue_dir = os.path.join(MEDIA_SLOT_DIR, 'queue')
+    running_dir = os.path.join(MEDIA_SLOT_DIR, 'running')
+    os.makedirs(queue_dir, exist_ok=True)
+    os.makedirs(running_dir, exist_ok=True)
+
+    start = time.monotonic()
+    token = uuid.uuid4().hex
+    ticket = os.path.join(queue_dir, _entry_name(PRIORITY_CLASSES.index(priority), time.time_ns(), user, ffmpeg, token))
+    open(ticket, 'w').close()
+    if has_request_context():
+        queued = _queue_order(_entries(queue_dir), _entries(running_dir))
+        position = next(i for i, entry in enumerate(queued) if entry['token'] == token)
+        if position >= MEDIA_QUEUE_BUDGET:
+            os.remove(ticket)
+            MEDIA_REJECTED.labels(priority=priority).inc()
+            raise MediaQueueFull(f"{position} media jobs are queued ahead of this request")
+    handles = []
+    running_entry = None
+    try:
+        while True:
+            running = _entries(running_dir)
+            waiting = _queue_order(_entries(queue_dir), running)
+            position = next(i for i, entry in enumerate(waiting) if entry['token'] == token)
+
+            # Jobs ahead that need an FFmpeg slot do not hold up other jobs while those are all taken
+            ffmpeg_full = sum(entry['ffmpeg'] for entry in running) >= MEDIA_FFMPEG_WORKERS
+            ahead = [entry for entry in waiting[:position] if not (entry['ffmpeg'] and ffmpeg_full)]
+            if len(ahead) < MEDIA_WORKERS - len(running) and not (ffmpeg and ffmpeg_full):
+                handles = _acquire(ffmpeg)
+                if handles:
+                    break
+
+            if cancelled is not None and cancelled():
+                raise MediaCancelled("Cancelled while waiting for a media worker")
+            if time.monotonic() - start >= wait:
+                raise MediaPoolBusy(f"All {MEDIA_WORKERS} media workers are busy")
+            time.sleep(SLOT_POLL_SECONDS)
+
+        slot = handles[-1][0]
+        running_entry = os.path.join(running_dir, _entry_name(slot, time.time_ns(), user, ffmpeg, token))
+        open(running_entry, 'w').close()
+        os.remove(ticket)
+        ticket = None
+        MEDIA_QUEUE_SECONDS.labels(priority=priority).observe(time.monotonic() - start)
+        yield
+    finally:
+        for path in (ticket, running_entry):
+            if path is not None:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        for _, fd in handles:
+            _unlock(fd)
+
+
+def _get_context():
+    global _context
+    with _context_lock:
+        if _context is None:
+            _context = multiprocessing.get_context('forkserver')
+            # Imported once in the fork server instead of in every job
+            _context.set_forkserver_preload(
+                ['__main__', 'scene_detection', 'scene_detectors', 'scenedetect', 'video_processing', 'pipe_detection']
+            )
+        return _context
+
+
+def start() -> None:
+    """
+    Start the fork server now instead of on the first job
+
+    Returns once the fork server is launched; it then imports PySceneDetect
+    and OpenCV in its own process while the web worker serves requests.
+    """
+    from multiprocessing import forkserver
+    _get_context()
+    forkserver.ensure_running()
+
+
+def _child(conn, func, args, kwargs, kind, trace):
+    """
+    Entry point of a media process: run the job and send back its result or
+    exception, with the metric updates it made (applied by the web worker)
+
+    The job runs in a media.<kind> span continuing the request's trace
+    (trace: tracing.trace_context() in the web worker), so its spans belong
+    to the request that queued it.
+    """
+    if MEDIA_NICE:
+        os.nice(MEDIA_NICE)
+    updates = record_in_memory()
+    try:
+        with continue_trace(trace, f"media.{kind}"):
+            result = ('ok', func(*args, **kwargs), updates)
+    except Exception as e:
+        result = ('error', e, updates)
+    try:
+        conn.send(result)
+    except Exception as e:
+        # Exception (or result) that cannot be pickled
+        conn.send(('error', RuntimeError(f"{type(result[1]).__name__}: {result[1]}; {e}"), updates))
+    finally:
+        conn.close()
+        # Background span exports would otherwise die with this process
+        flush_spans()
+
+
+def _poll_interval(deadline: float, cancelled: Optional[Callable[[], bool]]) -> float:
+    """How long to wait for a job's result before checking for cancellation or timeout again"""
+    remaining = max(0.0, deadline - time.monotonic())
+    return remaining if cancelled is None else min(remaining, CANCEL_POLL_SECONDS)
+
+
+@contextmanager
+def latest_request(video_path: str, kind: str):
+    """
+    Make this request the current one for a video's jobs of one kind
+
+    Claims a job file next to the video; an older request holding the same
+    file sees it change and cancels its job. Pass the yielded callable as
+    run_media(cancelled=...).
+
+    Args:
+        video_path: Video the job runs on (its folder is the editor session)
+        kind: Job kind; requests of different kinds do not cancel each other
+
+    Yields:
+        Callable that returns True once a newer request has claimed the file
+    """
+    path = os.path.join(os.path.dirname(video_path), f".{kind}-{os.path.basename(video_path)}.job")
+    token = uuid.uuid4().hex
+    tmp_path = f"{path}.{token}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(token)
+    os.replace(tmp_path, path)
+
+    def superseded() -> bool:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return f.read() != token
+        except FileNotFoundError:
+            return False
+
+    try:
+        yield superseded
+    finally:
+        # Leave the file to a newer request; otherwise remove it so the session can be seen as empty
+        if not superseded():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def run_media(func: Callable, *args, timeout: Optional[float] = None, kind: str = 'media',
+              cancelled: Optional[Callable[[], bool]] = None, priority: Optional[str] = None,
+              user: Optional[str] = None, **kwargs):
+    """
+    Run func(*args, **kwargs) in a media process and return its result
+
+    Args:
+        func: Module-level (picklable) function
+        timeout: Seconds for slot wait plus run time (default: the current route's timeout)
+        kind: Job label for metrics
+        cancelled: Checked every CANCEL_POLL_SECONDS; the job is stopped once it returns True
+        priority: Priority class for the slot queue (default: by the current route)
+        user: Fair-share key (default: the current request's user)
+
+    Returns:
+        The function's return value
+
+    Raises:
+        MediaQueueFull: If too many jobs were queued ahead of the request
+        MediaPoolBusy: If no media slot became free in time
+        MediaTimeout: If the job did not finish in time (the process is killed)
+        MediaCancelled: If cancelled() returned True first (the process is killed)
+        Exception: Whatever func raised
+    """
+    timeout = route_timeout() if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+
+    try:
+        with media_slot(wait=timeout, cancelled=cancelled, priority=priority, user=user):
+            context = _get_context()
+            parent_conn, child_conn = context.Pipe(duplex=False)
+            process = context.Process(target=_child, args=(child_conn, func, args, kwargs, kind, trace_context()),
+                                      daemon=True)
+            process.start()
+            child_conn.close()
+            try:
+                # Read before join: a large result would otherwise block the child on a full pipe
+                while not parent_conn.poll(_poll_interval(deadline, cancelled)):
+                    if cancelled is not None and cancelled():
+                        process.kill()
+                        raise MediaCancelled(f"{kind} job was superseded")
+                    if time.monotonic() >= deadline:
+                        process.kill()
+                        MEDIA_JOBS.labels(kind=kind, outcome='timeout').inc()
+                        raise MediaTimeout(f"{kind} job exceeded {timeout:.0f}s")
+                try:
+                    status, value, updates = parent_conn.recv()
+                except EOFError:
+                    MEDIA_JOBS.labels(kind=kind, outcome='error').inc()
+                    raise RuntimeError(f"{kind} process exited with code {process.exitcode}")
+            finally:
+                parent_conn.close()
+                process.join()
+                mark_process_dead(process.pid)
+    except MediaCancelled:
+        MEDIA_JOBS.labels(kind=kind, outcome='cancelled').inc()
+        raise
+
+    replay(updates)
+    MEDIA_JOBS.labels(kind=kind, outcome='ok' if status == 'ok' else 'error').inc()
+    if status == 'error':
+        raise value
+    return value
@@ -0,0 +1,238 @@
+"""
+Metrics Collection
+Prometheus histograms and gauges for each pipeline stage (upload, scene
+detection, encoding, thumbnails, storage, database)
+
+With gunicorn, set PROMETHEUS_MULTIPROC_DIR to a shared, empty directory
+(entrypoint.sh does this) so /metrics aggregates every worker process.
+Media processes (media_pool.run_media) do not write there: they record
+their updates with record_in_memory() and the web worker that ran the job
+applies them with replay(), so short-lived processes leave no files behind.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    from config import Config
+    METRICS_DIR = Config.PROMETHEUS_MULTIPROC_DIR
+except ImportError:
+    METRICS_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR', '')
+
+# prometheus_client picks its value storage at import time, so the
+# multiprocess directory must be in the environment before importing it
+if METRICS_DIR:
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', METRICS_DIR)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+
+# Bucket sets (seconds unless noted)
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MEDIA_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+SIZE_BUCKETS = tuple(mb * 1024 * 1024 for mb in (1, 5, 10, 25, 50, 100, 200, 300, 500))
+FPS_BUCKETS = (10, 25, 50, 100, 200, 400, 800, 1600)
+
+
+UPLOAD_SIZE_BYTES = Histogram(
+    'workout_upload_size_bytes', 'Size of uploaded videos', ['endpoint'], buckets=SIZE_BUCKETS
+)
+SCENE_DETECTION_SECONDS = Histogram(
+    'workout_scene_detection_seconds', 'Scene detection wall time per video', buckets=MEDIA_BUCKETS
+)
+SCENE_DETECTION_FPS = Histogram(
+    'workout_scene_detection_fps', 'Scene detection throughput in frames per second', buckets=FPS_BUCKETS
+)
+SEGMENT_ENCODE_SECONDS = Histogram(
+    'workout_segment_encode_seconds', 'FFmpeg encode time per segment', ['profile'], buckets=MEDIA_BUCKETS
+)
+THUMBNAIL_SECONDS = Histogram(
+    'workout_thumbnail_seconds', 'FFmpeg thumbnail generation time', buckets=FAST_BUCKETS
+)
+NORMALIZE_SECONDS = Histogram(
+    'workout_normalize_seconds', 'FFmpeg time to normalize an upload to a mezzanine file', buckets=MEDIA_BUCKETS
+)
+# result: normalized, conformant (used as uploaded) or failed (original used)
+NORMALIZE_RESULTS = Counter(
+    'workout_normalize_uploads', 'Uploads checked by the normalization stage', ['result']
+)
+STORAGE_UPLOAD_SECONDS = Histogram(
+    'workout_storage_upload_seconds', 'Storage upload latency', ['backend'], buckets=MEDIA_BUCKETS
+)
+DB_QUERY_SECONDS = Histogram(
+    'workout_db_query_seconds', 'Database statement latency', ['route'], buckets=FAST_BUCKETS
+)
+DB_CONNECT_SECONDS = Histogram(
+    'workout_db_connect_seconds', 'Time to acquire a database connection', buckets=FAST_BUCKETS
+)
+STORAGE_CACHE_REQUESTS = Counter(
+    'workout_storage_cache_requests', 'Local storage cache lookups', ['result']
+)
+STORAGE_DOWNLOAD_SECONDS = Histogram(
+    'workout_storage_download_seconds', 'Storage download latency on cache misses', ['backend'], buckets=MEDIA_BUCKETS
+)
+RESULT_CACHE_REQUESTS = Counter(
+    'workout_result_cache_requests', 'Shared result cache lookups (waited: computed by another worker)',
+    ['namespace', 'result']
+)
+# priority: interactive, save or batch (see media_pool.PRIORITY_CLASSES)
+MEDIA_QUEUE_SECONDS = Histogram(
+    'workout_media_queue_seconds', 'Wait for a free media worker slot', ['priority'], buckets=MEDIA_BUCKETS
+)
+MEDIA_REJECTED = Counter(
+    'workout_media_rejected', 'Requests turned away (429) because too many media jobs were queued', ['priority']
+)
+# outcome: ok, error, timeout, or cancelled (superseded by a newer request for the same video)
+MEDIA_JOBS = Counter(
+    'workout_media_jobs', 'Jobs run in media processes', ['kind', 'outcome']
+)
+# Upload bytes written but not yet fsynced (see streaming_upload.py)
+UPLOAD_INFLIGHT_BYTES = Gauge(
+    'workout_upload_inflight_bytes', 'Upload bytes written but not yet synced to disk', multiprocess_mode='livesum'
+)
+UPLOAD_WAIT_SECONDS = Histogram(
+    'workout_upload_budget_wait_seconds', 'Wait for room in the in-flight upload budget', buckets=MEDIA_BUCKETS
+)
+ACTIVE_JOBS = Gauge(
+    'workout_active_jobs', 'Media jobs currently running', ['kind'], multiprocess_mode='livesum'
+)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """
+    Observe the duration of a block in a histogram
+
+    Args:
+        histogram: Histogram to observe into
+        **labels: Label values, if the histogram has labels
+
+    Example:
+        with timed(STORAGE_UPLOAD_SECONDS, backend='r2'):
+            upload()
+    """
+    metric = histogram.labels(**labels) if labels else histogram
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_job(kind: str):
+    """
+    Count a media job as active for the duration of a block
+    (also usable as a decorator on a route)
+
+    Args:
+        kind: Job type ('detect', 'save', ...)
+    """
+    gauge = ACTIVE_JOBS.labels(kind=kind)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+
+class _Recorder:
+    """Stands in for a metric (or one of its label sets) and records updates instead of applying them"""
+
+    def __init__(self, metric_name: str, labelnames, labelvalues, updates: list):
+        self._metric_name = metric_name
+        self._labelnames = labelnames
+        self._labelvalues = labelvalues
+        self._updates = updates
+
+    def labels(self, *labelvalues, **labelkwargs) -> '_Recorder':
+        if labelkwargs:
+            labelvalues = tuple(labelkwargs[name] for name in self._labelnames)
+        return _Recorder(self._metric_name, self._labelnames, tuple(str(value) for value in labelvalues),
+                         self._updates)
+
+    def _record(self, method: str, value: float) -> None:
+        self._updates.append((self._metric_name, self._labelvalues, method, value))
+
+    def inc(self, amount: float = 1) -> None:
+        self._record('inc', amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._record('dec', amount)
+
+    def set(self, value: float) -> None:
+        self._record('set', value)
+
+    def observe(self, amount: float) -> None:
+        self._record('observe', amount)
+
+
+def _metrics() -> dict:
+    """This module's metrics by variable name"""
+    return {name: value for name, value in globals().items() if isinstance(value, (Counter, Gauge, Histogram))}
+
+
+def record_in_memory() -> list:
+    """
+    Record this process's metric updates in a list from now on, instead of
+    applying them (for media processes; see replay())
+
+    In multiprocess mode every process that touches a metric gets its own
+    <type>_<pid>.db file in PROMETHEUS_MULTIPROC_DIR, and nothing removes
+    the files of processes that have exited, so one media job per process
+    would grow the directory, and /metrics scrape time, with every job.
+
+    Returns:
+        List the updates are appended to as (metric, label values, method, value)
+    """
+    updates = []
+    for name, metric in _metrics().items():
+        recorder = _Recorder(name, metric._labelnames, (), updates)
+        for method in ('labels', 'inc', 'dec', 'set', 'observe'):
+            if hasattr(metric, method):
+                setattr(metric, method, getattr(recorder, method))
+    return updates
+
+
+def replay(updates: list) -> None:
+    """Apply updates recorded by record_in_memory() in another process"""
+    metrics = _metrics()
+    for name, labelvalues, method, value in updates:
+        metric = metrics.get(name)
+        if metric is None:
+            continue
+        if labelvalues:
+            metric = metric.labels(*labelvalues)
+        getattr(metric, method)(value)
+
+
+def render_metrics():
+    """
+    Render all metrics in Prometheus text format
+
+    Returns:
+        Tuple of (body bytes, content type)
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop a dead worker's live gauges (called from gunicorn's child_exit hook)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,12 @@
+-- Migration: Add import key for bulk imports
+-- Identifies exercises created by bulk_import.py so an interrupted import
+-- can be re-run without inserting duplicates
+-- Date: 2026-10-19
+
+ALTER TABLE exercises
+ADD COLUMN IF NOT EXISTS import_key VARCHAR(64);
+
+-- NULLs are distinct, so exercises created in the editor are unaffected
+CREATE UNIQUE INDEX IF NOT EXISTS idx_exercises_import_key ON exercises(import_key);
+
+SELECT 'Migration 002 completed successfully!' as status;
@@ -0,0 +1,16 @@
+-- Migration: Add save state to timelines
+-- Checkpoints of /api/timeline/save (see timeline_saves.py), so a save
+-- interrupted partway can be retried with the same save id without
+-- encoding, uploading or inserting segments twice
+-- Date: 2026-10-19
+
+ALTER TABLE timelines
+ADD COLUMN IF NOT EXISTS save_id VARCHAR(64),
+ADD COLUMN IF NOT EXISTS request_hash VARCHAR(64),
+ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'saving',  -- 'saving', 'saved'
+ADD COLUMN IF NOT EXISTS segment_states JSONB DEFAULT '{}'::jsonb,  -- segment index -> {state, content_key, video_url, thumbnail_url, exercise_id}
+ADD COLUMN IF NOT EXISTS result JSONB;  -- Response of the completed save
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_timelines_save_id ON timelines(save_id);
+
+SELECT 'Migration 003 completed successfully!' as status;
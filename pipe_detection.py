@@ -0,0 +1,221 @@
+"""
+Pipe Detection
+Content detection frame scores computed with NumPy from an FFmpeg rawvideo
+pipe, without PySceneDetect's per-frame OpenCV calls
+
+ContentDetector converts every frame to HSV with OpenCV and scores it
+against the previous one in Python, one call per frame. Here FFmpeg decodes
+the video, downscales it to PIPE_DETECT_WIDTH and writes raw frames
+(PIPE_DETECT_FORMAT: yuv420p or gray) to a pipe. The frames are read
+straight into a preallocated NumPy buffer, PIPE_DETECT_BATCH at a time, and
+each batch is scored with a few whole-array operations.
+
+A frame's score is the mean absolute difference from the previous frame,
+averaged over the Y, U and V planes (Y only for gray), on the same 0-255
+scale as ContentDetector's hue, saturation and value deltas. Hard cuts
+score about as high as with ContentDetector, so the editor's thresholds
+keep their meaning, but fades from black do not: ContentDetector's hue on
+near-black frames is noise that often trips a cut there, while these
+scores stay low. Fades are the threshold detector's job.
+
+NumPy is imported by the functions that use it, like PySceneDetect in
+scene_detection.py.
+"""
+
+import os
+import subprocess
+import tempfile
+from typing import Dict
+
+from video_processing import get_ffmpeg_command, get_video_info, VideoProcessingError
+
+try:
+    from config import Config
+    PIPE_DETECT_WIDTH = Config.PIPE_DETECT_WIDTH
+    PIPE_DETECT_BATCH = Config.PIPE_DETECT_BATCH
+    PIPE_DETECT_FORMAT = Config.PIPE_DETECT_FORMAT
+except ImportError:
+    PIPE_DETECT_WIDTH = int(os.getenv('PIPE_DETECT_WIDTH', 256))
+    PIPE_DETECT_BATCH = int(os.getenv('PIPE_DETECT_BATCH', 64))
+    PIPE_DETECT_FORMAT = os.getenv('PIPE_DETECT_FORMAT', 'yuv420p')
+
+# Raw frame formats the pipe can carry: plane sizes as fractions of width x height
+PIXEL_FORMATS = {
+    'yuv420p': (1, 0.25, 0.25),
+    'gray': (1,),
+}
+
+
+def frame_size(width: int, height: int, max_width: int = PIPE_DETECT_WIDTH):
+    """
+    Size frames are scored at: at most max_width wide, same aspect, even dimensions
+
+    Args:
+        width: Coded frame width
+        height: Coded frame height
+        max_width: Widest scored frame (videos are never upscaled)
+
+    Returns:
+        Tuple of (width, height)
+    """
+    scaled_width = max(2, min(width, max_width) // 2 * 2)
+    scaled_height = max(2, round(height * scaled_width / width / 2) * 2)
+    return scaled_width, scaled_height
+
+
+class FrameRing:
+    """
+    Preallocated frame buffer that raw frames are read into and scored from in batches
+
+    Slot 0 holds the last frame of the previous batch and slots 1..batch
+    the frames being read, so every frame in a batch is scored against
+    the one before it, across batch boundaries too. After a batch its last
+    frame moves to slot 0; nothing else is allocated or copied per frame.
+    """
+
+    def __init__(self, planes, batch: int):
+        """
+        Args:
+            planes: Byte size of each plane of a frame, in pipe order
+            batch: Frames read and scored at a time
+        """
+        import numpy
+
+        self.batch = max(1, batch)
+        self.planes = list(planes)
+        self.frame_bytes = sum(self.planes)
+        self.frames = numpy.zeros((self.batch + 1, self.frame_bytes), dtype=numpy.uint8)
+        # Scratch space for the absolute differences (max - min keeps them in uint8)
+        self._high = numpy.empty((self.batch, self.frame_bytes), dtype=numpy.uint8)
+        self._low = numpy.empty((self.batch, self.frame_bytes), dtype=numpy.uint8)
+        self._plane_bounds = []
+        offset = 0
+        for size in self.planes:
+            self._plane_bounds.append((offset, offset + size))
+            offset += size
+        self._filled = False
+
+    def read(self, stream) -> int:
+        """
+        Read up to batch frames from stream into slots 1..batch
+
+        Args:
+            stream: Unbuffered binary stream (readinto() writes straight into the buffer)
+
+        Returns:
+            Number of whole frames read (less than batch only at the end of the stream)
+        """
+        view = memoryview(self.frames[1:]).cast('B')
+        received = 0
+        while received < len(view):
+            count = stream.readinto(view[received:])
+            if not count:
+                break
+            received += count
+        return received // self.frame_bytes
+
+    def scores(self, count: int):
+        """
+        Scores of the count frames just read (the first frame of the video scores 0)
+
+        Returns:
+            NumPy float64 array of count scores
+        """
+        import numpy
+
+        current = self.frames[1:count + 1]
+        previous = self.frames[:count]
+        high = numpy.maximum(current, previous, out=self._high[:count])
+        low = numpy.minimum(current, previous, out=self._low[:count])
+        difference = numpy.subtract(high, low, out=high)
+
+        scores = numpy.zeros(count, dtype=numpy.float64)
+        for (start, end), size in zip(self._plane_bounds, self.planes):
+            scores += difference[:, start:end].sum(axis=1, dtype=numpy.int64) / size
+        scores /= len(self.planes)
+
+        if not self._filled:
+            # No previous frame for the first one
+            scores[0] = 0.0
+            self._filled = True
+        self.frames[0] = self.frames[count]
+        return scores
+
+
+def frame_scores(video_path: str, width: int = PIPE_DETECT_WIDTH, batch: int = PIPE_DETECT_BATCH,
+                 pixel_format: str = PIPE_DETECT_FORMAT) -> Dict:
+    """
+    Score every frame of a video against the previous one
+
+    Args:
+        video_path: Path to the video file
+        width: Widest frame scored (see frame_size())
+        batch: Frames scored at a time
+        pixel_format: 'yuv420p' (luma and chroma) or 'gray' (luma only)
+
+    Returns:
+        Dictionary with:
+            scores: NumPy float64 array, one score per decoded frame
+            fps: Video frame rate
+            frames: Number of frames decoded
+            size: Scored frame size as (width, height)
+
+    Raises:
+        VideoProcessingError: If the format is unknown or FFmpeg decodes no frames
+    """
+    import numpy
+
+    if pixel_format not in PIXEL_FORMATS:
+        raise VideoProcessingError(
+            f"Unknown pipe pixel format '{pixel_format}'. Supported: {', '.join(PIXEL_FORMATS)}"
+        )
+    info = get_video_info(video_path)
+    scaled_width, scaled_height = frame_size(info['width'], info['height'], width)
+    area = scaled_width * scaled_height
+    ring = FrameRing([int(area * fraction) for fraction in PIXEL_FORMATS[pixel_format]], batch)
+
+    cmd = [
+        get_ffmpeg_command(),
+        '-v', 'error',
+        # Orientation does not change frame differences; keeping the coded one keeps the probed size
+        '-noautorotate',
+        '-i', video_path,
+        '-map', '0:v:0',
+        '-vf', f"scale={scaled_width}:{scaled_height}:flags=area",
+        # Every decoded frame once, as OpenCV reads them
+        '-fps_mode', 'passthrough',
+        '-pix_fmt', pixel_format,
+        '-f', 'rawvideo',
+        'pipe:1'
+    ]
+
+    batches = []
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors, bufsize=0)
+        try:
+            while True:
+                count = ring.read(process.stdout)
+                if count:
+                    batches.append(ring.scores(count))
+                if count < ring.batch:
+                    break
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        errors.seek(0)
+        error_output = errors.read().decode('utf-8', 'replace').strip()
+
+    frames = sum(len(scores) for scores in batches)
+    if returncode != 0 and not frames:
+        raise VideoProcessingError(f"FFmpeg could not decode {video_path}: {error_output[-500:]}")
+    if not frames:
+        raise VideoProcessingError(f"No video frames decoded from {video_path}")
+    if returncode != 0:
+        print(f"[Pipe Detection] FFmpeg exited with {returncode} after {frames} frames: {error_output[-200:]}")
+
+    return {
+        'scores': numpy.concatenate(batches),
+        'fps': info['fps'],
+        'frames': frames,
+        'size': (scaled_width, scaled_height)
+    }
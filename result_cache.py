@@ -0,0 +1,308 @@
+"""
+Shared Result Cache
+Caches expensive results (scene detection, detection sweeps, FFprobe
+metadata, file content hashes) in one SQLite file shared by every web
+worker on the host
+
+Gunicorn workers are separate processes, so a result cached in memory by
+one worker is invisible to the others. Entries are keyed by the video's
+content hash and the parameters used (cache_key()), expire after
+RESULT_CACHE_TTL_HOURS, and the least recently used entries are evicted
+once the cache holds more than RESULT_CACHE_MAX_MB.
+
+get_or_compute() records the key as pending while it computes. When two
+workers miss on the same key at once, one computes and the other waits
+for its result instead of repeating the work. A pending entry whose
+process has died is taken over.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from metrics import RESULT_CACHE_REQUESTS
+
+try:
+    from config import Config
+    RESULT_CACHE_PATH = Config.RESULT_CACHE_PATH
+    RESULT_CACHE_MAX_MB = Config.RESULT_CACHE_MAX_MB
+    RESULT_CACHE_TTL_HOURS = Config.RESULT_CACHE_TTL_HOURS
+except ImportError:
+    RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', '/tmp/workout_result_cache.sqlite3')
+    RESULT_CACHE_MAX_MB = float(os.getenv('RESULT_CACHE_MAX_MB', 256))
+    RESULT_CACHE_TTL_HOURS = float(os.getenv('RESULT_CACHE_TTL_HOURS', 24))
+
+PENDING_POLL_SECONDS = 0.1
+# Reads refresh an entry's last access at most this often, to keep reads from writing
+ACCESS_UPDATE_SECONDS = 60
+# Eviction trims the cache to this fraction of its size limit
+EVICT_TO_FRACTION = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS pending (
+    key TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL
+);
+"""
+
+_MISSING = object()
+
+
+def cache_key(namespace: str, content_hash: str, **params) -> str:
+    """
+    Key of a cached result
+
+    Args:
+        namespace: Kind of result, e.g. 'detect' (also the metrics label)
+        content_hash: Hash identifying the input (usually file_content_hash())
+        **params: Parameters the result depends on (JSON-serializable)
+
+    Returns:
+        '<namespace>:<40 hex characters>'
+    """
+    material = json.dumps([namespace, content_hash, params], sort_keys=True, default=str)
+    return f"{namespace}:{hashlib.sha256(material.encode('utf-8')).hexdigest()[:40]}"
+
+
+def _namespace(key: str) -> str:
+    return key.split(':', 1)[0]
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ResultCache:
+    """SQLite-backed cache shared by every process that opens the same file"""
+
+    def __init__(self, path: str, max_mb: float = 256, ttl_hours: float = 24):
+        """
+        Args:
+            path: SQLite database file (created on first use)
+            max_mb: Size limit of the stored values; 0 disables the cache
+            ttl_hours: Default lifetime of an entry
+        """
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_hours * 3600
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection (a new one after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit; every statement is its own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _lookup(self, key: str):
+        """Stored value, or _MISSING"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, accessed FROM entries WHERE key = ? AND expires > ?', (key, now)
+            ).fetchone()
+            if row is None:
+                return _MISSING
+            if now - row[1] > ACCESS_UPDATE_SECONDS:
+                conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+            return pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            print(f"[Cache] Warning: Could not read {key}: {e}")
+            return _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Cached value for a key
+
+        Args:
+            key: Key from cache_key()
+            default: Returned when the key is missing or expired
+
+        Returns:
+            The cached value or default
+        """
+        if not self.enabled:
+            return default
+        value = self._lookup(key)
+        RESULT_CACHE_REQUESTS.labels(namespace=_namespace(key), result='miss' if value is _MISSING else 'hit').inc()
+        return default if value is _MISSING else value
+
+    def put(self, key: str, value: Any, ttl_hours: Optional[float] = None) -> None:
+        """
+        Store a value (anything picklable), evicting old entries if the cache is full
+
+        Args:
+            key: Key from cache_key()
+            value: Value to store
+            ttl_hours: Lifetime of this entry (default: the cache's)
+        """
+        if not self.enabled:
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        ttl_seconds = self.ttl_seconds if ttl_hours is None else ttl_hours * 3600
+        try:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, data, len(data), now + ttl_seconds, now)
+            )
+            self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"[Cache] Warning: Could not store {key}: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries, then least recently used ones until under the size limit"""
+        conn.execute('DELETE FROM entries WHERE expires <= ?', (now,))
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = total - int(self.max_bytes * EVICT_TO_FRACTION)
+        freed = 0
+        keys = []
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            keys.append(key)
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key in keys])
+
+    def _claim(self, key: str) -> Optional[str]:
+        """
+        Mark a key as being computed by this process
+
+        Returns:
+            Claim token, or None if another live process holds the claim
+        """
+        conn = self._connection()
+        token = uuid.uuid4().hex
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO pending (key, token, pid, started) VALUES (?, ?, ?, ?)',
+            (key, token, os.getpid(), time.time())
+        )
+        if cursor.rowcount == 1:
+            return token
+
+        row = conn.execute('SELECT token, pid FROM pending WHERE key = ?', (key,)).fetchone()
+        if row is not None and not _process_alive(row[1]):
+            # The process computing this key died; take its claim over
+            conn.execute('DELETE FROM pending WHERE key = ? AND token = ?', (key, row[0]))
+        return None
+
+    def _release(self, key: str, token: str) -> None:
+        try:
+            self._connection().execute('DELETE FROM pending WHERE key = ? AND token = ?', (key, token))
+        except sqlite3.Error as e:
+            print(f"[Cache] Warning: Could not release {key}: {e}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl_hours: Optional[float] = None) -> Any:
+        """
+        Cached value for a key, computing and storing it on a miss
+
+        Only one process (or thread) computes a given key at a time; others
+        wait for its result. If the computation raises, the exception
+        propagates and a waiting caller computes the key itself.
+
+        compute must not call get_or_compute itself, or it could wait on a
+        key claimed further up its own call stack.
+
+        Args:
+            key: Key from cache_key()
+            compute: Called without arguments on a miss
+            ttl_hours: Lifetime of a new entry (default: the cache's)
+
+        Returns:
+            The cached or computed value
+        """
+        if not self.enabled:
+            return compute()
+
+        namespace = _namespace(key)
+        value = self._lookup(key)
+        if value is not _MISSING:
+            RESULT_CACHE_REQUESTS.labels(namespace=namespace, result='hit').inc()
+            return value
+
+        token = None
+        waited = False
+        try:
+            while token is None:
+                try:
+                    token = self._claim(key)
+                except sqlite3.Error as e:
+                    print(f"[Cache] Warning: Could not claim {key}, computing without the cache: {e}")
+                    RESULT_CACHE_REQUESTS.labels(namespace=namespace, result='miss').inc()
+                    return compute()
+                if token is None:
+                    waited = True
+                    time.sleep(PENDING_POLL_SECONDS)
+                    value = self._lookup(key)
+                    if value is not _MISSING:
+                        RESULT_CACHE_REQUESTS.labels(namespace=namespace, result='waited').inc()
+                        return value
+
+            # Another process may have stored it between the first lookup and the claim
+            value = self._lookup(key)
+            if value is not _MISSING:
+                RESULT_CACHE_REQUESTS.labels(namespace=namespace, result='waited' if waited else 'hit').inc()
+                return value
+
+            RESULT_CACHE_REQUESTS.labels(namespace=namespace, result='miss').inc()
+            value = compute()
+            self.put(key, value, ttl_hours)
+            return value
+        finally:
+            if token is not None:
+                self._release(key, token)
+
+    def stats(self) -> Dict:
+        """Number of entries, stored bytes and keys being computed"""
+        if not self.enabled:
+            return {'entries': 0, 'bytes': 0, 'pending': 0}
+        conn = self._connection()
+        entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        pending = conn.execute('SELECT COUNT(*) FROM pending').fetchone()[0]
+        return {'entries': entries, 'bytes': size, 'pending': pending}
+
+
+# Shared by server.py and video_processing.py
+result_cache = ResultCache(RESULT_CACHE_PATH, RESULT_CACHE_MAX_MB, RESULT_CACHE_TTL_HOURS)
@@ -0,0 +1,411 @@
+"""
+Scene Detection Engine
+Runs one or more PySceneDetect detectors over a single shared frame decode
+and merges their cut lists with per-detector provenance, or sweeps the
+content detector's settings over one decode
+
+With DETECTION_BACKEND=pipe, the content detector on its own is run from
+an FFmpeg rawvideo pipe with NumPy instead (see pipe_detection.py); its
+results have the same shape. Other detectors, alone or with content,
+always run through PySceneDetect.
+
+PySceneDetect (and with it OpenCV and NumPy) is imported when detection
+runs, not when this module is imported, so the web server can parse
+detector selections without loading them.
+"""
+
+import os
+import time
+from typing import TYPE_CHECKING, List, Dict, Optional, Iterable
+
+if TYPE_CHECKING:
+    from scenedetect.scene_detector import SceneDetector
+
+from metrics import SCENE_DETECTION_SECONDS, SCENE_DETECTION_FPS
+from tracing import traced, set_attributes
+
+try:
+    from config import Config
+    ADAPTIVE_THRESHOLD = Config.ADAPTIVE_THRESHOLD
+    FADE_THRESHOLD = Config.FADE_THRESHOLD
+    HISTOGRAM_THRESHOLD = Config.HISTOGRAM_THRESHOLD
+    SCENE_DETECTORS = Config.SCENE_DETECTORS
+    DETECTION_BACKEND = Config.DETECTION_BACKEND
+except ImportError:
+    ADAPTIVE_THRESHOLD = float(os.getenv('ADAPTIVE_THRESHOLD', 3.0))
+    FADE_THRESHOLD = float(os.getenv('FADE_THRESHOLD', 12.0))
+    HISTOGRAM_THRESHOLD = float(os.getenv('HISTOGRAM_THRESHOLD', 0.05))
+    SCENE_DETECTORS = os.getenv('SCENE_DETECTORS', 'content')
+    DETECTION_BACKEND = os.getenv('DETECTION_BACKEND', 'scenedetect')
+
+
+# Detector names accepted in requests, in the order they are reported
+DETECTOR_NAMES = ('content', 'adaptive', 'threshold', 'histogram')
+DEFAULT_DETECTORS = tuple(
+    name.strip() for name in SCENE_DETECTORS.split(',') if name.strip() in DETECTOR_NAMES
+) or ('content',)
+
+# Where frames are decoded and scored: PySceneDetect, or FFmpeg rawvideo pipe + NumPy (content only)
+DETECTION_BACKENDS = ('scenedetect', 'pipe')
+DEFAULT_BACKEND = DETECTION_BACKEND.strip().lower()
+if DEFAULT_BACKEND not in DETECTION_BACKENDS:
+    DEFAULT_BACKEND = 'scenedetect'
+
+
+def parse_detectors(value) -> List[str]:
+    """
+    Parse a detector selection from a request parameter
+
+    Args:
+        value: Comma-separated string, list of names, or None for the default
+
+    Returns:
+        Ordered list of unique detector names
+
+    Raises:
+        ValueError: If an unknown detector name is given
+    """
+    if not value:
+        return list(DEFAULT_DETECTORS)
+
+    if isinstance(value, str):
+        value = value.split(',')
+
+    names = []
+    for name in value:
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in DETECTOR_NAMES:
+            raise ValueError(f"Unknown detector '{name}'. Supported detectors: {', '.join(DETECTOR_NAMES)}")
+        if name not in names:
+            names.append(name)
+
+    return names or list(DEFAULT_DETECTORS)
+
+
+def detection_backend(detectors: Iterable[str], backend: Optional[str] = None) -> str:
+    """
+    Backend that runs a detector selection
+
+    Args:
+        detectors: Parsed detector names
+        backend: Requested backend (defaults to DETECTION_BACKEND)
+
+    Returns:
+        'pipe' for the content detector alone when the pipe backend is
+        requested, otherwise 'scenedetect'
+
+    Raises:
+        ValueError: If an unknown backend is given
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in DETECTION_BACKENDS:
+        raise ValueError(f"Unknown detection backend '{backend}'. Supported backends: {', '.join(DETECTION_BACKENDS)}")
+    if backend == 'pipe' and list(detectors) == ['content']:
+        return 'pipe'
+    return 'scenedetect'
+
+
+def create_detector(name: str, threshold: float = 27.0, min_scene_len: int = 15) -> 'SceneDetector':
+    """
+    Create a detector instance by name
+
+    Args:
+        name: One of DETECTOR_NAMES
+        threshold: Threshold for the content detector (the editor's slider value)
+        min_scene_len: Minimum scene length in frames
+
+    Returns:
+        SceneDetector instance
+    """
+    from scenedetect.detectors import ContentDetector, AdaptiveDetector, ThresholdDetector
+    from scene_detectors import HistogramDetector
+
+    if name == 'content':
+        return ContentDetector(threshold=threshold, min_scene_len=min_scene_len)
+    elif name == 'adaptive':
+        return AdaptiveDetector(adaptive_threshold=ADAPTIVE_THRESHOLD, min_scene_len=min_scene_len)
+    elif name == 'threshold':
+        # Fade-to-black detection
+        return ThresholdDetector(threshold=FADE_THRESHOLD, min_scene_len=min_scene_len)
+    elif name == 'histogram':
+        return HistogramDetector(threshold=HISTOGRAM_THRESHOLD, min_scene_len=min_scene_len)
+    else:
+        raise ValueError(f"Unsupported detector: {name}")
+
+
+def merge_cuts(detector_cuts: Dict[str, Iterable[int]], merge_window: int) -> List[Dict]:
+    """
+    Merge cut lists from several detectors
+
+    Cuts from different detectors that fall closer than merge_window frames to
+    each other are treated as the same transition and reported once, at the earliest
+    frame, with every detector that found it.
+
+    Args:
+        detector_cuts: Mapping of detector name to cut frame numbers
+        merge_window: Cuts closer than this many frames are merged
+
+    Returns:
+        List of {'frame': int, 'detectors': [names]} sorted by frame
+    """
+    events = sorted(
+        (frame, DETECTOR_NAMES.index(name), name)
+        for name, frames in detector_cuts.items()
+        for frame in set(frames)
+    )
+
+    merged = []
+    for frame, _, name in events:
+        if merged and frame - merged[-1]['frame'] < merge_window:
+            if name not in merged[-1]['detectors']:
+                merged[-1]['detectors'].append(name)
+            continue
+        merged.append({'frame': frame, 'detectors': [name]})
+
+    return merged
+
+
+@traced('detect_scenes')
+def run_detection(video_path: str, detectors: Optional[Iterable[str]] = None,
+                  threshold: float = 27.0, min_scene_len: int = 15,
+                  min_scene_length: Optional[float] = None, backend: Optional[str] = None) -> Dict:
+    """
+    Run the selected detectors over one decode of the video
+
+    Args:
+        video_path: Path to the video file
+        detectors: Detector names (defaults to DEFAULT_DETECTORS)
+        threshold: Threshold for the content detector
+        min_scene_len: Minimum scene length in frames
+        min_scene_length: Minimum scene length in seconds (overrides min_scene_len,
+                          converted with the video's frame rate)
+        backend: 'scenedetect' or 'pipe' (defaults to DETECTION_BACKEND; see detection_backend())
+
+    Returns:
+        Dictionary with:
+            scene_list: List of (start, end) FrameTimecode tuples (empty if no cuts)
+            cuts: Merged cut list, each {'time', 'frame', 'detectors'}
+            fps: Video frame rate
+            frames: Number of frames decoded
+    """
+    from scenedetect import open_video, SceneManager
+    from scenedetect.scene_manager import get_scenes_from_cuts
+    from scene_detectors import RecordingDetector
+
+    names = parse_detectors(detectors)
+    if detection_backend(names, backend) == 'pipe':
+        return _run_pipe_detection(video_path, threshold, min_scene_len, min_scene_length)
+
+    video = open_video(video_path)
+    if min_scene_length is not None:
+        min_scene_len = int(min_scene_length * video.frame_rate)
+    scene_manager = SceneManager()
+
+    recorders = []
+    for name in names:
+        recorder = RecordingDetector(name, create_detector(name, threshold, min_scene_len))
+        scene_manager.add_detector(recorder)
+        recorders.append(recorder)
+
+    start = time.perf_counter()
+    frames = scene_manager.detect_scenes(video)
+    elapsed = time.perf_counter() - start
+
+    set_attributes(detectors=','.join(names), frames=frames, backend='scenedetect')
+    SCENE_DETECTION_SECONDS.observe(elapsed)
+    if elapsed > 0:
+        SCENE_DETECTION_FPS.observe(frames / elapsed)
+
+    merged = merge_cuts({r.name: r.cuts for r in recorders}, merge_window=min_scene_len)
+
+    # Build the scene list from the merged cuts, using the same timecode base as SceneManager
+    scene_list = []
+    base_timecode = video.base_timecode
+    if merged:
+        cut_list = [base_timecode + cut['frame'] for cut in merged]
+        scene_list = get_scenes_from_cuts(cut_list, start_pos=base_timecode,
+                                          end_pos=video.position + 1)
+
+    cuts = [
+        {
+            'time': (base_timecode + cut['frame']).get_seconds(),
+            'frame': cut['frame'],
+            'detectors': cut['detectors']
+        }
+        for cut in merged
+    ]
+
+    fps = video.frame_rate
+    del video
+
+    return {
+        'scene_list': scene_list,
+        'cuts': cuts,
+        'fps': fps,
+        'frames': frames
+    }
+
+
+def _run_pipe_detection(video_path: str, threshold: float, min_scene_len: int,
+                        min_scene_length: Optional[float]) -> Dict:
+    """run_detection() for the content detector on the pipe backend"""
+    import numpy
+    from scenedetect.frame_timecode import FrameTimecode
+    from scenedetect.scene_manager import get_scenes_from_cuts
+    from pipe_detection import frame_scores
+
+    start = time.perf_counter()
+    scored = frame_scores(video_path)
+    elapsed = time.perf_counter() - start
+
+    fps = scored['fps']
+    frames = scored['frames']
+    if min_scene_length is not None:
+        min_scene_len = int(min_scene_length * fps)
+    # A cut is at least one frame after the previous one
+    min_scene_len = max(1, min_scene_len)
+
+    set_attributes(detectors='content', frames=frames, backend='pipe')
+    SCENE_DETECTION_SECONDS.observe(elapsed)
+    if elapsed > 0:
+        SCENE_DETECTION_FPS.observe(frames / elapsed)
+
+    candidates = numpy.flatnonzero(scored['scores'] >= threshold)
+    merged = merge_cuts({'content': _sweep_cuts(candidates, min_scene_len)}, merge_window=min_scene_len)
+
+    scene_list = []
+    base_timecode = FrameTimecode(0, fps)
+    if merged:
+        cut_list = [base_timecode + cut['frame'] for cut in merged]
+        scene_list = get_scenes_from_cuts(cut_list, start_pos=base_timecode, end_pos=base_timecode + frames)
+
+    cuts = [
+        {
+            'time': (base_timecode + cut['frame']).get_seconds(),
+            'frame': cut['frame'],
+            'detectors': cut['detectors']
+        }
+        for cut in merged
+    ]
+
+    return {
+        'scene_list': scene_list,
+        'cuts': cuts,
+        'fps': fps,
+        'frames': frames
+    }
+
+
+def _sweep_cuts(candidates, min_scene_len: int) -> List[int]:
+    """
+    ContentDetector's cut rule over precomputed candidates
+
+    Args:
+        candidates: Sorted frame offsets whose score reached the threshold (NumPy array)
+        min_scene_len: Minimum scene length in frames
+
+    Returns:
+        Cut frame offsets
+    """
+    cuts = []
+    last_cut = 0
+    while True:
+        # A length under one frame would find the same cut again forever
+        pos = candidates.searchsorted(last_cut + max(1, min_scene_len))
+        if pos >= len(candidates):
+            return cuts
+        last_cut = int(candidates[pos])
+        cuts.append(last_cut)
+
+
+@traced('sweep_scenes')
+def run_sweep(video_path: str, thresholds: Iterable[float], min_scene_lengths: Iterable[float],
+              backend: Optional[str] = None) -> Dict:
+    """
+    Content detector cuts for every threshold and minimum scene length, from one decode
+
+    The frame scores are computed once; the threshold and minimum length
+    only decide which scores become cuts, so each combination gives the
+    same cuts as run_detection() with the content detector on the same backend.
+
+    Args:
+        video_path: Path to the video file
+        thresholds: Content detector thresholds
+        min_scene_lengths: Minimum scene lengths in seconds
+        backend: 'scenedetect' or 'pipe' (defaults to DETECTION_BACKEND)
+
+    Returns:
+        Dictionary with:
+            thresholds, min_scene_lengths: The swept values (table axes)
+            results: Distinct outcomes, each {'suggested_cuts': [seconds], 'scene_count': int}
+            table: table[i][j] is the index in results for thresholds[i] and min_scene_lengths[j]
+            fps: Video frame rate
+            frames: Number of frames decoded
+    """
+    import numpy
+    from scenedetect import open_video, SceneManager
+    from scenedetect.frame_timecode import FrameTimecode
+    from scene_detectors import ContentScoreRecorder
+    from pipe_detection import frame_scores
+
+    thresholds = list(thresholds)
+    min_scene_lengths = list(min_scene_lengths)
+    backend = detection_backend(['content'], backend)
+
+    if backend == 'pipe':
+        start = time.perf_counter()
+        scored = frame_scores(video_path)
+        elapsed = time.perf_counter() - start
+        scores = scored['scores']
+        frames = scored['frames']
+        fps = scored['fps']
+        base_timecode = FrameTimecode(0, fps)
+        first_frame = 0
+    else:
+        video = open_video(video_path)
+        scene_manager = SceneManager()
+        recorder = ContentScoreRecorder()
+        scene_manager.add_detector(recorder)
+
+        start = time.perf_counter()
+        frames = scene_manager.detect_scenes(video)
+        elapsed = time.perf_counter() - start
+
+        scores = numpy.asarray(recorder.scores, dtype=numpy.float64)
+        base_timecode = video.base_timecode
+        first_frame = recorder.first_frame or 0
+        fps = video.frame_rate
+        del video
+
+    set_attributes(detectors='content', frames=frames, backend=backend,
+                   combinations=len(thresholds) * len(min_scene_lengths))
+    SCENE_DETECTION_SECONDS.observe(elapsed)
+    if elapsed > 0:
+        SCENE_DETECTION_FPS.observe(frames / elapsed)
+
+    results, result_index, table = [], {}, []
+    for threshold in thresholds:
+        candidates = numpy.flatnonzero(scores >= threshold)
+        row = []
+        for min_scene_length in min_scene_lengths:
+            cuts = tuple(_sweep_cuts(candidates, int(min_scene_length * fps)))
+            if cuts not in result_index:
+                result_index[cuts] = len(results)
+                results.append({
+                    'suggested_cuts': [(base_timecode + first_frame + cut).get_seconds() for cut in cuts],
+                    # Matches /reprocess: no cuts means no scene list
+                    'scene_count': len(cuts) + 1 if cuts else 0
+                })
+            row.append(result_index[cuts])
+        table.append(row)
+
+    return {
+        'thresholds': thresholds,
+        'min_scene_lengths': min_scene_lengths,
+        'results': results,
+        'table': table,
+        'fps': fps,
+        'frames': frames
+    }
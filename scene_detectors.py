@@ -0,0 +1,117 @@
+"""
+Scene Detector Classes
+PySceneDetect detectors added by this app. They need OpenCV and NumPy, so
+scene_detection.py imports this module only when detection runs.
+"""
+
+from typing import List
+
+import cv2
+import numpy
+from scenedetect.detectors import ContentDetector
+from scenedetect.scene_detector import SceneDetector
+
+
+class HistogramDetector(SceneDetector):
+    """
+    Detects fast cuts by comparing luma histograms of consecutive frames
+
+    PySceneDetect only ships a HistogramDetector from 0.6.4 onwards; this
+    follows the same approach (Y channel histogram, correlation distance)
+    so it can run alongside the bundled detectors on 0.6.3.
+    """
+
+    def __init__(self, threshold: float = 0.05, bins: int = 256, min_scene_len: int = 15):
+        """
+        Args:
+            threshold: Histogram distance (0-1) that must be exceeded to trigger a cut
+            bins: Number of histogram bins
+            min_scene_len: Minimum scene length in frames
+        """
+        super().__init__()
+        self._threshold = threshold
+        self._bins = bins
+        self._min_scene_len = min_scene_len
+        self._last_hist = None
+        self._last_cut = None
+
+    def process_frame(self, frame_num: int, frame_img: numpy.ndarray) -> List[int]:
+        """Compare this frame's histogram with the previous one"""
+        luma = cv2.cvtColor(frame_img, cv2.COLOR_BGR2YUV)[:, :, 0]
+        hist = cv2.calcHist([luma], [0], None, [self._bins], [0, 256])
+        cv2.normalize(hist, hist)
+
+        cuts = []
+        if self._last_cut is None:
+            self._last_cut = frame_num
+
+        if self._last_hist is not None:
+            distance = 1.0 - cv2.compareHist(self._last_hist, hist, cv2.HISTCMP_CORREL)
+            if distance >= self._threshold and (frame_num - self._last_cut) >= self._min_scene_len:
+                cuts.append(frame_num)
+                self._last_cut = frame_num
+
+        self._last_hist = hist
+        return cuts
+
+
+class RecordingDetector(SceneDetector):
+    """Wraps a detector so the cuts it reports can be attributed to it"""
+
+    def __init__(self, name: str, detector: SceneDetector):
+        self.name = name
+        self.detector = detector
+        self.cuts = []
+
+    @property
+    def stats_manager(self):
+        return self.detector.stats_manager
+
+    @stats_manager.setter
+    def stats_manager(self, value):
+        self.detector.stats_manager = value
+
+    @property
+    def event_buffer_length(self) -> int:
+        return self.detector.event_buffer_length
+
+    def stats_manager_required(self) -> bool:
+        return self.detector.stats_manager_required()
+
+    def get_metrics(self) -> List[str]:
+        return self.detector.get_metrics()
+
+    def is_processing_required(self, frame_num: int) -> bool:
+        return self.detector.is_processing_required(frame_num)
+
+    def process_frame(self, frame_num: int, frame_img: numpy.ndarray) -> List[int]:
+        cuts = self.detector.process_frame(frame_num, frame_img)
+        self.cuts.extend(cuts)
+        return cuts
+
+    def post_process(self, frame_num: int) -> List[int]:
+        cuts = self.detector.post_process(frame_num)
+        self.cuts.extend(cuts)
+        return cuts
+
+
+class ContentScoreRecorder(ContentDetector):
+    """
+    Records ContentDetector's per-frame score instead of cutting
+
+    ContentDetector cuts where the score reaches the threshold and at least
+    min_scene_len frames have passed since the previous cut. With the scores
+    recorded from one decode, that rule can be replayed for any threshold and
+    minimum length (see scene_detection.run_sweep).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.first_frame = None
+        self.scores = []
+
+    def process_frame(self, frame_num: int, frame_img: numpy.ndarray) -> List[int]:
+        if self.first_frame is None:
+            self.first_frame = frame_num
+        self.scores.append(self._calculate_frame_score(frame_num, frame_img))
+        return []
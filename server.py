@@ -1,27 +1,61 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, has_request_context
 from flask_cors import CORS
-from scenedetect import open_video, SceneManager, split_video_ffmpeg
-from scenedetect.detectors import ContentDetector
 import os
 import csv
+import json
+import hashlib
+import math
 import shutil
+import threading
+import time
+import uuid
 from datetime import datetime
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-import psycopg2
-from psycopg2.extras import RealDictCursor
 
 # Phase 4 imports
 from config import Config, get_config
-from storage import create_storage, VideoStorage
+from storage import (
+    create_storage,
+    open_reader,
+    VideoStorage,
+    CONTENT_FOLDER,
+    IMMUTABLE_CACHE_CONTROL,
+    INCOMING_FOLDER,
+    WORKOUT_FOLDER
+)
+from storage_deletion import DeletionQueue
 from video_processing import (
     split_video_by_timeline,
+    file_content_hash,
     get_video_info,
     check_ffmpeg_installed,
+    check_conformance,
+    normalize_video,
     VideoProcessingError
 )
+from scene_detection import run_detection, run_sweep, parse_detectors, detection_backend
+import media_pool
+from result_cache import result_cache, cache_key
+from media_pool import (run_media, media_slot, route_timeout, latest_request, PRIORITY_BATCH,
+                        MediaPoolBusy, MediaQueueFull, MediaTimeout, MediaCancelled)
+from encoder_profiles import get_profile
+from metrics import track_job, render_metrics, NORMALIZE_RESULTS, UPLOAD_SIZE_BYTES, DB_CONNECT_SECONDS
+import tracing
+from workout_compiler import compile_workout, parse_plan
+from bulk_import import run_import, load_progress, progress_path, ImportRunning
+from batch_processing import BatchScheduler, load_batch, summarize, BATCH_COMPLETED
+from exercise_export import export_stream, iter_exercise_batches, check_format, EXPORT_BATCH_SIZE, MAX_EXPORT_BATCH_SIZE
+from timeline_saves import (try_lock, load_timeline, create_timeline, record_segment, segment_state,
+                            finish_timeline, lock_library, request_hash, SAVE_ID_PATTERN, SEGMENT_CLAIMED,
+                            SEGMENT_ENCODED, SEGMENT_UPLOADED, SEGMENT_INSERTED, TIMELINE_SAVED)
+from streaming_upload import receive_multipart, UploadError, UploadTooLarge, UploadBusy
+from session_gc import touch_session, is_empty_session, start_scheduler, STATE_DETECTED, STATE_SAVING, STATE_SAVED
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Trace-Id'])
+tracing.init_app(app)
 
 # Load configuration
 env = os.getenv('FLASK_ENV', 'development')
@@ -50,16 +84,69 @@ DB_CONFIG = app_config.DB_CONFIG
 storage = create_storage(app_config.get_storage_config())
 print(f"[Storage] Using {app_config.STORAGE_BACKEND} storage backend")
 
+# Storage objects of deleted exercises are removed in the background, in batches,
+# unless a save has started using them again
+deletion_queue = DeletionQueue(storage, connect=lambda: get_db_connection())
+MAX_BULK_DELETE = 1000
+
+# Suggested client back-off when every media worker is busy
+MEDIA_RETRY_AFTER_SECONDS = 30
+
+# Suggested client back-off when the host's in-flight upload budget stayed full
+UPLOAD_RETRY_AFTER_SECONDS = 5
+
+# Most clips one POST /api/batches may contain, and how often its event stream checks for changes
+MAX_BATCH_FILES = 50
+BATCH_EVENT_POLL_SECONDS = 0.5
+# The event stream sends a comment this often while nothing changes (a gone client then fails the write),
+# and ends after this long without a change so it never holds a request thread indefinitely
+BATCH_EVENT_KEEPALIVE_SECONDS = 15
+BATCH_EVENT_MAX_IDLE_SECONDS = 10 * 60
+
+# Largest threshold x min_scene_length grid one sweep request may ask for
+MAX_SWEEP_COMBINATIONS = 2500
+
+# Direct uploads: the token handed to the client names the upload it may complete
+upload_signer = URLSafeTimedSerializer(app_config.SECRET_KEY, salt='direct-upload')
+UPLOAD_TOKEN_MAX_AGE = 24 * 3600
+
+# Bulk imports started through the API, by import id (this worker only)
+IMPORT_ROOT = app_config.IMPORT_ROOT
+imports = {}
+imports_lock = threading.Lock()
+
 # Create folders if they don't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-# Check FFmpeg availability
-if not check_ffmpeg_installed():
-    print("WARNING: FFmpeg is not installed or not accessible!")
-    print("Video cutting functionality will not work without FFmpeg")
-else:
-    print("[FFmpeg] FFmpeg is available and ready")
+
+
+def warm_up():
+    """
+    Startup checks that would otherwise delay the worker's first request:
+    the FFmpeg check, the storage bucket check and the media fork server
+    (which loads PySceneDetect/OpenCV in its own process)
+    """
+    start = time.perf_counter()
+    if not check_ffmpeg_installed():
+        print("WARNING: FFmpeg is not installed or not accessible!")
+        print("Video cutting functionality will not work without FFmpeg")
+    else:
+        print("[FFmpeg] FFmpeg is available and ready")
+    storage.verify()
+    media_pool.start()
+    print(f"[Startup] Warm-up finished in {time.perf_counter() - start:.2f}s")
+
+
+def start_warmup():
+    """Run warm_up() in a background thread (gunicorn's post_worker_init hook calls this)"""
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
+
+# Periodically delete abandoned editor sessions and orphaned storage objects
+if app_config.GC_INTERVAL_MINUTES > 0:
+    start_scheduler(app_config.GC_INTERVAL_MINUTES, storage=storage, connect=lambda: get_db_connection(),
+                    output_folder=OUTPUT_FOLDER, upload_folder=UPLOAD_FOLDER)
 
 
 def allowed_file(filename):
@@ -69,7 +156,18 @@ def allowed_file(filename):
 def get_db_connection():
     """Create and return a database connection"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        # psycopg2 is loaded on the first connection rather than at startup
+        import psycopg2
+        from db import InstrumentedConnection
+
+        start = time.perf_counter()
+        options = {}
+        if has_request_context():
+            # Postgres cancels statements that run past the route's time budget
+            options['options'] = f"-c statement_timeout={int(route_timeout() * 1000)}"
+        with tracing.span('db.connect'):
+            conn = psycopg2.connect(**DB_CONFIG, connection_factory=InstrumentedConnection, **options)
+        DB_CONNECT_SECONDS.observe(time.perf_counter() - start)
         return conn
     except Exception as e:
         print(f"Database connection error: {e}")
@@ -77,7 +175,7 @@ def get_db_connection():
 
 
 def get_or_create_muscle_group(conn, name):
-    """Get muscle group ID or create if doesn't exist"""
+    """Get muscle group ID or create if doesn't exist (in the caller's transaction; the caller commits)"""
     cursor = conn.cursor()
 
     # Try to get existing
@@ -87,15 +185,19 @@ def get_or_create_muscle_group(conn, name):
     if result:
         return result[0]
 
-    # Create new
-    cursor.execute("INSERT INTO muscle_groups (name) VALUES (%s) RETURNING id", (name.strip(),))
-    muscle_id = cursor.fetchone()[0]
-    conn.commit()
-    return muscle_id
+    # Create new; a concurrent transaction may have created it since the SELECT
+    cursor.execute(
+        "INSERT INTO muscle_groups (name) VALUES (%s) ON CONFLICT (name) DO NOTHING RETURNING id", (name.strip(),)
+    )
+    result = cursor.fetchone()
+    if result is None:
+        cursor.execute("SELECT id FROM muscle_groups WHERE name = %s", (name.strip(),))
+        result = cursor.fetchone()
+    return result[0]
 
 
 def get_or_create_equipment(conn, name):
-    """Get equipment ID or create if doesn't exist"""
+    """Get equipment ID or create if doesn't exist (in the caller's transaction; the caller commits)"""
     cursor = conn.cursor()
 
     # Try to get existing
@@ -105,40 +207,187 @@ def get_or_create_equipment(conn, name):
     if result:
         return result[0]
 
-    # Create new
-    cursor.execute("INSERT INTO equipment (name) VALUES (%s) RETURNING id", (name.strip(),))
-    equipment_id = cursor.fetchone()[0]
-    conn.commit()
-    return equipment_id
+    # Create new; a concurrent transaction may have created it since the SELECT
+    cursor.execute(
+        "INSERT INTO equipment (name) VALUES (%s) ON CONFLICT (name) DO NOTHING RETURNING id", (name.strip(),)
+    )
+    result = cursor.fetchone()
+    if result is None:
+        cursor.execute("SELECT id FROM equipment WHERE name = %s", (name.strip(),))
+        result = cursor.fetchone()
+    return result[0]
+
+
+def parse_min_scene_length(value):
+    """
+    Minimum scene length in seconds from a request parameter
+
+    Raises:
+        ValueError: If it is not a number greater than 0
+    """
+    length = float(value)
+    if not math.isfinite(length) or length <= 0:
+        raise ValueError(f"min_scene_length must be a positive number of seconds, got {value}")
+    return length
 
 
-def detect_scenes(video_path, threshold=27.0, min_scene_len=15):
+def detect_scenes(video_path, threshold=27.0, min_scene_length=0.6, detectors=None, cancelled=None, timeout=None,
+                  priority=None, user=None):
     """
     Detect scenes in a video using PySceneDetect
 
     Args:
         video_path: Path to the video file
         threshold: Threshold for scene detection (lower = more sensitive)
-        min_scene_len: Minimum scene length in frames
+        min_scene_length: Minimum scene length in seconds
+        detectors: Detector names to run over one shared decode (default: content)
+        cancelled: Optional callable; detection is stopped once it returns True
+        timeout: Seconds for detection (default: the current route's time budget)
+        priority: Media queue priority class (default: by the current route)
+        user: Fair-share key in the media queue (default: the current request's user)
+
+    With DETECTION_BACKEND=pipe, the content detector alone runs on the
+    FFmpeg rawvideo pipe backend (see pipe_detection.py).
+
+    Results are kept in the shared result cache by the video's content hash
+    and the detection settings, so the same video detected again (by any
+    worker) is not decoded again.
 
     Returns:
-        List of scenes (tuples of start and end timecodes)
+        Detection result with 'scene_list' (tuples of start and end timecodes)
+        and 'cuts' (merged cut list with per-detector provenance)
+
+    Raises:
+        MediaQueueFull: If too many media jobs were queued ahead of the request
+        MediaPoolBusy: If every media worker stayed busy for the route's time budget
+        MediaTimeout: If detection ran past the route's time budget
+        MediaCancelled: If cancelled() returned True before detection finished
+    """
+    detectors = parse_detectors(detectors)
+    backend = detection_backend(detectors)
+    key = cache_key('detect', file_content_hash(video_path), threshold=float(threshold),
+                    min_scene_length=float(min_scene_length), detectors=detectors, backend=backend)
+
+    # Decoding holds the GIL, so it runs in a media process rather than this worker's thread
+    return result_cache.get_or_compute(key, lambda: run_media(
+        run_detection,
+        video_path,
+        detectors=detectors,
+        threshold=threshold,
+        min_scene_length=min_scene_length,
+        backend=backend,
+        kind='detect',
+        cancelled=cancelled,
+        timeout=timeout,
+        priority=priority,
+        user=user
+    ))
+
+
+def normalize_upload(video_path, timeout=None, priority=None, user=None):
     """
-    video = open_video(video_path)
-    scene_manager = SceneManager()
+    Replace an upload with a normalized mezzanine file when NORMALIZE_UPLOADS
+    is on and the upload does not conform (see video_processing.check_conformance)
 
-    # Add ContentDetector with threshold
-    scene_manager.add_detector(
-        ContentDetector(threshold=threshold, min_scene_len=min_scene_len)
-    )
+    The mezzanine is written next to the upload as <name>.mp4 and the upload
+    is deleted, so detection, the editor and cutting all use it. If
+    normalization fails the upload is kept; it still works, just slower.
+
+    Args:
+        video_path: Uploaded video
+        timeout: Seconds for the slot wait and the encode (default: the current route's time budget)
+        priority: Media queue priority class (default: by the current route)
+        user: Fair-share key in the media queue (default: the current request's user)
 
-    # Detect scenes
-    scene_manager.detect_scenes(video)
+    Returns:
+        Path of the video to use from now on
 
-    # Get scene list
-    scene_list = scene_manager.get_scene_list()
+    Raises:
+        MediaQueueFull: If too many media jobs were queued ahead of the request
+        MediaPoolBusy: If every FFmpeg slot stayed busy for the time budget
+    """
+    if not app_config.NORMALIZE_UPLOADS:
+        return video_path
+    try:
+        conformance = check_conformance(video_path)
+    except VideoProcessingError as e:
+        print(f"[Normalize] Could not check {video_path}, using it as uploaded: {e}")
+        NORMALIZE_RESULTS.labels(result='failed').inc()
+        return video_path
+    if conformance['conformant']:
+        NORMALIZE_RESULTS.labels(result='conformant').inc()
+        return video_path
+
+    output_path = os.path.splitext(video_path)[0] + '.mp4'
+    timeout = route_timeout() if timeout is None else timeout
+    try:
+        with media_slot(wait=timeout, priority=priority, user=user, ffmpeg=True):
+            normalize_video(video_path, output_path, conformance, timeout=timeout)
+    except VideoProcessingError as e:
+        print(f"[Normalize] Failed for {video_path}, using it as uploaded: {e}")
+        NORMALIZE_RESULTS.labels(result='failed').inc()
+        return video_path
 
-    return scene_list
+    if output_path != video_path:
+        os.remove(video_path)
+    NORMALIZE_RESULTS.labels(result='normalized').inc()
+    return output_path
+
+
+def media_error_response(e):
+    """
+    429 with Retry-After when too many media jobs are queued, 503 with
+    Retry-After when every media worker stayed busy, 504 when a job ran out
+    of time, 409 when a newer request for the same video replaced it
+    """
+    print(f"[Media] {e}")
+    if isinstance(e, MediaQueueFull):
+        return jsonify({'error': str(e)}), 429, {'Retry-After': str(MEDIA_RETRY_AFTER_SECONDS)}
+    if isinstance(e, MediaPoolBusy):
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(MEDIA_RETRY_AFTER_SECONDS)}
+    if isinstance(e, MediaCancelled):
+        return jsonify({'error': str(e), 'cancelled': True}), 409
+    return jsonify({'error': str(e)}), 504
+
+
+def upload_error_status(e):
+    """HTTP status for an UploadError: 413 too large, 503 upload buffer full, else 400"""
+    if isinstance(e, UploadTooLarge):
+        return 413
+    if isinstance(e, UploadBusy):
+        return 503
+    return 400
+
+
+def upload_error_response(e):
+    """JSON error for an UploadError, with Retry-After when the upload buffer stayed full"""
+    print(f"ERROR: {e}")
+    status = upload_error_status(e)
+    headers = {'Retry-After': str(UPLOAD_RETRY_AFTER_SECONDS)} if status == 503 else {}
+    return jsonify({'error': str(e)}), status, headers
+
+
+def receive_video_upload(destination):
+    """
+    Stream the 'video' part of this multipart request to disk (see streaming_upload.py)
+
+    Args:
+        destination: Called with the uploaded filename, returns the path to
+            write to; raises UploadError to reject the file
+
+    Returns:
+        Tuple of (form fields, {'filename', 'path', 'size'} or None without a video part)
+
+    Raises:
+        UploadError: Malformed, too large (UploadTooLarge), rejected, or the
+            upload buffer stayed full (UploadBusy)
+    """
+    max_bytes = app.config['MAX_CONTENT_LENGTH']
+    try:
+        stream = request.stream
+    except RequestEntityTooLarge:
+        raise UploadTooLarge(f"Upload is larger than {max_bytes // (1024 * 1024)} MB")
+    return receive_multipart(stream, request.content_type, request.content_length, 'video', destination, max_bytes)
 
 
 def create_csv_report(scene_list, csv_path, video_path, tags=None):
@@ -210,13 +459,46 @@ def serve_icons(filename):
 
 
 @app.route('/share-receiver', methods=['POST'])
+@track_job('detect')
 def share_receiver():
     """Handle videos shared from other apps via Web Share Target API"""
     print(f"DEBUG: Share receiver - Content-Type: {request.content_type}")
-    print(f"DEBUG: Share receiver files: {request.files}")
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    names = {}
+    rejected = {}
+
+    def destination(name):
+        if not allowed_file(name):
+            rejected['filename'] = name
+            raise UploadError(f"Invalid file type: {name}")
+        names['filename'] = secure_filename(name)
+        names['unique_filename'] = f"shared_{timestamp}_{names['filename']}"
+        return os.path.join(app.config['UPLOAD_FOLDER'], names['unique_filename'])
+
+    # The video is written to the upload folder while the request body arrives
+    try:
+        _, upload = receive_video_upload(destination)
+    except UploadError as e:
+        if 'filename' not in rejected:
+            print(f"ERROR: Failed to save shared video: {e}")
+            return '''
+            <html dir="rtl">
+            <head>
+                <meta http-equiv="refresh" content="3;url=/" />
+                <meta charset="UTF-8">
+                <style>body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }</style>
+            </head>
+            <body>
+                <h2>❌ שגיאה בשמירת הוידאו</h2>
+                <p>מפנה לדף הבית...</p>
+            </body>
+            </html>
+        ''', upload_error_status(e)
+        upload = None
 
     # Check if video file is present
-    if 'video' not in request.files:
+    if upload is None and 'filename' not in rejected:
         print("ERROR: No video file in share")
         # Redirect to home page with error message
         return '''
@@ -233,9 +515,7 @@ def share_receiver():
             </html>
         ''', 400
 
-    file = request.files['video']
-
-    if file.filename == '':
+    if rejected.get('filename') == '':
         print("ERROR: Empty filename in share")
         return '''
             <html dir="rtl">
@@ -251,147 +531,136 @@ def share_receiver():
             </html>
         ''', 400
 
-    if file and allowed_file(file.filename):
-        # Save the shared video temporarily
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        base_name = os.path.splitext(filename)[0]
-        ext = os.path.splitext(filename)[1]
-        unique_filename = f"shared_{timestamp}_{filename}"
-        video_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-
-        try:
-            file.save(video_path)
-            print(f"SUCCESS: Shared video saved as {unique_filename}")
-
-            # Process the video with scene detection (using default settings)
-            threshold = 27.0  # Default threshold
-            min_scene_length = 0.6  # Default minimum scene length
+    if rejected:
+        print(f"ERROR: Invalid file type: {rejected['filename']}")
+        return '''
+            <html dir="rtl">
+            <head>
+                <meta http-equiv="refresh" content="3;url=/" />
+                <meta charset="UTF-8">
+                <style>body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }</style>
+            </head>
+            <body>
+                <h2>❌ פורמט וידאו לא נתמך</h2>
+                <p>אנא שתף קובץ וידאו (MP4, AVI, MOV, MKV, FLV, WMV)</p>
+                <p>מפנה לדף הבית...</p>
+            </body>
+            </html>
+        ''', 400
 
-            try:
-                # Detect scenes
-                video = open_video(video_path)
-                fps = video.frame_rate
-                min_scene_len_frames = int(min_scene_length * fps)
-                scene_list = detect_scenes(video_path, threshold=threshold, min_scene_len=min_scene_len_frames)
-
-                # Get video duration
-                video_duration = 0
-                if scene_list:
-                    video_duration = scene_list[-1][1].get_seconds()
-                else:
-                    from video_processing import get_video_info
-                    video_info = get_video_info(video_path)
-                    video_duration = video_info['duration']
+    filename = names['filename']
+    base_name = os.path.splitext(filename)[0]
+    unique_filename = names['unique_filename']
+    video_path = upload['path']
 
-                # Close the video file
-                del video
+    try:
+        UPLOAD_SIZE_BYTES.labels(endpoint='share_receiver').observe(upload['size'])
+        print(f"SUCCESS: Shared video saved as {unique_filename}")
 
-                # Create output directory
-                output_dir = os.path.join(app.config['OUTPUT_FOLDER'], f"{base_name}_{timestamp}")
-                os.makedirs(output_dir, exist_ok=True)
+        # Process the video with scene detection (using default settings)
+        threshold = 27.0  # Default threshold
+        min_scene_length = 0.6  # Default minimum scene length
 
-                # Move video to output directory
-                stored_video_path = os.path.join(output_dir, unique_filename)
+        try:
+            video_path = normalize_upload(video_path)
+            unique_filename = os.path.basename(video_path)
+
+            # Detect scenes
+            detection = detect_scenes(video_path, threshold=threshold, min_scene_length=min_scene_length)
+            scene_list = detection['scene_list']
+
+            # Create output directory
+            output_dir = os.path.join(app.config['OUTPUT_FOLDER'], f"{base_name}_{timestamp}")
+            os.makedirs(output_dir, exist_ok=True)
+
+            # Move video to output directory
+            stored_video_path = os.path.join(output_dir, unique_filename)
+            shutil.move(video_path, stored_video_path)
+            touch_session(output_dir, STATE_DETECTED)
+
+            # Extract cut points
+            suggested_cuts = []
+            if scene_list:
+                for i, scene in enumerate(scene_list):
+                    if i < len(scene_list) - 1:
+                        end_time = scene[1].get_seconds()
+                        suggested_cuts.append(end_time)
+
+            print(f"[Share Receiver] Processed shared video: {len(scene_list)} scenes, {len(suggested_cuts)} cuts")
+
+            # Redirect to timeline editor with suggested cuts
+            cuts_param = ','.join(map(str, suggested_cuts)) if suggested_cuts else ''
+            video_url = f"/download/{os.path.basename(output_dir)}/{unique_filename}"
+            redirect_url = f"/editor?video={video_url}&cuts={cuts_param}"
+
+            return f'''
+                <html dir="rtl">
+                <head>
+                    <meta http-equiv="refresh" content="1;url={redirect_url}" />
+                    <meta charset="UTF-8">
+                    <style>
+                        body {{
+                            font-family: Arial, sans-serif;
+                            text-align: center;
+                            padding: 50px;
+                            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                            color: white;
+                        }}
+                        .spinner {{
+                            border: 4px solid rgba(255,255,255,0.3);
+                            border-radius: 50%;
+                            border-top: 4px solid white;
+                            width: 40px;
+                            height: 40px;
+                            animation: spin 1s linear infinite;
+                            margin: 20px auto;
+                        }}
+                        @keyframes spin {{
+                            0% {{ transform: rotate(0deg); }}
+                            100% {{ transform: rotate(360deg); }}
+                        }}
+                    </style>
+                </head>
+                <body>
+                    <h2>✅ הוידאו התקבל בהצלחה!</h2>
+                    <div class="spinner"></div>
+                    <p>מעבד ומזהה סצינות...</p>
+                    <p>מיד תועבר לעורך הטיימליין</p>
+                </body>
+                </html>
+            '''
+
+        except Exception as processing_error:
+            print(f"ERROR: Failed to process shared video: {processing_error}")
+            # If processing fails, still allow user to use the video manually
+            # Move to output folder without processing
+            output_dir = os.path.join(app.config['OUTPUT_FOLDER'], f"{base_name}_{timestamp}")
+            os.makedirs(output_dir, exist_ok=True)
+            stored_video_path = os.path.join(output_dir, unique_filename)
+            if os.path.exists(video_path):
                 shutil.move(video_path, stored_video_path)
+            touch_session(output_dir, STATE_DETECTED)
 
-                # Extract cut points
-                suggested_cuts = []
-                if scene_list:
-                    for i, scene in enumerate(scene_list):
-                        if i < len(scene_list) - 1:
-                            end_time = scene[1].get_seconds()
-                            suggested_cuts.append(end_time)
-
-                print(f"[Share Receiver] Processed shared video: {len(scene_list)} scenes, {len(suggested_cuts)} cuts")
-
-                # Redirect to timeline editor with suggested cuts
-                cuts_param = ','.join(map(str, suggested_cuts)) if suggested_cuts else ''
-                video_url = f"/download/{os.path.basename(output_dir)}/{unique_filename}"
-                redirect_url = f"/editor?video={video_url}&cuts={cuts_param}"
-
-                return f'''
-                    <html dir="rtl">
-                    <head>
-                        <meta http-equiv="refresh" content="1;url={redirect_url}" />
-                        <meta charset="UTF-8">
-                        <style>
-                            body {{
-                                font-family: Arial, sans-serif;
-                                text-align: center;
-                                padding: 50px;
-                                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                                color: white;
-                            }}
-                            .spinner {{
-                                border: 4px solid rgba(255,255,255,0.3);
-                                border-radius: 50%;
-                                border-top: 4px solid white;
-                                width: 40px;
-                                height: 40px;
-                                animation: spin 1s linear infinite;
-                                margin: 20px auto;
-                            }}
-                            @keyframes spin {{
-                                0% {{ transform: rotate(0deg); }}
-                                100% {{ transform: rotate(360deg); }}
-                            }}
-                        </style>
-                    </head>
-                    <body>
-                        <h2>✅ הוידאו התקבל בהצלחה!</h2>
-                        <div class="spinner"></div>
-                        <p>מעבד ומזהה סצינות...</p>
-                        <p>מיד תועבר לעורך הטיימליין</p>
-                    </body>
-                    </html>
-                '''
-
-            except Exception as processing_error:
-                print(f"ERROR: Failed to process shared video: {processing_error}")
-                # If processing fails, still allow user to use the video manually
-                # Move to output folder without processing
-                output_dir = os.path.join(app.config['OUTPUT_FOLDER'], f"{base_name}_{timestamp}")
-                os.makedirs(output_dir, exist_ok=True)
-                stored_video_path = os.path.join(output_dir, unique_filename)
-                if os.path.exists(video_path):
-                    shutil.move(video_path, stored_video_path)
-
-                video_url = f"/download/{os.path.basename(output_dir)}/{unique_filename}"
-                redirect_url = f"/editor?video={video_url}&cuts="
-
-                return f'''
-                    <html dir="rtl">
-                    <head>
-                        <meta http-equiv="refresh" content="2;url={redirect_url}" />
-                        <meta charset="UTF-8">
-                        <style>body {{ font-family: Arial, sans-serif; text-align: center; padding: 50px; }}</style>
-                    </head>
-                    <body>
-                        <h2>⚠️ לא הצלחתי לזהות סצינות אוטומטית</h2>
-                        <p>הוידאו נשמר בהצלחה</p>
-                        <p>מפנה לעורך - תוכל להוסיף נקודות חיתוך ידנית</p>
-                    </body>
-                    </html>
-                '''
+            video_url = f"/download/{os.path.basename(output_dir)}/{unique_filename}"
+            redirect_url = f"/editor?video={video_url}&cuts="
 
-        except Exception as e:
-            print(f"ERROR: Failed to save shared video: {e}")
-            return '''
+            return f'''
                 <html dir="rtl">
                 <head>
-                    <meta http-equiv="refresh" content="3;url=/" />
+                    <meta http-equiv="refresh" content="2;url={redirect_url}" />
                     <meta charset="UTF-8">
-                    <style>body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }</style>
+                    <style>body {{ font-family: Arial, sans-serif; text-align: center; padding: 50px; }}</style>
                 </head>
                 <body>
-                    <h2>❌ שגיאה בשמירת הוידאו</h2>
-                    <p>מפנה לדף הבית...</p>
+                    <h2>⚠️ לא הצלחתי לזהות סצינות אוטומטית</h2>
+                    <p>הוידאו נשמר בהצלחה</p>
+                    <p>מפנה לעורך - תוכל להוסיף נקודות חיתוך ידנית</p>
                 </body>
                 </html>
-            ''', 500
-    else:
-        print(f"ERROR: Invalid file type: {file.filename}")
+            '''
+
+    except Exception as e:
+        print(f"ERROR: Failed to save shared video: {e}")
         return '''
             <html dir="rtl">
             <head>
@@ -400,82 +669,72 @@ def share_receiver():
                 <style>body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }</style>
             </head>
             <body>
-                <h2>❌ פורמט וידאו לא נתמך</h2>
-                <p>אנא שתף קובץ וידאו (MP4, AVI, MOV, MKV, FLV, WMV)</p>
+                <h2>❌ שגיאה בשמירת הוידאו</h2>
                 <p>מפנה לדף הבית...</p>
             </body>
             </html>
-        ''', 400
+        ''', 500
 
 
 @app.route('/process', methods=['POST'])
+@track_job('detect')
 def process_video():
     """Process uploaded video and detect scenes"""
 
     print(f"DEBUG: Request received - Content-Type: {request.content_type}")
-    print(f"DEBUG: Request files: {request.files}")
-    print(f"DEBUG: Request form: {request.form}")
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    names = {}
+
+    def destination(name):
+        if name == '':
+            raise UploadError('No file selected')
+        if not allowed_file(name):
+            raise UploadError(f'Invalid file type for {name}. Supported formats: MP4, AVI, MOV, MKV, FLV, WMV')
+        filename = secure_filename(name)
+        base_name, ext = os.path.splitext(filename)
+        names['base_name'] = base_name
+        names['unique_filename'] = f"{base_name}_{timestamp}{ext}"
+        return os.path.join(app.config['UPLOAD_FOLDER'], names['unique_filename'])
+
+    # The video is written to the upload folder while the request body arrives,
+    # instead of being spooled to a temporary file and copied
+    try:
+        fields, upload = receive_video_upload(destination)
+    except UploadError as e:
+        return upload_error_response(e)
 
     # Check if file is present
-    if 'video' not in request.files:
+    if upload is None:
         error_msg = 'No video file provided'
         print(f"ERROR: {error_msg}")
         return jsonify({'error': error_msg}), 400
 
-    file = request.files['video']
-
-    if file.filename == '':
-        error_msg = 'No file selected'
-        print(f"ERROR: {error_msg}")
-        return jsonify({'error': error_msg}), 400
-
-    if not allowed_file(file.filename):
-        error_msg = f'Invalid file type for {file.filename}. Supported formats: MP4, AVI, MOV, MKV, FLV, WMV'
-        print(f"ERROR: {error_msg}")
-        return jsonify({'error': error_msg}), 400
+    video_path = upload['path']
+    base_name = names['base_name']
+    unique_filename = names['unique_filename']
+    UPLOAD_SIZE_BYTES.labels(endpoint='process').observe(upload['size'])
 
-    # Get parameters
+    # Get parameters (the form fields may follow the file, so they are checked after it arrived)
     try:
-        threshold = float(request.form.get('threshold', 27.0))
-        min_scene_length = float(request.form.get('min_scene_length', 0.6))
-        print(f"DEBUG: Parameters - threshold={threshold}, min_scene_length={min_scene_length}")
+        threshold = float(fields.get('threshold', 27.0))
+        min_scene_length = parse_min_scene_length(fields.get('min_scene_length', 0.6))
+        detectors = parse_detectors(fields.get('detectors'))
+        print(f"DEBUG: Parameters - threshold={threshold}, min_scene_length={min_scene_length}, detectors={detectors}")
     except ValueError as e:
-        error_msg = f'Invalid threshold or min_scene_length value: {str(e)}'
+        os.remove(video_path)
+        error_msg = f'Invalid threshold, min_scene_length or detectors value: {str(e)}'
         print(f"ERROR: {error_msg}")
         return jsonify({'error': error_msg}), 400
 
-    # Save uploaded file
-    filename = secure_filename(file.filename)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    base_name = os.path.splitext(filename)[0]
-    ext = os.path.splitext(filename)[1]
-
-    unique_filename = f"{base_name}_{timestamp}{ext}"
-    video_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-    file.save(video_path)
-
     try:
-        # Detect scenes
-        # Convert min_scene_length from seconds to frames (assuming 30fps, will be auto-detected)
-        video = open_video(video_path)
-        fps = video.frame_rate
+        # Optional single-pass re-encode to an upright, constant frame rate H.264 mezzanine
+        video_path = normalize_upload(video_path)
+        unique_filename = os.path.basename(video_path)
 
-        min_scene_len_frames = int(min_scene_length * fps)
-
-        scene_list = detect_scenes(video_path, threshold=threshold, min_scene_len=min_scene_len_frames)
-
-        # Close the video file to release the file handle
-        del video
-
-        # Get video duration from scene list if available, otherwise get it from video metadata
-        video_duration = 0
-        if scene_list:
-            video_duration = scene_list[-1][1].get_seconds()
-        else:
-            # Get video duration from video metadata
-            from video_processing import get_video_info
-            video_info = get_video_info(video_path)
-            video_duration = video_info['duration']
+        # Detect scenes (min_scene_length is converted to frames at the video's frame rate)
+        detection = detect_scenes(video_path, threshold=threshold, min_scene_length=min_scene_length,
+                                  detectors=detectors)
 
         # Create output directory for this video to store temporarily
         output_dir = os.path.join(app.config['OUTPUT_FOLDER'], f"{base_name}_{timestamp}")
@@ -486,30 +745,13 @@ def process_video():
 
         # Use shutil.move instead of os.rename for cross-device compatibility
         shutil.move(video_path, stored_video_path)
-
-        # Extract cut point times from scene_list
-        # Scene list contains (start_timecode, end_timecode) tuples
-        # We want the END times as cut points (transitions between scenes)
-        suggested_cuts = []
-        if scene_list:
-            for i, scene in enumerate(scene_list):
-                if i < len(scene_list) - 1:  # Don't include the last scene's end time
-                    end_time = scene[1].get_seconds()
-                    suggested_cuts.append(end_time)
-
-        print(f"DEBUG: Scene detection result - {len(scene_list)} scenes detected, suggested cuts: {suggested_cuts}")
+        touch_session(output_dir, STATE_DETECTED)
 
         # Return data for timeline editor (even if no scenes detected)
-        cuts_param = ','.join(map(str, suggested_cuts)) if suggested_cuts else ''
-        return jsonify({
-            'success': True,
-            'scene_count': len(scene_list),
-            'video_url': f"/download/{os.path.basename(output_dir)}/{unique_filename}",
-            'suggested_cuts': suggested_cuts,
-            'video_duration': video_duration,
-            'redirect_url': f"/editor?video=/download/{os.path.basename(output_dir)}/{unique_filename}&cuts={cuts_param}"
-        })
+        return jsonify(_session_response(stored_video_path, detection, detectors))
 
+    except (MediaPoolBusy, MediaTimeout) as e:
+        return media_error_response(e)
     except Exception as e:
         print(f"ERROR: Processing failed: {e}")
         return jsonify({'error': f'Processing failed: {str(e)}'}), 500
@@ -519,25 +761,35 @@ def process_video():
 def download_file(folder, filename):
     """Serve generated files for download or streaming"""
     directory = os.path.join(app.config['OUTPUT_FOLDER'], folder)
+    if folder not in ('.', '..'):
+        touch_session(directory)
     # If it's a video file, serve for streaming (not download)
+    # Content-addressed files never change, so browsers may cache them indefinitely
+    max_age = 31536000 if folder in (CONTENT_FOLDER, WORKOUT_FOLDER) else None
     if filename.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv')):
-        return send_from_directory(directory, filename, as_attachment=False)
+        return send_from_directory(directory, filename, as_attachment=False, max_age=max_age)
     return send_from_directory(directory, filename, as_attachment=True)
 
 
 @app.route('/reprocess', methods=['GET'])
+@track_job('reprocess')
 def reprocess_video():
     """
     Reprocess an existing video with new detection settings
     Query Parameters:
         - path: Path to the video file (relative to server)
         - threshold: Detection threshold (1-100)
-        - min_scene_length: Minimum scene length in seconds
+        - min_scene_length: Minimum scene length in seconds (greater than 0)
+        - detectors: Comma-separated detectors (content, adaptive, threshold, histogram)
     """
     try:
         video_path_param = request.args.get('path')
-        threshold = float(request.args.get('threshold', 27.0))
-        min_scene_length = float(request.args.get('min_scene_length', 0.6))
+        try:
+            threshold = float(request.args.get('threshold', 27.0))
+            min_scene_length = parse_min_scene_length(request.args.get('min_scene_length', 0.6))
+            detectors = parse_detectors(request.args.get('detectors'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         if not video_path_param:
             return jsonify({'error': 'Video path is required'}), 400
@@ -551,24 +803,23 @@ def reprocess_video():
         if not os.path.exists(video_path):
             return jsonify({'error': f'Video file not found: {video_path}'}), 404
 
-        print(f"[Reprocess] Video: {video_path}, Threshold: {threshold}, Min scene: {min_scene_length}")
+        touch_session(os.path.dirname(video_path))
 
-        # Open video and get FPS
-        video = open_video(video_path)
-        fps = video.frame_rate
-        min_scene_len_frames = int(min_scene_length * fps)
+        print(f"[Reprocess] Video: {video_path}, Threshold: {threshold}, Min scene: {min_scene_length}, Detectors: {detectors}")
 
-        # Detect scenes
-        scene_list = detect_scenes(video_path, threshold=threshold, min_scene_len=min_scene_len_frames)
-
-        # Close video
-        del video
+        # A newer /reprocess for this video (e.g. the user changed the settings again) stops this one
+        with latest_request(video_path, 'detect') as superseded:
+            detection = detect_scenes(video_path, threshold=threshold, min_scene_length=min_scene_length,
+                                      detectors=detectors, cancelled=superseded)
+        scene_list = detection['scene_list']
 
         if not scene_list:
             return jsonify({
                 'success': True,
                 'scene_count': 0,
                 'suggested_cuts': [],
+                'cuts': [],
+                'detectors': detectors,
                 'message': 'No scenes detected with these settings'
             })
 
@@ -584,14 +835,522 @@ def reprocess_video():
         return jsonify({
             'success': True,
             'scene_count': len(scene_list),
-            'suggested_cuts': suggested_cuts
+            'suggested_cuts': suggested_cuts,
+            'cuts': detection['cuts'],
+            'detectors': detectors
         })
 
+    except (MediaPoolBusy, MediaTimeout, MediaCancelled) as e:
+        return media_error_response(e)
     except Exception as e:
         print(f"ERROR: Reprocessing failed: {e}")
         return jsonify({'error': f'Reprocessing failed: {str(e)}'}), 500
 
 
+def _float_count(start, stop, step):
+    """Number of values _float_range() returns, without building them"""
+    return int(math.floor((stop - start) / step + 0.5)) + 1
+
+
+def _float_range(start, stop, step):
+    """Values from start to stop inclusive, rounded so float steps do not drift"""
+    return [round(start + i * step, 3) for i in range(_float_count(start, stop, step))]
+
+
+@app.route('/api/scenes/sweep', methods=['GET'])
+@track_job('sweep')
+def sweep_scenes():
+    """
+    Content detector cuts for a grid of detection settings, from one decode
+
+    The editor fetches this once and then looks up cuts for any slider
+    position without calling /reprocess again.
+
+    Query Parameters:
+        - path: Path to the video file (relative to server)
+        - threshold_min, threshold_max, threshold_step: Threshold range (default 8-50, step 1)
+        - min_scene_lengths: Comma-separated minimum scene lengths in seconds
+                             (default 0.3-3.0 in steps of 0.1)
+
+    Returns:
+        thresholds and min_scene_lengths (the table's axes), results (distinct
+        outcomes, each with suggested_cuts and scene_count) and table, where
+        table[i][j] is the index in results for thresholds[i] and min_scene_lengths[j]
+    """
+    try:
+        video_path_param = request.args.get('path')
+        try:
+            threshold_min = float(request.args.get('threshold_min', 8))
+            threshold_max = float(request.args.get('threshold_max', 50))
+            threshold_step = float(request.args.get('threshold_step', 1))
+            lengths_param = request.args.get('min_scene_lengths')
+            if lengths_param:
+                min_scene_lengths = sorted({float(value) for value in lengths_param.split(',') if value.strip()})
+            else:
+                min_scene_lengths = _float_range(0.3, 3.0, 0.1)
+        except ValueError:
+            return jsonify({'error': 'Thresholds and min_scene_lengths must be numbers'}), 400
+
+        values = [threshold_min, threshold_max, threshold_step, *min_scene_lengths]
+        if not all(math.isfinite(value) for value in values):
+            return jsonify({'error': 'Thresholds and min_scene_lengths must be finite numbers'}), 400
+        if threshold_min <= 0 or threshold_step <= 0 or threshold_max < threshold_min:
+            return jsonify({'error': 'Invalid threshold range'}), 400
+        if not min_scene_lengths or min(min_scene_lengths) <= 0:
+            return jsonify({'error': 'Invalid min_scene_lengths'}), 400
+
+        # Checked before the thresholds are built: a tiny step would otherwise ask for billions of them
+        combinations = _float_count(threshold_min, threshold_max, threshold_step) * len(min_scene_lengths)
+        if combinations > MAX_SWEEP_COMBINATIONS:
+            return jsonify({
+                'error': f'Sweep has {combinations} combinations; the maximum is {MAX_SWEEP_COMBINATIONS}'
+            }), 400
+        thresholds = _float_range(threshold_min, threshold_max, threshold_step)
+
+        if not video_path_param:
+            return jsonify({'error': 'Video path is required'}), 400
+
+        # Security check - ensure path is within output folder
+        video_path = os.path.normpath(video_path_param)
+        if not video_path.startswith('output'):
+            return jsonify({'error': 'Invalid video path'}), 400
+
+        if not os.path.exists(video_path):
+            return jsonify({'error': f'Video file not found: {video_path}'}), 404
+
+        # Every minimum scene length must be at least one frame long
+        fps = get_video_info(video_path)['fps']
+        if fps and int(min(min_scene_lengths) * fps) < 1:
+            return jsonify({
+                'error': f'min_scene_lengths must be at least one frame ({1 / fps:.3f}s at {fps:g} fps)'
+            }), 400
+
+        touch_session(os.path.dirname(video_path))
+
+        print(f"[Sweep] Video: {video_path}, {len(thresholds)} thresholds x {len(min_scene_lengths)} min lengths")
+
+        # Scores come from the same backend as /reprocess, so the table matches its cuts
+        backend = detection_backend(['content'])
+        key = cache_key('sweep', file_content_hash(video_path), thresholds=thresholds,
+                        min_scene_lengths=min_scene_lengths, backend=backend)
+        with latest_request(video_path, 'sweep') as superseded:
+            sweep = result_cache.get_or_compute(key, lambda: run_media(
+                run_sweep, video_path, thresholds, min_scene_lengths, backend=backend, kind='sweep',
+                cancelled=superseded
+            ))
+
+        print(f"[Sweep] {combinations} combinations, {len(sweep['results'])} distinct cut lists")
+
+        return jsonify({
+            'success': True,
+            'thresholds': sweep['thresholds'],
+            'min_scene_lengths': sweep['min_scene_lengths'],
+            'results': sweep['results'],
+            'table': sweep['table']
+        })
+
+    except (MediaPoolBusy, MediaTimeout, MediaCancelled) as e:
+        return media_error_response(e)
+    except Exception as e:
+        print(f"ERROR: Scene sweep failed: {e}")
+        return jsonify({'error': f'Scene sweep failed: {str(e)}'}), 500
+
+
+@app.route('/api/uploads', methods=['POST'])
+def create_direct_upload():
+    """
+    Start an upload that goes straight to storage instead of through /process
+
+    Request body:
+    {
+        "filename": "squats.mp4",
+        "size": 104857600,
+        "content_type": "video/mp4"
+    }
+
+    The client PUTs each part_size slice of the file to the matching part
+    URL (presigned S3/R2 URLs, or /storage/upload/... with local storage),
+    then calls /api/uploads/complete with upload_token.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Supported formats: MP4, AVI, MOV, MKV, FLV, WMV'}), 400
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return jsonify({'error': 'size must be a positive number of bytes'}), 400
+    if size > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': f"File is larger than {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB"}), 413
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    base_name = os.path.splitext(filename)[0]
+    key = f"{INCOMING_FOLDER}/{base_name}_{timestamp}_{uuid.uuid4().hex[:8]}/{filename}"
+
+    try:
+        upload = storage.create_upload(key, size, content_type=data.get('content_type'))
+    except NotImplementedError as e:
+        return jsonify({'error': str(e)}), 501
+    except Exception as e:
+        print(f"ERROR: Could not start direct upload: {e}")
+        return jsonify({'error': f'Could not start upload: {str(e)}'}), 500
+
+    print(f"[Direct Upload] Started {key} ({size} bytes, {len(upload['parts'])} parts)")
+    return jsonify({
+        'success': True,
+        'upload_token': upload_signer.dumps({'key': key, 'upload_id': upload['upload_id']}),
+        'part_size': upload['part_size'],
+        'parts': upload['parts']
+    })
+
+
+def _load_upload_token(data):
+    """(key, upload_id) from a token issued by create_direct_upload, or None"""
+    try:
+        claims = upload_signer.loads(data.get('upload_token') or '', max_age=UPLOAD_TOKEN_MAX_AGE)
+    except BadSignature:
+        return None
+    return claims['key'], claims['upload_id']
+
+
+@app.route('/storage/upload/<token>', methods=['PUT'])
+def receive_upload_part(token):
+    """Local storage stand-in for a presigned part URL"""
+    if not hasattr(storage, 'receive_part'):
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        etag = storage.receive_part(token, request.stream)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 403
+    response = Response(status=200)
+    response.headers['ETag'] = f'"{etag}"'
+    return response
+
+
+def _copy_upload_to_session(key, size):
+    """
+    Stream a completed direct upload into a new editor session
+
+    Args:
+        key: Storage key of the upload (incoming/<session>/<file>)
+        size: Size in bytes (for tracing)
+
+    Returns:
+        Path of the session's copy of the video
+    """
+    # incoming/<name>_<timestamp>_<id>/<file> -> output/<name>_<timestamp>_<id>/<file>
+    _, session_name, unique_filename = key.split('/')
+    output_dir = os.path.join(app.config['OUTPUT_FOLDER'], session_name)
+    os.makedirs(output_dir, exist_ok=True)
+    stored_video_path = os.path.join(output_dir, unique_filename)
+    touch_session(output_dir, STATE_DETECTED)
+
+    with tracing.span('storage.stream', key=key, bytes=size), \
+            open_reader(storage, key) as source, open(stored_video_path, 'wb') as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+    # The session now holds its own copy
+    deletion_queue.enqueue([key])
+    return stored_video_path
+
+
+def _session_response(video_path, detection, detectors):
+    """
+    Editor session details for a detected video in a session folder
+    (the response body of /process and /api/uploads/complete)
+    """
+    scene_list = detection['scene_list']
+    if scene_list:
+        video_duration = scene_list[-1][1].get_seconds()
+    else:
+        video_duration = get_video_info(video_path)['duration']
+
+    # End times of every scene but the last are the cut points
+    suggested_cuts = [scene[1].get_seconds() for scene in scene_list[:-1]]
+
+    session_name = os.path.basename(os.path.dirname(video_path))
+    video_url = f"/download/{session_name}/{os.path.basename(video_path)}"
+    cuts_param = ','.join(map(str, suggested_cuts))
+    return {
+        'success': True,
+        'scene_count': len(scene_list),
+        'video_url': video_url,
+        'suggested_cuts': suggested_cuts,
+        'cuts': detection['cuts'],
+        'detectors': detectors,
+        'video_duration': video_duration,
+        'redirect_url': f"/editor?video={video_url}&cuts={cuts_param}"
+    }
+
+
+@app.route('/api/uploads/complete', methods=['POST'])
+@track_job('detect')
+def complete_direct_upload():
+    """
+    Finish a direct upload and run scene detection on it
+
+    Request body:
+    {
+        "upload_token": "...",
+        "threshold": 27,
+        "min_scene_length": 0.6,
+        "detectors": "content"
+    }
+
+    The video is streamed from storage into a new editor session with
+    ranged reads, then processed like /process; the response matches /process.
+    """
+    data = request.get_json(silent=True) or {}
+    upload = _load_upload_token(data)
+    if upload is None:
+        return jsonify({'error': 'Invalid or expired upload_token'}), 400
+    key, upload_id = upload
+
+    try:
+        threshold = float(data.get('threshold', 27.0))
+        min_scene_length = parse_min_scene_length(data.get('min_scene_length', 0.6))
+        detectors = parse_detectors(data.get('detectors'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid threshold, min_scene_length or detectors value: {str(e)}'}), 400
+
+    try:
+        size = storage.complete_upload(key, upload_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"ERROR: Could not complete direct upload {key}: {e}")
+        return jsonify({'error': f'Could not complete upload: {str(e)}'}), 500
+
+    if size > app.config['MAX_CONTENT_LENGTH']:
+        deletion_queue.enqueue([key])
+        return jsonify({'error': f"File is larger than {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB"}), 413
+    UPLOAD_SIZE_BYTES.labels(endpoint='direct_upload').observe(size)
+
+    try:
+        stored_video_path = _copy_upload_to_session(key, size)
+    except Exception as e:
+        print(f"ERROR: Could not read uploaded video {key}: {e}")
+        return jsonify({'error': f'Could not read uploaded video: {str(e)}'}), 500
+
+    try:
+        stored_video_path = normalize_upload(stored_video_path)
+        detection = detect_scenes(stored_video_path, threshold=threshold, min_scene_length=min_scene_length,
+                                  detectors=detectors)
+        result = _session_response(stored_video_path, detection, detectors)
+        print(f"[Direct Upload] {key}: {result['scene_count']} scenes, suggested cuts: {result['suggested_cuts']}")
+        return jsonify(result)
+
+    except (MediaPoolBusy, MediaTimeout) as e:
+        return media_error_response(e)
+    except Exception as e:
+        print(f"ERROR: Processing failed: {e}")
+        return jsonify({'error': f'Processing failed: {str(e)}'}), 500
+
+
+@app.route('/api/uploads/abort', methods=['POST'])
+def abort_direct_upload():
+    """Discard an unfinished direct upload (body: {"upload_token": "..."})"""
+    upload = _load_upload_token(request.get_json(silent=True) or {})
+    if upload is None:
+        return jsonify({'error': 'Invalid or expired upload_token'}), 400
+    try:
+        storage.abort_upload(*upload)
+    except NotImplementedError as e:
+        return jsonify({'error': str(e)}), 501
+    return jsonify({'success': True})
+
+
+def process_batch_file(source, params):
+    """
+    Detection for one clip of a batch (runs on a batch dispatcher thread)
+
+    Args:
+        source: {'filename', 'user', 'path'} for a posted file, or
+                {'filename', 'user', 'upload_key', 'size'} for a completed direct upload
+        params: The batch's threshold, min_scene_length and detectors
+
+    Returns:
+        The clip's editor session details (same as the /process response)
+    """
+    video_path = source.get('path')
+    if video_path is None:
+        video_path = _copy_upload_to_session(source['upload_key'], source['size'])
+
+    # No request context here, so the budget is that of a single /process upload
+    video_path = normalize_upload(video_path, timeout=route_timeout('process_video'), priority=PRIORITY_BATCH,
+                                  user=source['user'])
+    detection = detect_scenes(video_path, threshold=params['threshold'],
+                              min_scene_length=params['min_scene_length'], detectors=params['detectors'],
+                              timeout=route_timeout('process_video'), priority=PRIORITY_BATCH,
+                              user=source['user'])
+    result = _session_response(video_path, detection, params['detectors'])
+    print(f"[Batch] {source['filename']}: {result['scene_count']} scenes")
+    return result
+
+
+batch_scheduler = BatchScheduler(process_batch_file)
+
+
+def _batch_user(values):
+    """Fairness key for batches: X-User-Id header or 'user' field, else the client address"""
+    user = request.headers.get('X-User-Id') or values.get('user') or request.remote_addr
+    return (user or 'anonymous')[:64]
+
+
+@app.route('/api/batches', methods=['POST'])
+def create_batch():
+    """
+    Upload several clips at once and detect scenes in all of them in the background
+
+    Multipart form data:
+        - videos: One or more video files
+        - threshold, min_scene_length, detectors: As for /process
+
+    Or a JSON body with direct uploads (see /api/uploads), for large or resumable uploads:
+    {
+        "upload_tokens": ["...", "..."],
+        "threshold": 27,
+        "min_scene_length": 0.6,
+        "detectors": "content"
+    }
+
+    Each clip becomes its own editor session. Clips from different users
+    (X-User-Id header or 'user' field) are processed in turn. The response
+    has a batch_id; poll GET /api/batches/<batch_id> or stream
+    GET /api/batches/<batch_id>/events for per-file progress and results.
+    """
+    data = request.get_json(silent=True) if request.is_json else None
+    values = data if data is not None else request.form
+
+    try:
+        params = {
+            'threshold': float(values.get('threshold', 27.0)),
+            'min_scene_length': parse_min_scene_length(values.get('min_scene_length', 0.6)),
+            'detectors': parse_detectors(values.get('detectors'))
+        }
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid threshold, min_scene_length or detectors value: {str(e)}'}), 400
+
+    if data is not None:
+        tokens = data.get('upload_tokens') or []
+        count = len(tokens)
+    else:
+        files = [f for f in request.files.getlist('videos') if f.filename]
+        count = len(files)
+
+    if count == 0:
+        return jsonify({'error': 'No videos provided'}), 400
+    if count > MAX_BATCH_FILES:
+        return jsonify({'error': f'A batch may contain at most {MAX_BATCH_FILES} videos'}), 400
+
+    user = _batch_user(values)
+    sources = []
+    if data is not None:
+        # Every token is checked before any upload is completed
+        uploads = [_load_upload_token({'upload_token': token}) for token in tokens]
+        if None in uploads:
+            return jsonify({'error': f'Invalid or expired upload_token at index {uploads.index(None)}'}), 400
+        if len({key for key, _ in uploads}) != len(uploads):
+            return jsonify({'error': 'The same upload_token was given more than once'}), 400
+        completed = []
+        for key, upload_id in uploads:
+            try:
+                size = storage.complete_upload(key, upload_id)
+                completed.append(key)
+                if size > app.config['MAX_CONTENT_LENGTH']:
+                    error = (jsonify({
+                        'error': f"{os.path.basename(key)} is larger than {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB"
+                    }), 413)
+                else:
+                    UPLOAD_SIZE_BYTES.labels(endpoint='batch').observe(size)
+                    sources.append({'filename': os.path.basename(key), 'user': user, 'upload_key': key, 'size': size})
+                    continue
+            except ValueError as e:
+                error = (jsonify({'error': str(e)}), 400)
+            except Exception as e:
+                print(f"ERROR: Could not complete direct upload {key}: {e}")
+                error = (jsonify({'error': f'Could not complete upload: {str(e)}'}), 500)
+            # The batch is not created, so nothing else would remove the uploads completed for it
+            deletion_queue.enqueue(completed)
+            return error
+    else:
+        invalid = [f.filename for f in files if not allowed_file(f.filename)]
+        if invalid:
+            return jsonify({
+                'error': f"Invalid file type for {', '.join(invalid)}. Supported formats: MP4, AVI, MOV, MKV, FLV, WMV"
+            }), 400
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        for file in files:
+            filename = secure_filename(file.filename)
+            base_name = os.path.splitext(filename)[0]
+            unique_filename = f"{base_name}_{timestamp}{os.path.splitext(filename)[1]}"
+            # Clips of a batch often share a name (IMG_0001.mp4 from two phones), so sessions get an id
+            output_dir = os.path.join(app.config['OUTPUT_FOLDER'], f"{base_name}_{timestamp}_{uuid.uuid4().hex[:8]}")
+            os.makedirs(output_dir, exist_ok=True)
+            video_path = os.path.join(output_dir, unique_filename)
+            file.save(video_path)
+            touch_session(output_dir, STATE_DETECTED)
+            UPLOAD_SIZE_BYTES.labels(endpoint='batch').observe(os.path.getsize(video_path))
+            sources.append({'filename': filename, 'user': user, 'path': video_path})
+
+    batch = batch_scheduler.submit(user, sources, params)
+    batch_id = batch['batch_id']
+    return jsonify({
+        **summarize(batch),
+        'success': True,
+        'status_url': f"/api/batches/{batch_id}",
+        'events_url': f"/api/batches/{batch_id}/events"
+    }), 202
+
+
+@app.route('/api/batches/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """Per-file progress and results of a batch"""
+    batch = load_batch(batch_id)
+    if batch is None:
+        return jsonify({'error': 'Batch not found'}), 404
+    return jsonify(summarize(batch))
+
+
+@app.route('/api/batches/<batch_id>/events', methods=['GET'])
+def stream_batch(batch_id):
+    """
+    Server-sent events with the batch's state each time it changes,
+    ending after the event in which the batch is completed
+
+    The stream also ends when the batch's state file is gone, or after
+    BATCH_EVENT_MAX_IDLE_SECONDS without a change (clients reconnect or
+    poll). A ': keepalive' comment is sent every BATCH_EVENT_KEEPALIVE_SECONDS
+    while nothing changes.
+    """
+    batch = load_batch(batch_id)
+    if batch is None:
+        return jsonify({'error': 'Batch not found'}), 404
+
+    def events():
+        current = batch
+        last_update = None
+        last_change = last_write = time.monotonic()
+        while current is not None:
+            now = time.monotonic()
+            if current['updated'] != last_update:
+                last_update = current['updated']
+                last_change = last_write = now
+                yield f"data: {json.dumps(summarize(current))}\n\n"
+                if current['state'] == BATCH_COMPLETED:
+                    return
+            elif now - last_change >= BATCH_EVENT_MAX_IDLE_SECONDS:
+                return
+            elif now - last_write >= BATCH_EVENT_KEEPALIVE_SECONDS:
+                last_write = now
+                yield ": keepalive\n\n"
+            time.sleep(BATCH_EVENT_POLL_SECONDS)
+            current = load_batch(batch_id)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/get-tags', methods=['GET'])
 def get_tags():
     """Get all unique muscle groups and equipment for autocomplete"""
@@ -600,6 +1359,7 @@ def get_tags():
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
 
+        from psycopg2.extras import RealDictCursor
         cursor = conn.cursor(cursor_factory=RealDictCursor)
 
         # Get all muscle groups
@@ -725,21 +1485,45 @@ def save_tags():
 
 
 @app.route('/api/timeline/save', methods=['POST'])
+@track_job('save')
 def save_timeline():
     """
     Save timeline with cut points and exercise segments
     Phase 4: Now includes FFmpeg video cutting and storage upload
+
+    The client sends a saveId and sends the same one again when it retries.
+    Every segment's progress is checkpointed in the timelines table (see
+    timeline_saves.py): a retry after an interrupted save only encodes,
+    uploads and inserts what is missing, and a retry after a completed save
+    returns the stored response. A saveId that is being saved by another
+    request, or that was used for a different timeline, gets 409.
     """
+    conn = None
     try:
         data = request.get_json()
         video_url = data.get('videoUrl')
         cut_points = data.get('cutPoints', [])
         segments = data.get('segments', [])
+        encoder_profile = data.get('encoderProfile') or app_config.ENCODER_PROFILE
+        # Saves without an id still get checkpoints, they just cannot be resumed
+        save_id = str(data.get('saveId') or uuid.uuid4().hex)
 
         if not video_url or not segments:
             return jsonify({'error': 'Invalid timeline data'}), 400
+        if not SAVE_ID_PATTERN.match(save_id):
+            return jsonify({'error': 'saveId must be 8-64 letters, digits, "-" or "_"'}), 400
+
+        # Validate encoder profiles (per job and per segment) before doing any work
+        try:
+            get_profile(encoder_profile)
+            for segment in segments:
+                segment_profile = (segment.get('details') or {}).get('encoderProfile')
+                if segment_profile:
+                    get_profile(segment_profile)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        print(f"[Timeline Save] Processing {len(segments)} segments")
+        print(f"[Timeline Save] Processing {len(segments)} segments (save {save_id})")
 
         # Extract the original video path from the URL
         # video_url format: /download/folder_name/filename.ext
@@ -751,11 +1535,61 @@ def save_timeline():
         filename = parts[3]
         original_video_path = os.path.join(app.config['OUTPUT_FOLDER'], folder_name, filename)
 
+        # The connection holds the save's lock until it is closed
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        if not try_lock(conn, save_id):
+            return jsonify({'error': 'This timeline is already being saved', 'in_progress': True}), 409
+
+        fingerprint = request_hash(video_url, segments, encoder_profile)
+        timeline = load_timeline(conn, save_id)
+        if timeline is not None:
+            if timeline['request_hash'] != fingerprint:
+                return jsonify({'error': 'saveId was already used for a different timeline'}), 409
+            if timeline['status'] == TIMELINE_SAVED:
+                print(f"[Timeline Save] Save {save_id} is already complete")
+                return jsonify({**timeline['result'], 'already_saved': True})
+
         # Verify original video exists
         if not os.path.exists(original_video_path):
             return jsonify({'error': f'Original video not found: {original_video_path}'}), 404
 
         print(f"[Timeline Save] Original video: {original_video_path}")
+        session_dir = os.path.join(app.config['OUTPUT_FOLDER'], folder_name)
+        touch_session(session_dir, STATE_SAVING)
+
+        # Segments that become exercises (split_video_by_timeline skips the rest)
+        expected = [i for i, segment in enumerate(segments, start=1) if segment.get('details')]
+        resumed = timeline is not None
+        if resumed:
+            print(f"[Timeline Save] Resuming save {save_id}: {len(timeline['segments'])} segments checkpointed")
+        else:
+            timeline = create_timeline(conn, save_id, fingerprint, {
+                'original_filename': filename,
+                'storage_path': video_url,
+                'duration': get_video_info(original_video_path)['duration'],
+                'file_size': os.path.getsize(original_video_path),
+                'storage_type': app_config.STORAGE_BACKEND
+            }, cut_points, len(expected))
+
+        def checkpointed(key, states):
+            return any(s.get('content_key') == key and s['state'] in states for s in timeline['segments'].values())
+
+        def is_stored(key, index):
+            # Uploaded checkpoints are verified too: the objects may be gone by the time a save is retried
+            if checkpointed(key, (SEGMENT_INSERTED,)):
+                return True
+            # Claim the key before trusting the objects: a pending deletion either already
+            # removed them (and they are uploaded again) or sees the claim and keeps them
+            lock_library(conn)
+            try:
+                if segment_state(timeline, index).get('content_key') != key:
+                    record_segment(conn, timeline, index, SEGMENT_CLAIMED, commit=False, content_key=key)
+                return (storage.exists(f"{CONTENT_FOLDER}/{key}.mp4")
+                        and storage.exists(f"{CONTENT_FOLDER}/{key}.jpg"))
+            finally:
+                conn.commit()
 
         # Create output folder for segments
         segments_output_folder = os.path.join(app.config['OUTPUT_FOLDER'], folder_name, 'segments')
@@ -764,66 +1598,90 @@ def save_timeline():
         # Phase 4: Cut video into segments using FFmpeg
         print("[Timeline Save] Starting video cutting with FFmpeg...")
         try:
-            cut_results = split_video_by_timeline(
-                video_path=original_video_path,
-                segments=segments,
-                output_folder=segments_output_folder,
-                base_name=os.path.splitext(filename)[0],
-                codec=app_config.VIDEO_CODEC,
-                preset=app_config.VIDEO_PRESET,
-                crf=app_config.VIDEO_CRF
-            )
-            print(f"[Timeline Save] Video cutting completed: {len(cut_results)} segments processed")
+            # Segments are content-addressed: ones already in storage are not encoded or uploaded again
+            with media_slot(ffmpeg=True):
+                cut_results = split_video_by_timeline(
+                    video_path=original_video_path,
+                    segments=segments,
+                    output_folder=segments_output_folder,
+                    base_name=os.path.splitext(filename)[0],
+                    profile=encoder_profile,
+                    source_hash=file_content_hash(original_video_path),
+                    is_stored=is_stored,
+                    is_encoded=lambda key: checkpointed(key, (SEGMENT_ENCODED,)),
+                    on_encoded=lambda result: record_segment(
+                        conn, timeline, result['segment_index'], SEGMENT_ENCODED, content_key=result['content_key']
+                    )
+                )
+            reused = sum(1 for result in cut_results if result['stored'])
+            print(f"[Timeline Save] Video cutting completed: {len(cut_results)} segments processed, {reused} already stored")
+        except MediaPoolBusy as e:
+            return media_error_response(e)
         except VideoProcessingError as e:
             print(f"[Timeline Save] Video cutting failed: {e}")
             return jsonify({'error': f'Video processing failed: {str(e)}'}), 500
 
-        # Connect to database
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'error': 'Database connection failed'}), 500
-
         cursor = conn.cursor()
         saved_count = 0
 
         # Save each segment to database
         upload_errors = []
         for result in cut_results:
+            index = result['segment_index']
+            state = segment_state(timeline, index)
+            if state.get('state') == SEGMENT_INSERTED:
+                saved_count += 1
+                print(f"[Timeline Save] Segment {index} was saved by an earlier attempt")
+                continue
             try:
                 # Phase 6: Upload segment video and thumbnail to storage with error handling
-                segment_filename = os.path.basename(result['video_path'])
-                thumbnail_filename = os.path.basename(result['thumbnail_path'])
-
-                # Upload video file with retry logic
-                try:
-                    video_storage_path = storage.save(
-                        file_data=result['video_path'],
-                        filename=segment_filename,
-                        folder=f"{folder_name}/segments"
-                    )
-                    video_url = storage.get_url(video_storage_path)
-                    print(f"[Timeline Save] Uploaded video segment {result['segment_index']}: {video_url}")
-                except Exception as upload_error:
-                    error_msg = f"Failed to upload video segment {result['segment_index']}: {str(upload_error)}"
-                    print(f"[Timeline Save] ERROR: {error_msg}")
-                    upload_errors.append(error_msg)
-                    continue  # Skip this segment if video upload fails
-
-                # Upload thumbnail file with retry logic
-                try:
-                    thumbnail_storage_path = storage.save(
-                        file_data=result['thumbnail_path'],
-                        filename=thumbnail_filename,
-                        folder=f"{folder_name}/thumbnails"
-                    )
-                    thumbnail_url = storage.get_url(thumbnail_storage_path)
-                    print(f"[Timeline Save] Uploaded thumbnail {result['segment_index']}: {thumbnail_url}")
-                except Exception as upload_error:
-                    error_msg = f"Failed to upload thumbnail {result['segment_index']}: {str(upload_error)}"
-                    print(f"[Timeline Save] WARNING: {error_msg}")
-                    upload_errors.append(error_msg)
-                    # Continue anyway - thumbnail is not critical, use placeholder or skip
-                    thumbnail_url = None  # Will store NULL in database
+                content_key = result['content_key']
+                uploaded = state.get('state') == SEGMENT_UPLOADED and result['stored']
+                if uploaded:
+                    video_url = state['video_url']
+                    thumbnail_url = state['thumbnail_url']
+                    print(f"[Timeline Save] Segment {index} was uploaded by an earlier attempt: {video_url}")
+                elif result['stored']:
+                    video_url = storage.get_url(f"{CONTENT_FOLDER}/{content_key}.mp4")
+                    thumbnail_url = storage.get_url(f"{CONTENT_FOLDER}/{content_key}.jpg")
+                    print(f"[Timeline Save] Reusing stored segment {index}: {video_url}")
+                else:
+                    # Upload video file with retry logic
+                    try:
+                        video_storage_path = storage.save(
+                            file_data=result['video_path'],
+                            filename=f"{content_key}.mp4",
+                            folder=CONTENT_FOLDER,
+                            cache_control=IMMUTABLE_CACHE_CONTROL
+                        )
+                        video_url = storage.get_url(video_storage_path)
+                        print(f"[Timeline Save] Uploaded video segment {index}: {video_url}")
+                    except Exception as upload_error:
+                        error_msg = f"Failed to upload video segment {index}: {str(upload_error)}"
+                        print(f"[Timeline Save] ERROR: {error_msg}")
+                        upload_errors.append(error_msg)
+                        continue  # Skip this segment if video upload fails
+
+                    # Upload thumbnail file with retry logic
+                    try:
+                        thumbnail_storage_path = storage.save(
+                            file_data=result['thumbnail_path'],
+                            filename=f"{content_key}.jpg",
+                            folder=CONTENT_FOLDER,
+                            cache_control=IMMUTABLE_CACHE_CONTROL
+                        )
+                        thumbnail_url = storage.get_url(thumbnail_storage_path)
+                        print(f"[Timeline Save] Uploaded thumbnail {index}: {thumbnail_url}")
+                    except Exception as upload_error:
+                        error_msg = f"Failed to upload thumbnail {index}: {str(upload_error)}"
+                        print(f"[Timeline Save] WARNING: {error_msg}")
+                        upload_errors.append(error_msg)
+                        # Continue anyway - thumbnail is not critical, use placeholder or skip
+                        thumbnail_url = None  # Will store NULL in database
+
+                if not uploaded:
+                    record_segment(conn, timeline, index, SEGMENT_UPLOADED, content_key=content_key,
+                                   video_url=video_url, thumbnail_url=thumbnail_url)
 
                 # Insert exercise with Phase 4 fields
                 cursor.execute(
@@ -862,22 +1720,48 @@ def save_timeline():
                             (exercise_id, equipment_id)
                         )
 
+                # The exercise, its tags and its checkpoint are committed together
+                record_segment(conn, timeline, index, SEGMENT_INSERTED, commit=False, exercise_id=exercise_id)
+                conn.commit()
                 saved_count += 1
                 print(f"[Timeline Save] Saved exercise {saved_count}: {result['exercise_name']}")
 
             except Exception as e:
-                print(f"[Timeline Save] Failed to save segment {result['segment_index']}: {e}")
+                print(f"[Timeline Save] Failed to save segment {index}: {e}")
+                conn.rollback()
+                # Drop checkpoints that were rolled back with the segment
+                timeline['segments'] = load_timeline(conn, save_id)['segments']
                 # Continue with other segments
                 continue
 
-        # Commit all changes
-        conn.commit()
         cursor.close()
-        conn.close()
 
+        complete = all(segment_state(timeline, i).get('state') == SEGMENT_INSERTED for i in expected)
+        response = {
+            'success': complete,
+            'save_id': save_id,
+            'saved_count': saved_count,
+            'message': f'Saved {saved_count} exercises to database',
+            'segments_processed': len(cut_results),
+            'segments_reused': reused,
+            'resumed': resumed
+        }
+        if upload_errors:
+            response['upload_errors'] = upload_errors
+            response['warning'] = f"{len(upload_errors)} upload errors occurred (see upload_errors)"
+
+        if not complete:
+            # Keep the original video and encoded segments for a retry with the same saveId
+            response['message'] = (f'Saved {saved_count} of {len(expected)} exercises; '
+                                   f'retry with the same saveId to save the rest')
+            print(f"[Timeline Save] Save {save_id} incomplete: {saved_count}/{len(expected)} exercises saved")
+            return jsonify(response)
+
+        finish_timeline(conn, timeline, response)
         print(f"[Timeline Save] Successfully saved {saved_count} exercises to database")
+        touch_session(session_dir, STATE_SAVED)
 
-        # Phase 6: Cleanup - Delete original video and local segments (if using cloud storage)
+        # Phase 6: Cleanup - Delete original video and local segments
         cleanup_success = True
         try:
             # Delete original full video (we only need the segments now)
@@ -885,61 +1769,50 @@ def save_timeline():
                 os.remove(original_video_path)
                 print(f"[Cleanup] Deleted original video: {original_video_path}")
 
-            # If using cloud storage (R2 or S3), delete local segment files
-            if app_config.STORAGE_BACKEND in ['r2', 's3']:
-                # Delete segment video files
-                for result in cut_results:
-                    if os.path.exists(result['video_path']):
-                        os.remove(result['video_path'])
-                        print(f"[Cleanup] Deleted local segment: {result['video_path']}")
+            # Delete local segment files (uploaded to the content-addressed library folder)
+            for result in cut_results:
+                if result['video_path'] and os.path.exists(result['video_path']):
+                    os.remove(result['video_path'])
+                    print(f"[Cleanup] Deleted local segment: {result['video_path']}")
 
-                    if os.path.exists(result['thumbnail_path']):
-                        os.remove(result['thumbnail_path'])
-                        print(f"[Cleanup] Deleted local thumbnail: {result['thumbnail_path']}")
+                if result['thumbnail_path'] and os.path.exists(result['thumbnail_path']):
+                    os.remove(result['thumbnail_path'])
+                    print(f"[Cleanup] Deleted local thumbnail: {result['thumbnail_path']}")
 
-                # Delete empty segment folders
-                segments_folder = os.path.join(app.config['OUTPUT_FOLDER'], folder_name, 'segments')
-                thumbnails_folder = os.path.join(app.config['OUTPUT_FOLDER'], folder_name, 'thumbnails')
+            # Delete empty segment folders
+            segments_folder = os.path.join(app.config['OUTPUT_FOLDER'], folder_name, 'segments')
+            thumbnails_folder = os.path.join(app.config['OUTPUT_FOLDER'], folder_name, 'thumbnails')
 
-                if os.path.exists(segments_folder) and not os.listdir(segments_folder):
-                    os.rmdir(segments_folder)
-                    print(f"[Cleanup] Deleted empty folder: {segments_folder}")
+            if os.path.exists(segments_folder) and not os.listdir(segments_folder):
+                os.rmdir(segments_folder)
+                print(f"[Cleanup] Deleted empty folder: {segments_folder}")
 
-                if os.path.exists(thumbnails_folder) and not os.listdir(thumbnails_folder):
-                    os.rmdir(thumbnails_folder)
-                    print(f"[Cleanup] Deleted empty folder: {thumbnails_folder}")
+            if os.path.exists(thumbnails_folder) and not os.listdir(thumbnails_folder):
+                os.rmdir(thumbnails_folder)
+                print(f"[Cleanup] Deleted empty folder: {thumbnails_folder}")
 
-                # Delete video folder if empty
-                video_folder = os.path.join(app.config['OUTPUT_FOLDER'], folder_name)
-                if os.path.exists(video_folder) and not os.listdir(video_folder):
-                    os.rmdir(video_folder)
-                    print(f"[Cleanup] Deleted empty folder: {video_folder}")
+            # Delete video folder if empty (apart from its session state file)
+            video_folder = os.path.join(app.config['OUTPUT_FOLDER'], folder_name)
+            if is_empty_session(video_folder):
+                shutil.rmtree(video_folder)
+                print(f"[Cleanup] Deleted empty folder: {video_folder}")
 
         except Exception as cleanup_error:
             print(f"[Cleanup] Warning: Cleanup failed: {cleanup_error}")
             cleanup_success = False
             # Don't fail the request if cleanup fails - exercises are already saved
 
-        # Return result with upload errors if any
-        response = {
-            'success': True,
-            'saved_count': saved_count,
-            'message': f'Saved {saved_count} exercises to database',
-            'segments_processed': len(cut_results),
-            'cleanup_success': cleanup_success
-        }
-
-        if upload_errors:
-            response['upload_errors'] = upload_errors
-            response['warning'] = f"{len(upload_errors)} upload errors occurred (see upload_errors)"
-
-        return jsonify(response)
+        return jsonify({**response, 'cleanup_success': cleanup_success})
 
     except Exception as e:
         print(f"ERROR: Failed to save timeline: {e}")
-        if 'conn' in locals() and conn:
+        if conn:
             conn.rollback()
         return jsonify({'error': f'Failed to save timeline: {str(e)}'}), 500
+    finally:
+        # Also releases the save's advisory lock
+        if conn:
+            conn.close()
 
 
 @app.route('/api/exercises', methods=['GET'])
@@ -983,6 +1856,7 @@ def get_exercises():
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
 
+        from psycopg2.extras import RealDictCursor
         cursor = conn.cursor(cursor_factory=RealDictCursor)
 
         # Build query
@@ -1103,6 +1977,125 @@ def get_exercises():
         return jsonify({'error': f'Failed to get exercises: {str(e)}'}), 500
 
 
+@app.route('/api/exercises/export', methods=['GET'])
+def export_exercises():
+    """
+    Stream the whole exercise library for analytics
+
+    Query Parameters:
+        - format: csv (default), jsonl or parquet
+        - gzip: Compress CSV/JSON Lines output (default: 1)
+        - batch_size: Rows fetched per database round trip (default: 1000)
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    compress = request.args.get('gzip', '1').lower() not in ('0', 'false', 'no')
+    try:
+        batch_size = min(MAX_EXPORT_BATCH_SIZE, max(1, int(request.args.get('batch_size', EXPORT_BATCH_SIZE))))
+        check_format(export_format)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    export = export_stream(iter_exercise_batches(conn, batch_size), export_format, compress=compress)
+    print(f"[Export] Streaming exercises as {export['filename']} (batches of {batch_size})")
+    response = Response(
+        stream_with_context(export['chunks']),
+        mimetype=export['mimetype'],
+        headers={'Content-Disposition': f"attachment; filename={export['filename']}"}
+    )
+    # Also close the connection if the client goes away before streaming starts
+    response.call_on_close(conn.close)
+    return response
+
+
+def _import_manifest_path(import_id):
+    for ext in ('.csv', '.jsonl'):
+        path = os.path.join(IMPORT_ROOT, f".import-{import_id}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+@app.route('/api/exercises/import', methods=['POST'])
+def start_import():
+    """
+    Bulk import pre-cut clips from a manifest (see bulk_import.py)
+
+    Form data:
+        - manifest: CSV or JSON Lines file; clip paths are relative to IMPORT_ROOT
+
+    The import runs in the background. Its id is derived from the manifest
+    contents, so posting the same manifest again resumes an interrupted import.
+    A manifest already being imported by another worker is not run again;
+    its progress is reported from the journal.
+    """
+    manifest = request.files.get('manifest')
+    if not manifest or not manifest.filename:
+        return jsonify({'error': 'No manifest provided'}), 400
+    ext = '.jsonl' if manifest.filename.lower().endswith(('.jsonl', '.ndjson')) else '.csv'
+
+    data = manifest.read()
+    import_id = hashlib.sha256(data).hexdigest()[:16]
+    manifest_path = os.path.join(IMPORT_ROOT, f".import-{import_id}{ext}")
+
+    with imports_lock:
+        status = imports.get(import_id)
+        if status and status['state'] == 'running':
+            return jsonify({'success': True, 'import_id': import_id, **status}), 202
+        status = imports[import_id] = {'state': 'running', 'summary': None, 'error': None}
+
+    os.makedirs(IMPORT_ROOT, exist_ok=True)
+    # Same id, same contents: leave a manifest another worker may be reading as it is
+    if not os.path.exists(manifest_path):
+        partial_path = f"{manifest_path}.{uuid.uuid4().hex}.partial"
+        with open(partial_path, 'wb') as f:
+            f.write(data)
+        os.replace(partial_path, manifest_path)
+
+    def run():
+        try:
+            status['summary'] = run_import(
+                manifest_path, storage, connect=get_db_connection, root=IMPORT_ROOT,
+                upload_concurrency=app_config.IMPORT_UPLOAD_CONCURRENCY,
+                progress=lambda summary: status.update(summary=dict(summary))
+            )
+            status['state'] = 'completed'
+        except ImportRunning as e:
+            print(f"[Import] {import_id}: {e}")
+            # GET reports the other worker's progress from the journal
+            with imports_lock:
+                imports.pop(import_id, None)
+        except Exception as e:
+            print(f"[Import] {import_id} failed: {e}")
+            status.update(state='failed', error=str(e))
+
+    threading.Thread(target=run, name=f"import-{import_id}", daemon=True).start()
+    print(f"[Import] Started {import_id} from {manifest.filename}")
+    return jsonify({'success': True, 'import_id': import_id, **status}), 202
+
+
+@app.route('/api/exercises/import/<import_id>', methods=['GET'])
+def get_import(import_id):
+    """Progress of a bulk import"""
+    if import_id in imports:
+        return jsonify({'import_id': import_id, **imports[import_id]})
+
+    # Started by another worker or before a restart: report from the progress journal
+    manifest_path = _import_manifest_path(secure_filename(import_id))
+    if not manifest_path:
+        return jsonify({'error': 'Import not found'}), 404
+    uploaded, merged = load_progress(progress_path(manifest_path))
+    return jsonify({
+        'import_id': import_id,
+        'state': 'unknown',
+        'summary': {'uploaded': len(uploaded), 'merged': len(merged)},
+        'error': None
+    })
+
+
 @app.route('/api/exercises/<int:exercise_id>', methods=['GET'])
 def get_exercise(exercise_id):
     """
@@ -1114,6 +2107,7 @@ def get_exercise(exercise_id):
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
 
+        from psycopg2.extras import RealDictCursor
         cursor = conn.cursor(cursor_factory=RealDictCursor)
 
         query = """
@@ -1236,6 +2230,49 @@ def update_exercise(exercise_id):
         return jsonify({'error': f'Failed to update exercise: {str(e)}'}), 500
 
 
+def _unshared_urls(cursor, rows):
+    """
+    File URLs of deleted exercises that no remaining exercise uses
+
+    Content-addressed segments can be shared by several exercises, so a file
+    is only deleted once its last exercise is gone. Call inside the deleting
+    transaction.
+
+    Args:
+        cursor: Cursor in the transaction that deleted the rows
+        rows: (video_file_path, thumbnail_url) tuples of deleted exercises
+
+    Returns:
+        List of URLs safe to delete from storage
+    """
+    urls = list({url for row in rows for url in row if url})
+    if not urls:
+        return []
+    cursor.execute(
+        "SELECT video_file_path, thumbnail_url FROM exercises WHERE video_file_path = ANY(%s) OR thumbnail_url = ANY(%s)",
+        (urls, urls)
+    )
+    shared = {url for row in cursor.fetchall() for url in row}
+    return [url for url in urls if url not in shared]
+
+
+def _queue_file_deletion(urls):
+    """
+    Queue storage objects of deleted exercises for background deletion
+
+    Args:
+        urls: File URLs from _unshared_urls()
+
+    Returns:
+        Number of storage keys queued
+    """
+    keys = [storage.get_key_from_url(url) for url in urls]
+    queued = deletion_queue.enqueue(keys)
+    if queued:
+        print(f"[File Cleanup] Queued {queued} files for deletion from {app_config.STORAGE_BACKEND}")
+    return queued
+
+
 @app.route('/api/exercises/<int:exercise_id>', methods=['DELETE'])
 def delete_exercise(exercise_id):
     """
@@ -1249,101 +2286,172 @@ def delete_exercise(exercise_id):
 
         cursor = conn.cursor()
 
-        # Check if exercise exists and get video path for cleanup
+        # Delete from junction tables first (foreign key constraints)
+        cursor.execute("DELETE FROM exercise_muscle_groups WHERE exercise_id = %s", (exercise_id,))
+        cursor.execute("DELETE FROM exercise_equipment WHERE exercise_id = %s", (exercise_id,))
+
+        # Delete the exercise, keeping its file URLs for storage cleanup
         cursor.execute(
-            "SELECT video_file_path, thumbnail_url FROM exercises WHERE id = %s",
+            "DELETE FROM exercises WHERE id = %s RETURNING video_file_path, thumbnail_url",
             (exercise_id,)
         )
         result = cursor.fetchone()
 
         if not result:
+            conn.rollback()
             cursor.close()
             conn.close()
             return jsonify({'error': 'Exercise not found'}), 404
 
-        video_path, thumbnail_url = result
+        unshared_urls = _unshared_urls(cursor, [result])
+        conn.commit()
+        cursor.close()
+        conn.close()
 
-        # Delete from junction tables first (foreign key constraints)
-        cursor.execute("DELETE FROM exercise_muscle_groups WHERE exercise_id = %s", (exercise_id,))
-        cursor.execute("DELETE FROM exercise_equipment WHERE exercise_id = %s", (exercise_id,))
+        # Phase 6: Delete video and thumbnail files from storage in the background
+        _queue_file_deletion(unshared_urls)
 
-        # Delete the exercise
-        cursor.execute("DELETE FROM exercises WHERE id = %s", (exercise_id,))
+        print(f"[Exercise Delete] Deleted exercise ID {exercise_id}")
 
+        return jsonify({
+            'success': True,
+            'message': 'Exercise deleted successfully'
+        })
+
+    except Exception as e:
+        print(f"ERROR: Failed to delete exercise: {e}")
+        return jsonify({'error': f'Failed to delete exercise: {str(e)}'}), 500
+
+
+@app.route('/api/exercises', methods=['DELETE'])
+def delete_exercises():
+    """
+    Delete several exercises in one transaction
+
+    Request Body:
+        - ids: List of exercise IDs (at most MAX_BULK_DELETE)
+
+    Storage files are deleted in the background, in batches.
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+
+    if not isinstance(ids, list) or not ids:
+        return jsonify({'error': 'ids must be a non-empty list of exercise IDs'}), 400
+    if len(ids) > MAX_BULK_DELETE:
+        return jsonify({'error': f'At most {MAX_BULK_DELETE} exercises can be deleted at once'}), 400
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'error': 'ids must be integers'}), 400
+
+    ids = sorted(set(ids))
+
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM exercise_muscle_groups WHERE exercise_id = ANY(%s)", (ids,))
+        cursor.execute("DELETE FROM exercise_equipment WHERE exercise_id = ANY(%s)", (ids,))
+        cursor.execute(
+            "DELETE FROM exercises WHERE id = ANY(%s) RETURNING id, video_file_path, thumbnail_url",
+            (ids,)
+        )
+        rows = cursor.fetchall()
+        unshared_urls = _unshared_urls(cursor, [row[1:] for row in rows])
         conn.commit()
         cursor.close()
         conn.close()
 
-        # Phase 6: Delete video and thumbnail files from storage backend
-        deletion_errors = []
-        try:
-            # For cloud storage (R2/S3), extract the storage path from URL
-            if app_config.STORAGE_BACKEND in ['r2', 's3']:
-                # video_path is actually a URL like: https://pub-xxxxx.r2.dev/folder/segments/file.mp4
-                # We need to extract the storage key: folder/segments/file.mp4
-                if video_path:
-                    try:
-                        # Extract storage key from URL
-                        video_storage_key = storage.get_key_from_url(video_path) if hasattr(storage, 'get_key_from_url') else video_path.split('/')[-3:]
-                        if isinstance(video_storage_key, list):
-                            video_storage_key = '/'.join(video_storage_key)
-
-                        # Delete from cloud storage
-                        if storage.delete(video_storage_key):
-                            print(f"[File Cleanup] Deleted video from {app_config.STORAGE_BACKEND}: {video_storage_key}")
-                        else:
-                            deletion_errors.append(f"Failed to delete video: {video_storage_key}")
-                    except Exception as e:
-                        print(f"[File Cleanup] Warning: Failed to delete video from {app_config.STORAGE_BACKEND}: {e}")
-                        deletion_errors.append(f"Video deletion error: {str(e)}")
-
-                if thumbnail_url:
-                    try:
-                        # Extract storage key from URL
-                        thumbnail_storage_key = storage.get_key_from_url(thumbnail_url) if hasattr(storage, 'get_key_from_url') else thumbnail_url.split('/')[-3:]
-                        if isinstance(thumbnail_storage_key, list):
-                            thumbnail_storage_key = '/'.join(thumbnail_storage_key)
-
-                        # Delete from cloud storage
-                        if storage.delete(thumbnail_storage_key):
-                            print(f"[File Cleanup] Deleted thumbnail from {app_config.STORAGE_BACKEND}: {thumbnail_storage_key}")
-                        else:
-                            deletion_errors.append(f"Failed to delete thumbnail: {thumbnail_storage_key}")
-                    except Exception as e:
-                        print(f"[File Cleanup] Warning: Failed to delete thumbnail from {app_config.STORAGE_BACKEND}: {e}")
-                        deletion_errors.append(f"Thumbnail deletion error: {str(e)}")
-
-            # For local storage, delete files directly
-            elif app_config.STORAGE_BACKEND == 'local':
-                if video_path and os.path.exists(video_path):
-                    os.remove(video_path)
-                    print(f"[File Cleanup] Deleted local video file: {video_path}")
-
-                if thumbnail_url and os.path.exists(thumbnail_url):
-                    os.remove(thumbnail_url)
-                    print(f"[File Cleanup] Deleted local thumbnail file: {thumbnail_url}")
+        deleted_ids = sorted(row[0] for row in rows)
+        not_found = sorted(set(ids) - set(deleted_ids))
 
-        except Exception as cleanup_error:
-            print(f"[File Cleanup] Warning: Failed to delete files: {cleanup_error}")
-            deletion_errors.append(f"Cleanup error: {str(cleanup_error)}")
-            # Don't fail the request if file cleanup fails
+        queued = _queue_file_deletion(unshared_urls)
 
-        print(f"[Exercise Delete] Deleted exercise ID {exercise_id}")
+        print(f"[Exercise Delete] Deleted {len(deleted_ids)} exercises")
 
         response = {
             'success': True,
-            'message': 'Exercise deleted successfully'
+            'deleted_count': len(deleted_ids),
+            'deleted_ids': deleted_ids,
+            'files_queued': queued,
+            'message': f'Deleted {len(deleted_ids)} exercises'
         }
-
-        if deletion_errors:
-            response['deletion_errors'] = deletion_errors
-            response['warning'] = f"{len(deletion_errors)} file deletion errors occurred"
+        if not_found:
+            response['not_found'] = not_found
 
         return jsonify(response)
 
     except Exception as e:
-        print(f"ERROR: Failed to delete exercise: {e}")
-        return jsonify({'error': f'Failed to delete exercise: {str(e)}'}), 500
+        print(f"ERROR: Failed to delete exercises: {e}")
+        if 'conn' in locals() and conn:
+            conn.rollback()
+        return jsonify({'error': f'Failed to delete exercises: {str(e)}'}), 500
+
+
+@app.route('/api/workouts/compile', methods=['POST'])
+@track_job('compile')
+def compile_workout_video():
+    """
+    Join exercise clips into one workout video
+
+    Request body:
+    {
+        "exercise_ids": [3, 7, 3],
+        "repeats": [2, 1, 1],        // optional: one value, or one per exercise (default 1)
+        "rest_seconds": 15,          // optional: rest after each repeat (default 0)
+        "encoderProfile": "standard" // optional: used only for clips that must be re-encoded
+    }
+
+    Clips are stream-copied when their codec parameters match; the result is
+    stored once per distinct input and returned from storage afterwards.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        plan = parse_plan(data)
+        profile = data.get('encoderProfile')
+        get_profile(profile)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    try:
+        from psycopg2.extras import RealDictCursor
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(
+            "SELECT id, video_file_path FROM exercises WHERE id = ANY(%s)",
+            (list({item['exercise_id'] for item in plan}),)
+        )
+        paths = {row['id']: row['video_file_path'] for row in cursor.fetchall()}
+        cursor.close()
+    except Exception as e:
+        return jsonify({'error': f'Failed to load exercises: {str(e)}'}), 500
+    finally:
+        conn.close()
+
+    missing = sorted({item['exercise_id'] for item in plan} - paths.keys())
+    if missing:
+        return jsonify({'error': 'Exercises not found', 'not_found': missing}), 404
+
+    items = [
+        {'key': storage.get_key_from_url(paths[item['exercise_id']]), 'repeat': item['repeat'], 'rest': item['rest']}
+        for item in plan
+    ]
+
+    try:
+        with media_slot(ffmpeg=True):
+            result = compile_workout(storage, items, profile=profile)
+    except MediaPoolBusy as e:
+        return media_error_response(e)
+    except FileNotFoundError as e:
+        return jsonify({'error': f'Exercise video missing from storage: {str(e)}'}), 404
+    except VideoProcessingError as e:
+        return jsonify({'error': f'Compilation failed: {str(e)}'}), 500
+
+    return jsonify({'success': True, 'video_url': result.pop('url'), **result})
 
 
 @app.route('/health')
@@ -1352,11 +2460,19 @@ def health():
     return jsonify({'status': 'ok'})
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics (aggregated across gunicorn workers in multiprocess mode)"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
 # Catch-all route for React client-side routing (MUST be after all API routes)
 @app.route('/<path:path>')
 def catch_all(path):
     # Don't catch API routes or known endpoints
-    if path.startswith(('api/', 'process', 'download/', 'get-tags', 'share-receiver', 'health', 'reprocess')):
+    if path.startswith(('api/', 'process', 'download/', 'storage/', 'get-tags', 'share-receiver', 'health',
+                        'reprocess', 'metrics')):
         return jsonify({'error': 'Not found'}), 404
     # Check if file exists in React build
     file_path = os.path.join(REACT_BUILD_DIR, path)
@@ -1373,4 +2489,5 @@ if __name__ == '__main__':
     print("Server starting on http://localhost:5000")
     print("Open your browser and navigate to http://localhost:5000")
     print("=" * 60)
+    start_warmup()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Session Garbage Collector
+Reclaims disk space from abandoned editor sessions and storage space from
+orphaned segment objects
+
+Every /process or /share-receiver upload creates output/<name>_<timestamp>/
+holding the full original video, which is only removed when the timeline is
+saved. Each session folder carries a small state file (.session.json) with
+its state (detected / saving / saved) and last access time; the collector:
+
+  - deletes session files not accessed for GC_MAX_AGE_HOURS
+  - evicts least recently used sessions while their total size exceeds
+    GC_DISK_BUDGET_MB
+  - deletes stale files left in uploads/ by failed detections
+  - deletes R2/S3 segment and thumbnail objects no longer referenced by
+    exercises.video_file_path / thumbnail_url or by a save in progress
+    (batched delete_objects)
+
+The content-addressed library/ and workouts/ folders are never treated as
+sessions (compiled workouts are a cache and are kept). With
+local storage, segments/ and thumbnails/ inside older session folders are
+part of the exercise library and are never evicted.
+
+Usage:
+    python session_gc.py [--dry-run] [--max-age-hours 24] [--budget-mb 5120]
+                         [--skip-files] [--skip-objects]
+
+Set GC_INTERVAL_MINUTES to also run it periodically inside the server.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from storage import CONTENT_FOLDER, INCOMING_FOLDER, WORKOUT_FOLDER
+from timeline_saves import lock_library, TIMELINE_SAVING
+
+try:
+    from config import Config
+    OUTPUT_FOLDER = Config.OUTPUT_FOLDER
+    UPLOAD_FOLDER = Config.UPLOAD_FOLDER
+    GC_MAX_AGE_HOURS = Config.GC_MAX_AGE_HOURS
+    GC_DISK_BUDGET_MB = Config.GC_DISK_BUDGET_MB
+    GC_UPLOAD_MAX_AGE_HOURS = Config.GC_UPLOAD_MAX_AGE_HOURS
+    GC_OBJECT_GRACE_HOURS = Config.GC_OBJECT_GRACE_HOURS
+except ImportError:
+    OUTPUT_FOLDER = os.getenv('OUTPUT_FOLDER', 'output')
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
+    GC_MAX_AGE_HOURS = float(os.getenv('GC_MAX_AGE_HOURS', 24))
+    GC_DISK_BUDGET_MB = float(os.getenv('GC_DISK_BUDGET_MB', 0))
+    GC_UPLOAD_MAX_AGE_HOURS = float(os.getenv('GC_UPLOAD_MAX_AGE_HOURS', 2))
+    GC_OBJECT_GRACE_HOURS = float(os.getenv('GC_OBJECT_GRACE_HOURS', 24))
+
+SESSION_FILE = '.session.json'
+
+STATE_DETECTED = 'detected'
+STATE_SAVING = 'saving'
+STATE_SAVED = 'saved'
+STATE_UNKNOWN = 'unknown'  # Folders created before session tracking
+
+# Sessions used this recently are never evicted, even over budget
+ACTIVE_SESSION_SECONDS = 30 * 60
+# A save still marked 'saving' after this long crashed or was abandoned
+SAVING_TIMEOUT_SECONDS = 6 * 3600
+# Don't rewrite the state file on every request
+TOUCH_INTERVAL_SECONDS = 60
+
+# Subfolders holding the exercise library when storage is local
+LIBRARY_SUBFOLDERS = ('segments', 'thumbnails')
+
+
+# ---------------------------------------------------------------------------
+# Session state
+# ---------------------------------------------------------------------------
+
+def read_session(session_dir: str) -> Dict:
+    """
+    Read a session folder's state
+
+    Folders without a state file (created before tracking, or by hand) fall
+    back to the folder's modification time and state 'unknown'.
+
+    Returns:
+        Dictionary with 'state', 'created' and 'last_access' (epoch seconds)
+    """
+    try:
+        with open(os.path.join(session_dir, SESSION_FILE), encoding='utf-8') as f:
+            session = json.load(f)
+        session.setdefault('state', STATE_UNKNOWN)
+        session.setdefault('last_access', session.get('created', 0))
+        return session
+    except (OSError, ValueError):
+        mtime = os.path.getmtime(session_dir)
+        return {'state': STATE_UNKNOWN, 'created': mtime, 'last_access': mtime}
+
+
+def touch_session(session_dir: str, state: Optional[str] = None) -> None:
+    """
+    Record an access to a session folder, optionally changing its state
+
+    Safe to call on every request: the state file is only rewritten when the
+    state changes or the last write is older than TOUCH_INTERVAL_SECONDS.
+
+    Args:
+        session_dir: output/<session> folder
+        state: New state (STATE_DETECTED, STATE_SAVING or STATE_SAVED)
+    """
+    if not os.path.isdir(session_dir):
+        return
+
+    path = os.path.join(session_dir, SESSION_FILE)
+    now = time.time()
+    session = read_session(session_dir) if os.path.exists(path) else {'created': now}
+
+    if (state is None or state == session.get('state')) and \
+            now - session.get('last_access', 0) < TOUCH_INTERVAL_SECONDS:
+        return
+
+    if state is not None:
+        session['state'] = state
+    session.setdefault('state', STATE_DETECTED)
+    session['last_access'] = now
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[GC] Warning: Could not update session state for {session_dir}: {e}")
+
+
+def is_empty_session(session_dir: str) -> bool:
+    """True if a session folder holds nothing but its state file"""
+    return os.path.isdir(session_dir) and not [
+        name for name in os.listdir(session_dir) if name != SESSION_FILE
+    ]
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _evictable_paths(session_dir: str, keep_library: bool) -> List[str]:
+    """Files and folders in a session that eviction may delete"""
+    paths = []
+    for name in os.listdir(session_dir):
+        if name == SESSION_FILE:
+            continue
+        if keep_library and name in LIBRARY_SUBFOLDERS:
+            continue
+        paths.append(os.path.join(session_dir, name))
+    return paths
+
+
+def scan_sessions(output_folder: str = OUTPUT_FOLDER, keep_library: bool = True) -> List[Dict]:
+    """
+    List session folders with their state, last access and evictable size
+
+    Args:
+        output_folder: Folder holding session folders
+        keep_library: Exclude segments/ and thumbnails/ (local storage backend)
+
+    Returns:
+        List of session dictionaries, least recently used first
+    """
+    sessions = []
+    if not os.path.isdir(output_folder):
+        return sessions
+
+    for name in os.listdir(output_folder):
+        session_dir = os.path.join(output_folder, name)
+        if not os.path.isdir(session_dir) or name in (CONTENT_FOLDER, INCOMING_FOLDER, WORKOUT_FOLDER):
+            continue
+        session = read_session(session_dir)
+        paths = _evictable_paths(session_dir, keep_library)
+        session.update({
+            'name': name,
+            'path': session_dir,
+            'evictable': paths,
+            'bytes': sum(_tree_size(p) if os.path.isdir(p) else os.path.getsize(p) for p in paths)
+        })
+        sessions.append(session)
+
+    sessions.sort(key=lambda s: s['last_access'])
+    return sessions
+
+
+def _evict_session(session: Dict, dry_run: bool) -> None:
+    for path in session['evictable']:
+        if dry_run:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    if not dry_run and is_empty_session(session['path']):
+        shutil.rmtree(session['path'], ignore_errors=True)
+
+
+def collect_sessions(output_folder: str = OUTPUT_FOLDER, max_age_hours: float = GC_MAX_AGE_HOURS,
+                     budget_mb: float = GC_DISK_BUDGET_MB, keep_library: bool = True,
+                     dry_run: bool = False) -> Dict:
+    """
+    Evict abandoned session files by age, then by LRU until under the disk budget
+
+    Args:
+        output_folder: Folder holding session folders
+        max_age_hours: Evict sessions idle for longer than this
+        budget_mb: Total evictable size to stay under (0 = no budget)
+        keep_library: Never delete segments/ and thumbnails/ (local storage backend)
+        dry_run: Report what would be deleted without deleting
+
+    Returns:
+        Dictionary with scanned/evicted counts, bytes freed and evicted session names
+    """
+    now = time.time()
+    sessions = scan_sessions(output_folder, keep_library)
+    total_bytes = sum(s['bytes'] for s in sessions)
+
+    def evictable(session):
+        idle = now - session['last_access']
+        if session['state'] == STATE_SAVING and idle < SAVING_TIMEOUT_SECONDS:
+            return False
+        return idle >= ACTIVE_SESSION_SECONDS and (session['bytes'] > 0 or is_empty_session(session['path']))
+
+    evicted = []
+
+    # Age: everything idle for longer than max_age_hours, and saved sessions with nothing left
+    for session in sessions:
+        idle = now - session['last_access']
+        expired = idle >= max_age_hours * 3600 or (session['state'] == STATE_SAVED and not keep_library)
+        if expired and evictable(session):
+            evicted.append(session)
+
+    # Budget: least recently used first
+    remaining = total_bytes - sum(s['bytes'] for s in evicted)
+    if budget_mb and remaining > budget_mb * 1024 * 1024:
+        for session in sessions:
+            if remaining <= budget_mb * 1024 * 1024:
+                break
+            if session in evicted or not evictable(session):
+                continue
+            evicted.append(session)
+            remaining -= session['bytes']
+
+    for session in evicted:
+        idle_hours = (now - session['last_access']) / 3600
+        print(f"[GC] {'Would evict' if dry_run else 'Evicting'} session {session['name']} "
+              f"({session['state']}, idle {idle_hours:.1f}h, {session['bytes'] / (1024 * 1024):.1f} MB)")
+        _evict_session(session, dry_run)
+
+    return {
+        'sessions_scanned': len(sessions),
+        'sessions_evicted': len(evicted),
+        'session_bytes_freed': sum(s['bytes'] for s in evicted),
+        'session_bytes_remaining': total_bytes - sum(s['bytes'] for s in evicted),
+        'evicted': [s['name'] for s in evicted]
+    }
+
+
+def collect_uploads(upload_folder: str = UPLOAD_FOLDER, max_age_hours: float = GC_UPLOAD_MAX_AGE_HOURS,
+                    dry_run: bool = False) -> Dict:
+    """
+    Delete files left in the upload folder by failed or interrupted detections
+
+    Successful uploads are moved into a session folder right after detection,
+    so anything older than max_age_hours is orphaned.
+
+    Returns:
+        Dictionary with deleted file count and bytes freed
+    """
+    deleted = 0
+    freed = 0
+    cutoff = time.time() - max_age_hours * 3600
+    if not os.path.isdir(upload_folder):
+        return {'uploads_deleted': 0, 'upload_bytes_freed': 0}
+
+    for name in os.listdir(upload_folder):
+        path = os.path.join(upload_folder, name)
+        if not os.path.isfile(path) or os.path.getmtime(path) >= cutoff:
+            continue
+        size = os.path.getsize(path)
+        print(f"[GC] {'Would delete' if dry_run else 'Deleting'} stale upload {name} ({size / (1024 * 1024):.1f} MB)")
+        if not dry_run:
+            os.remove(path)
+        deleted += 1
+        freed += size
+
+    return {'uploads_deleted': deleted, 'upload_bytes_freed': freed}
+
+
+# ---------------------------------------------------------------------------
+# Storage reconciliation (S3 / R2)
+# ---------------------------------------------------------------------------
+
+def referenced_keys(conn, storage) -> set:
+    """
+    Storage keys referenced by exercises (video and thumbnail URLs) and by
+    saves in progress (uploaded URLs and library objects of the content
+    keys they claimed), so a retried save still finds what it checkpointed
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT video_file_path, thumbnail_url FROM exercises")
+    rows = cursor.fetchall()
+    cursor.execute("SELECT segment_states FROM timelines WHERE status = %s", (TIMELINE_SAVING,))
+    saving = [states or {} for (states,) in cursor.fetchall()]
+    cursor.close()
+
+    keys = set()
+    for states in saving:
+        for state in states.values():
+            rows.append((state.get('video_url'), state.get('thumbnail_url')))
+            if state.get('content_key'):
+                keys.add(f"{CONTENT_FOLDER}/{state['content_key']}.mp4")
+                keys.add(f"{CONTENT_FOLDER}/{state['content_key']}.jpg")
+    for row in rows:
+        for url in row:
+            if not url:
+                continue
+            keys.add(storage.get_key_from_url(url))
+            # Also keep the URL's path, so a changed public URL/custom domain
+            # can only cause objects to be kept, never deleted
+            keys.add(urlparse(url).path.lstrip('/'))
+    return keys
+
+
+def _is_app_object(key: str) -> bool:
+    """
+    Only consider keys in the layouts the app writes:
+    library/<content key>.mp4|jpg, incoming/<upload>/<file> (direct uploads,
+    never referenced once processed) and (older) <session>/segments|thumbnails/<file>
+    """
+    parts = key.split('/')
+    if len(parts) == 2:
+        return parts[0] == CONTENT_FOLDER
+    return len(parts) == 3 and (parts[0] == INCOMING_FOLDER or parts[1] in LIBRARY_SUBFOLDERS)
+
+
+def list_objects(storage) -> Iterable[Dict]:
+    """Yield every object in the storage bucket (Key, Size, LastModified)"""
+    paginator = storage.s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=storage.bucket_name):
+        yield from page.get('Contents', [])
+
+
+def reconcile_objects(storage, conn, grace_hours: float = GC_OBJECT_GRACE_HOURS, dry_run: bool = False) -> Dict:
+    """
+    Delete segment/thumbnail objects that no exercise references
+
+    Objects newer than grace_hours are kept. Library objects are shared and
+    a save can reuse an old one, so references are read again under
+    lock_library() right before deleting: objects claimed by a save in
+    progress are kept, and a save that claims one afterwards finds it
+    missing and uploads it again.
+
+    Args:
+        storage: S3Storage or R2Storage instance
+        conn: Database connection
+        grace_hours: Minimum object age before it can be deleted
+        dry_run: Report what would be deleted without deleting
+
+    Returns:
+        Dictionary with scanned/orphaned/deleted counts, bytes and errors
+    """
+    if not hasattr(storage, 's3_client'):
+        return {'objects_skipped': f"{storage.backend_name} storage has no bucket to reconcile"}
+
+    referenced = referenced_keys(conn, storage)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+
+    scanned = 0
+    orphans = []
+    orphan_bytes = 0
+    for obj in list_objects(storage):
+        scanned += 1
+        key = obj['Key']
+        if not _is_app_object(key) or key in referenced or obj['LastModified'] > cutoff:
+            continue
+        orphans.append(key)
+        orphan_bytes += obj.get('Size', 0)
+
+    print(f"[GC] {len(orphans)} unreferenced objects ({orphan_bytes / (1024 * 1024):.1f} MB) "
+          f"of {scanned} in {storage.bucket_name}")
+
+    result = {
+        'objects_scanned': scanned,
+        'objects_orphaned': len(orphans),
+        'object_bytes_orphaned': orphan_bytes,
+        'objects_deleted': 0,
+        'object_errors': []
+    }
+    if orphans and not dry_run:
+        try:
+            lock_library(conn)
+            referenced = referenced_keys(conn, storage)
+            claimed = [key for key in orphans if key in referenced]
+            if claimed:
+                print(f"[GC] Keeping {len(claimed)} objects referenced since the scan")
+            deletion = storage.delete_many([key for key in orphans if key not in referenced])
+        finally:
+            conn.commit()
+        result['objects_deleted'] = len(deletion['deleted'])
+        result['object_errors'] = deletion['failed']
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def run_gc(storage=None, connect: Optional[Callable] = None, dry_run: bool = False,
+           files: bool = True, objects: bool = True, max_age_hours: float = GC_MAX_AGE_HOURS,
+           budget_mb: float = GC_DISK_BUDGET_MB, output_folder: str = OUTPUT_FOLDER,
+           upload_folder: str = UPLOAD_FOLDER) -> Dict:
+    """
+    Run one garbage collection pass
+
+    Args:
+        storage: Storage backend (required for object reconciliation)
+        connect: Callable returning a database connection (required for objects)
+        dry_run: Report without deleting anything
+        files: Collect session folders and stale uploads
+        objects: Reconcile bucket objects against the exercises table
+        max_age_hours: Session idle limit
+        budget_mb: Session disk budget (0 = none)
+        output_folder: Session folder root
+        upload_folder: Upload folder
+
+    Returns:
+        Combined result dictionary
+    """
+    start = time.perf_counter()
+    result = {'dry_run': dry_run}
+    keep_library = storage is None or storage.backend_name == 'local'
+
+    if files:
+        result.update(collect_sessions(output_folder, max_age_hours, budget_mb, keep_library, dry_run))
+        result.update(collect_uploads(upload_folder, dry_run=dry_run))
+
+    if objects and storage is not None and connect is not None:
+        conn = connect()
+        if conn is None:
+            result['objects_skipped'] = 'database connection failed'
+        else:
+            try:
+                result.update(reconcile_objects(storage, conn, dry_run=dry_run))
+            finally:
+                conn.close()
+
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _run_locked(lock_path: str, **kwargs) -> Optional[Dict]:
+    """Run a pass unless another process (e.g. another gunicorn worker) holds the lock"""
+    with open(lock_path, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        try:
+            return run_gc(**kwargs)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def start_scheduler(interval_minutes: float, storage=None, connect: Optional[Callable] = None,
+                    output_folder: str = OUTPUT_FOLDER, **kwargs) -> threading.Thread:
+    """
+    Run garbage collection every interval_minutes in a daemon thread
+
+    Every gunicorn worker starts a scheduler; a lock file in the output folder
+    ensures only one of them collects at a time.
+
+    Returns:
+        The scheduler thread
+    """
+    lock_path = os.path.join(output_folder, '.gc.lock')
+
+    def loop():
+        while True:
+            time.sleep(interval_minutes * 60)
+            try:
+                result = _run_locked(lock_path, storage=storage, connect=connect,
+                                     output_folder=output_folder, **kwargs)
+                if result:
+                    freed = result.get('session_bytes_freed', 0) + result.get('upload_bytes_freed', 0)
+                    print(f"[GC] Evicted {result.get('sessions_evicted', 0)} sessions, "
+                          f"{result.get('uploads_deleted', 0)} uploads ({freed / (1024 * 1024):.1f} MB), "
+                          f"deleted {result.get('objects_deleted', 0)} objects")
+            except Exception as e:
+                print(f"[GC] Garbage collection failed: {e}")
+
+    thread = threading.Thread(target=loop, name='session-gc', daemon=True)
+    thread.start()
+    print(f"[GC] Scheduler started (every {interval_minutes:g} min)")
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete abandoned session files and orphaned storage objects')
+    parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting')
+    parser.add_argument('--max-age-hours', type=float, default=GC_MAX_AGE_HOURS, help='Session idle limit')
+    parser.add_argument('--budget-mb', type=float, default=GC_DISK_BUDGET_MB, help='Session disk budget (0 = none)')
+    parser.add_argument('--skip-files', action='store_true', help="Don't collect session folders and uploads")
+    parser.add_argument('--skip-objects', action='store_true', help="Don't reconcile bucket objects")
+    parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+    args = parser.parse_args()
+
+    import psycopg2
+    from config import Config
+    from storage import create_storage
+
+    storage = create_storage(Config.get_storage_config())
+
+    result = run_gc(
+        storage=storage,
+        connect=lambda: psycopg2.connect(**Config.DB_CONFIG),
+        dry_run=args.dry_run,
+        files=not args.skip_files,
+        objects=not args.skip_objects and storage.backend_name != 'local',
+        max_age_hours=args.max_age_hours,
+        budget_mb=args.budget_mb
+    )
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            if key != 'evicted':
+                print(f"  {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,21 +3,109 @@ Video Storage Abstraction Layer
 Supports Local, AWS S3, and Cloudflare R2 storage backends
 """
 
+import fcntl
+import hashlib
+import io
 import os
 import shutil
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Optional, BinaryIO
-import boto3
+from typing import Dict, List, Optional, BinaryIO
+from urllib.parse import urlparse
 from botocore.exceptions import ClientError
+from itsdangerous import BadSignature, URLSafeSerializer
 from werkzeug.utils import secure_filename
 
+from metrics import timed, STORAGE_UPLOAD_SECONDS, STORAGE_CACHE_REQUESTS, STORAGE_DOWNLOAD_SECONDS
+from tracing import span
+
+# S3 DeleteObjects accepts at most 1000 keys per call
+S3_DELETE_BATCH_SIZE = 1000
+
+# Folder for content-addressed segments and thumbnails (keys never change content)
+CONTENT_FOLDER = 'library'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Compiled workout videos, keyed by a hash of their clips, repeats and rests
+WORKOUT_FOLDER = 'workouts'
+
+# Range size for chunked downloads from S3/R2
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Direct uploads: clients PUT parts straight to the bucket under incoming/<upload>/<file>
+INCOMING_FOLDER = 'incoming'
+UPLOAD_PART_SIZE = 8 * 1024 * 1024  # S3 requires at least 5 MB for every part but the last
+S3_MAX_PARTS = 10000
+UPLOAD_URL_EXPIRES_SECONDS = 3600
+
+
+def upload_part_sizes(size: int):
+    """(part size, part count) for a multipart upload of size bytes"""
+    part_size = max(UPLOAD_PART_SIZE, -(-size // S3_MAX_PARTS))
+    return part_size, max(1, -(-size // part_size))
+
+
+class StorageReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a stored file
+
+    Reads are served with ranged reads (read_range), so a large object can be
+    streamed or partially read without downloading it first. Wrap it in
+    io.BufferedReader (see open_reader) to read in chunk_size ranges.
+    """
+
+    def __init__(self, storage: 'VideoStorage', path: str):
+        self.storage = storage
+        self.path = path
+        self.size = storage.get_size(path)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self.size - self._position)
+        if length <= 0:
+            return 0
+        data = self.storage.read_range(self.path, self._position, length)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def open_reader(storage: 'VideoStorage', path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> io.BufferedReader:
+    """Buffered StorageReader that fetches chunk_size bytes per ranged read"""
+    return io.BufferedReader(StorageReader(storage, path), buffer_size=chunk_size)
+
 
 class VideoStorage(ABC):
     """Abstract base class for video storage"""
 
+    # Backend label used in metrics
+    backend_name = 'base'
+
     @abstractmethod
-    def save(self, file_data: BinaryIO, filename: str, folder: str = "") -> str:
+    def save(self, file_data: BinaryIO, filename: str, folder: str = "",
+             cache_control: Optional[str] = None) -> str:
         """
         Save a file to storage
 
@@ -25,6 +113,7 @@ class VideoStorage(ABC):
             file_data: File object or binary data
             filename: Name of the file
             folder: Optional folder/prefix for organization
+            cache_control: Optional Cache-Control header for the stored object
 
         Returns:
             Storage path or URL
@@ -83,22 +172,143 @@ class VideoStorage(ABC):
         """
         pass
 
+    def delete_many(self, paths: List[str]) -> Dict[str, List[str]]:
+        """
+        Delete several files
+
+        Backends with a bulk delete API override this; the default deletes
+        one file at a time.
+
+        Args:
+            paths: Storage paths
+
+        Returns:
+            Dictionary with 'deleted' and 'failed' path lists
+        """
+        result = {'deleted': [], 'failed': []}
+        for path in paths:
+            # A file that is already gone counts as deleted
+            deleted = self.delete(path) or not self.exists(path)
+            result['deleted' if deleted else 'failed'].append(path)
+        return result
+
+    def get_size(self, path: str) -> int:
+        """
+        Size of a stored file in bytes
+
+        The default works for backends with local paths; remote backends override it.
+        """
+        local_path = self.get_local_path(path)
+        if local_path is None:
+            raise FileNotFoundError(path)
+        return os.path.getsize(local_path)
+
+    def read_range(self, path: str, start: int, length: int) -> bytes:
+        """
+        Read part of a stored file
+
+        Args:
+            path: Storage path
+            start: Byte offset
+            length: Maximum number of bytes to read
+
+        Returns:
+            The bytes read (shorter than length at the end of the file)
+        """
+        local_path = self.get_local_path(path)
+        if local_path is None:
+            raise FileNotFoundError(path)
+        with open(local_path, 'rb') as f:
+            f.seek(start)
+            return f.read(length)
+
+    def download(self, path: str, local_path: str) -> None:
+        """
+        Copy a stored file to a local path
+
+        Args:
+            path: Storage path
+            local_path: Destination file
+        """
+        source = self.get_local_path(path)
+        if source is None:
+            raise FileNotFoundError(path)
+        shutil.copyfile(source, local_path)
+
+    def create_upload(self, path: str, size: int, content_type: Optional[str] = None,
+                      expires_in: int = UPLOAD_URL_EXPIRES_SECONDS) -> Dict:
+        """
+        Start a direct multipart upload that the client sends without going through the app
+
+        Args:
+            path: Storage key the file will be stored under
+            size: File size in bytes
+            content_type: Optional Content-Type of the stored object
+            expires_in: Lifetime of the part URLs in seconds
+
+        Returns:
+            Dictionary with 'upload_id', 'part_size' and 'parts'
+            ({'part_number', 'url'}; the client PUTs each part to its URL)
+        """
+        raise NotImplementedError(f"{self.backend_name} storage does not support direct uploads")
+
+    def complete_upload(self, path: str, upload_id: str) -> int:
+        """
+        Assemble the uploaded parts into the stored file
+
+        Returns:
+            Size of the stored file in bytes
+
+        Raises:
+            ValueError: If no parts were uploaded
+        """
+        raise NotImplementedError(f"{self.backend_name} storage does not support direct uploads")
+
+    def abort_upload(self, path: str, upload_id: str) -> None:
+        """Discard an unfinished direct upload and its parts"""
+        raise NotImplementedError(f"{self.backend_name} storage does not support direct uploads")
+
+    def verify(self) -> None:
+        """Check that the backend is reachable (run in the background after startup)"""
+
+    def get_key_from_url(self, url: str) -> str:
+        """
+        Extract storage key from a URL returned by get_url()
+
+        Args:
+            url: Public URL (e.g., https://pub-xxxxx.r2.dev/folder/segments/file.mp4)
+
+        Returns:
+            Storage key (e.g., folder/segments/file.mp4)
+        """
+        prefix = self.get_url('')
+        if url.startswith(prefix):
+            return url[len(prefix):]
+        # Fallback for URLs from an older public URL or custom domain: the
+        # key is the URL path
+        return urlparse(url).path.lstrip('/')
+
 
 class LocalStorage(VideoStorage):
     """Local filesystem storage implementation"""
 
-    def __init__(self, base_path: str = "output"):
+    backend_name = 'local'
+
+    def __init__(self, base_path: str = "output", signing_key: Optional[str] = None):
         """
         Initialize local storage
 
         Args:
             base_path: Base directory for storage
+            signing_key: Secret for signing direct upload URLs (random per process if not set)
         """
         self.base_path = Path(base_path)
         self.base_path.mkdir(parents=True, exist_ok=True)
+        self._signer = URLSafeSerializer(signing_key or os.urandom(32).hex(), salt='local-upload')
 
-    def save(self, file_data: BinaryIO, filename: str, folder: str = "") -> str:
-        """Save file to local filesystem"""
+    def save(self, file_data: BinaryIO, filename: str, folder: str = "",
+             cache_control: Optional[str] = None) -> str:
+        """Save file to local filesystem (cache_control is applied when serving)"""
         # Secure the filename
         safe_filename = secure_filename(filename)
 
@@ -110,13 +320,15 @@ class LocalStorage(VideoStorage):
         file_path = folder_path / safe_filename
 
         # Save the file
-        if isinstance(file_data, (str, Path)):
-            # If it's a path, move/copy the file
-            shutil.copy2(str(file_data), str(file_path))
-        else:
-            # If it's a file object, write it
-            with open(file_path, 'wb') as f:
-                shutil.copyfileobj(file_data, f)
+        with timed(STORAGE_UPLOAD_SECONDS, backend=self.backend_name), \
+                span('storage.save', backend=self.backend_name, key=str(file_path.relative_to(self.base_path))):
+            if isinstance(file_data, (str, Path)):
+                # If it's a path, move/copy the file
+                shutil.copy2(str(file_data), str(file_path))
+            else:
+                # If it's a file object, write it
+                with open(file_path, 'wb') as f:
+                    shutil.copyfileobj(file_data, f)
 
         # Return relative path
         return str(file_path.relative_to(self.base_path))
@@ -147,10 +359,86 @@ class LocalStorage(VideoStorage):
         file_path = self.base_path / path
         return str(file_path) if file_path.exists() else None
 
+    # Direct uploads: a stand-in for presigned S3 part URLs, so the flow works
+    # offline. Part URLs point at the app (PUT /storage/upload/<token>), and
+    # parts are staged under incoming/.parts/<upload id>/.
+
+    def _parts_dir(self, upload_id: str) -> Path:
+        return self.base_path / INCOMING_FOLDER / '.parts' / secure_filename(upload_id)
+
+    def create_upload(self, path: str, size: int, content_type: Optional[str] = None,
+                      expires_in: int = UPLOAD_URL_EXPIRES_SECONDS) -> Dict:
+        """Start a direct upload with signed URLs served by the app"""
+        upload_id = uuid.uuid4().hex
+        self._parts_dir(upload_id).mkdir(parents=True)
+        part_size, part_count = upload_part_sizes(size)
+        expires = int(time.time()) + expires_in
+        parts = [
+            {
+                'part_number': n,
+                'url': f"/storage/upload/{self._signer.dumps({'upload_id': upload_id, 'part': n, 'expires': expires})}"
+            }
+            for n in range(1, part_count + 1)
+        ]
+        return {'upload_id': upload_id, 'part_size': part_size, 'parts': parts}
+
+    def receive_part(self, token: str, stream: BinaryIO) -> str:
+        """
+        Store one part sent to a signed URL from create_upload()
+
+        Returns:
+            The part's ETag (MD5 hex digest, as S3 returns)
+
+        Raises:
+            ValueError: If the token is invalid or expired, or the upload is gone
+        """
+        try:
+            claims = self._signer.loads(token)
+        except BadSignature as e:
+            raise ValueError("Invalid upload URL") from e
+        if time.time() > claims['expires']:
+            raise ValueError("Upload URL has expired")
+
+        parts_dir = self._parts_dir(claims['upload_id'])
+        if not parts_dir.is_dir():
+            raise ValueError("Upload not found (completed or aborted)")
+
+        md5 = hashlib.md5()
+        part_path = parts_dir / f"{claims['part']:05d}"
+        temp_path = parts_dir / f"{claims['part']:05d}.tmp"
+        with open(temp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                md5.update(chunk)
+                f.write(chunk)
+        os.replace(temp_path, part_path)
+        return md5.hexdigest()
+
+    def complete_upload(self, path: str, upload_id: str) -> int:
+        """Concatenate the staged parts into the stored file"""
+        parts_dir = self._parts_dir(upload_id)
+        parts = sorted(p for p in parts_dir.glob('*') if p.suffix != '.tmp') if parts_dir.is_dir() else []
+        if not parts:
+            raise ValueError("No parts were uploaded")
+
+        file_path = self.base_path / path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, 'wb') as f:
+            for part in parts:
+                with open(part, 'rb') as part_file:
+                    shutil.copyfileobj(part_file, f, 1024 * 1024)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        return file_path.stat().st_size
+
+    def abort_upload(self, path: str, upload_id: str) -> None:
+        """Delete the staged parts"""
+        shutil.rmtree(self._parts_dir(upload_id), ignore_errors=True)
+
 
 class S3Storage(VideoStorage):
     """AWS S3 storage implementation"""
 
+    backend_name = 's3'
+
     def __init__(self, bucket_name: str, region: str, access_key: str, secret_key: str,
                  endpoint_url: Optional[str] = None):
         """
@@ -166,22 +454,34 @@ class S3Storage(VideoStorage):
         self.bucket_name = bucket_name
         self.region = region
 
-        # Create S3 client
-        self.s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            endpoint_url=endpoint_url
-        )
-
-        # Verify bucket exists
+        # boto3 and the client are created on first use, so startup does not pay for them
+        self._client_args = {
+            'region_name': region,
+            'aws_access_key_id': access_key,
+            'aws_secret_access_key': secret_key,
+            'endpoint_url': endpoint_url
+        }
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def s3_client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+                    self._client = boto3.client('s3', **self._client_args)
+        return self._client
+
+    def verify(self) -> None:
+        """Check that the bucket exists and is accessible (warns only)"""
         try:
-            self.s3_client.head_bucket(Bucket=bucket_name)
+            self.s3_client.head_bucket(Bucket=self.bucket_name)
         except ClientError as e:
-            print(f"Warning: Bucket {bucket_name} may not exist or is not accessible: {e}")
+            print(f"Warning: Bucket {self.bucket_name} may not exist or is not accessible: {e}")
 
-    def save(self, file_data: BinaryIO, filename: str, folder: str = "") -> str:
+    def save(self, file_data: BinaryIO, filename: str, folder: str = "",
+             cache_control: Optional[str] = None) -> str:
         """Upload file to S3"""
         # Secure the filename
         safe_filename = secure_filename(filename)
@@ -191,12 +491,15 @@ class S3Storage(VideoStorage):
 
         try:
             # Upload the file
-            if isinstance(file_data, (str, Path)):
-                # Upload from file path
-                self.s3_client.upload_file(str(file_data), self.bucket_name, s3_key)
-            else:
-                # Upload from file object
-                self.s3_client.upload_fileobj(file_data, self.bucket_name, s3_key)
+            with timed(STORAGE_UPLOAD_SECONDS, backend=self.backend_name), \
+                    span('storage.save', backend=self.backend_name, key=s3_key):
+                extra_args = {'CacheControl': cache_control} if cache_control else None
+                if isinstance(file_data, (str, Path)):
+                    # Upload from file path
+                    self.s3_client.upload_file(str(file_data), self.bucket_name, s3_key, ExtraArgs=extra_args)
+                else:
+                    # Upload from file object
+                    self.s3_client.upload_fileobj(file_data, self.bucket_name, s3_key, ExtraArgs=extra_args)
 
             return s3_key
         except ClientError as e:
@@ -212,6 +515,38 @@ class S3Storage(VideoStorage):
             print(f"Error deleting from S3: {e}")
             return False
 
+    def delete_many(self, paths: List[str], retries: int = 3) -> Dict[str, List[str]]:
+        """
+        Delete objects with DeleteObjects, up to 1000 keys per call
+
+        Keys that fail (per-key errors or a failed call) are retried with
+        exponential backoff.
+        """
+        result = {'deleted': [], 'failed': []}
+        for i in range(0, len(paths), S3_DELETE_BATCH_SIZE):
+            pending = list(paths[i:i + S3_DELETE_BATCH_SIZE])
+            for attempt in range(retries + 1):
+                if attempt:
+                    time.sleep(0.5 * 2 ** (attempt - 1))
+                try:
+                    response = self.s3_client.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={'Objects': [{'Key': key} for key in pending], 'Quiet': True}
+                    )
+                except ClientError as e:
+                    print(f"Error deleting {len(pending)} objects from S3 (attempt {attempt + 1}): {e}")
+                    continue
+
+                failed = {error['Key'] for error in response.get('Errors', [])}
+                result['deleted'].extend(key for key in pending if key not in failed)
+                pending = [key for key in pending if key in failed]
+                if not pending:
+                    break
+                print(f"Error deleting {len(pending)} objects from S3 (attempt {attempt + 1}), retrying")
+
+            result['failed'].extend(pending)
+        return result
+
     def exists(self, path: str) -> bool:
         """Check if file exists in S3"""
         try:
@@ -220,6 +555,114 @@ class S3Storage(VideoStorage):
         except ClientError:
             return False
 
+    def get_size(self, path: str) -> int:
+        """Object size from a HEAD request"""
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket_name, Key=path)['ContentLength']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(path) from e
+            raise
+
+    def read_range(self, path: str, start: int, length: int) -> bytes:
+        """Ranged GET of part of an object"""
+        if length <= 0:
+            return b''
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name, Key=path, Range=f"bytes={start}-{start + length - 1}"
+            )
+        except ClientError as e:
+            # Reading at or past the end of the object
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                return b''
+            raise
+        return response['Body'].read()
+
+    def download(self, path: str, local_path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                 retries: int = 3) -> None:
+        """
+        Download an object with sequential ranged GETs
+
+        Each range is streamed to disk and retried on its own, so a dropped
+        connection costs at most one chunk rather than the whole object.
+        """
+        size = self.get_size(path)
+        with span('storage.download', backend=self.backend_name, key=path, bytes=size), \
+                open(local_path, 'wb') as f:
+            for start in range(0, size, chunk_size):
+                end = min(start + chunk_size, size) - 1
+                for attempt in range(retries + 1):
+                    try:
+                        response = self.s3_client.get_object(
+                            Bucket=self.bucket_name, Key=path, Range=f"bytes={start}-{end}"
+                        )
+                        f.seek(start)
+                        for chunk in response['Body'].iter_chunks(1024 * 1024):
+                            f.write(chunk)
+                        break
+                    except (ClientError, IOError) as e:
+                        if attempt == retries:
+                            raise
+                        print(f"Error downloading {path} bytes {start}-{end} (attempt {attempt + 1}): {e}")
+                        time.sleep(0.5 * 2 ** attempt)
+            f.truncate(size)
+
+    def create_upload(self, path: str, size: int, content_type: Optional[str] = None,
+                      expires_in: int = UPLOAD_URL_EXPIRES_SECONDS) -> Dict:
+        """Create a multipart upload with one presigned UploadPart URL per part"""
+        params = {'Bucket': self.bucket_name, 'Key': path}
+        if content_type:
+            params['ContentType'] = content_type
+        upload_id = self.s3_client.create_multipart_upload(**params)['UploadId']
+
+        part_size, part_count = upload_part_sizes(size)
+        parts = [
+            {
+                'part_number': n,
+                'url': self.s3_client.generate_presigned_url(
+                    'upload_part',
+                    Params={'Bucket': self.bucket_name, 'Key': path, 'UploadId': upload_id, 'PartNumber': n},
+                    ExpiresIn=expires_in
+                )
+            }
+            for n in range(1, part_count + 1)
+        ]
+        return {'upload_id': upload_id, 'part_size': part_size, 'parts': parts}
+
+    def complete_upload(self, path: str, upload_id: str) -> int:
+        """
+        Complete a multipart upload
+
+        The part list comes from ListParts rather than the client, so the
+        bucket does not need to expose the ETag header through CORS.
+        """
+        parts = []
+        paginator = self.s3_client.get_paginator('list_parts')
+        try:
+            for page in paginator.paginate(Bucket=self.bucket_name, Key=path, UploadId=upload_id):
+                parts.extend(page.get('Parts', []))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'NoSuchUpload':
+                raise ValueError("Upload not found (completed or aborted)") from e
+            raise
+        if not parts:
+            raise ValueError("No parts were uploaded")
+
+        with span('storage.complete_upload', backend=self.backend_name, key=path, parts=len(parts)):
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=path, UploadId=upload_id,
+                MultipartUpload={'Parts': [{'PartNumber': p['PartNumber'], 'ETag': p['ETag']} for p in parts]}
+            )
+        return sum(p['Size'] for p in parts)
+
+    def abort_upload(self, path: str, upload_id: str) -> None:
+        """Abort a multipart upload (S3 deletes the uploaded parts)"""
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=path, UploadId=upload_id)
+        except ClientError as e:
+            print(f"Error aborting upload of {path}: {e}")
+
     def get_url(self, path: str) -> str:
         """Get public URL for S3 object"""
         return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{path}"
@@ -232,6 +675,8 @@ class S3Storage(VideoStorage):
 class R2Storage(S3Storage):
     """Cloudflare R2 storage implementation (S3-compatible)"""
 
+    backend_name = 'r2'
+
     def __init__(self, account_id: str, bucket_name: str, access_key: str,
                  secret_key: str, public_url: Optional[str] = None):
         """
@@ -263,20 +708,209 @@ class R2Storage(S3Storage):
         """Get public URL for R2 object"""
         return f"{self.public_url}/{path}"
 
-    def get_key_from_url(self, url: str) -> str:
-        """
-        Extract storage key from public URL
 
+class CachedStorage(VideoStorage):
+    """
+    Read-through local disk cache in front of another storage backend
+
+    Objects fetched through get_local_path() or uploaded through save() are
+    kept in cache_dir, least recently used first out once the cache exceeds
+    max_bytes. Concurrent misses for the same key (threads or gunicorn
+    workers sharing cache_dir) wait on a file lock and share one download.
+    Everything else is delegated to the wrapped backend, including its
+    attributes (bucket_name, s3_client, ...).
+    """
+
+    # Entries used this recently are not evicted (a caller may be about to open them)
+    MIN_AGE_SECONDS = 300
+
+    def __init__(self, backend: VideoStorage, cache_dir: str, max_bytes: int):
+        """
         Args:
-            url: Public URL (e.g., https://pub-xxxxx.r2.dev/folder/file.mp4)
+            backend: Storage backend to cache
+            cache_dir: Cache directory (may be shared by several processes)
+            max_bytes: Cache size limit
+        """
+        self.backend = backend
+        self.backend_name = backend.backend_name
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._size_lock = threading.Lock()
+        self._approx_bytes = self._scan()[1]
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the wrapper
+        return getattr(self.backend, name)
+
+    def _entry_path(self, path: str) -> Path:
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        return self.cache_dir / digest[:2] / f"{digest}{Path(path).suffix}"
+
+    def _scan(self):
+        """(entries as (mtime, size, path), total bytes) for every cached file"""
+        entries = []
+        for entry in self.cache_dir.glob('*/*'):
+            if entry.suffix in ('.lock', '.part'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        return entries, sum(size for _, size, _ in entries)
+
+    def _added(self, size: int) -> None:
+        with self._size_lock:
+            self._approx_bytes += size
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Delete least recently used entries until the cache fits in max_bytes
 
         Returns:
-            Storage key (e.g., folder/file.mp4)
+            Bytes freed
         """
-        if url.startswith(self.public_url):
-            return url[len(self.public_url):].lstrip('/')
-        # Fallback: try to extract path from any URL
-        return url.split('/')[-3:] if '/' in url else url
+        entries, total = self._scan()
+        freed = 0
+        now = time.time()
+        for mtime, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total - freed <= self.max_bytes:
+                break
+            if now - mtime < self.MIN_AGE_SECONDS:
+                continue
+            try:
+                entry.unlink()
+                freed += size
+            except FileNotFoundError:
+                pass
+        with self._size_lock:
+            self._approx_bytes = total - freed
+        return freed
+
+    def _store(self, path: str, source) -> None:
+        """Copy an uploaded file into the cache"""
+        entry = self._entry_path(path)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        part = entry.with_name(f"{entry.name}.{os.getpid()}.{threading.get_ident()}.part")
+        shutil.copyfile(str(source), part)
+        os.replace(part, entry)
+        self._added(entry.stat().st_size)
+
+    def save(self, file_data: BinaryIO, filename: str, folder: str = "",
+             cache_control: Optional[str] = None) -> str:
+        """Upload through the backend; uploads from a file path are also cached"""
+        key = self.backend.save(file_data, filename, folder, cache_control=cache_control)
+        if isinstance(file_data, (str, Path)):
+            try:
+                self._store(key, file_data)
+            except OSError as e:
+                print(f"[Storage Cache] Warning: Could not cache {key}: {e}")
+        return key
+
+    def _drop(self, path: str) -> None:
+        try:
+            self._entry_path(path).unlink()
+        except FileNotFoundError:
+            pass
+
+    def delete(self, path: str) -> bool:
+        self._drop(path)
+        return self.backend.delete(path)
+
+    def delete_many(self, paths: List[str]) -> Dict[str, List[str]]:
+        for path in paths:
+            self._drop(path)
+        return self.backend.delete_many(paths)
+
+    def exists(self, path: str) -> bool:
+        # Deletes go through this wrapper, so a cached copy means the object is still stored
+        return self._entry_path(path).exists() or self.backend.exists(path)
+
+    def get_url(self, path: str) -> str:
+        return self.backend.get_url(path)
+
+    def create_upload(self, path: str, size: int, content_type: Optional[str] = None,
+                      expires_in: int = UPLOAD_URL_EXPIRES_SECONDS) -> Dict:
+        return self.backend.create_upload(path, size, content_type, expires_in)
+
+    def complete_upload(self, path: str, upload_id: str) -> int:
+        return self.backend.complete_upload(path, upload_id)
+
+    def abort_upload(self, path: str, upload_id: str) -> None:
+        self.backend.abort_upload(path, upload_id)
+
+    def verify(self) -> None:
+        self.backend.verify()
+
+    def get_key_from_url(self, url: str) -> str:
+        return self.backend.get_key_from_url(url)
+
+    def get_size(self, path: str) -> int:
+        entry = self._entry_path(path)
+        if entry.exists():
+            return entry.stat().st_size
+        return self.backend.get_size(path)
+
+    def read_range(self, path: str, start: int, length: int) -> bytes:
+        entry = self._entry_path(path)
+        try:
+            with open(entry, 'rb') as f:
+                f.seek(start)
+                return f.read(length)
+        except FileNotFoundError:
+            return self.backend.read_range(path, start, length)
+
+    def download(self, path: str, local_path: str) -> None:
+        shutil.copyfile(self.get_local_path(path), local_path)
+
+    def get_local_path(self, path: str) -> Optional[str]:
+        """
+        Local copy of a stored file, downloading it into the cache on a miss
+
+        Returns:
+            Path of the cached file, or None if the object does not exist
+        """
+        local_path = self.backend.get_local_path(path)
+        if local_path is not None:
+            return local_path
+
+        entry = self._entry_path(path)
+        if entry.exists():
+            STORAGE_CACHE_REQUESTS.labels(result='hit').inc()
+            os.utime(entry)  # Mark as recently used
+            return str(entry)
+
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        with open(entry.with_name(f"{entry.name}.lock"), 'w') as lock_file:
+            # Whoever holds the lock downloads; everyone else waits for it
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if entry.exists():
+                    STORAGE_CACHE_REQUESTS.labels(result='shared').inc()
+                    os.utime(entry)
+                    return str(entry)
+
+                STORAGE_CACHE_REQUESTS.labels(result='miss').inc()
+                part = entry.with_name(f"{entry.name}.{os.getpid()}.part")
+                try:
+                    with timed(STORAGE_DOWNLOAD_SECONDS, backend=self.backend_name):
+                        self.backend.download(path, str(part))
+                except FileNotFoundError:
+                    return None
+                except Exception:
+                    if part.exists():
+                        part.unlink()
+                    raise
+                os.replace(part, entry)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        self._added(entry.stat().st_size)
+        return str(entry)
 
 
 def create_storage(config: dict) -> VideoStorage:
@@ -293,13 +927,30 @@ def create_storage(config: dict) -> VideoStorage:
         {'type': 'local', 'path': 'output'}
         {'type': 's3', 'bucket': 'my-bucket', 'region': 'us-east-1', ...}
         {'type': 'r2', 'account_id': '...', 'bucket': '...', ...}
+
+    S3/R2 backends are wrapped in CachedStorage when 'cache_max_mb' > 0.
     """
     storage_type = config.get('type', 'local')
 
     if storage_type == 'local':
-        return LocalStorage(base_path=config.get('path', 'output'))
+        return LocalStorage(base_path=config.get('path', 'output'), signing_key=config.get('signing_key'))
 
-    elif storage_type == 's3':
+    elif storage_type in ('s3', 'r2'):
+        backend = _create_cloud_storage(config)
+        cache_mb = config.get('cache_max_mb') or 0
+        if cache_mb > 0:
+            print(f"[Storage] Caching {backend.backend_name} objects in {config['cache_dir']} (up to {cache_mb} MB)")
+            return CachedStorage(backend, config['cache_dir'], int(cache_mb * 1024 * 1024))
+        return backend
+
+    else:
+        raise ValueError(f"Unsupported storage type: {storage_type}")
+
+
+def _create_cloud_storage(config: dict) -> VideoStorage:
+    storage_type = config['type']
+
+    if storage_type == 's3':
         return S3Storage(
             bucket_name=config['bucket'],
             region=config['region'],
@@ -316,6 +967,3 @@ def create_storage(config: dict) -> VideoStorage:
             secret_key=config['secret_key'],
             public_url=config.get('public_url')
         )
-
-    else:
-        raise ValueError(f"Unsupported storage type: {storage_type}")
@@ -0,0 +1,144 @@
+"""
+Background Storage Deletion
+Deletes storage objects outside the request that removed their database rows
+
+Exercise deletion commits the database change, then queues the video and
+thumbnail keys here. A daemon thread drains the queue in batches (up to
+1000 keys, one DeleteObjects call on S3/R2) and retries failed keys with
+backoff. Keys still failing after the last attempt, or lost when a worker
+exits, are left for session_gc.py, which deletes unreferenced objects.
+
+A library object can be reused by a save between the request that queued
+it and its deletion. With a database connection, each batch re-reads the
+references under lock_library() and keys referenced again are kept (see
+timeline_saves.py).
+"""
+
+import queue
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from session_gc import referenced_keys
+from storage import VideoStorage, S3_DELETE_BATCH_SIZE
+from timeline_saves import lock_library
+
+# Attempts per key before leaving it to the garbage collector
+MAX_ATTEMPTS = 5
+# Backoff before retrying a failed batch (doubles each attempt)
+RETRY_DELAY_SECONDS = 2.0
+
+
+class DeletionQueue:
+    """Queue of storage keys deleted in batches by a background thread"""
+
+    def __init__(self, storage: VideoStorage, batch_size: int = S3_DELETE_BATCH_SIZE,
+                 connect: Optional[Callable] = None):
+        """
+        Args:
+            storage: Storage backend to delete from
+            batch_size: Maximum keys per delete_many() call
+            connect: Returns a database connection (or None); when given,
+                keys referenced again are kept instead of deleted
+        """
+        self.storage = storage
+        self.batch_size = batch_size
+        self.connect = connect
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'queued': 0, 'deleted': 0, 'failed': 0, 'kept': 0}
+
+    def enqueue(self, keys: Iterable[str]) -> int:
+        """
+        Queue keys for deletion, starting the worker thread if needed
+
+        Returns:
+            Number of keys queued
+        """
+        count = 0
+        for key in keys:
+            if key:
+                self._queue.put((key, 1))
+                count += 1
+        self.stats['queued'] += count
+        if count:
+            self._ensure_worker()
+        return count
+
+    def pending(self) -> int:
+        """Approximate number of keys waiting to be deleted"""
+        return self._queue.qsize()
+
+    def join(self) -> None:
+        """Block until every queued key has been processed (used by scripts and benchmarks)"""
+        self._queue.join()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='storage-deletion', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        # Wait for one key, then take whatever else is already queued
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            attempts = dict(batch)
+            try:
+                result = self._delete(list(attempts))
+            except Exception as e:
+                print(f"[Storage Deletion] Batch of {len(batch)} failed: {e}")
+                result = {'deleted': [], 'failed': list(attempts)}
+
+            self.stats['deleted'] += len(result['deleted'])
+            if result['deleted']:
+                print(f"[Storage Deletion] Deleted {len(result['deleted'])} objects from {self.storage.backend_name}")
+
+            retry = [(key, attempts[key] + 1) for key in result['failed'] if attempts[key] < MAX_ATTEMPTS]
+            gave_up = len(result['failed']) - len(retry)
+            if gave_up:
+                self.stats['failed'] += gave_up
+                print(f"[Storage Deletion] Giving up on {gave_up} objects (left for garbage collection)")
+
+            if retry:
+                delay = RETRY_DELAY_SECONDS * 2 ** (min(attempt for _, attempt in retry) - 2)
+                threading.Timer(delay, self._requeue, args=(retry,)).start()
+
+            # Retried keys stay unfinished until they are back in the queue
+            for _ in range(len(batch) - len(retry)):
+                self._queue.task_done()
+
+    def _delete(self, keys: List[str]) -> Dict[str, List[str]]:
+        """Delete keys no exercise or save in progress references"""
+        if self.connect is None:
+            return self.storage.delete_many(keys)
+        conn = self.connect()
+        if conn is None:
+            raise RuntimeError('database connection failed')
+        try:
+            # Held until the commit, so no save can claim a key between the check and the delete
+            lock_library(conn)
+            referenced = referenced_keys(conn, self.storage)
+            kept = [key for key in keys if key in referenced]
+            result = self.storage.delete_many([key for key in keys if key not in referenced])
+            conn.commit()
+        finally:
+            conn.close()
+        if kept:
+            self.stats['kept'] += len(kept)
+            print(f"[Storage Deletion] Keeping {len(kept)} objects referenced again since they were queued")
+        return result
+
+    def _requeue(self, items) -> None:
+        for item in items:
+            self._queue.put(item)
+            self._queue.task_done()
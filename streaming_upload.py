@@ -0,0 +1,391 @@
+"""
+Streaming Uploads
+Parses a multipart/form-data request body as it arrives and writes the
+video part straight to its destination file
+
+Flask's request.files keeps small parts in memory and spools larger ones
+to a temporary file, which file.save() then copies to the upload folder:
+every byte is written twice and a temporary file the size of the video
+exists for the length of the request. receive_multipart() reads the body
+in UPLOAD_CHUNK_KB chunks, feeds them to Werkzeug's incremental multipart
+parser and writes the file part's data to its final path as it is parsed.
+
+Bytes written but not yet on disk sit in the page cache as dirty pages.
+Two budgets keep them bounded:
+
+    per upload   after UPLOAD_FSYNC_MB unsynced MB the file is fsynced and
+                 its cached pages dropped (0: fsync only when complete)
+    per host     the unsynced bytes of all uploads in all web workers on
+                 the host stay under UPLOAD_INFLIGHT_MB; an upload that
+                 would go over first fsyncs its own data, then waits for
+                 others to sync theirs (UploadBusy after
+                 UPLOAD_BUDGET_WAIT_SECONDS)
+
+The host budget is kept in MEDIA_SLOT_DIR/uploads, one file per web worker
+holding that worker's unsynced bytes, like media_pool's slots.
+
+The file is always fsynced before receive_multipart() returns, so a
+worker killed after a successful upload never leaves a truncated video.
+"""
+
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.sansio.multipart import (
+    Data,
+    Epilogue,
+    Field,
+    File,
+    MultipartDecoder,
+    NeedData,
+)
+from werkzeug.http import parse_options_header
+
+from metrics import UPLOAD_INFLIGHT_BYTES, UPLOAD_WAIT_SECONDS
+
+try:
+    from config import Config
+    UPLOAD_CHUNK_KB = Config.UPLOAD_CHUNK_KB
+    UPLOAD_FSYNC_MB = Config.UPLOAD_FSYNC_MB
+    UPLOAD_INFLIGHT_MB = Config.UPLOAD_INFLIGHT_MB
+    UPLOAD_BUDGET_WAIT_SECONDS = Config.UPLOAD_BUDGET_WAIT_SECONDS
+    MEDIA_SLOT_DIR = Config.MEDIA_SLOT_DIR
+except ImportError:
+    UPLOAD_CHUNK_KB = int(os.getenv('UPLOAD_CHUNK_KB', 256))
+    UPLOAD_FSYNC_MB = float(os.getenv('UPLOAD_FSYNC_MB', 16))
+    UPLOAD_INFLIGHT_MB = float(os.getenv('UPLOAD_INFLIGHT_MB', 64))
+    UPLOAD_BUDGET_WAIT_SECONDS = float(os.getenv('UPLOAD_BUDGET_WAIT_SECONDS', 30))
+    MEDIA_SLOT_DIR = os.getenv('MEDIA_SLOT_DIR', '/tmp/workout_media_slots')
+
+# Largest form field value kept in memory (threshold, detectors, ...)
+MAX_FIELD_BYTES = 64 * 1024
+# How often an upload waiting for room checks other workers' bytes
+BUDGET_POLL_SECONDS = 0.05
+
+
+class UploadError(Exception):
+    """Malformed or unacceptable upload (callers answer 400)"""
+
+
+class UploadTooLarge(UploadError):
+    """Request body larger than allowed (callers answer 413)"""
+
+
+class UploadBusy(UploadError):
+    """No room in the host's in-flight budget in time (callers answer 503 with Retry-After)"""
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class InFlightBudget:
+    """
+    Bytes written to upload files but not yet fsynced, across the web workers on the host
+
+    Each worker keeps its own count in directory, in a file named after its
+    pid (removed when the count drops to 0). Taking bytes locks the folder,
+    adds up the counts of live workers (files of dead ones are removed) and
+    updates the worker's own. Waiting uploads are woken when bytes are
+    released in the same worker and check the other workers every
+    BUDGET_POLL_SECONDS.
+
+    A single chunk larger than the whole budget is still let through when
+    nothing else is in flight, so a small budget slows uploads down but
+    never blocks them for good.
+    """
+
+    def __init__(self, limit_bytes: int, directory: str):
+        self.limit = max(0, int(limit_bytes))
+        self.directory = directory
+        self._used = 0
+        self._condition = threading.Condition()
+
+    @property
+    def used(self) -> int:
+        """Unsynced bytes on the host"""
+        with self._condition, self._locked():
+            return self._others() + self._used
+
+    def reserve(self, size: int, flush: Callable[[], None], wait: float) -> None:
+        """
+        Count size bytes as in flight, blocking until they fit
+
+        Args:
+            size: Bytes about to be written
+            flush: Syncs the caller's own unsynced bytes (releasing them);
+                called once before waiting on other uploads
+            wait: Seconds to wait for other uploads
+
+        Raises:
+            UploadBusy: The bytes did not fit within wait seconds
+        """
+        if not self.limit:
+            return
+        with self._condition:
+            if self._take(size):
+                return
+        flush()
+
+        start = time.perf_counter()
+        deadline = time.monotonic() + wait
+        with self._condition:
+            while not self._take(size):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise UploadBusy(f"Upload buffer full ({self.used // (1024 * 1024)} MB unsynced), try again shortly")
+                self._condition.wait(min(remaining, BUDGET_POLL_SECONDS))
+        UPLOAD_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+    def release(self, size: int) -> None:
+        """Return bytes that are now on disk (or were never written)"""
+        if not self.limit or not size:
+            return
+        with self._condition:
+            with self._locked():
+                self._used -= size
+                self._publish()
+            UPLOAD_INFLIGHT_BYTES.dec(size)
+            self._condition.notify_all()
+
+    def _take(self, size: int) -> bool:
+        """Count size bytes if they fit in the host budget (caller holds the condition)"""
+        with self._locked():
+            used = self._others() + self._used
+            if used + size > self.limit and used != 0:
+                return False
+            self._used += size
+            self._publish()
+        UPLOAD_INFLIGHT_BYTES.inc(size)
+        return True
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the budget folder, against the other workers' threads too"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _others(self) -> int:
+        """Unsynced bytes of the other live workers"""
+        total = 0
+        own = os.getpid()
+        for name in os.listdir(self.directory):
+            if not name.isdigit() or int(name) == own:
+                continue
+            path = os.path.join(self.directory, name)
+            if not _process_alive(int(name)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    total += int(f.read() or 0)
+            except (FileNotFoundError, ValueError):
+                continue
+        return total
+
+    def _publish(self) -> None:
+        """Write this worker's count to its file"""
+        path = os.path.join(self.directory, str(os.getpid()))
+        if not self._used:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return
+        with open(path, 'w') as f:
+            f.write(str(self._used))
+
+
+# Shared by every upload on the host (each worker process holds its own share)
+upload_budget = InFlightBudget(UPLOAD_INFLIGHT_MB * 1024 * 1024, os.path.join(MEDIA_SLOT_DIR, 'uploads'))
+
+
+class _SyncedWriter:
+    """Writes a file through the in-flight budget, fsyncing every sync_bytes"""
+
+    def __init__(self, path: str, budget: InFlightBudget, sync_bytes: int, wait: float):
+        self.path = path
+        self.size = 0
+        self._budget = budget
+        self._sync_bytes = sync_bytes
+        self._wait = wait
+        self._unsynced = 0
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+    def write(self, data) -> None:
+        view = memoryview(data)
+        self._budget.reserve(len(view), self.sync, self._wait)
+        self._unsynced += len(view)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+            self.size += written
+        if self._sync_bytes and self._unsynced >= self._sync_bytes:
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush written data to disk and drop it from the page cache"""
+        if not self._unsynced:
+            return
+        os.fsync(self._fd)
+        if hasattr(os, 'posix_fadvise'):
+            # The file is read again by detection, not now; let the kernel reclaim its pages
+            os.posix_fadvise(self._fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        self._budget.release(self._unsynced)
+        self._unsynced = 0
+
+    def close(self) -> None:
+        try:
+            self.sync()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def abort(self) -> None:
+        """Close and delete a partly written file"""
+        self._budget.release(self._unsynced)
+        self._unsynced = 0
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def receive_multipart(stream: BinaryIO, content_type: Optional[str], content_length: Optional[int],
+                      file_field: str, destination: Callable[[str], str], max_bytes: int,
+                      chunk_size: int = UPLOAD_CHUNK_KB * 1024,
+                      sync_bytes: int = int(UPLOAD_FSYNC_MB * 1024 * 1024),
+                      budget: InFlightBudget = upload_budget,
+                      budget_wait: float = UPLOAD_BUDGET_WAIT_SECONDS) -> Tuple[Dict[str, str], Optional[Dict]]:
+    """
+    Read a multipart/form-data body, writing one file part straight to disk
+
+    Only the first file part named file_field is kept; other file parts are
+    read and discarded. Fields may come before or after the file.
+
+    Args:
+        stream: Request body (request.stream; request.files/form must not be used)
+        content_type: Request Content-Type with the boundary
+        content_length: Request Content-Length, if given
+        file_field: Name of the file part to keep
+        destination: Called with the part's filename, returns the path to
+            write it to; may raise UploadError to reject the file
+        max_bytes: Largest body accepted
+        chunk_size: Bytes read from the body at a time
+        sync_bytes: Unsynced bytes of this upload before an fsync (0: only at the end)
+        budget: In-flight budget shared with concurrent uploads
+        budget_wait: Seconds to wait for room in the budget
+
+    Returns:
+        Tuple of (form fields, {'filename', 'path', 'size'} or None if the
+        body had no such file part). The file is synced to disk.
+
+    Raises:
+        UploadTooLarge: The body is larger than max_bytes
+        UploadBusy: The in-flight budget stayed full
+        UploadError: Not multipart/form-data, malformed, or rejected by destination
+    """
+    mimetype, options = parse_options_header(content_type or '')
+    boundary = options.get('boundary', '').encode('latin-1')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise UploadError('Expected a multipart/form-data upload')
+    if content_length is not None and content_length > max_bytes:
+        raise UploadTooLarge(f"Upload is larger than {max_bytes // (1024 * 1024)} MB")
+
+    # Bounds the parser's own buffer: one chunk plus a partial boundary or field
+    decoder = MultipartDecoder(boundary, max_form_memory_size=2 * chunk_size + MAX_FIELD_BYTES)
+    fields = {}
+    field_name = None
+    field_value = []
+    field_bytes = 0
+    writer = None
+    target = None  # writer, or None while skipping a part
+    upload = None
+    received = 0
+    finished = False
+
+    try:
+        while not finished:
+            chunk = stream.read(chunk_size)
+            if chunk:
+                received += len(chunk)
+                if received > max_bytes:
+                    raise UploadTooLarge(f"Upload is larger than {max_bytes // (1024 * 1024)} MB")
+                decoder.receive_data(chunk)
+            else:
+                decoder.receive_data(None)
+
+            event = decoder.next_event()
+            while not isinstance(event, NeedData):
+                if isinstance(event, Field):
+                    field_name, field_value, field_bytes = event.name, [], 0
+                    target = None
+                elif isinstance(event, File):
+                    field_name = None
+                    if event.name == file_field and writer is None:
+                        writer = _SyncedWriter(destination(event.filename), budget, sync_bytes, budget_wait)
+                        upload = {'filename': event.filename, 'path': writer.path, 'size': 0}
+                        target = writer
+                    else:
+                        target = None
+                elif isinstance(event, Data):
+                    if target is not None:
+                        target.write(event.data)
+                    elif field_name is not None:
+                        field_bytes += len(event.data)
+                        if field_bytes > MAX_FIELD_BYTES:
+                            raise UploadTooLarge(f"Form field {field_name} is too large")
+                        field_value.append(bytes(event.data))
+                        if not event.more_data:
+                            fields[field_name] = b''.join(field_value).decode('utf-8', 'replace')
+                            field_name = None
+                elif isinstance(event, Epilogue):
+                    finished = True
+                    break
+                event = decoder.next_event()
+
+            if not chunk and not finished:
+                raise UploadError('Upload ended before the end of the form data')
+    except RequestEntityTooLarge:
+        if writer is not None:
+            writer.abort()
+        raise UploadTooLarge('Form data part is too large')
+    except ValueError as e:
+        if writer is not None:
+            writer.abort()
+        raise UploadError(f"Malformed form data: {e}")
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    if writer is not None:
+        try:
+            writer.close()
+        except OSError:
+            writer.abort()
+            raise
+        upload['size'] = writer.size
+    return fields, upload
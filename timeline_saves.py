@@ -0,0 +1,207 @@
+"""
+Timeline Saves
+Checkpoints of /api/timeline/save in the timelines table, so a save cut
+short by a killed worker (timeout, OOM, redeploy) can be retried with the
+same save id and only redoes the missing work
+
+The client sends a save id with the timeline and reuses it when it
+retries. Each segment of the save goes through these states, recorded in
+timelines.segment_states as soon as it is reached:
+
+    claimed   its content key is recorded before the save relies on an
+              identical segment already in storage (see lock_library())
+    encoded   the segment and its thumbnail are in the session's segments folder
+    uploaded  both are in storage (video_url, thumbnail_url); a retry checks
+              that they still are before skipping the upload
+    inserted  its exercise row and tags are committed (exercise_id)
+
+The exercise insert and its 'inserted' checkpoint are committed in one
+transaction, so a retried save never creates an exercise twice. Once
+every segment is inserted the timeline is marked saved and the response is
+stored with it; a retry after that gets the stored response.
+
+While a save runs, its database connection holds a Postgres advisory lock
+on the save id. A second request with the same save id is turned away
+instead of working alongside it, and the lock goes away with the
+connection, also when the worker is killed. Requires migration 003.
+
+Content-addressed library objects are shared, so one can be deleted (its
+last exercise removed, or collected by session_gc.py) while a save is
+about to reuse it. A save claims a content key and checks storage while
+holding lock_library(); storage_deletion.py and session_gc.py hold it
+while they re-read references and delete. A deletion either finishes
+before the claim, and the save finds the objects missing and uploads them
+again, or sees the claim and keeps them.
+"""
+
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional
+
+SEGMENT_CLAIMED = 'claimed'
+SEGMENT_ENCODED = 'encoded'
+SEGMENT_UPLOADED = 'uploaded'
+SEGMENT_INSERTED = 'inserted'
+
+TIMELINE_SAVING = 'saving'
+TIMELINE_SAVED = 'saved'
+
+SAVE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def request_hash(video_url: str, segments: List[Dict], encoder_profile: str) -> str:
+    """Hash of what a save produces; a save id may only be reused for the same timeline"""
+    material = json.dumps([video_url, segments, encoder_profile], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:40]
+
+
+def _lock_key(name: str) -> int:
+    return int.from_bytes(hashlib.sha256(name.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+# Not a valid save id (too short), so it never shares a lock with a save
+LIBRARY_LOCK_KEY = _lock_key('library')
+
+
+def try_lock(conn, save_id: str) -> bool:
+    """
+    Take the session-level advisory lock of a save id
+
+    Returns:
+        False if another connection holds it (the save is running elsewhere)
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_try_advisory_lock(%s)", (_lock_key(save_id),))
+    locked = cursor.fetchone()[0]
+    # End the implicit transaction; the lock belongs to the session
+    conn.commit()
+    return locked
+
+
+def lock_library(conn) -> None:
+    """
+    Take the transaction-level lock on library objects (waits for the holder)
+
+    Released when the caller commits or rolls back. Held by saves while they
+    claim a content key and check storage, and by deleters while they
+    re-read references and delete.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LIBRARY_LOCK_KEY,))
+    cursor.close()
+
+
+def load_timeline(conn, save_id: str) -> Optional[Dict]:
+    """
+    Checkpoint of a save
+
+    Returns:
+        Dictionary with id, video_id, request_hash, status, segments (segment
+        index as a string -> state dictionary) and result, or None
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT id, video_id, request_hash, status, segment_states, result
+           FROM timelines WHERE save_id = %s""",
+        (save_id,)
+    )
+    row = cursor.fetchone()
+    conn.commit()
+    if row is None:
+        return None
+    return {
+        'id': row[0],
+        'video_id': row[1],
+        'request_hash': row[2],
+        'status': row[3],
+        'segments': row[4] or {},
+        'result': row[5]
+    }
+
+
+def create_timeline(conn, save_id: str, request_hash: str, video: Dict,
+                    cut_points: List, segments_count: int) -> Dict:
+    """
+    Record a new save with its source video (committed)
+
+    Args:
+        conn: Database connection
+        save_id: Client-supplied save id
+        request_hash: request_hash() of the timeline
+        video: original_filename, storage_path, duration, file_size and storage_type
+        cut_points: The editor's cut points
+        segments_count: Segments with details (the ones that become exercises)
+
+    Returns:
+        The new checkpoint (see load_timeline())
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """INSERT INTO videos (original_filename, storage_path, duration, file_size, storage_type, status)
+           VALUES (%s, %s, %s, %s, %s, 'processing') RETURNING id""",
+        (video['original_filename'], video['storage_path'], video['duration'],
+         video['file_size'], video['storage_type'])
+    )
+    video_id = cursor.fetchone()[0]
+    cursor.execute(
+        """INSERT INTO timelines (video_id, cut_points, segments_count, save_id, request_hash, status, segment_states)
+           VALUES (%s, %s::jsonb, %s, %s, %s, %s, '{}'::jsonb) RETURNING id""",
+        (video_id, json.dumps(cut_points), segments_count, save_id, request_hash, TIMELINE_SAVING)
+    )
+    timeline_id = cursor.fetchone()[0]
+    conn.commit()
+    return {
+        'id': timeline_id,
+        'video_id': video_id,
+        'request_hash': request_hash,
+        'status': TIMELINE_SAVING,
+        'segments': {},
+        'result': None
+    }
+
+
+def segment_state(timeline: Dict, index: int) -> Dict:
+    """Recorded state of a segment ({} if it has none yet)"""
+    return timeline['segments'].get(str(index), {})
+
+
+def record_segment(conn, timeline: Dict, index: int, state: str, commit: bool = True, **fields) -> None:
+    """
+    Checkpoint a segment's state
+
+    Args:
+        conn: Database connection
+        timeline: Checkpoint from load_timeline() or create_timeline(); updated in place
+        index: Segment index (split_video_by_timeline()'s segment_index)
+        state: SEGMENT_CLAIMED, SEGMENT_ENCODED, SEGMENT_UPLOADED or SEGMENT_INSERTED
+        commit: Commit now; pass False to commit together with other statements
+        **fields: Stored with the state (content_key, video_url, thumbnail_url, exercise_id)
+    """
+    entry = dict(segment_state(timeline, index), state=state, **fields)
+    cursor = conn.cursor()
+    cursor.execute(
+        """UPDATE timelines
+           SET segment_states = jsonb_set(segment_states, %s, %s::jsonb), updated_at = NOW()
+           WHERE id = %s""",
+        ([str(index)], json.dumps(entry), timeline['id'])
+    )
+    if commit:
+        conn.commit()
+    timeline['segments'][str(index)] = entry
+
+
+def finish_timeline(conn, timeline: Dict, result: Dict) -> None:
+    """Mark a save complete and store its response (committed)"""
+    cursor = conn.cursor()
+    cursor.execute(
+        """UPDATE timelines SET status = %s, result = %s::jsonb, saved_at = NOW(), updated_at = NOW()
+           WHERE id = %s""",
+        (TIMELINE_SAVED, json.dumps(result), timeline['id'])
+    )
+    cursor.execute(
+        "UPDATE videos SET status = 'completed', processed_at = NOW() WHERE id = %s",
+        (timeline['video_id'],)
+    )
+    conn.commit()
+    timeline.update(status=TIMELINE_SAVED, result=result)
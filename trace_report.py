@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Trace Report
+Prints a flame-style breakdown of one trace from the JSON-lines trace file
+
+Usage:
+    python trace_report.py <trace_id> [--file traces.jsonl]
+    python trace_report.py --latest
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+
+from tracing import TRACE_FILE
+
+BAR_WIDTH = 40
+
+
+def load_spans(path, trace_id=None):
+    """Read spans from a JSON-lines file, optionally only one trace"""
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if trace_id is None or record.get('trace_id') == trace_id:
+                spans.append(record)
+    return spans
+
+
+def latest_trace_id(spans):
+    """Trace id of the most recently started root span"""
+    roots = [s for s in spans if not s.get('parent_id')] or spans
+    if not roots:
+        return None
+    return max(roots, key=lambda s: s['start'])['trace_id']
+
+
+def print_trace(spans):
+    """Print the span tree with bars positioned on the trace's timeline"""
+    by_id = {s['span_id']: s for s in spans}
+    children = defaultdict(list)
+    roots = []
+    for s in spans:
+        if s.get('parent_id') in by_id:
+            children[s['parent_id']].append(s)
+        else:
+            roots.append(s)
+
+    trace_start = min(s['start'] for s in spans)
+    trace_end = max(s['start'] + s['duration_ms'] / 1000 for s in spans)
+    total = max(trace_end - trace_start, 1e-9)
+
+    print(f"Trace {spans[0]['trace_id']}  ({total * 1000:.1f} ms, {len(spans)} spans)\n")
+
+    def walk(span, depth):
+        offset = int((span['start'] - trace_start) / total * BAR_WIDTH)
+        width = max(1, int(span['duration_ms'] / 1000 / total * BAR_WIDTH))
+        bar = ' ' * offset + '█' * min(width, BAR_WIDTH - offset)
+        label = ('  ' * depth + span['name'])[:48]
+        marker = ' !' if span.get('status') == 'error' else ''
+        print(f"{label:<48} {span['duration_ms']:>10.1f} ms |{bar:<{BAR_WIDTH}}|{marker}")
+        for child in sorted(children[span['span_id']], key=lambda c: c['start']):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda r: r['start']):
+        walk(root, 0)
+
+    # Self time by span name: time not covered by child spans
+    self_time = defaultdict(float)
+    for s in spans:
+        child_ms = sum(c['duration_ms'] for c in children[s['span_id']])
+        self_time[s['name']] += max(0.0, s['duration_ms'] - child_ms)
+
+    print(f"\n{'Self time by span':<48} {'ms':>10}    share")
+    for name, ms in sorted(self_time.items(), key=lambda item: -item[1]):
+        print(f"{name:<48} {ms:>10.1f}   {ms / (total * 1000) * 100:5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print a breakdown of one trace')
+    parser.add_argument('trace_id', nargs='?', help='Trace id (from the X-Trace-Id response header)')
+    parser.add_argument('--file', default=TRACE_FILE, help='JSON-lines trace file')
+    parser.add_argument('--latest', action='store_true', help='Show the most recent trace')
+    args = parser.parse_args()
+
+    if not args.trace_id and not args.latest:
+        parser.error('give a trace id or --latest')
+
+    trace_id = args.trace_id
+    if args.latest:
+        trace_id = latest_trace_id(load_spans(args.file))
+
+    spans = load_spans(args.file, trace_id) if trace_id else []
+    if not spans:
+        print(f"No spans found for trace {trace_id} in {args.file}")
+        sys.exit(1)
+
+    print_trace(spans)
+
+
+if __name__ == '__main__':
+    main()
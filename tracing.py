@@ -0,0 +1,367 @@
+"""
+Request Tracing
+Lightweight spans with a trace id carried from the HTTP request through
+video cutting, thumbnails, storage uploads and database statements
+
+Spans are exported when they finish, to a JSON-lines file (TRACE_EXPORTER=jsonl)
+or to an OTLP/HTTP JSON collector (TRACE_EXPORTER=otlp). Use trace_report.py to
+print a breakdown of one trace.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    from config import Config
+    TRACE_EXPORTER = Config.TRACE_EXPORTER
+    TRACE_FILE = Config.TRACE_FILE
+    TRACE_OTLP_ENDPOINT = Config.TRACE_OTLP_ENDPOINT
+except ImportError:
+    TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', 'none')
+    TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+    TRACE_OTLP_ENDPOINT = os.getenv('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+
+SERVICE_NAME = 'workout-video-editor'
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.root = False  # First span of the trace in this process
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self.duration = None
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._start_perf
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round((self.duration or 0.0) * 1000, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+            'pid': os.getpid()
+        }
+
+
+class JsonLinesExporter:
+    """Appends one JSON object per finished span to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + '\n'
+        with self._lock:
+            # O_APPEND keeps lines from different gunicorn workers intact
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class OtlpHttpExporter:
+    """
+    Sends finished spans to an OTLP/HTTP collector (JSON encoding)
+
+    Spans are buffered per trace and posted when the trace's root span
+    finishes, so each request costs one collector call.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self._pending = {}
+        self._posting = set()
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._pending.setdefault(span.trace_id, []).append(span)
+            if not span.root:
+                return
+            spans = self._pending.pop(span.trace_id)
+        thread = threading.Thread(target=self._post, args=(spans,), daemon=True)
+        with self._lock:
+            self._posting.add(thread)
+        thread.start()
+
+    def flush(self, timeout: float) -> None:
+        """Wait up to timeout seconds for spans still being posted"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            threads = list(self._posting)
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _post(self, spans) -> None:
+        import requests
+
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    {'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': 'tracing'},
+                    'spans': [self._to_otlp(span) for span in spans]
+                }]
+            }]
+        }
+        try:
+            requests.post(self.endpoint, json=payload, timeout=5)
+        except requests.RequestException as e:
+            print(f"[Tracing] Warning: Failed to export {len(spans)} spans: {e}")
+        finally:
+            with self._lock:
+                self._posting.discard(threading.current_thread())
+
+    @staticmethod
+    def _to_otlp(span: Span) -> Dict:
+        start_ns = int(span.start * 1e9)
+        return {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'parentSpanId': span.parent_id or '',
+            'name': span.name,
+            'kind': 1,
+            'startTimeUnixNano': str(start_ns),
+            'endTimeUnixNano': str(start_ns + int((span.duration or 0.0) * 1e9)),
+            'attributes': [
+                {'key': key, 'value': {'stringValue': str(value)}}
+                for key, value in span.attributes.items()
+            ],
+            'status': {'code': 2 if span.status == 'error' else 1}
+        }
+
+
+def _create_exporter():
+    if TRACE_EXPORTER == 'jsonl':
+        return JsonLinesExporter(TRACE_FILE)
+    if TRACE_EXPORTER == 'otlp':
+        return OtlpHttpExporter(TRACE_OTLP_ENDPOINT)
+    return None
+
+
+exporter = _create_exporter()
+
+
+def new_trace_id() -> str:
+    """Generate a W3C-compatible 128-bit trace id"""
+    return secrets.token_hex(16)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Dict]:
+    """
+    Parse a W3C traceparent header ("00-<trace id>-<parent span id>-<flags>")
+
+    Returns:
+        {'trace_id', 'parent_id'} or None if the header is missing or malformed
+    """
+    if not header:
+        return None
+    parts = header.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    return {'trace_id': parts[1], 'parent_id': parts[2]}
+
+
+def current_span() -> Optional[Span]:
+    """The active span in this context, if any"""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace id of the active span, if any"""
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def trace_context() -> Optional[Dict]:
+    """
+    The active span's trace id and span id, for continuing the trace in
+    another process (see continue_trace())
+
+    Returns:
+        {'trace_id', 'parent_id'} or None if no span is active
+    """
+    span = _current_span.get()
+    return {'trace_id': span.trace_id, 'parent_id': span.span_id} if span else None
+
+
+def set_attributes(**attributes) -> None:
+    """Add attributes to the active span"""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+def start_span(name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes):
+    """
+    Start a span and make it current
+
+    Without trace_id/parent_id the span joins the current trace as a child of
+    the active span, or starts a new trace.
+
+    Returns:
+        (span, token) - pass both to end_span()
+    """
+    parent = _current_span.get()
+    root = trace_id is not None or parent is None
+    if trace_id is None:
+        trace_id = parent.trace_id if parent else new_trace_id()
+        parent_id = parent.span_id if parent else None
+
+    span = Span(name, trace_id, parent_id, attributes)
+    span.root = root
+    token = _current_span.set(span)
+    return span, token
+
+
+def end_span(span: Span, token, error: Optional[BaseException] = None) -> None:
+    """Finish a span, restore the previous current span and export it"""
+    span.finish()
+    if error is not None:
+        span.status = 'error'
+        span.attributes['error'] = str(error)[:500]
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Token created in another context (e.g. a streamed response)
+        pass
+    if exporter is not None:
+        try:
+            exporter.export(span)
+        except Exception as e:
+            print(f"[Tracing] Warning: Failed to export span {span.name}: {e}")
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Trace a block as a child of the active span
+
+    Example:
+        with span('storage.save', backend='r2', key=key):
+            upload()
+    """
+    active, token = start_span(name, **attributes)
+    try:
+        yield active
+    except BaseException as e:
+        end_span(active, token, error=e)
+        raise
+    else:
+        end_span(active, token)
+
+
+@contextmanager
+def continue_trace(context: Optional[Dict], name: str, **attributes):
+    """
+    Trace a block as a child of a span in another process
+
+    The block's span is the root of the trace in this process, so it is
+    exported (and OTLP spans posted) when it finishes.
+
+    Args:
+        context: trace_context() from the other process; with None the
+            block is not traced and its spans start their own trace
+        name: Span name
+    """
+    if context is None:
+        yield None
+        return
+    active, token = start_span(name, trace_id=context['trace_id'], parent_id=context['parent_id'], **attributes)
+    try:
+        yield active
+    except BaseException as e:
+        end_span(active, token, error=e)
+        raise
+    else:
+        end_span(active, token)
+
+
+def flush(timeout: float = 5.0) -> None:
+    """Wait for spans still being exported (before a short-lived process exits)"""
+    if exporter is not None and hasattr(exporter, 'flush'):
+        exporter.flush(timeout)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator that traces every call of a function"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_app(app) -> None:
+    """
+    Open a root span for every request
+
+    The trace id comes from an incoming traceparent or X-Trace-Id header when
+    present, and is returned in the X-Trace-Id response header.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_span():
+        incoming = parse_traceparent(request.headers.get('traceparent'))
+        trace_id = incoming['trace_id'] if incoming else request.headers.get('X-Trace-Id')
+        parent_id = incoming['parent_id'] if incoming else None
+        if not trace_id or len(trace_id) > 64:
+            trace_id = new_trace_id()
+
+        g._trace_span = start_span(
+            f"{request.method} {request.path}",
+            trace_id=trace_id,
+            parent_id=parent_id,
+            endpoint=request.endpoint or '',
+        )
+
+    @app.after_request
+    def _add_trace_header(response):
+        active = g.get('_trace_span')
+        if active:
+            active[0].attributes['status_code'] = response.status_code
+            response.headers['X-Trace-Id'] = active[0].trace_id
+        return response
+
+    @app.teardown_request
+    def _end_request_span(error=None):
+        active = g.pop('_trace_span', None)
+        if active:
+            span_obj, token = active
+            if error is None and span_obj.attributes.get('status_code', 200) >= 500:
+                span_obj.status = 'error'
+            end_span(span_obj, token, error=error)
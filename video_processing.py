@@ -3,19 +3,35 @@ Video Processing Functions using FFmpeg
 Handles video cutting, audio removal, and thumbnail generation
 """
 
+import bisect
+import math
 import subprocess
 import os
+import hashlib
+import json
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
-from datetime import datetime
+from typing import Callable, List, Dict, Optional, Tuple
 from werkzeug.utils import secure_filename
 
+from encoder_profiles import get_profile, profile_args
+from metrics import timed, NORMALIZE_SECONDS, SEGMENT_ENCODE_SECONDS, THUMBNAIL_SECONDS
+from result_cache import result_cache, cache_key
+from tracing import traced, set_attributes
+
 # Import config to get FFMPEG_PATH
 try:
     from config import Config
     FFMPEG_PATH = Config.FFMPEG_PATH
+    NORMALIZE_GOP_SECONDS = Config.NORMALIZE_GOP_SECONDS
+    NORMALIZE_MAX_FPS = Config.NORMALIZE_MAX_FPS
+    NORMALIZE_PRESET = Config.NORMALIZE_PRESET
+    NORMALIZE_CRF = Config.NORMALIZE_CRF
 except ImportError:
     FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')
+    NORMALIZE_GOP_SECONDS = float(os.getenv('NORMALIZE_GOP_SECONDS', 1.0))
+    NORMALIZE_MAX_FPS = float(os.getenv('NORMALIZE_MAX_FPS', 60))
+    NORMALIZE_PRESET = os.getenv('NORMALIZE_PRESET', 'veryfast')
+    NORMALIZE_CRF = int(os.getenv('NORMALIZE_CRF', 18))
 
 
 def get_ffmpeg_command() -> str:
@@ -38,18 +54,88 @@ class VideoProcessingError(Exception):
     pass
 
 
+# Bump to give every segment a new content key (e.g. after changing audio or thumbnail settings)
+SEGMENT_KEY_VERSION = 1
+
+_content_hashes = {}
+
+
+def file_content_hash(path: str) -> str:
+    """
+    SHA-256 of a file's contents, cached per (device, inode, size, modification
+    time) in this process and in the shared result cache. A renamed or moved
+    file on the same filesystem keeps its cached hash.
+
+    Args:
+        path: File to hash
+
+    Returns:
+        Hex digest
+    """
+    stat = os.stat(path)
+    identity = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if identity not in _content_hashes:
+        def compute():
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            return digest.hexdigest()
+
+        key = cache_key('file_hash', ':'.join(str(part) for part in identity))
+        _content_hashes[identity] = result_cache.get_or_compute(key, compute)
+    return _content_hashes[identity]
+
+
+def segment_content_key(source_hash: str, start_time: float, end_time: float,
+                        remove_audio: bool, profile: Dict) -> str:
+    """
+    Content address of an encoded segment
+
+    The same source bytes cut at the same times with the same audio and
+    encoder settings always produce the same key, so a stored segment can be
+    reused instead of encoded and uploaded again.
+
+    Args:
+        source_hash: file_content_hash() of the source video
+        start_time: Segment start in seconds
+        end_time: Segment end in seconds
+        remove_audio: Whether audio is stripped
+        profile: Resolved encoder profile
+
+    Returns:
+        40-character hex key
+    """
+    material = json.dumps([
+        SEGMENT_KEY_VERSION, source_hash, round(start_time, 3), round(end_time, 3),
+        bool(remove_audio), profile_args(profile)
+    ])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:40]
+
+
+_ffmpeg_found = False
+
+
 def check_ffmpeg_installed() -> bool:
     """
     Check if FFmpeg is installed and accessible
     Tries both the configured FFMPEG_PATH and default 'ffmpeg' command
 
+    A successful check is remembered, so only the first call per process
+    spawns FFmpeg.
+
     Returns:
         True if FFmpeg is available, False otherwise
     """
+    global _ffmpeg_found
+    if _ffmpeg_found:
+        return True
+
     # Try configured path first
     if FFMPEG_PATH and FFMPEG_PATH != 'ffmpeg':
         try:
             subprocess.run([FFMPEG_PATH, '-version'], capture_output=True, check=True, timeout=5)
+            _ffmpeg_found = True
             return True
         except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
             pass
@@ -57,6 +143,7 @@ def check_ffmpeg_installed() -> bool:
     # Fallback to default 'ffmpeg' command
     try:
         subprocess.run([get_ffmpeg_command(), '-version'], capture_output=True, check=True, timeout=5)
+        _ffmpeg_found = True
         return True
     except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
         return False
@@ -66,23 +153,34 @@ def get_video_info(video_path: str) -> Dict:
     """
     Get video metadata using FFprobe
 
+    Results are kept in the shared result cache by content hash, so a
+    video probed by one worker is not probed again by another.
+
     Args:
         video_path: Path to video file
 
     Returns:
         Dictionary with video info (duration, fps, resolution, etc.)
     """
+    try:
+        key = cache_key('probe', file_content_hash(video_path))
+    except OSError as e:
+        raise VideoProcessingError(f"Failed to get video info: {e}")
+    return result_cache.get_or_compute(key, lambda: _probe_video_info(video_path))
+
+
+def _probe_video_info(video_path: str) -> Dict:
+    """Run FFprobe for get_video_info()"""
     try:
         cmd = [
             get_ffprobe_command(),
             '-v', 'error',
-            '-show_entries', 'format=duration:stream=width,height,r_frame_rate,codec_name',
+            '-show_entries', 'format=duration:stream=codec_type,width,height,r_frame_rate,codec_name',
             '-of', 'json',
             video_path
         ]
 
         result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        import json
         data = json.loads(result.stdout)
 
         # Extract video stream info
@@ -109,6 +207,292 @@ def get_video_info(video_path: str) -> Dict:
         raise VideoProcessingError(f"Failed to get video info: {e}")
 
 
+# Seconds of packets read (not decoded) to check frame timing and keyframe spacing
+CONFORMANCE_PROBE_SECONDS = 30
+# Frame rates a normalized file snaps to when the source is within SNAP_TOLERANCE of one
+STANDARD_FRAME_RATES = ['24000/1001', '24', '25', '30000/1001', '30', '50', '60000/1001', '60']
+SNAP_TOLERANCE = 0.02
+
+
+def _parse_rate(rate: str) -> float:
+    """'30000/1001' -> 29.97 (0.0 if unknown)"""
+    try:
+        num, _, den = (rate or '0').partition('/')
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _target_frame_rate(fps: float, max_fps: float) -> str:
+    """Constant frame rate for a mezzanine, as an FFmpeg rate string"""
+    fps = min(fps, max_fps) if fps > 0 else 30.0
+    nearest = min(STANDARD_FRAME_RATES, key=lambda rate: abs(_parse_rate(rate) - fps))
+    if abs(_parse_rate(nearest) - fps) <= fps * SNAP_TOLERANCE:
+        return nearest
+    return f"{fps:.3f}"
+
+
+def check_conformance(video_path: str, gop_seconds: float = NORMALIZE_GOP_SECONDS,
+                      max_fps: float = NORMALIZE_MAX_FPS) -> Dict:
+    """
+    Whether a video can be used as it is, or should be normalized first
+
+    A video conforms when it is H.264 (yuv420p), has no rotation metadata,
+    a constant frame rate no higher than max_fps, and a keyframe at least
+    every gop_seconds. Frame timing and keyframes are checked on the packets
+    of the first CONFORMANCE_PROBE_SECONDS, which FFprobe reads without
+    decoding. Results are cached by content hash like get_video_info().
+
+    Args:
+        video_path: Path to video file
+        gop_seconds: Longest keyframe interval allowed
+        max_fps: Highest frame rate allowed
+
+    Returns:
+        Dictionary with conformant, reasons (why not), codec, rotation,
+        fps (average frame rate), target_fps (FFmpeg rate string for
+        normalize_video()), max_keyframe_interval and audio_codec
+
+    Raises:
+        VideoProcessingError: If the file cannot be probed
+    """
+    try:
+        key = cache_key('conformance', file_content_hash(video_path),
+                        gop_seconds=float(gop_seconds), max_fps=float(max_fps))
+    except OSError as e:
+        raise VideoProcessingError(f"Failed to check video: {e}")
+    return result_cache.get_or_compute(key, lambda: _probe_conformance(video_path, gop_seconds, max_fps))
+
+
+def _probe_conformance(video_path: str, gop_seconds: float, max_fps: float) -> Dict:
+    """Run FFprobe for check_conformance()"""
+    try:
+        result = subprocess.run([
+            get_ffprobe_command(), '-v', 'error',
+            '-show_entries', 'stream=codec_type,codec_name,pix_fmt,r_frame_rate,avg_frame_rate'
+                             ':stream_tags=rotate:stream_side_data=rotation',
+            '-of', 'json', video_path
+        ], capture_output=True, text=True, check=True)
+        streams = json.loads(result.stdout).get('streams', [])
+        video = next((st for st in streams if st.get('codec_type') == 'video'), None)
+        if video is None:
+            raise VideoProcessingError("No video stream found in file")
+        audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+
+        # Packet timestamps and keyframe flags, without decoding
+        result = subprocess.run([
+            get_ffprobe_command(), '-v', 'error', '-select_streams', 'v:0',
+            '-read_intervals', f"%+{CONFORMANCE_PROBE_SECONDS}",
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path
+        ], capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
+        raise VideoProcessingError(f"Failed to check video: {e}")
+
+    times = []
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(',')
+        try:
+            pts_time = float(pts)
+        except ValueError:
+            continue
+        times.append(pts_time)
+        if 'K' in flags:
+            keyframes.append(pts_time)
+    times.sort()
+
+    rotation = 0
+    for side_data in video.get('side_data_list', []):
+        rotation = int(side_data.get('rotation', rotation) or 0)
+    rotation = rotation or int(video.get('tags', {}).get('rotate', 0) or 0)
+
+    fps = _parse_rate(video.get('avg_frame_rate')) or _parse_rate(video.get('r_frame_rate'))
+    deltas = sorted(b - a for a, b in zip(times, times[1:]))
+    if deltas:
+        median = deltas[len(deltas) // 2]
+        constant = median > 0 and max(abs(d - median) for d in deltas) <= max(0.001, median * 0.05)
+    else:
+        constant = True
+    intervals = [b - a for a, b in zip(keyframes, keyframes[1:] + times[-1:])]
+    max_interval = max(intervals, default=0.0)
+    frame = 1 / fps if fps else 0.0
+
+    reasons = []
+    if video.get('codec_name') != 'h264':
+        reasons.append(f"codec {video.get('codec_name')}")
+    if video.get('pix_fmt') not in ('yuv420p', 'yuvj420p'):
+        reasons.append(f"pixel format {video.get('pix_fmt')}")
+    if rotation % 360:
+        reasons.append(f"rotated {rotation}")
+    if not constant:
+        reasons.append('variable frame rate')
+    if fps > max_fps + 0.01:
+        reasons.append(f"{fps:.2f} fps")
+    if max_interval > gop_seconds + frame + 0.001:
+        reasons.append(f"keyframes {max_interval:.2f}s apart")
+
+    return {
+        'conformant': not reasons,
+        'reasons': reasons,
+        'codec': video.get('codec_name'),
+        'rotation': rotation,
+        'fps': fps,
+        'target_fps': _target_frame_rate(fps, max_fps),
+        'max_keyframe_interval': max_interval,
+        'audio_codec': audio.get('codec_name') if audio else None
+    }
+
+
+@traced('normalize_video')
+def normalize_video(input_path: str, output_path: str, conformance: Optional[Dict] = None,
+                    gop_seconds: float = NORMALIZE_GOP_SECONDS, preset: str = NORMALIZE_PRESET,
+                    crf: int = NORMALIZE_CRF, timeout: Optional[float] = None) -> Dict:
+    """
+    Re-encode a video to a mezzanine file in one FFmpeg pass
+
+    The mezzanine is an MP4 with upright H.264 video (rotation is applied,
+    not kept as metadata) at a constant frame rate with a keyframe every
+    gop_seconds, so detection decodes it quickly, min_scene_length converts
+    to frames exactly, and every cut seeks at most gop_seconds. AAC audio is
+    copied, other audio is encoded to AAC.
+
+    Args:
+        input_path: Uploaded video
+        output_path: Mezzanine file to write (MP4)
+        conformance: check_conformance() of the input (probed if not given)
+        gop_seconds: Keyframe interval
+        preset: x264 preset
+        crf: x264 quality (the mezzanine is encoded again when cut, so keep it low)
+        timeout: Seconds FFmpeg may run
+
+    Returns:
+        Dictionary with path, fps (the constant frame rate), gop (frames)
+        and the reasons the input did not conform
+
+    Raises:
+        VideoProcessingError: If FFmpeg fails or runs out of time
+    """
+    conformance = conformance or check_conformance(input_path, gop_seconds)
+    fps = conformance['target_fps']
+    gop = max(1, round(_parse_rate(fps) * gop_seconds))
+    tmp_path = f"{output_path}.tmp"
+
+    cmd = [
+        get_ffmpeg_command(), '-y',
+        '-i', input_path,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        # FFmpeg rotates by the display matrix on decode (autorotate) and drops it from the output
+        '-vf', f"fps={fps},format=yuv420p",
+        '-c:v', 'libx264', '-preset', preset, '-crf', str(crf),
+        '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0'
+    ]
+    if conformance.get('audio_codec') == 'aac':
+        cmd.extend(['-c:a', 'copy'])
+    else:
+        cmd.extend(['-c:a', 'aac', '-b:a', '192k'])
+    cmd.extend(['-movflags', '+faststart', '-f', 'mp4', tmp_path])
+
+    print(f"[FFmpeg] Normalizing {os.path.basename(input_path)} ({', '.join(conformance['reasons'])}) "
+          f"to {fps} fps, keyframe every {gop} frames")
+    set_attributes(reasons=','.join(conformance['reasons']), fps=fps, gop=gop)
+
+    try:
+        with timed(NORMALIZE_SECONDS):
+            subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=timeout)
+        os.replace(tmp_path, output_path)
+    except subprocess.CalledProcessError as e:
+        _remove_quietly(tmp_path)
+        print(f"[FFmpeg Error] {e.stderr[-2000:]}")
+        raise VideoProcessingError(f"FFmpeg error: {e.stderr[-2000:]}")
+    except subprocess.TimeoutExpired:
+        _remove_quietly(tmp_path)
+        raise VideoProcessingError(f"Normalization took longer than {timeout:.0f}s")
+
+    return {'path': output_path, 'fps': fps, 'gop': gop, 'reasons': conformance['reasons']}
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def keyframe_index(video_path: str) -> Dict:
+    """
+    Keyframe timestamps of a video, for two-stage seeking in cut_video_segment()
+
+    FFprobe decodes only the keyframes (-skip_frame nokey), so the index
+    costs a fraction of a full decode. It is built once per video and kept
+    in the shared result cache by content hash.
+
+    Args:
+        video_path: Path to video file
+
+    Returns:
+        Dictionary with keyframes (sorted times in seconds) and fps
+
+    Raises:
+        VideoProcessingError: If FFprobe fails
+    """
+    try:
+        key = cache_key('keyframes', file_content_hash(video_path))
+    except OSError as e:
+        raise VideoProcessingError(f"Failed to index keyframes: {e}")
+    return result_cache.get_or_compute(key, lambda: _probe_keyframes(video_path))
+
+
+def _probe_keyframes(video_path: str) -> Dict:
+    """Run FFprobe for keyframe_index()"""
+    cmd = [
+        get_ffprobe_command(), '-v', 'error', '-select_streams', 'v:0',
+        '-skip_frame', 'nokey',
+        '-show_entries', 'stream=r_frame_rate:frame=best_effort_timestamp_time', '-of', 'json',
+        video_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        data = json.loads(result.stdout)
+    except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
+        raise VideoProcessingError(f"Failed to index keyframes: {e}")
+    keyframes = sorted(float(frame['best_effort_timestamp_time']) for frame in data.get('frames', [])
+                       if 'best_effort_timestamp_time' in frame)
+    if not keyframes:
+        raise VideoProcessingError("No keyframes found")
+    streams = data.get('streams') or [{}]
+    return {'keyframes': keyframes, 'fps': _parse_rate(streams[0].get('r_frame_rate'))}
+
+
+def preceding_keyframe(keyframes: List[float], time: float) -> float:
+    """Latest keyframe at or before time (0.0 if there is none)"""
+    index = bisect.bisect_right(keyframes, time + 1e-6)
+    return keyframes[index - 1] if index else 0.0
+
+
+def seek_points(index: Dict, start_time: float) -> Tuple[float, float]:
+    """
+    Input and output seek of a cut starting at start_time
+
+    The output seek is rounded up to a whole frame after the keyframe, so
+    the segment's first frame lands at timestamp 0 instead of leaving a
+    gap that FFmpeg fills by shifting or dropping a frame. Frames are
+    evenly spaced only at a constant frame rate (see normalize_video()).
+
+    Args:
+        index: keyframe_index() of the input
+        start_time: Requested segment start in seconds
+
+    Returns:
+        Tuple of (keyframe to input-seek to, seconds to output-seek after it)
+    """
+    keyframe = preceding_keyframe(index['keyframes'], start_time)
+    offset = start_time - keyframe
+    fps = index.get('fps')
+    if fps:
+        offset = math.ceil(offset * fps - 0.001) / fps
+    return keyframe, max(0.0, offset)
+
+
 def format_timestamp(seconds: float) -> str:
     """
     Convert seconds to FFmpeg timestamp format (HH:MM:SS.mmm)
@@ -125,12 +509,20 @@ def format_timestamp(seconds: float) -> str:
     return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
 
 
+@traced('cut_video_segment')
 def cut_video_segment(input_path: str, output_path: str, start_time: float, end_time: float,
                       remove_audio: bool = False, codec: str = 'libx264',
-                      preset: str = 'medium', crf: int = 23) -> bool:
+                      preset: str = 'medium', crf: int = 23,
+                      profile: Optional[Dict] = None, keyframes: Optional[Dict] = None) -> bool:
     """
     Cut a segment from a video using FFmpeg
 
+    With a keyframe index the seek is done in two stages: an input seek to
+    the keyframe at or before start_time (where decoding has to begin
+    anyway), then an output seek over the remaining frames, which FFmpeg
+    decodes and drops. The segment then starts on the first frame at or
+    after start_time.
+
     Args:
         input_path: Path to input video file
         output_path: Path to output video file
@@ -140,6 +532,8 @@ def cut_video_segment(input_path: str, output_path: str, start_time: float, end_
         codec: Video codec to use (default: libx264 for H.264)
         preset: Encoding preset (ultrafast, superfast, veryfast, faster, fast, medium, slow, slower, veryslow)
         crf: Constant Rate Factor for quality (0-51, lower is better quality, 23 is default)
+        profile: Encoder profile settings from get_profile(); overrides codec/preset/crf
+        keyframes: keyframe_index() of the input; without it FFmpeg seeks on its own
 
     Returns:
         True if successful
@@ -152,16 +546,35 @@ def cut_video_segment(input_path: str, output_path: str, start_time: float, end_
         duration = end_time - start_time
 
         # Build FFmpeg command
-        cmd = [
-            get_ffmpeg_command(),
-            '-y',  # Overwrite output file
-            '-ss', format_timestamp(start_time),  # Start time
-            '-i', input_path,  # Input file
-            '-t', format_timestamp(duration),  # Duration
-            '-c:v', codec,  # Video codec
-            '-preset', preset,  # Encoding speed
-            '-crf', str(crf),  # Quality
-        ]
+        if keyframes:
+            keyframe, offset = seek_points(keyframes, start_time)
+            cmd = [
+                get_ffmpeg_command(),
+                '-y',  # Overwrite output file
+                '-ss', f"{keyframe:.6f}",  # Input seek to the keyframe decoding starts from
+                '-i', input_path,  # Input file
+                '-ss', f"{offset:.6f}",  # Output seek over the frames before start_time
+                '-t', f"{end_time - keyframe - offset:.6f}",  # Duration from the first frame
+            ]
+        else:
+            keyframe = None
+            cmd = [
+                get_ffmpeg_command(),
+                '-y',  # Overwrite output file
+                '-ss', format_timestamp(start_time),  # Start time
+                '-i', input_path,  # Input file
+                '-t', format_timestamp(duration),  # Duration
+            ]
+
+        # Video encoding settings
+        if profile:
+            cmd.extend(profile_args(profile))
+        else:
+            cmd.extend([
+                '-c:v', codec,  # Video codec
+                '-preset', preset,  # Encoding speed
+                '-crf', str(crf),  # Quality
+            ])
 
         # Handle audio
         if remove_audio:
@@ -175,8 +588,12 @@ def cut_video_segment(input_path: str, output_path: str, start_time: float, end_
         print(f"[FFmpeg] Cutting segment: {start_time:.2f}s - {end_time:.2f}s")
         print(f"[FFmpeg] Command: {' '.join(cmd)}")
 
+        set_attributes(start=start_time, end=end_time, profile=profile['name'] if profile else 'custom',
+                       output=os.path.basename(output_path), keyframe=keyframe)
+
         # Run FFmpeg
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        with timed(SEGMENT_ENCODE_SECONDS, profile=profile['name'] if profile else 'custom'):
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
 
         # Check if output file was created
         if not os.path.exists(output_path):
@@ -192,6 +609,7 @@ def cut_video_segment(input_path: str, output_path: str, start_time: float, end_
         raise VideoProcessingError(f"Failed to cut video segment: {e}")
 
 
+@traced('generate_thumbnail')
 def generate_thumbnail(video_path: str, output_path: str, timestamp: float = 0.0,
                        width: int = 320, height: int = 180) -> bool:
     """
@@ -223,8 +641,11 @@ def generate_thumbnail(video_path: str, output_path: str, timestamp: float = 0.0
 
         print(f"[FFmpeg] Generating thumbnail at {timestamp:.2f}s")
 
+        set_attributes(timestamp=timestamp, output=os.path.basename(output_path))
+
         # Run FFmpeg
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        with timed(THUMBNAIL_SECONDS):
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
 
         # Check if output file was created
         if not os.path.exists(output_path):
@@ -240,9 +661,14 @@ def generate_thumbnail(video_path: str, output_path: str, timestamp: float = 0.0
         raise VideoProcessingError(f"Failed to generate thumbnail: {e}")
 
 
+@traced('split_video_by_timeline')
 def split_video_by_timeline(video_path: str, segments: List[Dict], output_folder: str,
                             base_name: str = None, codec: str = 'libx264',
-                            preset: str = 'medium', crf: int = 23) -> List[Dict]:
+                            preset: str = 'medium', crf: int = 23,
+                            profile: Optional[str] = None, source_hash: Optional[str] = None,
+                            is_stored: Optional[Callable[[str, int], bool]] = None,
+                            is_encoded: Optional[Callable[[str], bool]] = None,
+                            on_encoded: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
     """
     Split a video into multiple segments based on timeline data
 
@@ -254,6 +680,20 @@ def split_video_by_timeline(video_path: str, segments: List[Dict], output_folder
         codec: Video codec to use
         preset: Encoding preset
         crf: Quality setting
+        profile: Encoder profile name for the whole job (overrides codec/preset/crf).
+                 A segment's details.encoderProfile overrides it for that segment.
+        source_hash: file_content_hash() of the source. When given, outputs are
+                     named by segment_content_key() and identical segments are
+                     encoded once.
+        is_stored: Called with a content key and the segment's index;
+                   segments it returns True for are already in storage and
+                   are not encoded (their result has 'stored': True and no
+                   local paths)
+        is_encoded: Called with a content key; segments it returns True for were
+                    encoded by an earlier, interrupted job, and their files in
+                    output_folder are used as they are
+        on_encoded: Called with each segment's result as soon as its video and
+                    thumbnail have been written
 
     Returns:
         List of dictionaries with segment info and file paths
@@ -267,7 +707,8 @@ def split_video_by_timeline(video_path: str, segments: List[Dict], output_folder
                     'name': 'Push-ups',
                     'muscleGroups': ['chest', 'triceps'],
                     'equipment': ['bodyweight'],
-                    'removeAudio': False
+                    'removeAudio': False,
+                    'encoderProfile': 'fast-preview'  # optional
                 }
             },
             ...
@@ -277,6 +718,8 @@ def split_video_by_timeline(video_path: str, segments: List[Dict], output_folder
     if not check_ffmpeg_installed():
         raise VideoProcessingError("FFmpeg is not installed or not accessible")
 
+    set_attributes(segments=len(segments))
+
     # Create output folder
     os.makedirs(output_folder, exist_ok=True)
 
@@ -284,8 +727,27 @@ def split_video_by_timeline(video_path: str, segments: List[Dict], output_folder
     if base_name is None:
         base_name = Path(video_path).stem
 
+    # Resolve encoder profiles up front so an unknown name fails before any encoding
+    try:
+        if profile is not None:
+            job_profile = get_profile(profile)
+        else:
+            job_profile = {'name': 'custom', 'codec': codec, 'preset': preset, 'crf': crf}
+        segment_profiles = {
+            name: get_profile(name)
+            for name in {s.get('details', {}).get('encoderProfile') for s in segments}
+            if name
+        }
+    except ValueError as e:
+        raise VideoProcessingError(str(e))
+
+    # Keyframe index shared by every cut from this video (built before the first cut)
+    keyframes = None
+    indexed = False
+
     # Process each segment
     results = []
+    encoded = {}  # content key -> (video path, thumbnail path) encoded in this job
     for idx, segment in enumerate(segments, start=1):
         start_time = segment.get('start', 0.0)
         end_time = segment.get('end', 0.0)
@@ -296,18 +758,78 @@ def split_video_by_timeline(video_path: str, segments: List[Dict], output_folder
             print(f"[Video Processing] Skipping segment {idx} (no details)")
             continue
 
-        # Generate output filename
         exercise_name = details.get('name', f'segment_{idx}')
-        safe_exercise_name = secure_filename(exercise_name)
-        output_filename = f"{base_name}_seg{idx:03d}_{safe_exercise_name}.mp4"
-        output_path = os.path.join(output_folder, output_filename)
 
         # Check if audio should be removed
         remove_audio = details.get('removeAudio', False)
 
+        segment_profile = segment_profiles.get(details.get('encoderProfile'), job_profile)
+
+        # Generate output filenames
+        content_key = None
+        if source_hash:
+            content_key = segment_content_key(source_hash, start_time, end_time, remove_audio, segment_profile)
+            output_filename = f"{content_key}.mp4"
+            thumbnail_filename = f"{content_key}.jpg"
+        else:
+            safe_exercise_name = secure_filename(exercise_name)
+            output_filename = f"{base_name}_seg{idx:03d}_{safe_exercise_name}.mp4"
+            thumbnail_filename = f"{base_name}_seg{idx:03d}_thumb.jpg"
+        output_path = os.path.join(output_folder, output_filename)
+        thumbnail_path = os.path.join(output_folder, thumbnail_filename)
+
         print(f"[Video Processing] Processing segment {idx}/{len(segments)}: {exercise_name}")
         print(f"  Time: {start_time:.2f}s - {end_time:.2f}s")
         print(f"  Remove audio: {remove_audio}")
+        print(f"  Encoder profile: {segment_profile['name']}")
+
+        result = {
+            'segment_index': idx,
+            'video_path': output_path,
+            'thumbnail_path': thumbnail_path,
+            'start_time': start_time,
+            'end_time': end_time,
+            'duration': end_time - start_time,
+            'exercise_name': details.get('name'),
+            'muscle_groups': details.get('muscleGroups', []),
+            'equipment': details.get('equipment', []),
+            'remove_audio': remove_audio,
+            'encoder_profile': segment_profile['name'],
+            'content_key': content_key,
+            'stored': False
+        }
+
+        # Identical segment already encoded in this job
+        if content_key in encoded:
+            result['video_path'], result['thumbnail_path'], result['stored'] = encoded[content_key]
+            result['file_size'] = None if result['stored'] else os.path.getsize(result['video_path'])
+            results.append(result)
+            print(f"  ✓ Same as an earlier segment: {content_key}")
+            continue
+
+        # Already in storage: skip encoding (and the caller skips the upload)
+        if content_key and is_stored is not None and is_stored(content_key, result['segment_index']):
+            result.update({'video_path': None, 'thumbnail_path': None, 'stored': True, 'file_size': None})
+            encoded[content_key] = (None, None, True)
+            results.append(result)
+            print(f"  ✓ Already stored: {content_key}")
+            continue
+
+        # Encoded by an earlier job that did not get as far as uploading it
+        if (content_key and is_encoded is not None and os.path.exists(output_path)
+                and os.path.exists(thumbnail_path) and is_encoded(content_key)):
+            result['file_size'] = os.path.getsize(output_path)
+            encoded[content_key] = (output_path, thumbnail_path, False)
+            results.append(result)
+            print(f"  ✓ Already encoded: {content_key}")
+            continue
+
+        if not indexed:
+            indexed = True
+            try:
+                keyframes = keyframe_index(video_path)
+            except VideoProcessingError as e:
+                print(f"[Video Processing] No keyframe index, FFmpeg seeks on its own: {e}")
 
         try:
             # Cut the segment
@@ -317,14 +839,11 @@ def split_video_by_timeline(video_path: str, segments: List[Dict], output_folder
                 start_time=start_time,
                 end_time=end_time,
                 remove_audio=remove_audio,
-                codec=codec,
-                preset=preset,
-                crf=crf
+                profile=segment_profile,
+                keyframes=keyframes
             )
 
             # Generate thumbnail (at midpoint of segment)
-            thumbnail_filename = f"{base_name}_seg{idx:03d}_thumb.jpg"
-            thumbnail_path = os.path.join(output_folder, thumbnail_filename)
             thumbnail_timestamp = (start_time + end_time) / 2
 
             generate_thumbnail(
@@ -334,19 +853,12 @@ def split_video_by_timeline(video_path: str, segments: List[Dict], output_folder
             )
 
             # Add result
-            results.append({
-                'segment_index': idx,
-                'video_path': output_path,
-                'thumbnail_path': thumbnail_path,
-                'start_time': start_time,
-                'end_time': end_time,
-                'duration': end_time - start_time,
-                'exercise_name': details.get('name'),
-                'muscle_groups': details.get('muscleGroups', []),
-                'equipment': details.get('equipment', []),
-                'remove_audio': remove_audio,
-                'file_size': os.path.getsize(output_path)
-            })
+            result['file_size'] = os.path.getsize(output_path)
+            results.append(result)
+            if content_key:
+                encoded[content_key] = (output_path, thumbnail_path, False)
+            if on_encoded is not None:
+                on_encoded(result)
 
             print(f"  ✓ Segment saved: {output_filename}")
             print(f"  ✓ Thumbnail saved: {thumbnail_filename}")
@@ -0,0 +1,336 @@
+"""
+Workout Compilation
+Joins library exercise clips (with repeats and rest gaps) into one workout video
+
+Clips cut by cut_video_segment() with the same encoder profile share their
+codec parameters, so they are joined with FFmpeg's concat demuxer and
+stream copy (no re-encoding). Only clips whose parameters differ from the
+majority (another resolution or frame rate, no audio track after
+removeAudio, ...) are re-encoded to match, and rest gaps are encoded once
+per length as black frames with silence.
+
+The compiled video is stored as workouts/<key>.mp4, where the key is a hash
+of the clip storage keys, repeats and rests, so compiling the same workout
+again returns the stored file.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+from collections import Counter
+from typing import Dict, List, Optional
+
+from encoder_profiles import get_profile, profile_args
+from storage import VideoStorage, WORKOUT_FOLDER, IMMUTABLE_CACHE_CONTROL
+from tracing import traced, set_attributes, span
+from video_processing import get_ffmpeg_command, get_ffprobe_command, VideoProcessingError
+
+# Bump to give every compiled workout a new key (e.g. after changing rest clips)
+COMPILE_KEY_VERSION = 1
+
+MAX_WORKOUT_ITEMS = 100
+MAX_REPEAT = 20
+MAX_REST_SECONDS = 600
+
+# Stream parameters that must match for stream-copy concatenation
+VIDEO_FIELDS = ('codec_name', 'profile', 'width', 'height', 'pix_fmt', 'r_frame_rate', 'time_base')
+AUDIO_FIELDS = ('codec_name', 'sample_rate', 'channels', 'channel_layout')
+
+
+def _per_item(value, count: int, name: str, cast) -> List:
+    """Expand a scalar or per-exercise list option to one value per exercise"""
+    if value is None:
+        return [None] * count
+    if isinstance(value, list):
+        if len(value) != count:
+            raise ValueError(f"{name} must have one value per exercise ({count})")
+        return [cast(v) for v in value]
+    return [cast(value)] * count
+
+
+def parse_plan(data: Dict) -> List[Dict]:
+    """
+    Validate a compile request
+
+    Args:
+        data: {"exercise_ids": [...], "repeats": n or [...], "rest_seconds": s or [...]}
+              repeats and rest_seconds are optional, either one value for every
+              exercise or one per exercise; the rest follows each repeat
+
+    Returns:
+        List of {'exercise_id', 'repeat', 'rest'} in workout order
+
+    Raises:
+        ValueError: If the request is invalid
+    """
+    ids = data.get('exercise_ids')
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("exercise_ids must be a non-empty list")
+    if len(ids) > MAX_WORKOUT_ITEMS:
+        raise ValueError(f"At most {MAX_WORKOUT_ITEMS} exercises per workout")
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError("exercise_ids must be integers")
+
+    repeats = _per_item(data.get('repeats'), len(ids), 'repeats', int)
+    rests = _per_item(data.get('rest_seconds'), len(ids), 'rest_seconds', float)
+
+    plan = []
+    for exercise_id, repeat, rest in zip(ids, repeats, rests):
+        repeat = 1 if repeat is None else repeat
+        rest = 0.0 if rest is None else rest
+        if not 1 <= repeat <= MAX_REPEAT:
+            raise ValueError(f"repeats must be between 1 and {MAX_REPEAT}")
+        if not 0 <= rest <= MAX_REST_SECONDS:
+            raise ValueError(f"rest_seconds must be between 0 and {MAX_REST_SECONDS}")
+        plan.append({'exercise_id': exercise_id, 'repeat': repeat, 'rest': round(rest, 3)})
+    return plan
+
+
+def workout_key(items: List[Dict], profile: Dict) -> str:
+    """
+    Cache key of a compiled workout
+
+    Args:
+        items: List of {'key': clip storage key, 'repeat', 'rest'}
+        profile: Encoder profile used for normalized clips and rests
+
+    Returns:
+        40-character hex key
+    """
+    payload = json.dumps([
+        COMPILE_KEY_VERSION,
+        [[item['key'], item['repeat'], item['rest']] for item in items],
+        profile_args(profile)
+    ])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:40]
+
+
+def probe_streams(path: str) -> Dict:
+    """
+    Stream parameters of a clip
+
+    Returns:
+        Dictionary with 'duration', 'video' (VIDEO_FIELDS) and 'audio'
+        (AUDIO_FIELDS, or None without an audio track)
+
+    Raises:
+        VideoProcessingError: If FFprobe fails or there is no video stream
+    """
+    cmd = [
+        get_ffprobe_command(),
+        '-v', 'error',
+        '-show_entries', f"format=duration:stream=codec_type,{','.join(dict.fromkeys(VIDEO_FIELDS + AUDIO_FIELDS))}",
+        '-of', 'json',
+        path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        data = json.loads(result.stdout)
+    except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
+        raise VideoProcessingError(f"Failed to probe {path}: {e}")
+
+    streams = data.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    if video is None:
+        raise VideoProcessingError(f"No video stream found in {path}")
+
+    return {
+        'duration': float(data.get('format', {}).get('duration', 0)),
+        'video': {field: video.get(field) for field in VIDEO_FIELDS},
+        'audio': {field: audio.get(field) for field in AUDIO_FIELDS} if audio else None
+    }
+
+
+def _signature(streams: Dict):
+    audio = streams['audio']
+    return (
+        tuple(streams['video'][f] for f in VIDEO_FIELDS),
+        tuple(audio[f] for f in AUDIO_FIELDS) if audio else None
+    )
+
+
+def choose_target(probes: List[Dict]) -> Dict:
+    """
+    Stream parameters every clip is made to match
+
+    The most common H.264 video parameters win (the encoder can only
+    produce H.264). Audio is kept if any clip has it, using the most common
+    audio parameters.
+    """
+    h264 = [p['video'] for p in probes if p['video']['codec_name'] == 'h264']
+    candidates = h264 or [dict(probes[0]['video'], codec_name='h264', profile=None)]
+    counts = Counter(tuple(v[f] for f in VIDEO_FIELDS) for v in candidates)
+    video = dict(zip(VIDEO_FIELDS, counts.most_common(1)[0][0]))
+
+    audio_counts = Counter(tuple(p['audio'][f] for f in AUDIO_FIELDS) for p in probes if p['audio'])
+    audio = dict(zip(AUDIO_FIELDS, audio_counts.most_common(1)[0][0])) if audio_counts else None
+    return {'video': video, 'audio': audio}
+
+
+def _run_ffmpeg(cmd: List[str], what: str) -> None:
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"[FFmpeg Error] {what}: {e.stderr}")
+        raise VideoProcessingError(f"Failed to {what}: {e.stderr[-500:]}")
+
+
+def _encode_args(target: Dict, profile: Dict) -> List[str]:
+    """Encoder arguments that reproduce the target parameters"""
+    video, audio = target['video'], target['audio']
+    args = profile_args(profile) + ['-pix_fmt', video['pix_fmt'] or 'yuv420p']
+    if video['time_base']:
+        # Same MP4 timescale as the stream-copied clips
+        args.extend(['-video_track_timescale', video['time_base'].split('/')[-1]])
+    if audio:
+        args.extend(['-c:a', 'aac', '-b:a', '128k', '-ar', str(audio['sample_rate']), '-ac', str(audio['channels'])])
+    return args
+
+
+def _silence_input(target: Dict) -> List[str]:
+    audio = target['audio']
+    layout = audio['channel_layout'] or ('mono' if audio['channels'] == 1 else 'stereo')
+    return ['-f', 'lavfi', '-i', f"anullsrc=r={audio['sample_rate']}:cl={layout}"]
+
+
+def normalize_clip(input_path: str, output_path: str, source: Dict, target: Dict, profile: Dict) -> None:
+    """Re-encode a clip to the target stream parameters (scaled and padded to size)"""
+    video = target['video']
+    filters = (
+        f"scale={video['width']}:{video['height']}:force_original_aspect_ratio=decrease,"
+        f"pad={video['width']}:{video['height']}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={video['r_frame_rate']}"
+    )
+    cmd = [get_ffmpeg_command(), '-y', '-i', input_path]
+    maps = ['-map', '0:v:0']
+    if target['audio']:
+        if source['audio']:
+            maps.extend(['-map', '0:a:0'])
+        else:
+            cmd.extend(_silence_input(target))
+            maps.extend(['-map', '1:a', '-shortest'])
+    cmd.extend(maps + ['-vf', filters] + _encode_args(target, profile) + [output_path])
+
+    with span('ffmpeg.normalize', input=os.path.basename(input_path)):
+        _run_ffmpeg(cmd, f"normalize {os.path.basename(input_path)}")
+
+
+def rest_clip(output_path: str, seconds: float, target: Dict, profile: Dict) -> None:
+    """Encode a black (and silent) clip of the given length"""
+    video = target['video']
+    cmd = [
+        get_ffmpeg_command(), '-y',
+        '-f', 'lavfi', '-i', f"color=c=black:s={video['width']}x{video['height']}:r={video['r_frame_rate']}"
+    ]
+    if target['audio']:
+        cmd.extend(_silence_input(target))
+    cmd.extend(['-t', str(seconds)] + _encode_args(target, profile) + [output_path])
+
+    with span('ffmpeg.rest', seconds=seconds):
+        _run_ffmpeg(cmd, f"encode {seconds}s rest")
+
+
+def _concat_line(path: str) -> str:
+    # Concat demuxer quoting: wrap in single quotes, escape embedded ones
+    return "file '" + path.replace("'", "'\\''") + "'\n"
+
+
+def _fetch_clip(storage: VideoStorage, key: str, workdir: str, index: int) -> str:
+    """Local path of a stored clip (downloaded into workdir if the backend has none)"""
+    local_path = storage.get_local_path(key)
+    if local_path is not None:
+        return local_path
+    local_path = os.path.join(workdir, f"clip_{index}{os.path.splitext(key)[1] or '.mp4'}")
+    storage.download(key, local_path)
+    return local_path
+
+
+@traced('compile_workout')
+def compile_workout(storage: VideoStorage, items: List[Dict], profile: Optional[str] = None) -> Dict:
+    """
+    Compile clips into one stored workout video
+
+    Args:
+        storage: Storage backend holding the clips and the compiled result
+        items: List of {'key': clip storage key, 'repeat': n, 'rest': seconds after each repeat}
+        profile: Encoder profile for normalized clips and rests (default: ENCODER_PROFILE)
+
+    Returns:
+        Dictionary with 'key', 'url', 'cached', and for new compilations
+        'duration', 'clips', 'stream_copied' and 'normalized'
+
+    Raises:
+        VideoProcessingError: If probing or FFmpeg fails
+    """
+    encoder = get_profile(profile)
+    key = workout_key(items, encoder)
+    storage_key = f"{WORKOUT_FOLDER}/{key}.mp4"
+    set_attributes(key=key, items=len(items))
+
+    if storage.exists(storage_key):
+        print(f"[Compile] Reusing stored workout {storage_key}")
+        return {'key': key, 'url': storage.get_url(storage_key), 'cached': True}
+
+    with tempfile.TemporaryDirectory(prefix='compile_') as workdir:
+        clip_paths = {}
+        for item in items:
+            if item['key'] not in clip_paths:
+                clip_paths[item['key']] = _fetch_clip(storage, item['key'], workdir, len(clip_paths))
+
+        probes = {clip_key: probe_streams(path) for clip_key, path in clip_paths.items()}
+        target = choose_target(list(probes.values()))
+        target_signature = _signature(target)
+
+        # Re-encode only the clips that cannot be stream-copied alongside the rest
+        normalized = 0
+        for index, (clip_key, path) in enumerate(list(clip_paths.items())):
+            if _signature(probes[clip_key]) != target_signature:
+                print(f"[Compile] Normalizing {clip_key} (parameters differ)")
+                normalized_path = os.path.join(workdir, f"normalized_{index}.mp4")
+                normalize_clip(path, normalized_path, probes[clip_key], target, encoder)
+                clip_paths[clip_key] = normalized_path
+                normalized += 1
+
+        rests = {}
+        lines = []
+        duration = 0.0
+        for position, item in enumerate(items):
+            for repeat in range(item['repeat']):
+                lines.append(_concat_line(os.path.abspath(clip_paths[item['key']])))
+                duration += probes[item['key']]['duration']
+                last = position == len(items) - 1 and repeat == item['repeat'] - 1
+                if item['rest'] > 0 and not last:
+                    if item['rest'] not in rests:
+                        rests[item['rest']] = os.path.join(workdir, f"rest_{len(rests)}.mp4")
+                        rest_clip(rests[item['rest']], item['rest'], target, encoder)
+                    lines.append(_concat_line(os.path.abspath(rests[item['rest']])))
+                    duration += item['rest']
+
+        list_path = os.path.join(workdir, 'concat.txt')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+
+        output_path = os.path.join(workdir, f"{key}.mp4")
+        cmd = [
+            get_ffmpeg_command(), '-y',
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-c', 'copy', '-movflags', '+faststart',
+            output_path
+        ]
+        print(f"[Compile] Concatenating {len(lines)} clips ({normalized} normalized, {len(rests)} rest lengths)")
+        with span('ffmpeg.concat', clips=len(lines)):
+            _run_ffmpeg(cmd, 'concatenate clips')
+
+        storage.save(output_path, f"{key}.mp4", folder=WORKOUT_FOLDER, cache_control=IMMUTABLE_CACHE_CONTROL)
+
+    return {
+        'key': key,
+        'url': storage.get_url(storage_key),
+        'cached': False,
+        'duration': round(duration, 3),
+        'clips': len(lines),
+        'stream_copied': len(clip_paths) - normalized,
+        'normalized': normalized
+    }